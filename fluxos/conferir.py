@@ -3,31 +3,26 @@
 from playwright.sync_api import TimeoutError, Page, expect
 import time
 import re
-from unidecode import unidecode
 from loguru import logger
-from rapidfuzz import process, fuzz # <--- Usa a busca robusta
+from utils.correspondencia import correspondente, normalizar_texto
+from typing import TYPE_CHECKING
 from dados.dataclass import Carga
 from utils.watchdog import TimeoutDetector
+from utils.esperas import aguardar_estado, aguardar_spinner
+from utils.digitacao import preencher_autocomplete, preencher_mascarado
 
+if TYPE_CHECKING:
+    from utils.cache_opcoes import CacheOpcoes
 
-def normalizar_texto(texto: str) -> str:
-    if not isinstance(texto, str):
-        return ""
-    texto_sem_underscore = texto.replace('_', ' ')
-    texto_base = unidecode(texto_sem_underscore.lower())
-    texto_limpo = ' '.join(texto_base.split())
-    return texto_limpo
 
-
-def escolher_opcao_mais_parecida(page: Page, texto_busca: str):
+def escolher_opcao_mais_parecida(page: Page, texto_busca: str, campo: str = "opcao"):
+    """Clica na opção mais parecida com `texto_busca`. Retorna o rótulo clicado (ou False)."""
     try:
         page.wait_for_selector("[role='option']", timeout=20000)  # Reduzido de 120000ms para 20s 
     except TimeoutError:
         logger.warning(f"[Worker Conferência] Dropdown de opções não carregou (timeout) para '{texto_busca}'")
         return False
 
-    texto_busca_norm = normalizar_texto(texto_busca)
-
     opcoes_locator = page.locator("[role='option']")
     try:
         todos_os_textos = opcoes_locator.all_inner_texts()
@@ -38,33 +33,66 @@ def escolher_opcao_mais_parecida(page: Page, texto_busca: str):
         logger.warning(f"[Worker Conferência] Não foi possível extrair textos das opções para '{texto_busca}': {e}")
         return False
 
-    mapa_de_textos = {normalizar_texto(t): t for t in todos_os_textos}
-
-    melhor_match = process.extractOne(
-        texto_busca_norm,
-        mapa_de_textos.keys(),
-        scorer=fuzz.WRatio, 
-        score_cutoff=30
-    )
-
-    if melhor_match:
-        texto_normalizado_encontrado, score, _ = melhor_match
-        texto_original_da_opcao = mapa_de_textos[texto_normalizado_encontrado]
-
-        logger.debug(f"[Worker Conferência] Match para '{texto_busca}': '{texto_original_da_opcao}' (Score: {score:.2f})")
+    resultado = correspondente.melhor(campo, todos_os_textos, texto_busca)
+
+    if resultado:
+        texto_original_da_opcao = resultado.rotulo
+        if resultado.ambiguo:
+            logger.warning(
+                f"[Worker Conferência] Match ambíguo para '{texto_busca}': '{texto_original_da_opcao}' "
+                f"(Score: {resultado.score:.2f}, margem para a 2ª opção: {resultado.margem:.2f})"
+            )
+        else:
+            logger.debug(f"[Worker Conferência] Match para '{texto_busca}': '{texto_original_da_opcao}' (Score: {resultado.score:.2f})")
         opcoes_locator.get_by_text(texto_original_da_opcao, exact=True).click()
-        return True
+        return texto_original_da_opcao
     else:
-        logger.warning(f"[Worker Conferência] Nenhuma opção correspondente encontrada para '{texto_busca_norm}' (Score < 30).")
+        logger.warning(f"[Worker Conferência] Nenhuma opção correspondente encontrada para '{normalizar_texto(texto_busca)}' (Score < 30).")
         return False
 
+def preencher_opcao(page: Page, campo: str, nome_textbox: str, texto: str, cache_opcoes: "CacheOpcoes | None" = None):
+    """
+    Preenche um autocomplete de cadastro (Expedidor, Tomador, Recebedor).
+
+    Com o rótulo já conhecido no cache, digita-o e clica na opção exata.
+    Senão: busca aproximada pelo texto e, se falhar, pelo "nome limpo".
+    Levanta ValueError se nenhuma opção servir.
+    """
+    textbox = page.get_by_role("textbox", name=nome_textbox)
+
+    rotulo = cache_opcoes.obter(campo, texto) if cache_opcoes else None
+    if rotulo:
+        preencher_autocomplete(page, textbox, rotulo, campo)
+        try:
+            page.locator("[role='option']").get_by_text(rotulo, exact=True).first.click(timeout=5000)
+            logger.debug(f"[Worker Conferência] '{nome_textbox}': opção '{rotulo}' reaproveitada do cache.")
+            return
+        except TimeoutError:
+            logger.info(f"[Worker Conferência] Opção em cache '{rotulo}' não apareceu para '{nome_textbox}'. Invalidando.")
+            cache_opcoes.invalidar(campo, texto)
+
+    preencher_autocomplete(page, textbox, texto, campo)
+    rotulo = escolher_opcao_mais_parecida(page, texto, campo) # Tentativa 1
+    if not rotulo:
+        logger.warning(f"[Worker Conferência] Primeira tentativa de '{nome_textbox}' falhou. Tentando nome limpo.")
+        nome_limpo = texto.rsplit("_")[-1].rsplit("-")[-1].strip()
+        preencher_autocomplete(page, textbox, nome_limpo, campo)
+        rotulo = escolher_opcao_mais_parecida(page, nome_limpo, campo) # Tentativa 2
+        if not rotulo:
+            raise ValueError(f"Opção de {campo} não encontrada após 2 tentativas.")
+
+    if cache_opcoes:
+        cache_opcoes.salvar(campo, texto, rotulo)
+
+
 # ==============================================================================
 # ETAPA PRINCIPAL: FUNÇÃO DE CONFERÊNCIA DA CARGA
 # ==============================================================================
 
-def conferir_lt(page: Page, carga: Carga) -> dict:
+def conferir_lt(page: Page, carga: Carga, cache_opcoes: "CacheOpcoes | None" = None) -> dict:
     """
     Executa o RPA de conferência.
+    `cache_opcoes` (opcional) reaproveita as opções já resolvidas de Expedidor/Tomador/Recebedor.
     Retorna um dicionário com o resultado:
     - {"status": "sucesso"}
     - {"status": "falha_cadastro", "motivo": "..."}
@@ -114,8 +142,7 @@ def conferir_lt(page: Page, carga: Carga) -> dict:
             try:
                 if not carga.placa: raise ValueError("Placa principal não fornecida.")
                 principal_input = page.get_by_role("textbox", name="Placa principal")
-                principal_input.fill("")
-                principal_input.type(carga.placa, delay=50)
+                preencher_autocomplete(page, principal_input, carga.placa, "placa_principal")
                 page.get_by_role("option", name=carga.placa).click(timeout=7000)
             except (TimeoutError, ValueError):
                 return cancelar_e_sair(campo="Placa Principal", valor=carga.placa)
@@ -129,8 +156,7 @@ def conferir_lt(page: Page, carga: Carga) -> dict:
                         page.get_by_role("textbox", name="Placas").click()
                         expect(page.get_by_role("textbox", name="Placa", exact=True)).to_be_visible()
                         placa2_input = page.get_by_role("textbox", name="Placa", exact=True)
-                        placa2_input.fill("")
-                        placa2_input.type(carga.placa2, delay=50)
+                        preencher_autocomplete(page, placa2_input, carga.placa2, "placa_secundaria")
                         page.get_by_role("option", name=carga.placa2).click(timeout=120000)
                         page.get_by_role("button", name="Salvar").click()
                 except (TimeoutError, ValueError):
@@ -140,50 +166,23 @@ def conferir_lt(page: Page, carga: Carga) -> dict:
         # Este 'try' agora captura o 'raise ValueError' se as 2 tentativas falharem
         with TimeoutDetector("Preencher Expedidor", max_seconds=20, job_id=carga.numero_lt):
             try:
-                expedidor_input = page.get_by_role("textbox", name="Expedidor")
-                expedidor_input.fill("")
-                expedidor_input.type(carga.origem, delay=50)
-                if not escolher_opcao_mais_parecida(page, carga.origem): # Tentativa 1
-                    logger.warning(f"[Worker Conferência] Primeira tentativa de 'Expedidor' falhou. Tentando nome limpo.")
-                    expedidor_input.fill("")
-                    nome_limpo = carga.origem.rsplit("_")[-1].rsplit("-")[-1].strip()
-                    expedidor_input.type(nome_limpo, delay=50)
-                    if not escolher_opcao_mais_parecida(page, nome_limpo): # Tentativa 2
-                        raise ValueError("Opção de expedidor não encontrada após 2 tentativas.")
-            except (TimeoutError, ValueError) as e:
+                preencher_opcao(page, "expedidor", "Expedidor", carga.origem, cache_opcoes)
+            except (TimeoutError, ValueError):
                 return cancelar_e_sair(campo="Expedidor", valor=carga.origem)
 
         # Tomador
         # Este 'try' agora captura o 'raise ValueError' se as 2 tentativas falharem
         with TimeoutDetector("Preencher Tomador", max_seconds=20, job_id=carga.numero_lt):
             try:
-                tomador_input = page.get_by_role("textbox", name="Tomador")
-                tomador_input.fill("")
-                tomador_input.type(carga.origem, delay=50)
-                if not escolher_opcao_mais_parecida(page, carga.origem): # Tentativa 1
-                    logger.warning(f"[Worker Conferência] Primeira tentativa de 'Tomador' falhou. Tentando nome limpo.")
-                    tomador_input.fill("")
-                    nome_limpo = carga.origem.rsplit("_")[-1].rsplit("-")[-1].strip()
-                    tomador_input.type(nome_limpo, delay=50)
-                    if not escolher_opcao_mais_parecida(page, nome_limpo): # Tentativa 2
-                        raise ValueError("Opção de tomador não encontrada após 2 tentativas.")
-            except (TimeoutError, ValueError) as e:
+                preencher_opcao(page, "tomador", "Tomador", carga.origem, cache_opcoes)
+            except (TimeoutError, ValueError):
                 return cancelar_e_sair(campo="Tomador", valor=carga.origem)
 
         # Recebedor
         with TimeoutDetector("Preencher Recebedor", max_seconds=20, job_id=carga.numero_lt):
             try:
-                recebedor_input = page.get_by_role("textbox", name="Recebedor")
-                recebedor_input.fill("")
-                recebedor_input.type(carga.destino, delay=50)
-                if not escolher_opcao_mais_parecida(page, carga.destino): # Tentativa 1
-                    logger.warning(f"[Worker Conferência] Primeira tentativa de 'Recebedor' falhou. Tentando nome limpo.")
-                    recebedor_input.fill("")
-                    nome_limpo = carga.destino.rsplit("_")[-1].rsplit("-")[-1].strip()
-                    recebedor_input.type(nome_limpo, delay=50)
-                    if not escolher_opcao_mais_parecida(page, nome_limpo): # Tentativa 2
-                        raise ValueError("Opção de recebedor não encontrada após 2 tentativas.")
-            except (TimeoutError, ValueError) as e:
+                preencher_opcao(page, "recebedor", "Recebedor", carga.destino, cache_opcoes)
+            except (TimeoutError, ValueError):
                 return cancelar_e_sair(campo="Recebedor", valor=carga.destino)
         
         # Motorista
@@ -192,8 +191,7 @@ def conferir_lt(page: Page, carga: Carga) -> dict:
             try:
                 if not carga.motorista: raise ValueError("Motorista não fornecido.")
                 motorista_input = page.get_by_role("textbox", name="Motoristas")
-                motorista_input.fill("")
-                motorista_input.type(carga.motorista, delay=50)
+                preencher_autocomplete(page, motorista_input, carga.motorista, "motorista")
                 page.get_by_role("option").first.click(timeout=7000)
             except (TimeoutError, ValueError):
                 return cancelar_e_sair(campo="Motorista", valor=carga.motorista)
@@ -212,8 +210,9 @@ def conferir_lt(page: Page, carga: Carga) -> dict:
             valor_ciot_formatado = f"{valor_ciot:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
             page.locator("div").filter(has_text=re.compile(r"^R\$Valor$")).get_by_placeholder("0,00").fill(valor_formatado)
             page.locator("div").filter(has_text=re.compile(r"^R\$Valor CIOT$")).get_by_placeholder("0,00").fill(valor_ciot_formatado)
-            page.locator("input[name=\"percAdiantamentoCiot\"]").click()
-            page.locator("input[name=\"percAdiantamentoCiot\"]").type("70,00")
+            perc_adiantamento_input = page.locator("input[name=\"percAdiantamentoCiot\"]")
+            perc_adiantamento_input.click()
+            preencher_mascarado(perc_adiantamento_input, "70,00", "perc_adiantamento_ciot")
             
             page.get_by_role("checkbox", name="Emitir Averbação").uncheck()
 
@@ -227,22 +226,25 @@ def conferir_lt(page: Page, carga: Carga) -> dict:
             page.get_by_role("option", name="Line Haul").click()
 
             transportadora_input = page.get_by_role("textbox", name="Transportadora*")
-            transportadora_input.clear()
-            transportadora_input.type("3ZX", delay=50)
+            preencher_autocomplete(page, transportadora_input, "3ZX", "transportadora")
             page.get_by_role("option", name="34.790.798/0001-34 - 3ZX SP").click()
 
             tipo_veiculo_input = page.get_by_role("textbox", name="Tipo de Veículo")
-            tipo_veiculo_input.clear()
-            tipo_veiculo_input.type(carga.perfil, delay=50)
+            preencher_autocomplete(page, tipo_veiculo_input, carga.perfil, "tipo_veiculo")
             page.get_by_role("option", name=carga.perfil, exact=True).click()
         # --- (Fim do preenchimento) ---
 
         # ETAPA 5: Finalização
         with TimeoutDetector("Submeter formulário EmiteAí", max_seconds=30, job_id=carga.numero_lt):
             page.get_by_role("button", name="EmiteAí").click()
-            time.sleep(2)
-            page.get_by_role("button", name="Sim").click()
-        time.sleep(5) # Espera o processamento
+            botao_sim = page.get_by_role("button", name="Sim")
+            aguardar_estado(botao_sim, "conferir_lt:confirmacao", "visible", timeout_ms=10000)
+            botao_sim.click()
+        # Espera o processamento: formulário fechado e sem indicador de carregamento
+        aguardar_estado(
+            page.get_by_role("textbox", name="Placa principal"), "conferir_lt:processamento", "hidden", timeout_ms=15000
+        )
+        aguardar_spinner(page, "conferir_lt:spinner", timeout_ms=10000)
         
         logger.success(f"[Worker Conferência] Conferência da LT {carga.numero_lt} concluída com sucesso (RPA).")
         return {"status": "sucesso"}
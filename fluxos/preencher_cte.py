@@ -1,33 +1,51 @@
 import re
 from playwright.sync_api import Page, Locator, TimeoutError
 from loguru import logger
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+from utils.abas_detalhe import aprender_rota
+from utils.estado_pagina import estado_da_pagina
 from utils.fluxo_utils import extrair_dados_dos_cards_cte 
 
 
-def preencher_cte(page: Page, card: Locator, numero_lt: str) -> Dict[str, Any]:
+def localizar_botao_cte(card: Locator) -> Tuple[Optional[Locator], Optional[Dict[str, Any]]]:
+    """Botão 'Autorizado' da linha do CT-e, ou o resultado de falha se ele não existir."""
+    cte_label = card.locator("div", has_text=re.compile(r"^\s*CT-e\s*$"))
+    if cte_label.count() == 0:
+        return None, {"status": "falha_rpa", "motivo": "A etiqueta 'CT-e' não foi encontrada no card."}
+
+    cte_row_container = cte_label.first.locator("xpath=..")
+    botao_autorizado = cte_row_container.locator('button:has(span[style*="margin-top"])').first
+
+    if botao_autorizado.count() == 0:
+        return None, {"status": "falha_rpa", "motivo": "Botão 'Autorizado' não encontrado na linha do CT-e."}
+    return botao_autorizado, None
+
+
+def preencher_cte(page: Page, card: Locator, numero_lt: str, aba: Optional[Page] = None) -> Dict[str, Any]:
+    """
+    Extrai números e valor total dos CT-es da LT.
+
+    Com `aba` (tela de CT-es já aberta em uma aba secundária) os dados são
+    lidos dela e a aba principal não sai da vista de Cards.
+    """
     try:
-        # 1. ENCONTRAR O BOTÃO DE AUTORIZADO
-        cte_label = card.locator("div", has_text=re.compile(r"^\s*CT-e\s*$"))
-        if cte_label.count() == 0:
-            motivo = f"A etiqueta 'CT-e' não foi encontrada no card."
-            logger.error(f"[Worker Emissão] [LT {numero_lt}] {motivo}")
-            return {"status": "falha_rpa", "motivo": motivo}
-
-        cte_row_container = cte_label.first.locator("xpath=..")
-        botao_autorizado = cte_row_container.locator('button:has(span[style*="margin-top"])').first
-
-        if botao_autorizado.count() == 0:
-            motivo = "Botão 'Autorizado' não encontrado na linha do CT-e."
-            logger.error(f"[Worker Emissão] [LT {numero_lt}] {motivo}")
-            return {"status": "falha_rpa", "motivo": motivo}
-            
-        # 2. CLICAR E NAVEGAR
-        with page.expect_navigation(wait_until="domcontentloaded", timeout=30000):
-            botao_autorizado.click()
+        if aba is None:
+            # 1. ENCONTRAR O BOTÃO DE AUTORIZADO
+            botao_autorizado, falha = localizar_botao_cte(card)
+            if falha:
+                logger.error(f"[Worker Emissão] [LT {numero_lt}] {falha['motivo']}")
+                return falha
+                
+            # 2. CLICAR E NAVEGAR
+            with page.expect_navigation(wait_until="domcontentloaded", timeout=30000):
+                botao_autorizado.click()
+            aprender_rota("cte", page.url, numero_lt)
+            estado = estado_da_pagina(page)
+            if estado:
+                estado.invalidar("tela de CT-e")
 
         # 3. EXTRAIR OS DADOS DA NOVA PÁGINA
-        dados_ctes = extrair_dados_dos_cards_cte(page, numero_lt)
+        dados_ctes = extrair_dados_dos_cards_cte(aba or page, numero_lt)
         
         if not dados_ctes:
             motivo = "Nenhum dado de CT-e foi extraído após o clique."
@@ -1,40 +1,66 @@
 import re
 from playwright.sync_api import Page, Locator, TimeoutError
 from loguru import logger
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+from utils.abas_detalhe import aprender_rota
+from utils.captura_rede import captura_da_pagina
+from utils.estado_pagina import estado_da_pagina
 from utils.fluxo_utils import extrair_dados_dos_cards_mdfe
 
 
-def preencher_mdfe(page: Page, card: Locator, numero_lt: str) -> Dict[str, Any]:
+def localizar_botao_mdfe(card: Locator, numero_lt: str) -> Tuple[Optional[Locator], Optional[Dict[str, Any]]]:
+    """Botão de status 'Autorizado' do MDF-e, ou o resultado que encerra o fluxo."""
+    # 1. Localiza o rótulo "MDF-e" (seu seletor original)
+    mdfe_label = card.locator("div").filter(has_text=re.compile(r"^MDF-eAutorizado$")).get_by_role("button")
+    if mdfe_label.count() == 0:
+        motivo = "Nenhuma seção MDF-e encontrada no card."
+        return None, {"status": "nao_aplicavel", "motivo": motivo} # <--- MUDANÇA
+
+    # 2. Encontra o container da "linha" (seu seletor original)
+    mdfe_row_container = mdfe_label.first.locator("xpath=../..")
+
+    # 3. Dentro do container, localiza o botão de status.
+    botao_status_mdfe = mdfe_row_container.locator("button")
+    if botao_status_mdfe.count() == 0:
+        motivo = "Botão de status não encontrado na linha do MDF-e."
+        logger.error(f"[Worker Emissão] [LT {numero_lt}] {motivo}")
+        return None, {"status": "falha_rpa", "motivo": motivo} # <--- MUDANÇA
+
+    # 4. Verificação de status (só clica se for 'Autorizado')
+    status_texto = botao_status_mdfe.first.inner_text().strip()
+    if "autorizado" not in status_texto.lower():
+        motivo = f"MDF-e não está 'Autorizado' (Status: {status_texto})."
+        return None, {"status": "nao_aplicavel", "motivo": motivo} # <--- MUDANÇA
+
+    return botao_status_mdfe, None
+
+
+def preencher_mdfe(page: Page, card: Locator, numero_lt: str, aba: Optional[Page] = None) -> Dict[str, Any]:
+    """
+    Extrai números e chaves dos MDF-es da LT.
+
+    Com `aba` (tela de MDF-es já aberta em uma aba secundária) os dados são
+    lidos dela e a aba principal não sai da vista de Cards.
+    """
     try:
-        # 1. Localiza o rótulo "MDF-e" (seu seletor original)
-        mdfe_label = card.locator("div").filter(has_text=re.compile(r"^MDF-eAutorizado$")).get_by_role("button")
-        if mdfe_label.count() == 0:
-            motivo = "Nenhuma seção MDF-e encontrada no card."
-            return {"status": "nao_aplicavel", "motivo": motivo} # <--- MUDANÇA
-
-        # 2. Encontra o container da "linha" (seu seletor original)
-        mdfe_row_container = mdfe_label.first.locator("xpath=../..")
-
-        # 3. Dentro do container, localiza o botão de status.
-        botao_status_mdfe = mdfe_row_container.locator("button")
-        if botao_status_mdfe.count() == 0:
-            motivo = "Botão de status não encontrado na linha do MDF-e."
-            logger.error(f"[Worker Emissão] [LT {numero_lt}] {motivo}")
-            return {"status": "falha_rpa", "motivo": motivo} # <--- MUDANÇA
-
-        # 4. Verificação de status (só clica se for 'Autorizado')
-        status_texto = botao_status_mdfe.first.inner_text().strip()
-        if "autorizado" not in status_texto.lower():
-            motivo = f"MDF-e não está 'Autorizado' (Status: {status_texto})."
-            return {"status": "nao_aplicavel", "motivo": motivo} # <--- MUDANÇA
-
-        # 5. CAMINHO FELIZ: Clicar e extrair
-        with page.expect_navigation(wait_until="domcontentloaded", timeout=30000):
-            botao_status_mdfe.click()
+        if aba is None:
+            botao_status_mdfe, resultado = localizar_botao_mdfe(card, numero_lt)
+            if resultado:
+                return resultado
+
+            # 5. CAMINHO FELIZ: Clicar e extrair (a lista de MDF-es que a página baixar fica capturada)
+            captura = captura_da_pagina(page)
+            if captura:
+                captura.limpar("mdfe")
+            with page.expect_navigation(wait_until="domcontentloaded", timeout=30000):
+                botao_status_mdfe.click()
+            aprender_rota("mdfe", page.url, numero_lt)
+            estado = estado_da_pagina(page)
+            if estado:
+                estado.invalidar("tela de MDF-e")
         
         # 6. Extrair dados da nova página
-        dados_mdfes = extrair_dados_dos_cards_mdfe(page)
+        dados_mdfes = extrair_dados_dos_cards_mdfe(aba or page)
         if not dados_mdfes:
             motivo = "Nenhum dado de MDF-e foi extraído após o clique."
             logger.warning(f"[Worker Emissão] [LT {numero_lt}] {motivo}")
@@ -3,6 +3,8 @@ import time
 import re
 from loguru import logger
 from typing import Dict, Any
+from utils.esperas import aguardar_estado
+from utils.digitacao import preencher_autocomplete
 
 
 def revisar_lt(page: Page, numero_lt: str) -> Dict[str, Any]:
@@ -23,21 +25,23 @@ def revisar_lt(page: Page, numero_lt: str) -> Dict[str, Any]:
 
         # 2. EXECUTAR A CADEIA DE CLIQUES
         card_locator.nth(0).locator("button").first.click()
-        time.sleep(1)
+        menu_conferir = page.get_by_role("menuitem", name="Conferir Carga")
+        aguardar_estado(menu_conferir, "revisar_lt:menu", "visible", timeout_ms=5000)
 
-        page.get_by_role("menuitem", name="Conferir Carga").click()
+        menu_conferir.click()
         page.get_by_role("button", name="Próximo").click()
         page.get_by_role("button", name="Próximo").click()
         page.get_by_role("button", name="Próximo").click()
         page.get_by_role("textbox", name="Componente").click()
 
         expect(page.get_by_role("textbox", name="Componente")).to_be_visible(timeout=10000)
-        page.get_by_role("textbox", name="Componente").type("gris")
+        preencher_autocomplete(page, page.get_by_role("textbox", name="Componente"), "gris", "componente")
         page.get_by_role("option", name="GRIS").click()
         page.get_by_role("button", name="Próximo").click()
-        page.get_by_role("button", name="EmiteAí!").click()
-
-        time.sleep(2) # Mantido do original
+        botao_emitir = page.get_by_role("button", name="EmiteAí!")
+        botao_emitir.click()
+        # O envio terminou quando o passo final do assistente fecha
+        aguardar_estado(botao_emitir, "revisar_lt:envio", "hidden", timeout_ms=10000)
         
         # Tenta fechar o modal/popup (opcional)
         try:
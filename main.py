@@ -1,8 +1,10 @@
 import os
+import signal
 import threading
 import time
 import sys
 import json
+from contextlib import nullcontext
 from playwright.sync_api import sync_playwright
 from loguru import logger
 from typing import Dict, Any
@@ -32,6 +34,12 @@ except ImportError:
     logger.critical("Não foi possível encontrar 'utils.watchdog.JobWatchdog'.")
     exit(1)
 
+try:
+    from utils.memoria import obter_pid_driver
+except ImportError:
+    logger.critical("Não foi possível encontrar 'utils.memoria.obter_pid_driver'.")
+    exit(1)
+
 try:
     from utils.status_display import StatusDisplay
 except ImportError:
@@ -41,6 +49,10 @@ except ImportError:
 from workers.fluxo_conferencia import fluxo_conferencia_worker
 from workers.fluxo_verificar_emissao import fluxo_verificar_emissao_worker
 from fluxos.fluxo_login import fluxo_login
+from utils.metricas import metricas
+from utils.roteamento import PoliticaRoteamento
+from utils.servidor_navegador import ServidorNavegador
+from utils.sessao import SessaoPortal
 
 
 # --- Configuração do Logger para APENAS logs importantes ---
@@ -79,6 +91,79 @@ if not USUARIO or not SENHA:
     logger.critical("Variáveis RPA_USUARIO/RPA_SENHA não configuradas. Defina-as no ambiente.")
     exit(1)
 
+# ===================================================================
+# NAVEGADOR DO WORKER
+# ===================================================================
+def _abrir_navegador(playwright, servidor):
+    """
+    Conecta ao navegador compartilhado (ServidorNavegador) ou, sem ele ou se
+    a conexão falhar, lança um Firefox próprio.
+
+    Returns:
+        (browser, modo), com modo "servidor" ou "local"
+    """
+    endpoint = servidor.endpoint() if servidor else None
+    if endpoint:
+        try:
+            return playwright.firefox.connect(endpoint, timeout=servidor.timeout_conexao_ms), "servidor"
+        except Exception as e:
+            logger.warning(f"Falha ao conectar ao navegador compartilhado ({e}). Lançando um navegador próprio.")
+    return playwright.firefox.launch(headless=True), "local"
+
+
+# ===================================================================
+# ABERTURA DA SESSÃO DO WORKER
+# ===================================================================
+def _abrir_sessao(browser, config: Dict[str, Any], nome_fluxo: str):
+    """
+    Cria o contexto do worker e o deixa logado: reaproveita a sessão salva
+    (SessaoPortal) ou faz o login com retry.
+
+    Returns:
+        (context, page), com page None se todas as tentativas de login falharem
+    """
+    # Sessão salva por outro worker: o contexto já nasce logado (partida rápida)
+    sessao = SessaoPortal.from_config(config)
+    estado_salvo = sessao.estado_salvo() if sessao else None
+    context = browser.new_context(storage_state=estado_salvo) if estado_salvo else browser.new_context()
+    # Aborta imagens, fontes e terceiros (menos banda a cada reload/goto)
+    politica_rotas = PoliticaRoteamento.from_config(config)
+    if politica_rotas:
+        politica_rotas.aplicar(context)
+    page = context.new_page()
+
+    login_ok = bool(estado_salvo) and sessao.restaurar(page)
+    if login_ok:
+        logger.success(f"Sessão salva reaproveitada para '{nome_fluxo}' (login dispensado).")
+    else:
+        page.goto("https://portal.emiteai.com.br/#/login")
+
+    # Tenta login com retry e backoff exponencial
+    for login_attempt in range(1, 4):  # 3 tentativas
+        if login_ok:
+            break
+        logger.info(f"Tentativa de login {login_attempt}/3 para worker '{nome_fluxo}'...")
+        login_ok = fluxo_login(page=page, usuario=USUARIO, senha=SENHA)
+        if login_ok:
+            logger.success(f"Login realizado com sucesso para '{nome_fluxo}' na tentativa {login_attempt}.")
+            if sessao:
+                sessao.salvar(context)
+            break
+
+        logger.warning(f"Login falhou na tentativa {login_attempt}/3 para '{nome_fluxo}'.")
+        if login_attempt < 3:
+            wait_time = 30 * login_attempt  # 30s, 60s
+            logger.info(f"Aguardando {wait_time}s antes da próxima tentativa...")
+            time.sleep(wait_time)
+            # Recarrega a página para tentar novamente
+            try:
+                page.goto("https://portal.emiteai.com.br/#/login", timeout=45000)
+            except Exception as nav_err:
+                logger.error(f"Erro ao navegar para login na tentativa {login_attempt + 1}: {nav_err}")
+
+    return context, (page if login_ok else None)
+
+
 # ===================================================================
 # FUNÇÃO DE EXECUÇÃO DE FLUXO (Alvo da Thread - CORRIGIDA)
 # ===================================================================
@@ -86,44 +171,39 @@ def executar_fluxo(nome_fluxo: str, funcao_fluxo, config: Dict[str, Any]): # <--
     """
     Executa um único worker de automação em seu próprio contexto E
     em sua própria instância do Playwright.
+
+    Com o servidor de navegador ('browser_server'), o worker só se conecta
+    a ele e cria seu contexto; fechar o browser apenas desconecta.
     """
     context = None
     browser = None 
+    pool_manager = config.get('thread_pool_manager')
+    inicio = time.monotonic()
     
     # --- CORREÇÃO: O 'with' do Playwright vem PARA DENTRO da thread ---
     with sync_playwright() as playwright:
         try:
             logger.info(f"Iniciando thread e navegador para o worker: '{nome_fluxo}'")
             
-            browser = playwright.firefox.launch(headless=True)
-            context = browser.new_context()
-            page = context.new_page()
-            page.goto("https://portal.emiteai.com.br/#/login")
-
-            # Tenta login com retry e backoff exponencial
-            login_ok = False
-            for login_attempt in range(1, 4):  # 3 tentativas
-                logger.info(f"Tentativa de login {login_attempt}/3 para worker '{nome_fluxo}'...")
-                login_ok = fluxo_login(page=page, usuario=USUARIO, senha=SENHA)
-                if login_ok:
-                    logger.success(f"Login realizado com sucesso para '{nome_fluxo}' na tentativa {login_attempt}.")
-                    break
-                
-                logger.warning(f"Login falhou na tentativa {login_attempt}/3 para '{nome_fluxo}'.")
-                if login_attempt < 3:
-                    wait_time = 30 * login_attempt  # 30s, 60s
-                    logger.info(f"Aguardando {wait_time}s antes da próxima tentativa...")
-                    time.sleep(wait_time)
-                    # Recarrega a página para tentar novamente
-                    try:
-                        page.goto("https://portal.emiteai.com.br/#/login", timeout=45000)
-                    except Exception as nav_err:
-                        logger.error(f"Erro ao navegar para login na tentativa {login_attempt + 1}: {nav_err}")
+            browser, modo = _abrir_navegador(playwright, config.get('browser_server'))
+            metricas.observar("partida", f"navegador_{modo}_s", time.monotonic() - inicio)
+            if pool_manager:
+                # Permite medir a memória da árvore de processos deste navegador
+                pool_manager.registrar_navegador_worker(obter_pid_driver(playwright))
+            # Login/restauração da sessão na vez deste worker (partidas simultâneas são espaçadas)
+            escalonador = pool_manager.escalonador_logins if pool_manager else None
+            with escalonador.vez(nome_fluxo) if escalonador else nullcontext():
+                context, page = _abrir_sessao(browser, config, nome_fluxo)
             
-            if not login_ok:
+            if page is None:
                 logger.critical(f"Todas as tentativas de login falharam para o worker '{nome_fluxo}'. A thread será encerrada.")
                 return
             
+            # Latência de subida do worker (navegador + sessão), por modo de navegador
+            metricas.observar("partida", f"worker_{modo}_s", time.monotonic() - inicio)
+            if pool_manager:
+                # Worker pronto para consumir jobs (mede a partida a frio após escala a zero)
+                pool_manager.registrar_worker_pronto()
             funcao_fluxo(page, config) 
             
             logger.info(f"Worker '{nome_fluxo}' encerrou seu loop de consumo. (Pode ser downscaling ou encerramento normal)")
@@ -140,12 +220,20 @@ def executar_fluxo(nome_fluxo: str, funcao_fluxo, config: Dict[str, Any]): # <--
                 context.close()
             if browser:
                 browser.close()
+            if pool_manager:
+                pool_manager.remover_navegador_worker()
             logger.info(f"Thread do worker '{nome_fluxo}' foi finalizada e recursos liberados.")
 
 # ===================================================================
 # MAIN (Orquestrador com ThreadPoolManager - NOVO)
 # ===================================================================
+def _sinal_encerramento(signum, frame):
+    """SIGTERM (docker stop / deploy) segue o mesmo caminho do Ctrl+C: drena os workers."""
+    raise KeyboardInterrupt
+
+
 def main():
+    signal.signal(signal.SIGTERM, _sinal_encerramento)
     config = carregar_config()
     if not config:
         logger.critical("Não foi possível carregar o config.json. Encerrando.")
@@ -167,12 +255,17 @@ def main():
         logger.critical(f"Erro ao conectar ao Redis: {e}")
         return
     
+    # Navegador de vida longa compartilhado pelos workers (sobe com o primeiro worker)
+    servidor_navegador = ServidorNavegador.from_config(config)
+    config['browser_server'] = servidor_navegador
+    
     try:
         # Inicializa o Watchdog para detectar travamentos
         watchdog = JobWatchdog(
             redis_client=redis_client,
             max_job_duration=300,      # 5 minutos máximo por job
-            check_interval=30          # Verificar a cada 30 segundos
+            check_interval=30,         # Verificar a cada 30 segundos
+            canal_eventos=redis_cfg.get('events_channel', 'eventos:filas'),
         )
         watchdog.iniciar()
         logger.success("Watchdog de travamentos iniciado")
@@ -183,7 +276,7 @@ def main():
         # Inicializa display de status em tempo real
         status_display = StatusDisplay(
             redis_client=redis_client,
-            update_interval=5  # Atualiza a cada 5 segundos
+            update_interval=15  # Atualiza a cada evento (ou a cada 15s sem eventos)
         )
         status_display.iniciar()
         logger.success("Status display iniciado")
@@ -195,7 +288,7 @@ def main():
             ejecutor_function=executar_fluxo,
             usuario=USUARIO,
             senha=SENHA,
-            rebalance_interval=60,  # Verifica a cada 60 segundos
+            rebalance_interval=60,  # Sem event_settings: verifica a cada 60 segundos
             max_threads_per_type=10,  # Máximo 10 threads por tipo (conferência/emissão)
             max_total_threads=20,  # Máximo 20 threads no total
             status_display=status_display,  # Passar o status display
@@ -231,6 +324,9 @@ def main():
             pool_manager.parar()
     
     finally:
+        # Depois do pool_manager.parar(): os workers já fecharam seus contextos
+        if servidor_navegador:
+            servidor_navegador.parar()
         logger.info("Automação finalizada.")
 
 if __name__ == "__main__":
@@ -8,6 +8,7 @@ import pandas as pd
 from google.oauth2.service_account import Credentials
 from loguru import logger
 from utils.helpers import carregar_config
+from utils.eventos import CANAL_EVENTOS_PADRAO, publicar_evento_fila
 
 # --- CONFIGURAÇÃO DO LOGGER ---
 logger.remove()
@@ -124,6 +125,7 @@ def iniciar_poller(config):
     q_conferencia = redis_cfg.get('conference_queue')
     q_emissao = redis_cfg.get('emission_queue')
     s_controle = redis_cfg.get('control_set')
+    canal_eventos = redis_cfg.get('events_channel', CANAL_EVENTOS_PADRAO)
     intervalo = poller_cfg.get('poll_interval_seconds', 300) # Padrão 5 min
 
     if not all([r_db, r_host, r_port, q_conferencia, q_emissao, s_controle]):
@@ -217,6 +219,10 @@ def iniciar_poller(config):
             except Exception as e:
                 logger.error(f"Erro ao processar linha {linha.get('original_row_number', 'N/A')}: {e}")
 
+        # Avisa o orquestrador para escalar imediatamente (em vez de esperar o próximo rebalanceamento)
+        if cont_conferencia or cont_emissao:
+            publicar_evento_fila(r, canal_eventos, origem="poller", conferencia=cont_conferencia, emissao=cont_emissao)
+
         logger.info(f"Ciclo de polling finalizado.")
         logger.info(f"Novos Jobs: {cont_conferencia} (Conferência), {cont_emissao} (Emissão).")
         logger.info(f"Jobs Limpos: {cont_limpeza}.")
@@ -0,0 +1,187 @@
+import fnmatch
+import threading
+import time
+
+import pytest
+
+
+class RedisFalso:
+    """
+    Redis em memória, thread-safe, com os comandos de lista/set usados pelos
+    workers (inclusive BLPOP bloqueante em várias chaves). Sem expiração real.
+    """
+
+    def __init__(self):
+        self.dados = {}
+        self.cond = threading.Condition()
+
+    # --- Listas ---
+    def rpush(self, chave, *valores):
+        with self.cond:
+            lista = self.dados.setdefault(chave, [])
+            lista.extend(valores)
+            self.cond.notify_all()
+            return len(lista)
+
+    def lpush(self, chave, *valores):
+        with self.cond:
+            lista = self.dados.setdefault(chave, [])
+            for valor in valores:
+                lista.insert(0, valor)
+            self.cond.notify_all()
+            return len(lista)
+
+    def llen(self, chave):
+        with self.cond:
+            return len(self.dados.get(chave, []))
+
+    def lrange(self, chave, inicio, fim):
+        with self.cond:
+            lista = self.dados.get(chave, [])
+            return list(lista[inicio:] if fim == -1 else lista[inicio:fim + 1])
+
+    def lindex(self, chave, indice):
+        with self.cond:
+            lista = self.dados.get(chave, [])
+            return lista[indice] if -len(lista) <= indice < len(lista) else None
+
+    def blpop(self, chaves, timeout=0):
+        prazo = time.monotonic() + timeout if timeout else None
+        with self.cond:
+            while True:
+                for chave in chaves:
+                    if self.dados.get(chave):
+                        return chave, self.dados[chave].pop(0)
+                restante = None if prazo is None else prazo - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return None
+                self.cond.wait(timeout=restante)
+
+    def lrem(self, chave, quantidade, valor):
+        with self.cond:
+            lista = self.dados.get(chave, [])
+            removidos = 0
+            while valor in lista and (quantidade == 0 or removidos < quantidade):
+                lista.remove(valor)
+                removidos += 1
+            return removidos
+
+    def lmove(self, origem, destino, src="LEFT", dest="RIGHT"):
+        with self.cond:
+            lista = self.dados.get(origem)
+            if not lista:
+                return None
+            valor = lista.pop(0 if src == "LEFT" else -1)
+            alvo = self.dados.setdefault(destino, [])
+            alvo.insert(0, valor) if dest == "LEFT" else alvo.append(valor)
+            self.cond.notify_all()
+            return valor
+
+    def blmove(self, origem, destino, timeout, src="LEFT", dest="RIGHT"):
+        prazo = time.monotonic() + timeout if timeout else None
+        with self.cond:
+            while True:
+                valor = self.lmove(origem, destino, src, dest)
+                if valor is not None:
+                    return valor
+                restante = None if prazo is None else prazo - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return None
+                self.cond.wait(timeout=restante)
+
+    # --- Sets ---
+    def sadd(self, chave, *valores):
+        with self.cond:
+            conjunto = self.dados.setdefault(chave, set())
+            novos = len(set(valores) - conjunto)
+            conjunto.update(valores)
+            return novos
+
+    def srem(self, chave, *valores):
+        with self.cond:
+            conjunto = self.dados.get(chave, set())
+            removidos = len(set(valores) & conjunto)
+            conjunto.difference_update(valores)
+            return removidos
+
+    def smembers(self, chave):
+        with self.cond:
+            return set(self.dados.get(chave, set()))
+
+    # --- Chaves ---
+    def delete(self, *chaves):
+        with self.cond:
+            return sum(1 for chave in chaves if self.dados.pop(chave, None) is not None)
+
+    def set(self, chave, valor, ex=None, nx=False):
+        with self.cond:
+            if nx and chave in self.dados:
+                return None
+            self.dados[chave] = valor
+            return True
+
+    def get(self, chave):
+        with self.cond:
+            return self.dados.get(chave)
+
+    def exists(self, *chaves):
+        with self.cond:
+            return sum(1 for chave in chaves if chave in self.dados)
+
+    def scan_iter(self, match="*"):
+        with self.cond:
+            return [chave for chave in self.dados if fnmatch.fnmatchcase(chave, match)]
+
+    def expire(self, chave, segundos):
+        return chave in self.dados
+
+    def hset(self, chave, campo=None, valor=None, mapping=None):
+        with self.cond:
+            hash_ = self.dados.setdefault(chave, {})
+            if campo is not None:
+                hash_[campo] = valor
+            hash_.update(mapping or {})
+            return len(hash_)
+
+    def hget(self, chave, campo):
+        with self.cond:
+            return self.dados.get(chave, {}).get(campo)
+
+    def hincrby(self, chave, campo, quantidade=1):
+        with self.cond:
+            hash_ = self.dados.setdefault(chave, {})
+            hash_[campo] = int(hash_.get(campo, 0)) + quantidade
+            return hash_[campo]
+
+    def hdel(self, chave, *campos):
+        with self.cond:
+            hash_ = self.dados.get(chave, {})
+            return sum(1 for campo in campos if hash_.pop(campo, None) is not None)
+
+    def publish(self, canal, mensagem):
+        return 0
+
+    def pipeline(self, transaction=True):
+        return _PipelineFalso(self)
+
+
+class _PipelineFalso:
+    def __init__(self, redis_falso):
+        self.redis_falso = redis_falso
+        self.comandos = []
+
+    def __getattr__(self, nome):
+        def enfileirar(*args, **kwargs):
+            self.comandos.append((nome, args, kwargs))
+            return self
+        return enfileirar
+
+    def execute(self):
+        resultados = [getattr(self.redis_falso, nome)(*args, **kwargs) for nome, args, kwargs in self.comandos]
+        self.comandos = []
+        return resultados
+
+
+@pytest.fixture
+def redis_falso():
+    return RedisFalso()
@@ -0,0 +1,124 @@
+import pytest
+
+import fluxos.preencher_cte as preencher_cte_mod
+from utils.abas_detalhe import AbasDetalhe, aprender_rota, esquecer_rotas, rota_conhecida
+from utils.captura_rede import captura_da_pagina
+
+CONFIG = {"network_capture_settings": {"endpoints": {"mdfe": r"/api/.*mdfe"}}}
+
+
+@pytest.fixture(autouse=True)
+def rotas_limpas():
+    esquecer_rotas()
+    yield
+    esquecer_rotas()
+
+
+class _Aba:
+    def __init__(self, falhar=False):
+        self.falhar = falhar
+        self.url = None
+        self.fechada = False
+        self.ouvintes = []
+
+    def on(self, evento, callback):
+        self.ouvintes.append(callback)
+
+    def remove_listener(self, evento, callback):
+        self.ouvintes.remove(callback)
+
+    def goto(self, url, wait_until=None, timeout=None):
+        assert wait_until == "commit"  # Não espera o carregamento: as abas carregam em paralelo
+        if self.falhar:
+            raise RuntimeError("net::ERR_ABORTED")
+        self.url = url
+
+    def close(self):
+        self.fechada = True
+
+
+class _Contexto:
+    def __init__(self, falhar=False):
+        self.falhar = falhar
+        self.abas = []
+
+    def new_page(self):
+        aba = _Aba(self.falhar)
+        self.abas.append(aba)
+        return aba
+
+
+class _Pagina:
+    def __init__(self, falhar=False):
+        self.context = _Contexto(falhar)
+
+
+class _Botao:
+    def __init__(self, href=None):
+        self.href = href
+
+    def evaluate(self, script):
+        return self.href
+
+
+def test_rota_aprendida_usa_a_lt_como_parametro():
+    aprender_rota("mdfe", "https://portal.emiteai.com.br/#/emissor/mdfe?carga=LT-1001", "LT-1001")
+    aprender_rota("cte", "https://portal.emiteai.com.br/#/emissor/cte/8841", "LT-1001")  # LT fora da URL
+
+    assert rota_conhecida("mdfe", "LT-2002") == "https://portal.emiteai.com.br/#/emissor/mdfe?carga=LT-2002"
+    assert rota_conhecida("cte", "LT-2002") is None
+
+
+def test_abre_pelo_link_ou_pela_rota_aprendida():
+    pagina = _Pagina()
+    abas = AbasDetalhe.from_config(pagina, CONFIG)
+    aprender_rota("mdfe", "https://portal/#/mdfe?carga=LT-1", "LT-1")
+
+    abertas = abas.abrir_varias("LT-7", {
+        "cte": _Botao(href="https://portal/#/cte?carga=LT-7"),
+        "mdfe": _Botao(),
+        "outro": None,
+    })
+
+    assert {tipo: aba.url for tipo, aba in abertas.items()} == {
+        "cte": "https://portal/#/cte?carga=LT-7",
+        "mdfe": "https://portal/#/mdfe?carga=LT-7",
+    }
+    # A aba nova já nasce com a captura de rede (lista de MDF-es)
+    assert captura_da_pagina(abertas["mdfe"]) is not None
+
+    abas.fechar(abertas)
+    assert all(aba.fechada for aba in pagina.context.abas)
+    assert captura_da_pagina(abertas["mdfe"]) is None
+
+
+def test_sem_rota_ou_com_falha_nao_abre_aba():
+    pagina = _Pagina(falhar=True)
+    abas = AbasDetalhe(pagina)
+
+    assert abas.abrir("cte", _Botao(), "LT-1") is None
+    assert pagina.context.abas == []
+
+    assert abas.abrir("cte", _Botao(href="https://portal/#/cte"), "LT-1") is None
+    assert pagina.context.abas[0].fechada
+
+
+def test_desligado():
+    assert AbasDetalhe.from_config(_Pagina(), {"detail_tabs_settings": {"enabled": False}}) is None
+
+
+def test_preencher_cte_le_da_aba_sem_tocar_no_card(monkeypatch):
+    aba = object()
+    lidas = []
+
+    def extrair(pagina, numero_lt):
+        lidas.append(pagina)
+        return [{"numero": "10", "valor": 1000.5}, {"numero": "11", "valor": 500.0}]
+
+    monkeypatch.setattr(preencher_cte_mod, "extrair_dados_dos_cards_cte", extrair)
+
+    resultado = preencher_cte_mod.preencher_cte(page=None, card=None, numero_lt="LT-1", aba=aba)
+
+    assert resultado == {"status": "sucesso", "numeros_ctes": "10/11", "valor_total": "1.500,50"}
+    assert lidas == [aba]
+    assert rota_conhecida("cte", "LT-1") is None
@@ -0,0 +1,196 @@
+"""
+Simulação do AutoscalerPreditivo com cargas em rajada.
+
+Roda um modelo de filas em tempo discreto (relógio simulado) e compara o
+autoscaler com a fórmula legada ceil(fila / 50) pela latência na fila e
+pelas threads ativas de cada trace.
+"""
+
+from collections import deque
+from math import ceil
+
+from utils.autoscaler import AutoscalerPreditivo, distribuir_orcamento
+
+
+PASSO = 5                 # Resolução da simulação (s)
+DURACAO = 3 * 3600        # 3 horas simuladas
+TEMPO_INICIALIZACAO = 20  # Navegador + login até o worker consumir jobs (s)
+TEMPO_SERVICO = {"conferencia": 90, "emissao": 30}
+
+
+def _chegadas_em_rajada(tipo_job: str, t: int) -> int:
+    """Rajadas grandes (ciclos do poller) sobre um fluxo contínuo pequeno."""
+    if tipo_job == "conferencia":
+        rajadas = {0: 300, 5400: 150}
+        continuo = 1 if t % 120 == 0 else 0
+    else:
+        rajadas = {1800: 100, 7200: 60}
+        continuo = 1 if t % 300 == 0 else 0
+    return rajadas.get(t, 0) + continuo
+
+
+def _simular(decidir, intervalo_decisao: int, registrar_servico=None) -> dict:
+    """
+    Simula um pool por tipo de job.
+
+    Args:
+        decidir: f(tipo_job, jobs_pendentes, t) -> tamanho alvo do pool
+        intervalo_decisao: De quanto em quanto tempo o alvo é recalculado (s)
+        registrar_servico: f(tipo_job, duracao) chamada a cada job concluído
+    """
+    resultado = {}
+    tipos = list(TEMPO_SERVICO)
+    fila = {tipo: deque() for tipo in tipos}
+    # Cada worker: {"pronto_em": t, "ocupado_ate": t, "morrer": bool}
+    workers = {tipo: [] for tipo in tipos}
+    esperas = {tipo: [] for tipo in tipos}
+    trace = {tipo: [] for tipo in tipos}
+    mudancas = {tipo: 0 for tipo in tipos}
+    alvo_anterior = {tipo: None for tipo in tipos}
+
+    for t in range(0, DURACAO, PASSO):
+        for tipo in tipos:
+            for _ in range(_chegadas_em_rajada(tipo, t)):
+                fila[tipo].append(t)
+
+            if t % intervalo_decisao == 0:
+                alvo = decidir(tipo, len(fila[tipo]), t)
+                if alvo != alvo_anterior[tipo]:
+                    mudancas[tipo] += 1
+                    alvo_anterior[tipo] = alvo
+                vivos = [w for w in workers[tipo] if not w["morrer"]]
+                if alvo > len(vivos):
+                    for _ in range(alvo - len(vivos)):
+                        workers[tipo].append({"pronto_em": t + TEMPO_INICIALIZACAO, "ocupado_ate": 0, "morrer": False})
+                elif alvo < len(vivos):
+                    for w in vivos[alvo:]:
+                        w["morrer"] = True
+
+            for w in workers[tipo]:
+                if w["pronto_em"] > t or w["ocupado_ate"] > t:
+                    continue
+                if w["morrer"]:
+                    w["encerrado"] = True
+                    continue
+                if fila[tipo]:
+                    chegada = fila[tipo].popleft()
+                    esperas[tipo].append(t - chegada)
+                    w["ocupado_ate"] = t + TEMPO_SERVICO[tipo]
+                    if registrar_servico:
+                        registrar_servico(tipo, TEMPO_SERVICO[tipo])
+            workers[tipo] = [w for w in workers[tipo] if not w.get("encerrado")]
+
+            trace[tipo].append((t, len(fila[tipo]), len(workers[tipo])))
+
+    for tipo in tipos:
+        ordenadas = sorted(esperas[tipo])
+        resultado[tipo] = {
+            "p95_espera": ordenadas[int(len(ordenadas) * 0.95)] if ordenadas else 0,
+            "max_espera": ordenadas[-1] if ordenadas else 0,
+            "max_threads": max(n for _, _, n in trace[tipo]),
+            "threads_finais": trace[tipo][-1][2],
+            "mudancas": mudancas[tipo],
+            "nao_atendidos": len(fila[tipo]),
+            "trace": trace[tipo],
+        }
+    return resultado
+
+
+def _simular_autoscaler():
+    relogio = [0.0]
+    autoscaler = AutoscalerPreditivo(
+        ["conferencia", "emissao"],
+        min_threads=1,
+        max_threads=10,
+        tempo_espera_alvo=900,
+        tempo_servico_padrao={"conferencia": 60, "emissao": 60},  # Estimativa inicial propositalmente errada
+        cooldown_aumento=30,
+        cooldown_reducao=300,
+        relogio=lambda: relogio[0],
+    )
+
+    def decidir(tipo_job, pendentes, t):
+        relogio[0] = t
+        return autoscaler.decidir(tipo_job, pendentes)
+
+    return autoscaler, _simular(decidir, intervalo_decisao=15, registrar_servico=autoscaler.registrar_servico)
+
+
+def _simular_legado():
+    def decidir(tipo_job, pendentes, t):
+        if pendentes == 0:
+            return 1
+        return max(1, min(ceil(pendentes / 50), 10))
+
+    return _simular(decidir, intervalo_decisao=60)
+
+
+def test_autoscaler_reduz_latencia_em_rajadas():
+    _, preditivo = _simular_autoscaler()
+    legado = _simular_legado()
+
+    for tipo in ("conferencia", "emissao"):
+        assert preditivo[tipo]["nao_atendidos"] == 0
+        assert preditivo[tipo]["p95_espera"] < legado[tipo]["p95_espera"]
+        assert preditivo[tipo]["max_threads"] <= 10
+
+
+def test_autoscaler_aprende_tempo_de_servico():
+    autoscaler, _ = _simular_autoscaler()
+    estimativas = autoscaler.obter_estimativas()
+    assert abs(estimativas["conferencia"]["tempo_servico_s"] - 90) < 1
+    assert abs(estimativas["emissao"]["tempo_servico_s"] - 30) < 1
+
+
+def test_autoscaler_histerese_evita_oscilacao():
+    _, preditivo = _simular_autoscaler()
+    for tipo in ("conferencia", "emissao"):
+        # Poucas mudanças de alvo mesmo com decisões a cada 15s por 3 horas
+        assert preditivo[tipo]["mudancas"] <= 12
+        # Depois que as rajadas drenam, o pool volta ao necessário para o fluxo
+        # contínuo (~0.75 thread de conferência, ~0.1 de emissão)
+        assert preditivo[tipo]["threads_finais"] <= 2
+
+
+def test_reducao_so_apos_cooldown():
+    relogio = [0.0]
+    autoscaler = AutoscalerPreditivo(
+        ["emissao"], min_threads=1, max_threads=10, tempo_espera_alvo=100,
+        tempo_servico_padrao={"emissao": 10}, cooldown_reducao=300, relogio=lambda: relogio[0],
+    )
+    assert autoscaler.decidir("emissao", 100) == 10
+
+    # Fila drenou: o alvo se mantém até o cooldown de redução expirar
+    relogio[0] = 60
+    assert autoscaler.decidir("emissao", 0) == 10
+    relogio[0] = 200
+    assert autoscaler.decidir("emissao", 0) == 10
+    relogio[0] = 400
+    assert autoscaler.decidir("emissao", 0) < 10
+
+
+def test_orcamento_atende_tudo_quando_cabe():
+    alocadas = distribuir_orcamento({"conferencia": 6, "emissao": 4}, {"conferencia": 1, "emissao": 1}, orcamento=12)
+    assert alocadas == {"conferencia": 6, "emissao": 4}
+
+
+def test_orcamento_divide_por_demanda_ponderada():
+    # 300 conferências × 90s contra 100 emissões × 30s: conferência pesa 9x mais
+    alocadas = distribuir_orcamento(
+        {"conferencia": 10, "emissao": 10},
+        {"conferencia": 300 * 90, "emissao": 100 * 30},
+        orcamento=12,
+    )
+    assert sum(alocadas.values()) == 12
+    assert alocadas["conferencia"] > alocadas["emissao"] >= 1
+
+
+def test_orcamento_reatribui_quando_fila_drena():
+    desejadas = {"conferencia": 10, "emissao": 10}  # Histerese ainda segura a emissão alta
+    alocadas = distribuir_orcamento(desejadas, {"conferencia": 27000, "emissao": 0}, orcamento=12)
+    assert alocadas == {"conferencia": 10, "emissao": 2}
+
+
+def test_orcamento_menor_que_minimos():
+    alocadas = distribuir_orcamento({"conferencia": 3, "emissao": 3}, {"conferencia": 1, "emissao": 5}, orcamento=1)
+    assert alocadas == {"conferencia": 0, "emissao": 1}
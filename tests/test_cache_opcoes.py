@@ -0,0 +1,79 @@
+import pytest
+from playwright.sync_api import TimeoutError
+
+import fluxos.conferir as conferir
+from utils.cache_opcoes import CacheOpcoes
+from utils.metricas import metricas
+
+
+class _OpcaoFalsa:
+    def __init__(self, pagina, rotulo):
+        self.pagina = pagina
+        self.rotulo = rotulo
+        self.first = self
+
+    def click(self, timeout=None):
+        if self.rotulo not in self.pagina.opcoes:
+            raise TimeoutError("opção não apareceu")
+        self.pagina.cliques.append(self.rotulo)
+
+
+class _PaginaFalsa:
+    def __init__(self, opcoes):
+        self.opcoes = opcoes
+        self.cliques = []
+
+    def get_by_role(self, role, name=None):
+        return name
+
+    def locator(self, seletor):
+        return self
+
+    def get_by_text(self, rotulo, exact=False):
+        return _OpcaoFalsa(self, rotulo)
+
+
+@pytest.fixture
+def fluxo(monkeypatch):
+    buscas = []
+    monkeypatch.setattr(conferir, "preencher_autocomplete", lambda page, textbox, valor, campo: None)
+
+    def escolher_falso(page, texto, campo="opcao"):
+        buscas.append(texto)
+        return "SHOPEE CAJAMAR - SP" if "CAJAMAR" in texto.upper() else False
+
+    monkeypatch.setattr(conferir, "escolher_opcao_mais_parecida", escolher_falso)
+    return buscas
+
+
+def test_segunda_carga_usa_opcao_do_cache(redis_falso, fluxo):
+    cache = CacheOpcoes(redis_falso)
+    page = _PaginaFalsa(opcoes={"SHOPEE CAJAMAR - SP"})
+
+    conferir.preencher_opcao(page, "expedidor", "Expedidor", "SHOPEE_XPT-Cajamar", cache)
+    assert fluxo == ["SHOPEE_XPT-Cajamar"]
+    assert cache.obter("expedidor", "shopee_xpt-cajamar") == "SHOPEE CAJAMAR - SP"  # Chave normalizada
+
+    conferir.preencher_opcao(page, "expedidor", "Expedidor", "SHOPEE_XPT-Cajamar", cache)
+    assert fluxo == ["SHOPEE_XPT-Cajamar"]  # Sem nova busca aproximada
+    assert page.cliques == ["SHOPEE CAJAMAR - SP"]
+    assert metricas.obter("cache_opcoes")["expedidor:acertos"] >= 2
+
+
+def test_opcao_em_cache_que_sumiu_e_invalidada(redis_falso, fluxo):
+    cache = CacheOpcoes(redis_falso)
+    cache.salvar("tomador", "SHOPEE_XPT-Cajamar", "RÓTULO ANTIGO")
+    page = _PaginaFalsa(opcoes=set())
+
+    conferir.preencher_opcao(page, "tomador", "Tomador", "SHOPEE_XPT-Cajamar", cache)
+
+    assert fluxo == ["SHOPEE_XPT-Cajamar"]
+    assert cache.obter("tomador", "SHOPEE_XPT-Cajamar") == "SHOPEE CAJAMAR - SP"
+
+
+def test_sem_opcao_levanta_erro_e_nao_grava(redis_falso, fluxo):
+    cache = CacheOpcoes(redis_falso)
+    with pytest.raises(ValueError):
+        conferir.preencher_opcao(_PaginaFalsa(set()), "recebedor", "Recebedor", "CD_DESCONHECIDO-Nada", cache)
+    assert fluxo == ["CD_DESCONHECIDO-Nada", "Nada"]
+    assert cache.limpar() == 0
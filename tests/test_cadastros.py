@@ -0,0 +1,119 @@
+from dados.dataclass import Carga
+from utils.cadastros import IndiceCadastros, extrair_nomes, extrair_registros
+
+
+def _carga(**campos):
+    base = dict(
+        id_alvo="ID1", numero_lt="LT1", frete=100.0, pedagio=0.0,
+        origem="SHOPEE_XPT-Cajamar", destino="CD_LOUVEIRA-Louveira", motorista="JOAO DA SILVA",
+        placa="ABC-1D23", placa2="", perfil="TRUCK", status="EM TRANSITO", status_emissao="Pendente",
+    )
+    base.update(campos)
+    return Carga(**base)
+
+
+class _RespostaFalsa:
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+        self.ok = status == 200
+
+    def json(self):
+        return self.payload
+
+
+class _RequestFalso:
+    def __init__(self, respostas):
+        self.respostas = respostas
+        self.urls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.urls.append(url)
+        resposta = self.respostas[url]
+        # Lista de respostas: uma por página
+        return resposta[params["page"]] if isinstance(resposta, list) else resposta
+
+
+class _PaginaFalsa:
+    def __init__(self, respostas):
+        self.request = _RequestFalso(respostas)
+
+
+def test_extrair_nomes_le_so_os_registros():
+    payload = {
+        "content": [
+            {"id": 1, "placa": "ABC1D23", "proprietario": {"nome": "FULANO"}},
+            {"id": 2, "placa": "XYZ9K87"},
+        ],
+        "totalElements": 2,
+    }
+    assert sorted(extrair_nomes(extrair_registros(payload), ["placa"])) == ["ABC1D23", "XYZ9K87"]
+    # Objetos aninhados (ex: o proprietário do veículo) não viram cadastro
+    assert extrair_nomes(extrair_registros(payload), ["nome"]) == []
+
+
+def test_sem_indice_nao_reprova_nada(redis_falso):
+    indice = IndiceCadastros(redis_falso)
+    assert indice.validar_carga(_carga(placa="ZZZ0000")) is None
+
+
+def test_reprova_cadastro_inexistente_antes_do_formulario(redis_falso):
+    indice = IndiceCadastros(redis_falso)
+    indice.gravar("veiculos", ["ABC1D23", "XYZ9K87"])
+    indice.gravar("motoristas", ["João da Silva", "Maria Souza"])
+    indice.gravar("participantes", ["SHOPEE CAJAMAR - SP", "CD LOUVEIRA"])
+
+    assert indice.validar_carga(_carga()) is None
+    assert indice.validar_carga(_carga(placa="QQQ1111")) == ("Placa Principal", "QQQ1111")
+    assert indice.validar_carga(_carga(motorista="PEDRO ALVES")) == ("Motorista", "PEDRO ALVES")
+    assert indice.validar_carga(_carga(perfil="CARRETA", placa2="XYZ-9K87")) is None
+
+
+def test_atualizacao_baixa_endpoints_uma_vez(redis_falso):
+    endpoints = {"veiculos": "https://portal/api/veiculos", "motoristas": "https://portal/api/motoristas"}
+    page = _PaginaFalsa({
+        endpoints["veiculos"]: _RespostaFalsa({"content": [{"placa": "ABC1D23"}], "totalElements": 1}),
+        endpoints["motoristas"]: _RespostaFalsa({}, status=500),
+    })
+    indice = IndiceCadastros(redis_falso, endpoints=endpoints, campos_nome={"veiculos": ["placa"]})
+
+    assert indice.atualizar_se_necessario(page)
+    assert indice.validar_carga(_carga(placa="QQQ1111")) == ("Placa Principal", "QQQ1111")
+    # Motoristas falhou: sem índice completo, nada é reprovado por motorista
+    assert indice.validar_carga(_carga(motorista="PEDRO ALVES")) is None
+    # Motoristas continua incompleto: tenta de novo na próxima chamada
+    indice.atualizar_se_necessario(page)
+    assert page.request.urls.count(endpoints["motoristas"]) == 2
+    assert page.request.urls.count(endpoints["veiculos"]) == 1
+
+
+def test_atualizacao_segue_paginas_ate_o_total(redis_falso):
+    endpoints = {"veiculos": "https://portal/api/veiculos", "motoristas": "https://portal/api/motoristas"}
+    page = _PaginaFalsa({
+        endpoints["veiculos"]: [
+            _RespostaFalsa({"content": [{"placa": "ABC1D23"}, {"placa": "XYZ9K87"}], "totalElements": 3}),
+            _RespostaFalsa({"content": [{"placa": "QQQ1111"}], "totalElements": 3}),
+        ],
+        # Sem total informado: não dá para saber se a lista está completa
+        endpoints["motoristas"]: _RespostaFalsa([{"nome": "João da Silva"}]),
+    })
+    indice = IndiceCadastros(redis_falso, endpoints=endpoints, campos_nome={"veiculos": ["placa"]})
+
+    indice.atualizar_se_necessario(page)
+    assert page.request.urls.count(endpoints["veiculos"]) == 2
+    assert indice.validar_carga(_carga(placa="QQQ-1111")) is None
+    assert indice.validar_carga(_carga(placa="ZZZ0000")) == ("Placa Principal", "ZZZ0000")
+    assert indice.validar_carga(_carga(motorista="PEDRO ALVES")) is None
+    assert not redis_falso.exists("cadastros:motoristas:completo")
+
+
+def test_pagina_faltando_nao_marca_indice_completo(redis_falso):
+    url = "https://portal/api/veiculos"
+    # O endpoint ignora a paginação: a segunda "página" repete a primeira
+    pagina = _RespostaFalsa({"content": [{"placa": "ABC1D23"}], "totalElements": 2})
+    page = _PaginaFalsa({url: [pagina, pagina]})
+    indice = IndiceCadastros(redis_falso, endpoints={"veiculos": url}, campos_nome={"veiculos": ["placa"]})
+
+    indice.atualizar_se_necessario(page)
+    assert not redis_falso.exists("cadastros:veiculos:completo")
+    assert indice.validar_carga(_carga(placa="ZZZ0000")) is None
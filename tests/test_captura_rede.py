@@ -0,0 +1,132 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from utils.captura_rede import CapturaRede, buscar_registros, ler_campo
+from utils.fluxo_utils import obter_status_lt
+
+CONSULTA_GRAVADA = json.loads((Path(__file__).parent / "dados" / "consulta_api.json").read_text(encoding="utf-8"))
+
+
+class _RespostaFalsa:
+    def __init__(self, url, payload, content_type="application/json"):
+        self.url = url
+        self.headers = {"content-type": content_type}
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class _PaginaFalsa:
+    def __init__(self):
+        self.ouvintes = []
+
+    def on(self, evento, callback):
+        self.ouvintes.append(callback)
+
+    def remove_listener(self, evento, callback):
+        self.ouvintes.remove(callback)
+
+    def responder(self, resposta):
+        for callback in list(self.ouvintes):
+            callback(resposta)
+
+
+def test_buscar_registros_e_ler_campo():
+    registros = buscar_registros(CONSULTA_GRAVADA, "LT-1001")
+    assert [r["id"] for r in registros] == [901]
+    assert ler_campo(registros[0], ["situacao", "STATUS"]) == "Carga Finalizada"
+    assert buscar_registros(CONSULTA_GRAVADA, "LT-9999") == []
+
+
+def test_captura_guarda_apenas_json_dos_endpoints_configurados():
+    page = _PaginaFalsa()
+    captura = CapturaRede(page, {"consulta": r"/api/.*consulta"})
+
+    page.responder(_RespostaFalsa("https://portal/api/v1/consulta?page=0", CONSULTA_GRAVADA))
+    page.responder(_RespostaFalsa("https://portal/api/v1/usuarios", {"nome": "x"}))
+    page.responder(_RespostaFalsa("https://portal/api/v1/consulta.css", "", content_type="text/css"))
+
+    assert captura.ultima("consulta") == CONSULTA_GRAVADA
+    assert len(captura.respostas["consulta"]) == 1
+
+    # Status vem do payload, sem tocar no DOM (a página falsa não tem locator)
+    assert obter_status_lt(page, "LT-1002", captura) == "Aguardando Conferência"
+
+    captura.encerrar()
+    assert page.ouvintes == []
+
+
+def test_from_config_desligada():
+    assert CapturaRede.from_config(_PaginaFalsa(), {"network_capture_settings": {"enabled": False}}) is None
+
+
+# --- Portal substituto local (navegador real) ---
+
+_HTML_PORTAL = """
+<html><body>
+<button id="pesquisar" onclick="pesquisar()">Pesquisar</button>
+<table><tbody id="linhas"></tbody></table>
+<script>
+async function pesquisar() {
+  const resp = await fetch('/api/v1/consulta?arquivo=LT');
+  const dados = await resp.json();
+  document.getElementById('linhas').innerHTML = dados.content
+    .map(c => `<tr><td></td><td></td><td>${c.nomeArquivo}</td><td>${c.status}</td></tr>`).join('');
+}
+</script>
+</body></html>
+"""
+
+
+class _PortalSubstituto(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/api/v1/consulta"):
+            corpo, tipo = json.dumps(CONSULTA_GRAVADA).encode(), "application/json"
+        else:
+            corpo, tipo = _HTML_PORTAL.encode(), "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def portal():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _PortalSubstituto)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_port}/"
+    servidor.shutdown()
+
+
+@pytest.fixture
+def pagina():
+    sync_api = pytest.importorskip("playwright.sync_api")
+    playwright = sync_api.sync_playwright().start()
+    try:
+        browser = playwright.firefox.launch(headless=True)
+    except Exception as e:
+        playwright.stop()
+        pytest.skip(f"Firefox do Playwright indisponível: {e}")
+    page = browser.new_page()
+    yield page
+    browser.close()
+    playwright.stop()
+
+
+def test_captura_le_resposta_do_portal_substituto(portal, pagina):
+    pagina.goto(portal)
+    captura = CapturaRede(pagina, {"consulta": r"/api/.*consulta"})
+
+    payload = captura.aguardar("consulta", lambda: pagina.click("#pesquisar"), timeout=5000)
+
+    assert payload == CONSULTA_GRAVADA
+    assert obter_status_lt(pagina, "LT-1001", captura) == "Carga Finalizada"
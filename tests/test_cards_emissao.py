@@ -0,0 +1,170 @@
+import pytest
+
+from utils.fluxo_utils import (
+    analisar_status_emissao,
+    decidir_status_cte,
+    extrair_cards_emissao,
+    interpretar_card,
+)
+
+# Dados como devolvidos pelo extrator JS para um card da grade de emissão
+CARD_GRAVADO = {
+    "dt": "LT-1001",
+    "status": "Ag. revisão",
+    "cte": {"contadores": ["0", "0", "1", "0"], "numeros": ["0", "0", "1", "0"]},
+    "nfs": None,
+    "mdfe": {"status": "Autorizado"},
+}
+
+HTML_GRADE = """
+<div class="MuiGrid-root MuiGrid-item MuiGrid-grid-xs-12 MuiGrid-grid-sm-6">
+  <p>DT: LT-1001</p>
+  <div><div>Ag. revisão</div><button>more_vert</button></div>
+  <div><div>CT-e</div>
+    <button><div><span>2</span></div></button><button><div><span>0</span></div></button>
+    <button><div><span>0</span></div></button><button><div><span>0</span></div></button>
+  </div>
+  <div><div><span>MDF-e</span></div><button>Encerrado</button></div>
+</div>
+<div class="MuiGrid-root MuiGrid-item MuiGrid-grid-xs-12 MuiGrid-grid-sm-6">
+  <p>DT: LT-1002</p>
+  <div><div>Liberado</div><button>more_vert</button></div>
+  <div><div>NFS-e</div><button><span>1</span></button></div>
+</div>
+"""
+
+
+class _Locator:
+    def __init__(self, dados):
+        self.dados = dados
+        self.avaliacoes = 0
+
+    def filter(self, has_text=None):
+        return self
+
+    def count(self):
+        return 1 if self.dados else 0
+
+    @property
+    def first(self):
+        return self
+
+    def evaluate(self, script):
+        self.avaliacoes += 1
+        return self.dados
+
+
+class _Pagina:
+    def __init__(self, dados):
+        self.cards = _Locator(dados)
+
+    def locator(self, seletor):
+        return self.cards
+
+
+@pytest.mark.parametrize("contadores, esperado", [
+    (["3", "0", "1", "0"], "rejeitado"),
+    (["3", "1", "0", "0"], "pendente"),
+    (["0", "0", "0", "2"], "cancelado"),
+    (["3", "0", "0", "1"], "autorizado"),
+    (["0", "0", "0", "0"], "vazio"),
+    (["3", "0", "0"], None),
+    (["x", "0", "0", "0"], None),
+])
+def test_decidir_status_cte(contadores, esperado):
+    assert decidir_status_cte(contadores) == esperado
+
+
+def test_interpretar_card():
+    assert interpretar_card(CARD_GRAVADO) == {
+        "status_card": "ag._revisão",
+        "status_cte": "rejeitado",
+        "status_mdfe": "autorizado",
+        "tipo_card": "cte",
+    }
+    sem_secoes = interpretar_card({"dt": "LT-1", "status": None, "cte": None, "nfs": None, "mdfe": {"status": None}})
+    assert sem_secoes["status_card"] == "nao_encontrado"
+    assert sem_secoes["status_cte"] is None
+    assert sem_secoes["status_mdfe"] == "status_nao_encontrado"
+    assert sem_secoes["tipo_card"] is None
+
+
+def test_analise_usa_leitura_do_lote_sem_ir_ao_navegador():
+    pagina = _Pagina(CARD_GRAVADO)
+
+    analise = analisar_status_emissao(pagina, "LT-1001", cards={"LT-1001": CARD_GRAVADO})
+
+    assert analise["status_card"] == "ag._revisão"
+    assert analise["card"] is pagina.cards
+    assert pagina.cards.avaliacoes == 0
+
+
+def test_analise_sem_lote_le_o_card_em_uma_chamada():
+    pagina = _Pagina(CARD_GRAVADO)
+
+    analise = analisar_status_emissao(pagina, "LT-1001")
+
+    assert analise["status_cte"] == "rejeitado"
+    assert pagina.cards.avaliacoes == 1
+    assert analisar_status_emissao(_Pagina(None), "LT-9") is None
+
+
+class _GradeFalsa:
+    """Vários cards na tela (modo lote); o filtro aplica o regex ao texto de cada um."""
+
+    def __init__(self, cards):
+        self.cards = cards  # [(texto do card, dados)]
+
+    def locator(self, seletor):
+        return self
+
+    def filter(self, has_text=None):
+        return _GradeFalsa([(texto, dados) for texto, dados in self.cards if has_text.search(texto)])
+
+    def count(self):
+        return len(self.cards)
+
+    @property
+    def first(self):
+        return self.cards[0][1] if self.cards else None
+
+
+def test_lote_nao_confunde_dt_que_e_prefixo_de_outra():
+    card_1234 = dict(CARD_GRAVADO, dt="1234")
+    card_123 = dict(CARD_GRAVADO, dt="123")
+    grade = _GradeFalsa([("DT: 1234\nAg. revisão", card_1234), ("DT: 123\nAg. revisão", card_123)])
+
+    analise = analisar_status_emissao(grade, "123", cards={"1234": card_1234, "123": card_123})
+
+    assert analise["card"] is card_123
+    assert analisar_status_emissao(grade, "1234", cards={"1234": card_1234, "123": card_123})["card"] is card_1234
+
+
+@pytest.fixture
+def pagina():
+    sync_api = pytest.importorskip("playwright.sync_api")
+    playwright = sync_api.sync_playwright().start()
+    try:
+        browser = playwright.firefox.launch(headless=True)
+    except Exception as e:
+        playwright.stop()
+        pytest.skip(f"Firefox do Playwright indisponível: {e}")
+    page = browser.new_page()
+    yield page
+    browser.close()
+    playwright.stop()
+
+
+def test_extrator_le_a_grade_inteira(pagina):
+    pagina.set_content(HTML_GRADE)
+
+    cards = extrair_cards_emissao(pagina)
+
+    assert set(cards) == {"LT-1001", "LT-1002"}
+    assert interpretar_card(cards["LT-1001"]) == {
+        "status_card": "ag._revisão",
+        "status_cte": "autorizado",
+        "status_mdfe": "encerrado",
+        "tipo_card": "cte",
+    }
+    assert interpretar_card(cards["LT-1002"])["tipo_card"] == "nfs"
@@ -0,0 +1,63 @@
+import random
+
+from rapidfuzz import fuzz, process
+from unidecode import unidecode
+
+from utils.correspondencia import CorrespondenteOpcoes, normalizar_texto
+from utils.metricas import metricas
+
+_CIDADES = ["Cajamar", "Louveira", "Extrema", "Barueri", "Guarulhos", "Contagem", "Betim", "Itajaí", "São José"]
+
+
+def _opcoes(n, seed=7):
+    """Rótulos no formato dos cadastros do portal (razão social - cidade - UF)."""
+    rnd = random.Random(seed)
+    return [
+        f"{rnd.choice(['SHOPEE', 'CD', 'XPT', 'TRANSP'])} {rnd.choice(_CIDADES).upper()} {i:04d} - "
+        f"{rnd.choice(_CIDADES)} - {rnd.choice(['SP', 'MG', 'SC'])}"
+        for i in range(n)
+    ]
+
+
+def _escolher_original(rotulos, texto):
+    """Implementação anterior de escolher_opcao_mais_parecida (sem o clique)."""
+    def normalizar(t):
+        return ' '.join(unidecode(t.replace('_', ' ').lower()).split())
+    mapa = {normalizar(t): t for t in rotulos}
+    melhor = process.extractOne(normalizar(texto), mapa.keys(), scorer=fuzz.WRatio, score_cutoff=30)
+    return mapa[melhor[0]] if melhor else None
+
+
+def test_mesma_escolha_que_a_implementacao_anterior():
+    correspondente = CorrespondenteOpcoes()
+    rotulos = _opcoes(300)
+    for consulta in ["SHOPEE_XPT-Cajamar", "cd louveira", "TRANSP EXTREMA 0042", "São José - SC"]:
+        assert correspondente.melhor("campo", rotulos, consulta).rotulo == _escolher_original(rotulos, consulta)
+
+
+def test_margem_sinaliza_ambiguidade():
+    correspondente = CorrespondenteOpcoes(margem_minima=5)
+    claro = correspondente.melhor("expedidor", ["SHOPEE CAJAMAR - SP", "CD BETIM - MG"], "shopee cajamar")
+    ambiguo = correspondente.melhor("expedidor", ["SHOPEE CAJAMAR 1 - SP", "SHOPEE CAJAMAR 2 - SP"], "shopee cajamar")
+
+    assert not claro.ambiguo and claro.margem >= 5
+    assert ambiguo.ambiguo and ambiguo.margem < 5
+    assert correspondente.melhor("expedidor", ["ZZZ"], "shopee cajamar") is None
+    assert normalizar_texto(None) == ""
+
+
+def test_opcoes_repetidas_reaproveitam_o_indice():
+    """Mesmo dropdown consultado várias vezes (o caso comum ao longo do dia)."""
+    correspondente = CorrespondenteOpcoes()
+    consultas = ["SHOPEE_XPT-Cajamar", "CD_LOUVEIRA-Louveira", "TRANSP_GUARULHOS-Guarulhos"] * 10
+
+    for tamanho in (20, 200, 2000):
+        rotulos = _opcoes(tamanho)
+        antes = metricas.obter("correspondencia").get("indices_reaproveitados", 0)
+
+        for consulta in consultas:
+            assert correspondente.melhor("campo", rotulos, consulta).rotulo == _escolher_original(rotulos, consulta)
+
+        # Indexado uma vez; as outras consultas reaproveitam o índice
+        reaproveitados = metricas.obter("correspondencia")["indices_reaproveitados"] - antes
+        assert reaproveitados == len(consultas) - 1
@@ -0,0 +1,45 @@
+from utils.digitacao import preencher_campo, preencher_mascarado
+from utils.metricas import metricas
+
+
+class _CampoFalso:
+    """Campo de texto; `aceita_fill=False` imita uma máscara que descarta o fill."""
+
+    def __init__(self, aceita_fill=True, exibicao=None):
+        self.valor = ""
+        self.aceita_fill = aceita_fill
+        self.exibicao = exibicao
+        self.teclas = 0
+
+    def fill(self, valor):
+        if self.aceita_fill or valor == "":
+            self.valor = valor
+
+    def type(self, valor, delay=0):
+        self.teclas += len(valor)
+        self.valor += valor
+
+    def input_value(self):
+        return self.exibicao(self.valor) if self.exibicao else self.valor
+
+
+def test_modo_rapido_preenche_sem_digitar():
+    campo = _CampoFalso()
+    assert preencher_campo(campo, "ABC1D23", "teste:placa")
+    assert campo.valor == "ABC1D23" and campo.teclas == 0
+    assert metricas.obter("preenchimento")["teste:placa:rapido:n"] >= 1
+
+
+def test_fallback_digita_quando_a_verificacao_falha():
+    campo = _CampoFalso(aceita_fill=False)
+    assert not preencher_campo(campo, "70,00", "teste:perc")
+    assert campo.valor == "70,00" and campo.teclas == 5
+    dados = metricas.obter("preenchimento")
+    assert dados["teste:perc:fallbacks"] >= 1 and dados["teste:perc:lento:n"] >= 1
+
+
+def test_mascara_confere_apenas_digitos():
+    # A máscara exibe "10/14/2025 00:00" para o valor "10-14-2025T00:00"
+    campo = _CampoFalso(exibicao=lambda v: v.replace("-", "/").replace("T", " "))
+    assert preencher_mascarado(campo, "10-14-2025T00:00", "teste:data")
+    assert campo.teclas == 0
@@ -0,0 +1,107 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import utils.redis_client
+import workers.fluxo_verificar_emissao as worker_emissao
+from utils.estado_pagina import URL_EMISSOR
+from utils.filas import FilaConfiavel
+
+
+class _PoolFalso:
+    """Deixa o worker processar um único lote e depois o encerra."""
+
+    def __init__(self):
+        self.lotes = 0
+        self.duracoes = []
+
+    def thread_deve_morrer(self, tipo_job):
+        self.lotes += 1
+        return self.lotes > 1
+
+    def obter_token_parada(self):
+        return None
+
+    def registrar_duracao_job(self, tipo_job, duracao):
+        self.duracoes.append(duracao)
+
+
+def _job(numero_lt, row, cte="", mdfe=""):
+    return json.dumps({"row": row, "data": {"N° Carga": numero_lt, "ID 3ZX": f"id-{row}", "CTE": cte, "MDFe": mdfe}})
+
+
+@pytest.fixture
+def ambiente(monkeypatch, redis_falso):
+    chamadas = {"filtros": [], "processados": [], "individuais": [], "extracoes": []}
+    encontrados = {"LT-1", "LT-2"}  # LT-3 não aparece na pesquisa em lote
+
+    monkeypatch.setattr(utils.redis_client, "get_redis", lambda **kwargs: redis_falso)
+    monkeypatch.setattr(worker_emissao, "goto_cards", lambda page: None)
+    monkeypatch.setattr(worker_emissao, "filtro_cards", lambda page, lts: chamadas["filtros"].append(lts))
+    monkeypatch.setattr(
+        worker_emissao, "analisar_status_emissao",
+        lambda page, lt, cards=None: {"card": object(), "status_card": "liberado"} if lt in encontrados else None,
+    )
+    monkeypatch.setattr(worker_emissao, "extrair_cards_emissao", lambda page: chamadas["extracoes"].append(page) or {})
+    monkeypatch.setattr(
+        worker_emissao, "_processar_analise",
+        lambda page, r, config, job, analise: chamadas["processados"].append(job["numero_lt"]),
+    )
+    monkeypatch.setattr(FilaConfiavel, "from_config", classmethod(
+        lambda cls, r, fila, consumidor, config: cls(r, fila, consumidor, fatia_espera=0.1)
+    ))
+    return redis_falso, chamadas
+
+
+def test_lote_usa_uma_pesquisa_e_cai_no_individual(ambiente):
+    r, chamadas = ambiente
+    r.rpush("fila:emissao", _job("LT-1", 1), _job("LT-2", 2), _job("LT-3", 3), _job("LT-4", 4, cte="10", mdfe="20"))
+    r.sadd("jobs_em_progresso", "id-1", "id-2", "id-3", "id-4")
+    pool = _PoolFalso()
+    config = {
+        "redis_settings": {"emission_queue": "fila:emissao", "control_set": "jobs_em_progresso", "results_queue": "fila:resultados"},
+        "emission_settings": {"batch_size": 10},
+        "thread_pool_manager": pool,
+    }
+
+    worker_emissao.fluxo_verificar_emissao_worker(page=None, config=config)
+
+    # Uma pesquisa com as 3 LTs que precisam do navegador + uma individual para a não encontrada
+    assert chamadas["filtros"] == [["LT-1", "LT-2", "LT-3"], "LT-3"]
+    assert len(chamadas["extracoes"]) == 1  # Uma leitura da grade para o lote inteiro
+    assert chamadas["processados"] == ["LT-1", "LT-2"]
+    # LT-4 já estava preenchida: resolvida sem navegador
+    assert json.loads(r.lrange("fila:resultados", 0, -1)[0])["payload"]["row"] == 4
+    # Todos confirmados, cadeados liberados e tempos enviados ao autoscaler
+    assert not [chave for chave, valor in r.dados.items() if ":processando:" in chave and valor]
+    assert r.smembers("jobs_em_progresso") == set()
+    assert len(pool.duracoes) == 4
+
+
+def test_lote_refiltra_quando_o_job_navega_a_aba_principal(ambiente, monkeypatch):
+    r, chamadas = ambiente
+    page = SimpleNamespace(url=URL_EMISSOR)
+    monkeypatch.setattr(worker_emissao, "goto_cards", lambda page: setattr(page, "url", URL_EMISSOR))
+
+    def processar_falso(page, r, config, job, analise):
+        chamadas["processados"].append(job["numero_lt"])
+        if job["numero_lt"] == "LT-1":
+            page.url = f"{URL_EMISSOR}/cte"  # CT-e aberto na própria aba, sem aba de detalhe
+
+    monkeypatch.setattr(worker_emissao, "_processar_analise", processar_falso)
+    r.rpush("fila:emissao", _job("LT-1", 1), _job("LT-2", 2), _job("LT-3", 3))
+    r.sadd("jobs_em_progresso", "id-1", "id-2", "id-3")
+    config = {
+        "redis_settings": {"emission_queue": "fila:emissao", "control_set": "jobs_em_progresso", "results_queue": "fila:resultados"},
+        "emission_settings": {"batch_size": 10},
+        "thread_pool_manager": _PoolFalso(),
+    }
+
+    worker_emissao.fluxo_verificar_emissao_worker(page=page, config=config)
+
+    # Depois da LT-1 as restantes são pesquisadas de novo (e a LT-3, não encontrada, individualmente)
+    assert chamadas["filtros"] == [["LT-1", "LT-2", "LT-3"], ["LT-2", "LT-3"], "LT-3"]
+    assert len(chamadas["extracoes"]) == 2
+    assert chamadas["processados"] == ["LT-1", "LT-2"]
+    assert r.smembers("jobs_em_progresso") == set()
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+
+from utils.filas import FilaConfiavel
+from utils.fluxo_utils import ThreadPoolManager
+from utils.metricas import metricas
+from utils.sessao import SessaoPortal
+
+
+def _criar_manager(redis_falso, ociosidade=0.1):
+    config = {
+        "thread_pool_settings": {
+            "autoscaler_enabled": False,
+            "shutdown_timeout_seconds": 5,
+            "scale_to_zero_enabled": True,
+            "scale_to_zero_idle_seconds": ociosidade,
+        },
+        "memory_settings": {"enabled": False},
+        "event_settings": {"enabled": False},
+    }
+    manager = None
+
+    def executor_falso(nome_worker, funcao_fluxo, config):
+        manager.registrar_worker_pronto()
+        token = manager.obter_token_parada()
+        fila = FilaConfiavel(redis_falso, "fila:emissao", nome_worker, fatia_espera=0.05)
+        while not manager.thread_deve_morrer("emissao"):
+            job_json = fila.aguardar(token, timeout=60)
+            if job_json:
+                fila.confirmar(job_json)
+
+    manager = ThreadPoolManager(
+        redis_client=redis_falso, config=config, ejecutor_function=executor_falso, usuario="u", senha="s",
+    )
+    return manager
+
+
+def _vivas(manager):
+    return sum(1 for threads in manager.threads.values() for t in threads if t.is_alive())
+
+
+def test_minimo_so_cai_a_zero_sem_nenhum_job(redis_falso):
+    manager = _criar_manager(redis_falso)
+
+    # Job em andamento (lista de processamento) não é ociosidade
+    redis_falso.rpush("fila:conferencia:processando:w1", "job")
+    manager._observar_ociosidade()
+    time.sleep(0.15)
+    assert manager.calcular_threads_necessarias("conferencia") == 1
+
+    redis_falso.delete("fila:conferencia:processando:w1")
+    manager._observar_ociosidade()
+    assert manager.calcular_threads_necessarias("conferencia") == 1  # Ainda dentro do período
+    time.sleep(0.15)
+    assert manager.calcular_threads_necessarias("conferencia") == 0
+
+
+def test_libera_navegadores_e_mede_a_partida_a_frio(redis_falso):
+    manager = _criar_manager(redis_falso)
+    antes = metricas.obter("ociosidade")
+    try:
+        manager.rebalancear_threads()  # Começa com o mínimo: 1 por tipo
+        assert _vivas(manager) == 2
+
+        time.sleep(0.15)
+        manager.rebalancear_threads()
+        for threads in manager.threads.values():
+            for thread in threads:
+                thread.join(timeout=2)
+        assert _vivas(manager) == 0
+        depois = metricas.obter("ociosidade")
+        assert depois["escalas_a_zero"] == antes.get("escalas_a_zero", 0) + 1
+
+        # Trabalho chega: o pool volta e a partida a frio é medida quando o worker fica pronto
+        redis_falso.rpush("fila:emissao", json.dumps({"row": 1}))
+        manager.rebalancear_threads()
+        assert _vivas(manager) == 2
+        for _ in range(50):
+            if metricas.obter("ociosidade").get("partida_fria_s:n", 0) > antes.get("partida_fria_s:n", 0):
+                break
+            time.sleep(0.02)
+        depois = metricas.obter("ociosidade")
+        assert depois["partida_fria_s:n"] == antes.get("partida_fria_s:n", 0) + 1
+        assert depois["tempo_zerado_s:n"] == antes.get("tempo_zerado_s:n", 0) + 1
+    finally:
+        manager.parar()
+
+
+class _ContextoFalso:
+    def storage_state(self, path):
+        with open(path, "w") as f:
+            json.dump({"cookies": [{"name": "sessao"}]}, f)
+
+
+class _PaginaFalsa:
+    def __init__(self, url_final):
+        self.url_final = url_final
+        self.url = "about:blank"
+
+    def goto(self, url, **kwargs):
+        self.url = self.url_final
+
+    def wait_for_function(self, script, timeout=None):
+        pass
+
+
+def test_sessao_salva_restaurada_e_descartada(tmp_path):
+    caminho = str(tmp_path / "sessao.json")
+    sessao = SessaoPortal(caminho, idade_maxima=60)
+    assert sessao.estado_salvo() is None
+
+    sessao.salvar(_ContextoFalso())
+    assert sessao.estado_salvo() == caminho
+    assert os.listdir(tmp_path) == ["sessao.json"]  # Sem temporários para trás
+
+    assert sessao.restaurar(_PaginaFalsa("https://portal.emiteai.com.br/#/emissor"))
+    assert sessao.estado_salvo() == caminho
+
+    # Portal pediu login: a sessão expirou e o arquivo é descartado
+    assert not sessao.restaurar(_PaginaFalsa("https://portal.emiteai.com.br/#/login"))
+    assert sessao.estado_salvo() is None
+
+
+def test_sessao_velha_e_ignorada(tmp_path):
+    caminho = tmp_path / "sessao.json"
+    caminho.write_text("{}")
+    os.utime(caminho, (time.time() - 120, time.time() - 120))
+    assert SessaoPortal(str(caminho), idade_maxima=60).estado_salvo() is None
+    assert SessaoPortal.from_config({}) is None
@@ -0,0 +1,65 @@
+import time
+
+from playwright.sync_api import TimeoutError
+
+from utils.esperas import aguardar_condicao, aguardar_estado
+from utils.fluxo_utils import garantir_pagina_consulta
+from utils.metricas import metricas
+
+
+class _LocatorFalso:
+    def __init__(self, aparece_em=None):
+        self.aparece_em = aparece_em
+
+    def wait_for(self, state, timeout):
+        if self.aparece_em is None or self.aparece_em * 1000 > timeout:
+            raise TimeoutError("timeout")
+        time.sleep(self.aparece_em)
+
+
+def test_condicao_termina_assim_que_satisfeita():
+    pronto_em = time.monotonic() + 0.2
+    inicio = time.monotonic()
+
+    assert aguardar_condicao("teste:condicao", lambda: time.monotonic() >= pronto_em, timeout=5, intervalo=0.02)
+
+    assert time.monotonic() - inicio < 1
+    dados = metricas.obter("esperas")
+    assert dados["teste:condicao:n"] >= 1 and dados["teste:condicao:max"] < 1
+
+
+def test_timeout_e_contado_sem_levantar_excecao():
+    antes = metricas.obter("esperas").get("teste:estado:timeouts", 0)
+
+    assert aguardar_estado(_LocatorFalso(aparece_em=0.05), "teste:estado", timeout_ms=1000)
+    assert not aguardar_estado(_LocatorFalso(), "teste:estado", timeout_ms=100)
+    assert not aguardar_condicao("teste:estado", lambda: False, timeout=0.1, intervalo=0.02)
+
+    assert metricas.obter("esperas")["teste:estado:timeouts"] - antes == 2
+
+
+class _PaginaInstavel:
+    """Página que nunca mostra o seletor-chave e fica ociosa na hora."""
+
+    url = "https://portal/#/alvo"
+
+    def locator(self, seletor):
+        return None  # expect() recusa: a tentativa falha
+
+    def wait_for_load_state(self, state, timeout):
+        pass
+
+    def reload(self, **kwargs):
+        pass
+
+    def goto(self, url, **kwargs):
+        pass
+
+
+def test_recuperacao_de_pagina_mantem_intervalo_entre_tentativas():
+    inicio = time.monotonic()
+    assert not garantir_pagina_consulta(
+        _PaginaInstavel(), "https://portal/#/alvo", "#chave", max_tentativas=3, espera_entre_tentativas=0.2
+    )
+    # Rede ociosa na hora não encurta o intervalo: 2 esperas entre 3 tentativas
+    assert time.monotonic() - inicio >= 0.4
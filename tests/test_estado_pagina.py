@@ -0,0 +1,62 @@
+import utils.fluxo_utils as fluxo_utils
+from utils.estado_pagina import URL_EMISSOR, EstadoPagina, estado_da_pagina
+from utils.filtros import filtro_cargas
+from utils.metricas import metricas
+
+
+class _PaginaFalsa:
+    """Página sem DOM: qualquer navegação real falharia com AttributeError."""
+
+    def __init__(self, url, resultado_js=True):
+        self.url = url
+        self.resultado_js = resultado_js
+        self.avaliacoes = 0
+
+    def evaluate(self, js):
+        self.avaliacoes += 1
+        return self.resultado_js
+
+
+def _evitadas(worker):
+    return {k: v for k, v in metricas.obter("navegacoes_evitadas").items() if k.startswith(worker)}
+
+
+def test_goto_cards_e_filtro_repetidos_sao_evitados():
+    page = _PaginaFalsa(URL_EMISSOR)
+    estado = EstadoPagina(page, "Worker-estado-1")
+    assert estado_da_pagina(page) is estado
+
+    estado.definir_vista("cards")
+    fluxo_utils.goto_cards(page)  # Não navega: vista conferida com uma chamada ao navegador
+    assert page.avaliacoes == 1
+
+    estado.definir_filtro("LT-1")
+    filtro_cargas(page, "LT-1")
+
+    assert _evitadas("Worker-estado-1") == {
+        "Worker-estado-1:goto_cards": 1,
+        "Worker-estado-1:filtro_cargas": 1,
+    }
+
+
+def test_vista_incerta_ou_divergente_nao_e_aceita():
+    page = _PaginaFalsa(URL_EMISSOR, resultado_js=False)  # Diálogo aberto / outra aba
+    estado = EstadoPagina(page, "Worker-estado-2", validade_filtro=0)
+    estado.definir_vista("cards")
+    assert not estado.vista_valida("cards")
+
+    page.resultado_js = True
+    page.url = "https://portal.emiteai.com.br/#/login"
+    assert not estado.vista_valida("cards")
+
+    page.url = URL_EMISSOR
+    assert estado.vista_valida("cards")
+    estado.invalidar("formulário aberto")
+    assert not estado.vista_valida("cards")
+
+    estado.definir_filtro("LT-1")
+    assert not estado.filtro_vigente("LT-1")  # Validade do filtro esgotada
+
+
+def test_from_config_desligado():
+    assert EstadoPagina.from_config(_PaginaFalsa(URL_EMISSOR), "w", {"page_state_settings": {"enabled": False}}) is None
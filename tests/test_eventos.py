@@ -0,0 +1,77 @@
+import threading
+import time
+
+from utils.eventos import OuvinteEventosFila, publicar_evento_fila
+from utils.fluxo_utils import ThreadPoolManager
+
+
+class _RedisPublicador:
+    def __init__(self):
+        self.publicados = []
+
+    def publish(self, canal, mensagem):
+        self.publicados.append((canal, mensagem))
+        return 1
+
+
+def _mensagem(dados='{"origem": "poller"}'):
+    return {"type": "message", "channel": "eventos:filas", "data": dados}
+
+
+def test_publica_evento_no_canal():
+    r = _RedisPublicador()
+    publicar_evento_fila(r, "eventos:teste", origem="poller", conferencia=3)
+    assert r.publicados == [("eventos:teste", '{"origem": "poller", "conferencia": 3}')]
+
+
+def test_debounce_agrupa_rajada_em_uma_chamada():
+    chamadas = []
+    ouvinte = OuvinteEventosFila(None, callback=lambda: chamadas.append(time.monotonic()), debounce=0.2)
+
+    inicio = time.monotonic()
+    for _ in range(50):
+        ouvinte.processar_mensagem(_mensagem())
+    ouvinte.processar_mensagem({"type": "subscribe", "data": 1})  # Ignorada
+    time.sleep(0.5)
+
+    assert len(chamadas) == 1
+    assert chamadas[0] - inicio >= 0.2
+    assert ouvinte.eventos_recebidos == 50
+
+    # Nova rajada após a janela gera nova chamada
+    ouvinte.processar_mensagem(_mensagem())
+    time.sleep(0.4)
+    assert len(chamadas) == 2
+
+
+class _FilasFalsas:
+    def llen(self, key):
+        return 0
+
+    def smembers(self, key):
+        return set()
+
+
+def test_evento_dispara_rebalanceamento_sem_esperar_intervalo():
+    config = {
+        "thread_pool_settings": {"autoscaler_enabled": False},
+        "memory_settings": {"enabled": False},
+        "event_settings": {"enabled": True, "fallback_rebalance_seconds": 3600},
+    }
+    manager = ThreadPoolManager(
+        redis_client=_FilasFalsas(), config=config, ejecutor_function=lambda *a: None,
+        usuario="u", senha="s",
+    )
+    rebalanceado = threading.Event()
+    manager.rebalancear_threads = rebalanceado.set
+
+    monitor = threading.Thread(target=manager.monitorar_rebalanceamento, daemon=True)
+    monitor.start()
+    try:
+        assert not rebalanceado.wait(timeout=0.3)  # Sem eventos, nada de polling
+        manager.notificar_mudanca_fila()
+        assert rebalanceado.wait(timeout=2)
+    finally:
+        manager.parar()
+        monitor.join(timeout=2)
+    assert not monitor.is_alive()
@@ -0,0 +1,212 @@
+import json
+import threading
+import time
+
+from utils.filas import FilaConfiavel, TokenParada, recuperar_jobs_orfaos
+from utils.fluxo_utils import ThreadPoolManager
+
+FILA = "fila:emissao"
+
+
+def _job(n):
+    return json.dumps({"row": n, "data": {"N° Carga": f"LT-{n}"}})
+
+
+def test_job_fica_em_processamento_ate_confirmar(redis_falso):
+    redis_falso.rpush(FILA, _job(1))
+    fila = FilaConfiavel(redis_falso, FILA, "Worker-emissao-1", fatia_espera=0.1)
+
+    job_json = fila.aguardar(timeout=1)
+    assert job_json == _job(1)
+    assert redis_falso.llen(FILA) == 0
+    assert redis_falso.lrange(fila.chave_processando, 0, -1) == [job_json]
+
+    fila.confirmar(job_json)
+    assert redis_falso.llen(fila.chave_processando) == 0
+
+
+def test_token_interrompe_espera_em_uma_fatia(redis_falso):
+    fila = FilaConfiavel(redis_falso, FILA, "Worker-emissao-1", fatia_espera=0.2)
+    token = TokenParada()
+    resultado = {}
+
+    def esperar():
+        inicio = time.monotonic()
+        resultado["job"] = fila.aguardar(token, timeout=30)
+        resultado["duracao"] = time.monotonic() - inicio
+
+    thread = threading.Thread(target=esperar)
+    thread.start()
+    time.sleep(0.1)
+    token.sinalizar()
+    thread.join(timeout=2)
+
+    assert not thread.is_alive()
+    assert resultado["job"] is None and resultado["duracao"] < 1
+
+
+def _worker(redis_falso, nome, concluidos, morrer_no_meio=False, espera=0.5):
+    """Worker mínimo: processa jobs até a fila esvaziar (ou 'morre' com um job na mão)."""
+    fila = FilaConfiavel(redis_falso, FILA, nome, fatia_espera=0.1)
+    fila.iniciar_heartbeat()
+    while True:
+        job_json = fila.aguardar(timeout=espera)
+        if job_json is None:
+            return
+        if morrer_no_meio:
+            raise RuntimeError("navegador travou no meio do job")
+        concluidos.append((nome, json.loads(job_json)["row"]))
+        fila.confirmar(job_json)
+
+
+def test_job_de_worker_morto_e_concluido_por_outro(redis_falso):
+    redis_falso.rpush(FILA, _job(1))
+    concluidos = []
+
+    # Worker A pega o job e morre no meio (exceção derruba a thread)
+    worker_a = threading.Thread(target=_worker, args=(redis_falso, "Worker-A", concluidos, True))
+    worker_a.start()
+    worker_a.join(timeout=2)
+    assert not worker_a.is_alive() and redis_falso.llen(FILA) == 0
+
+    # O heartbeat de A percebe a morte (em ~1s) e devolve o job; B o conclui
+    worker_b = threading.Thread(target=_worker, args=(redis_falso, "Worker-B", concluidos, False, 3))
+    worker_b.start()
+    worker_b.join(timeout=5)
+
+    assert concluidos == [("Worker-B", 1)]
+    assert not [chave for chave in redis_falso.dados if ":processando:" in chave and redis_falso.dados[chave]]
+
+
+def test_reaper_recupera_jobs_de_processo_morto(redis_falso):
+    # Processo inteiro morreu: job na lista de processamento e heartbeat expirado
+    redis_falso.rpush(FILA, _job(1), _job(2))
+    fila = FilaConfiavel(redis_falso, FILA, "Worker-emissao-1", fatia_espera=0.1)
+    fila.aguardar(timeout=1)
+    vivo = FilaConfiavel(redis_falso, FILA, "Worker-emissao-2", fatia_espera=0.1)
+    vivo.iniciar_heartbeat()
+    vivo.aguardar(timeout=1)
+
+    assert recuperar_jobs_orfaos(redis_falso, [FILA]) == 1
+    # Job recuperado volta para o início da fila; o do worker vivo não é tocado
+    assert redis_falso.lrange(FILA, 0, -1) == [_job(1)]
+    assert redis_falso.llen(vivo.chave_processando) == 1
+    vivo.parar()
+
+
+def test_job_que_derruba_o_worker_vai_para_os_mortos(redis_falso):
+    redis_falso.rpush(FILA, _job(1), _job(2))
+    for tentativa in range(1, 4):
+        fila = FilaConfiavel(redis_falso, FILA, f"Worker-emissao-{tentativa}", fatia_espera=0.1, max_tentativas=3)
+        assert fila.aguardar(timeout=1) == _job(1)  # Devolvido ao início: é entregue de novo primeiro
+        # Processo morreu com o job na mão (sem heartbeat)
+        devolvidos = recuperar_jobs_orfaos(redis_falso, [FILA], max_tentativas=3)
+        assert devolvidos == (1 if tentativa < 3 else 0)
+
+    # Terceira falha: sai da fila e não bloqueia mais os outros jobs
+    assert redis_falso.lrange(FILA, 0, -1) == [_job(2)]
+    assert redis_falso.lrange(f"{FILA}:mortos", 0, -1) == [_job(1)]
+    assert not redis_falso.dados.get(f"{FILA}:tentativas")
+
+
+def test_encerramento_limpo_nao_conta_tentativa(redis_falso):
+    redis_falso.rpush(FILA, _job(1))
+    for ciclo in range(1, 5):
+        # Downscale/reciclagem/SIGTERM com o job em andamento
+        fila = FilaConfiavel(redis_falso, FILA, f"Worker-emissao-{ciclo}", fatia_espera=0.1, max_tentativas=3)
+        assert fila.aguardar(timeout=1) == _job(1)
+        fila.parar()
+
+    assert redis_falso.lrange(FILA, 0, -1) == [_job(1)]
+    assert not redis_falso.lrange(f"{FILA}:mortos", 0, -1)
+    assert not redis_falso.dados.get(f"{FILA}:tentativas")
+
+
+def test_job_confirmado_zera_as_tentativas(redis_falso):
+    redis_falso.rpush(FILA, _job(1))
+    fila = FilaConfiavel(redis_falso, FILA, "Worker-emissao-1", fatia_espera=0.1, max_tentativas=2)
+    fila.devolver(fila.aguardar(timeout=1), contar_tentativa=True)
+    assert redis_falso.lrange(FILA, 0, -1) == [_job(1)]
+
+    fila.confirmar(fila.aguardar(timeout=1))
+    assert not redis_falso.dados.get(f"{FILA}:tentativas")
+
+    # Devolução sem falha do job (ex: página indisponível) não conta tentativa
+    redis_falso.rpush(FILA, _job(2))
+    for _ in range(3):
+        fila.devolver(fila.aguardar(timeout=1))
+    assert redis_falso.lrange(FILA, 0, -1) == [_job(2)]
+
+
+def test_fila_esvaziada_publica_um_evento_por_drenagem(redis_falso, monkeypatch):
+    publicados = []
+    monkeypatch.setattr(redis_falso, "publish", lambda canal, mensagem: publicados.append((canal, json.loads(mensagem))))
+    config = {"queue_settings": {"wait_slice_seconds": 0.1}, "redis_settings": {"events_channel": "eventos:teste"}}
+    fila = FilaConfiavel.from_config(redis_falso, FILA, "Worker-emissao-1", config)
+
+    redis_falso.rpush(FILA, _job(1), _job(2))
+    fila.confirmar(fila.aguardar(timeout=1))
+    assert publicados == []  # Ainda há jobs na fila
+
+    fila.confirmar(fila.aguardar(timeout=1))
+    fila.confirmar(_job(3))  # Outro confirmar com a fila ainda vazia não repete o aviso
+    assert publicados == [("eventos:teste", {"origem": "worker", "fila": FILA, "evento": "drenada"})]
+
+    # Voltou a ter jobs: o próximo esvaziamento é avisado de novo
+    redis_falso.rpush(FILA, _job(4))
+    fila.confirmar(fila.aguardar(timeout=1))
+    assert len(publicados) == 2
+
+    config["event_settings"] = {"enabled": False}
+    assert FilaConfiavel.from_config(redis_falso, FILA, "Worker-emissao-2", config).canal_eventos is None
+
+
+def _criar_manager(redis_falso, tipo_job="emissao"):
+    config = {
+        "thread_pool_settings": {"autoscaler_enabled": False, "shutdown_timeout_seconds": 5},
+        "memory_settings": {"enabled": False},
+        "event_settings": {"enabled": False},
+    }
+    manager = None
+
+    def executor_falso(nome_worker, funcao_fluxo, config):
+        # Loop mínimo de um worker: espera jobs até ser mandado parar
+        token = manager.obter_token_parada()
+        fila = FilaConfiavel(redis_falso, f"fila:{tipo_job}", nome_worker, fatia_espera=0.2)
+        while not manager.thread_deve_morrer(tipo_job):
+            fila.aguardar(token, timeout=60)
+
+    manager = ThreadPoolManager(
+        redis_client=redis_falso, config=config, ejecutor_function=executor_falso, usuario="u", senha="s",
+    )
+    return manager
+
+
+def _iniciar_threads(manager, tipo_job, quantidade):
+    for i in range(quantidade):
+        thread = manager.criar_thread_worker(tipo_job, f"{tipo_job}_worker_{i}")
+        thread.start()
+        manager.threads[tipo_job].append(thread)
+
+
+def test_downscaling_libera_worker_ocioso_em_segundos(redis_falso):
+    manager = _criar_manager(redis_falso)
+    _iniciar_threads(manager, "emissao", 3)
+    try:
+        with manager.lock:
+            manager._matar_threads_excedentes("emissao", threads_necessarias=1)
+        time.sleep(1)
+        assert len([t for t in manager.threads["emissao"] if t.is_alive()]) == 1
+    finally:
+        manager.parar()
+
+
+def test_parar_drena_todos_os_workers(redis_falso):
+    manager = _criar_manager(redis_falso)
+    _iniciar_threads(manager, "emissao", 4)
+
+    inicio = time.monotonic()
+    manager.parar()
+
+    assert time.monotonic() - inicio < 2
+    assert not any(t.is_alive() for t in manager.threads["emissao"])
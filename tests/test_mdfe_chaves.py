@@ -0,0 +1,114 @@
+import pytest
+
+from utils.captura_rede import CapturaRede, captura_da_pagina
+from utils.fluxo_utils import chave_acesso_valida, extrair_dados_dos_cards_mdfe
+
+CHAVE_1 = "35241012345678000190580010000001011000001011"
+CHAVE_2 = "35241012345678000190580010000001021000001027"
+CHAVE_3 = "35241012345678000190580010000001031000001032"
+
+# Lista de MDF-es como a API do portal devolve (gravada, campos reduzidos)
+LISTA_MDFE = {"content": [
+    {"numero": "102", "serie": "1", "chaveAcesso": CHAVE_2, "status": "AUTORIZADO"},
+    {"numero": "1021", "serie": "1", "chaveAcesso": CHAVE_1, "status": "AUTORIZADO"},
+]}
+
+
+class _Resposta:
+    url = "https://portal.emiteai.com.br/api/mdfe/listar"
+    headers = {"content-type": "application/json"}
+
+    def json(self):
+        return LISTA_MDFE
+
+
+class _Elemento:
+    """Locator falso: cada seletor devolve o mesmo elemento e as ações ficam registradas."""
+
+    def __init__(self, pagina, texto=""):
+        self.pagina = pagina
+        self.texto = texto
+
+    def locator(self, seletor):
+        return self
+
+    @property
+    def first(self):
+        return self
+
+    def nth(self, i):
+        return _Elemento(self.pagina, f"card {i}")
+
+    def wait_for(self, state="visible", timeout=None):
+        pass
+
+    def evaluate_all(self, script):
+        return self.pagina.cards
+
+    def click(self):
+        self.pagina.cliques.append(self.texto)
+
+    def inner_text(self):
+        return f"  {CHAVE_3}  "
+
+    def is_visible(self):
+        return False
+
+
+class _Pagina:
+    def __init__(self, cards):
+        self.cards = cards
+        self.cliques = []
+        self.ouvintes = []
+
+    def locator(self, seletor):
+        return _Elemento(self, seletor)
+
+    def on(self, evento, callback):
+        self.ouvintes.append(callback)
+
+    def remove_listener(self, evento, callback):
+        self.ouvintes.remove(callback)
+
+
+@pytest.mark.parametrize("chave, esperado", [
+    (CHAVE_1, True),
+    (CHAVE_2, True),
+    (CHAVE_1[:-1] + "9", False),   # Dígito verificador errado
+    (CHAVE_1[:-1], False),         # 43 dígitos
+    (None, False),
+])
+def test_chave_acesso_valida(chave, esperado):
+    assert chave_acesso_valida(chave) is esperado
+
+
+def test_chaves_do_card_e_da_api_sem_abrir_detalhes():
+    pagina = _Pagina([
+        {"numero": "Nº: 101", "chave": " ".join(CHAVE_1[i:i + 4] for i in range(0, 44, 4))},
+        {"numero": "Nº: 102", "chave": None},
+    ])
+    captura = CapturaRede(pagina, {"mdfe": r"/api/.*mdfe"})
+    for ouvinte in pagina.ouvintes:
+        ouvinte(_Resposta())
+
+    assert extrair_dados_dos_cards_mdfe(pagina) == [
+        {"numero": "101", "chave": CHAVE_1},
+        {"numero": "102", "chave": CHAVE_2},  # "1021" também contém "102", mas não é o mesmo número
+    ]
+    assert pagina.cliques == []
+    captura.encerrar()
+    assert captura_da_pagina(pagina) is None
+
+
+def test_so_os_mdfes_sem_chave_abrem_detalhes():
+    pagina = _Pagina([
+        {"numero": "Nº: 101", "chave": CHAVE_1},
+        {"numero": None, "chave": None},
+        {"numero": "Nº: 103", "chave": None},
+    ])
+
+    dados = extrair_dados_dos_cards_mdfe(pagina)
+
+    assert dados == [{"numero": "101", "chave": CHAVE_1}, {"numero": "103", "chave": CHAVE_3}]
+    # "Detalhes" só no terceiro card, depois o botão de fechar do painel
+    assert pagina.cliques == ["card 2", "div.MuiDrawer-paperAnchorRight"]
@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from utils.memoria import MonitorMemoria, ler_limite_cgroup, ler_uso_cgroup, listar_arvore, medir_arvore
+from utils.metricas import metricas
+
+MB = 1024 * 1024
+
+
+def _criar_cgroup_v2(raiz, limite, atual, inactive_file=0):
+    (raiz / "memory.max").write_text(str(limite))
+    (raiz / "memory.current").write_text(str(atual))
+    (raiz / "memory.stat").write_text(f"anon 123\ninactive_file {inactive_file}\n")
+
+
+def test_le_cgroup_v2_descontando_cache(tmp_path):
+    _criar_cgroup_v2(tmp_path, limite=2048 * MB, atual=1000 * MB, inactive_file=200 * MB)
+    assert ler_limite_cgroup(str(tmp_path)) == 2048 * MB
+    assert ler_uso_cgroup(str(tmp_path)) == 800 * MB
+
+
+def test_cgroup_sem_limite(tmp_path):
+    (tmp_path / "memory.max").write_text("max\n")
+    assert ler_limite_cgroup(str(tmp_path)) is None
+
+
+def test_cgroup_v1(tmp_path):
+    (tmp_path / "memory").mkdir()
+    (tmp_path / "memory" / "memory.limit_in_bytes").write_text(str(1024 * MB))
+    (tmp_path / "memory" / "memory.usage_in_bytes").write_text(str(600 * MB))
+    assert ler_limite_cgroup(str(tmp_path)) == 1024 * MB
+    assert ler_uso_cgroup(str(tmp_path)) == 600 * MB
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self"), reason="Requer /proc (Linux)")
+def test_mede_arvore_de_processos():
+    filho = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+    try:
+        arvore = listar_arvore(os.getpid())
+        assert os.getpid() in arvore and filho.pid in arvore
+        assert medir_arvore(os.getpid()) > 0
+    finally:
+        filho.kill()
+        filho.wait()
+
+
+def test_recusa_escalar_acima_da_margem(tmp_path):
+    _criar_cgroup_v2(tmp_path, limite=2000 * MB, atual=1200 * MB)
+    monitor = MonitorMemoria(
+        margem_seguranca=0.15, estimativa_navegador_bytes=400 * MB, cgroup_raiz=str(tmp_path)
+    )
+    monitor.amostrar(forcar=True)
+
+    # 1200 + 400 = 1600 <= 1700 (85% de 2000); 1200 + 800 = 2000 > 1700
+    assert monitor.pode_escalar(1)
+    assert not monitor.pode_escalar(2)
+    assert not monitor.sob_pressao()
+
+
+def test_pressao_aponta_workers_mais_pesados(tmp_path):
+    _criar_cgroup_v2(tmp_path, limite=2000 * MB, atual=1900 * MB)
+    monitor = MonitorMemoria(limiar_reciclagem=0.9, cgroup_raiz=str(tmp_path))
+    monitor.amostrar(forcar=True)
+    monitor.memoria_workers = {"Worker-conferencia-1": 700 * MB, "Worker-emissao-1": 300 * MB}
+
+    assert monitor.sob_pressao()
+    assert monitor.mais_pesados(1) == ["Worker-conferencia-1"]
+
+
+def test_memoria_por_worker_vira_metrica(tmp_path):
+    _criar_cgroup_v2(tmp_path, limite=2000 * MB, atual=500 * MB)
+    monitor = MonitorMemoria(cgroup_raiz=str(tmp_path))
+    monitor.registrar_worker("Worker-teste-1", os.getpid())
+    monitor.amostrar(forcar=True)
+
+    assert metricas.obter("memoria_workers")["Worker-teste-1"] > 0
+    assert metricas.obter("memoria_container")["limite_bytes"] == 2000 * MB
+
+    monitor.remover_worker("Worker-teste-1")
+    assert "Worker-teste-1" not in metricas.obter("memoria_workers")
@@ -0,0 +1,68 @@
+"""Orçamento global de navegadores do ThreadPoolManager (sem Redis real nem navegador)."""
+
+import threading
+
+from utils.fluxo_utils import ThreadPoolManager
+
+
+class _FilasFalsas:
+    """Redis mínimo: só o que o ThreadPoolManager usa para dimensionar o pool."""
+
+    def __init__(self, filas: dict):
+        self.filas = filas
+
+    def llen(self, key):
+        return self.filas.get(key, 0)
+
+    def smembers(self, key):
+        return set()
+
+
+def _criar_manager_teste(filas: dict, max_total: int, liberar: threading.Event):
+    def executor_falso(nome_worker, funcao_fluxo, config):
+        liberar.wait(timeout=10)
+
+    config = {
+        "thread_pool_settings": {"min_threads_per_type": 1, "autoscaler_enabled": False, "jobs_per_thread_ratio": 10},
+        "memory_settings": {"enabled": False},
+    }
+    return ThreadPoolManager(
+        redis_client=_FilasFalsas(filas),
+        config=config,
+        ejecutor_function=executor_falso,
+        usuario="u",
+        senha="s",
+        max_threads_per_type=10,
+        max_total_threads=max_total,
+    )
+
+
+def test_orcamento_global_limita_total_de_threads():
+    liberar = threading.Event()
+    manager = _criar_manager_teste({"fila:conferencia": 100, "fila:emissao": 100}, max_total=8, liberar=liberar)
+    try:
+        manager.rebalancear_threads()
+        vivas = {tipo: len([t for t in ts if t.is_alive()]) for tipo, ts in manager.threads.items()}
+        assert sum(vivas.values()) == 8
+        assert vivas["conferencia"] >= 1 and vivas["emissao"] >= 1
+    finally:
+        liberar.set()
+
+
+def test_orcamento_reatribui_capacidade_quando_fila_drena():
+    liberar = threading.Event()
+    filas = {"fila:conferencia": 100, "fila:emissao": 100}
+    manager = _criar_manager_teste(filas, max_total=8, liberar=liberar)
+    try:
+        manager.rebalancear_threads()
+        antes = len(manager._threads_ativas("conferencia"))
+
+        # Emissão drenou: as threads de emissão são marcadas e a conferência
+        # ganha as vagas assim que os navegadores forem liberados
+        filas["fila:emissao"] = 0
+        manager.rebalancear_threads()
+        assert len(manager._threads_ativas("emissao")) == 1
+        assert manager._contar_threads_vivas() <= 8
+        assert len(manager._threads_ativas("conferencia")) >= antes
+    finally:
+        liberar.set()
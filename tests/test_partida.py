@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+
+from utils.fluxo_utils import ThreadPoolManager
+from utils.metricas import metricas
+from utils.sessao import EscalonadorLogins
+
+
+def test_logins_espacados_e_limitados():
+    escalonador = EscalonadorLogins(max_simultaneos=2, intervalo=0.1)
+    inicios, ativos, pico = [], [0], [0]
+    lock = threading.Lock()
+
+    def abrir_sessao():
+        with escalonador.vez("w"):
+            with lock:
+                inicios.append(time.monotonic())
+                ativos[0] += 1
+                pico[0] = max(pico[0], ativos[0])
+            time.sleep(0.25)
+            with lock:
+                ativos[0] -= 1
+
+    threads = [threading.Thread(target=abrir_sessao) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    inicios.sort()
+    assert pico[0] == 2
+    assert all(b - a >= 0.09 for a, b in zip(inicios, inicios[1:]))
+
+
+def test_partida_dimensiona_pelo_backlog_atual(redis_falso):
+    config = {
+        "thread_pool_settings": {"autoscaler_enabled": False, "jobs_per_thread_ratio": 10, "shutdown_timeout_seconds": 5},
+        "startup_settings": {"max_concurrent_logins": 4, "login_stagger_seconds": 0},
+        "memory_settings": {"enabled": False},
+        "event_settings": {"enabled": False},
+    }
+    for i in range(35):
+        redis_falso.rpush("fila:conferencia", json.dumps({"row": i}))
+    manager = None
+
+    def executor_falso(nome_worker, funcao_fluxo, config):
+        with manager.escalonador_logins.vez(nome_worker):
+            time.sleep(0.05)  # "Login"
+        manager.registrar_worker_pronto()
+        token = manager.obter_token_parada()
+        token.evento.wait(timeout=10)
+
+    manager = ThreadPoolManager(
+        redis_client=redis_falso, config=config, ejecutor_function=executor_falso, usuario="u", senha="s",
+    )
+    antes = metricas.obter("partida").get("capacidade_inicial_s:n", 0)
+    try:
+        manager.iniciar()
+        # Sem esperar o rebalanceamento: 35 jobs / 10 por thread = 4 de conferência (+1 de emissão)
+        assert len(manager.threads["conferencia"]) == 4
+        assert len(manager.threads["emissao"]) == 1
+
+        for _ in range(100):
+            if metricas.obter("partida").get("capacidade_inicial_s:n", 0) > antes:
+                break
+            time.sleep(0.02)
+        assert metricas.obter("partida")["capacidade_inicial_s:n"] == antes + 1
+    finally:
+        manager.parar()
@@ -0,0 +1,257 @@
+import datetime
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import utils.redis_client
+import workers.fluxo_conferencia as worker_conferencia
+from utils.filas import FilaConfiavel
+from utils.fluxo_utils import ThreadPoolManager
+from utils.pipeline import JobCancelado, Pendencia, PipelinePaginas, executar_etapas
+
+
+class _PaginaFalsa:
+    def __init__(self, contexto=None):
+        self.context = contexto or SimpleNamespace(new_page=lambda: _PaginaFalsa(self.context))
+        self.esperas = 0
+        self.fechada = False
+
+    def wait_for_timeout(self, ms):
+        self.esperas += 1
+
+    def reload(self, **kwargs):
+        pass
+
+    def close(self):
+        self.fechada = True
+
+
+def _job_falso(nome, eventos, pronta=None):
+    eventos.append(f"{nome}:inicio")
+    try:
+        yield Pendencia(f"{nome}:pesquisa", pronta=pronta)
+        eventos.append(f"{nome}:fim")
+    finally:
+        eventos.append(f"{nome}:confirmado")
+
+
+def test_pipeline_intercala_os_jobs_entre_as_abas():
+    eventos = []
+    sinal = {"pronto": False}
+    paginas = [_PaginaFalsa(), _PaginaFalsa()]
+    pipeline = PipelinePaginas(paginas, "teste")
+
+    pipeline.iniciar(paginas[0], _job_falso("A", eventos, pronta=lambda: sinal["pronto"]), rotulo="LT-A")
+    pipeline.iniciar(paginas[1], _job_falso("B", eventos), rotulo="LT-B")
+    assert pipeline.livres() == [] and pipeline.rotulos() == ["LT-A", "LT-B"]
+
+    # B não depende de nada e termina; A continua esperando a pesquisa
+    assert pipeline.passo() == 1
+    assert eventos == ["A:inicio", "B:inicio", "B:fim", "B:confirmado"]
+    assert pipeline.livres() == [paginas[1]]
+
+    # Ninguém pode avançar: espera uma fatia (entregando os eventos do navegador)
+    assert pipeline.passo() == 0
+    assert paginas[0].esperas == 1
+
+    sinal["pronto"] = True
+    pipeline.drenar()
+    assert eventos[-2:] == ["A:fim", "A:confirmado"]
+    assert pipeline.ocupadas == 0
+
+
+def test_prazo_e_cancelamento():
+    eventos = []
+    pagina = _PaginaFalsa()
+    pipeline = PipelinePaginas([pagina], "teste")
+
+    pipeline.iniciar(pagina, _job_falso("A", eventos, pronta=lambda: False))
+    pipeline.cancelar()
+    assert eventos == ["A:inicio", "A:confirmado"]  # O finally do job roda
+    assert pipeline.ocupadas == 0
+
+    pendencia = Pendencia("lenta", pronta=lambda: False, prazo=0)
+    executar_etapas(pagina, iter([pendencia]))  # Prazo esgotado: segue sem esperar
+
+
+def test_cancelar_interrompe_so_o_job_indicado():
+    eventos = []
+    paginas = [_PaginaFalsa(), _PaginaFalsa()]
+    pipeline = PipelinePaginas(paginas, "teste")
+    interrompidos = []
+
+    def job(nome):
+        try:
+            yield Pendencia(f"{nome}:pesquisa", pronta=lambda: False)
+        except JobCancelado as e:
+            interrompidos.append((nome, e.falha))
+            raise
+        finally:
+            eventos.append(f"{nome}:finally")
+
+    pipeline.iniciar(paginas[0], job("A"), rotulo="LT-A")
+    pipeline.iniciar(paginas[1], job("B"), rotulo="LT-B")
+    assert pipeline.cancelar("LT-A", falha=True) == 1
+    assert interrompidos == [("A", True)] and pipeline.rotulos() == ["LT-B"]
+
+    assert pipeline.cancelar() == 1
+    assert interrompidos == [("A", True), ("B", False)]
+    assert eventos == ["A:finally", "B:finally"] and pipeline.ocupadas == 0
+
+
+def test_from_config_abre_as_abas_extras():
+    pagina = _PaginaFalsa()
+    preparadas = []
+
+    def preparar(aba, indice):
+        if indice == 2:
+            raise RuntimeError("login falhou")
+        preparadas.append(indice)
+
+    config = {"pipeline_settings": {"enabled": True, "pages_per_context": 4, "max_pages_per_context": 3}}
+    pipeline = PipelinePaginas.from_config(pagina, "teste", config, preparar)
+
+    assert preparadas == [1]
+    assert len(pipeline.vagas) == 2 and pipeline.vagas[0].page is pagina
+    assert PipelinePaginas.from_config(pagina, "teste", {}, preparar) is None
+
+
+# --- Worker de conferência ---
+
+class _PoolFalso:
+    """Encerra o worker quando a fila esvazia."""
+
+    def __init__(self, r):
+        self.r = r
+        self.duracoes = []
+
+    def thread_deve_morrer(self, tipo_job):
+        return self.r.llen("fila:conferencia") == 0
+
+    def obter_token_parada(self):
+        return None
+
+    def registrar_duracao_job(self, tipo_job, duracao):
+        self.duracoes.append(duracao)
+
+    def registrar_worker_pipeline(self):
+        pass
+
+
+@pytest.fixture
+def ambiente(monkeypatch, redis_falso):
+    eventos = []
+    monkeypatch.setattr(utils.redis_client, "get_redis", lambda **kwargs: redis_falso)
+    monkeypatch.setattr(worker_conferencia, "garantir_pagina_consulta", lambda **kwargs: True)
+    monkeypatch.setattr(worker_conferencia, "_preparar_aba_conferencia", lambda aba, indice, nome, config: None)
+    monkeypatch.setattr(worker_conferencia.Carga, "from_row", classmethod(lambda cls, row: SimpleNamespace(
+        numero_lt=row["N° Carga"], status_emissao="Pendente", status="EM TRANSITO",
+    )))
+    monkeypatch.setattr(
+        worker_conferencia, "disparar_filtro_cargas", lambda page, lt: eventos.append(f"pesquisa:{lt}") or True
+    )
+    monkeypatch.setattr(worker_conferencia, "concluir_filtro_cargas", lambda page, lt: eventos.append(f"resultado:{lt}"))
+    monkeypatch.setattr(worker_conferencia, "obter_status_lt", lambda page, lt, captura: "Carga Finalizada")
+    monkeypatch.setattr(FilaConfiavel, "from_config", classmethod(
+        lambda cls, r, fila, consumidor, config: cls(r, fila, consumidor, fatia_espera=0.1)
+    ))
+    for i in range(1, 4):
+        redis_falso.rpush("fila:conferencia", json.dumps({"row": i, "data": {"N° Carga": f"LT-{i}", "ID 3ZX": f"id-{i}"}}))
+        redis_falso.sadd("jobs_em_progresso", f"id-{i}")
+    return redis_falso, eventos
+
+
+def _config(pool, pipeline):
+    return {
+        "redis_settings": {"conference_queue": "fila:conferencia", "control_set": "jobs_em_progresso", "results_queue": "fila:resultados"},
+        "conference_settings": {"sweep_enabled": False},
+        "page_state_settings": {"enabled": False},
+        "pipeline_settings": {"enabled": pipeline, "pages_per_context": 2},
+        "thread_pool_manager": pool,
+    }
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_worker_conferencia_com_e_sem_pipeline(ambiente, pipeline):
+    r, eventos = ambiente
+    pool = _PoolFalso(r)
+
+    worker_conferencia.fluxo_conferencia_worker(page=_PaginaFalsa(), config=_config(pool, pipeline))
+
+    if pipeline:
+        # A pesquisa da LT-2 é disparada enquanto a da LT-1 ainda está em andamento
+        assert eventos[:2] == ["pesquisa:LT-1", "pesquisa:LT-2"]
+    else:
+        assert eventos[:2] == ["pesquisa:LT-1", "resultado:LT-1"]
+    assert sorted(eventos) == sorted(f"{etapa}:LT-{i}" for etapa in ("pesquisa", "resultado") for i in range(1, 4))
+    # Todos processados, confirmados e com os cadeados liberados
+    assert sorted(json.loads(j)["payload"]["row"] for j in r.lrange("fila:resultados", 0, -1)) == [1, 2, 3]
+    assert not [chave for chave, valor in r.dados.items() if ":processando:" in chave and valor]
+    assert r.smembers("jobs_em_progresso") == set()
+    assert len(pool.duracoes) == 3
+
+
+def test_kill_signal_interrompe_so_a_aba_da_lt(ambiente, monkeypatch):
+    r, eventos = ambiente
+    pool = _PoolFalso(r)
+
+    def disparar(page, lt):
+        if lt == "LT-1" and "pesquisa:LT-1" not in eventos:
+            r.sadd("watchdog:kill_workers", json.dumps({"job_id": "LT-1"}))
+        eventos.append(f"pesquisa:{lt}")
+        return True
+
+    monkeypatch.setattr(worker_conferencia, "disparar_filtro_cargas", disparar)
+    worker_conferencia.fluxo_conferencia_worker(page=_PaginaFalsa(), config=_config(pool, True))
+
+    # A LT-1 foi interrompida e devolvida à fila; o worker seguiu com as outras abas
+    assert eventos.count("pesquisa:LT-1") == 2 and eventos.count("resultado:LT-1") == 1
+    assert sorted(json.loads(j)["payload"]["row"] for j in r.lrange("fila:resultados", 0, -1)) == [1, 2, 3]
+    assert not [chave for chave, valor in r.dados.items() if ":processando:" in chave and valor]
+    assert r.smembers("jobs_em_progresso") == set()
+    assert not r.dados.get("fila:conferencia:tentativas")
+
+
+def _sinal_kill(lt, segundos_atras=0):
+    momento = datetime.datetime.now() - datetime.timedelta(seconds=segundos_atras)
+    return json.dumps({
+        "worker_id": threading.current_thread().name, "tipo": "conferencia", "job_id": lt,
+        "timestamp": momento.isoformat(),
+    })
+
+
+def test_gerenciador_deixa_o_kill_signal_para_o_worker_do_pipeline(ambiente, monkeypatch):
+    r, eventos = ambiente
+    criadas = []
+    manager = ThreadPoolManager(
+        redis_client=r,
+        config={"thread_pool_settings": {"autoscaler_enabled": False, "pipeline_kill_grace_seconds": 60},
+                "memory_settings": {"enabled": False}, "event_settings": {"enabled": False}},
+        ejecutor_function=lambda *args: None, usuario="u", senha="s",
+    )
+    monkeypatch.setattr(manager, "criar_thread_worker", lambda tipo, nome: criadas.append(tipo))
+    pool = _PoolFalso(r)
+    pool.registrar_worker_pipeline = manager.registrar_worker_pipeline
+
+    def disparar(page, lt):
+        if lt == "LT-1" and "pesquisa:LT-1" not in eventos:
+            r.sadd("watchdog:kill_workers", _sinal_kill("LT-1"))
+            manager._processar_kill_signals()  # O gerenciador acorda primeiro (evento do watchdog)
+        eventos.append(f"pesquisa:{lt}")
+        return True
+
+    monkeypatch.setattr(worker_conferencia, "disparar_filtro_cargas", disparar)
+    worker_conferencia.fluxo_conferencia_worker(page=_PaginaFalsa(), config=_config(pool, True))
+
+    # Nenhuma substituta: o próprio worker consumiu o sinal e interrompeu só a aba da LT-1
+    assert criadas == []
+    assert eventos.count("pesquisa:LT-1") == 2
+    assert r.smembers("watchdog:kill_workers") == set()
+
+    # Sinal não atendido dentro do prazo: a thread inteira travou e o gerenciador a substitui
+    r.sadd("watchdog:kill_workers", _sinal_kill("LT-9", segundos_atras=120))
+    manager._processar_kill_signals()
+    assert criadas == ["conferencia"]
+    assert r.smembers("watchdog:kill_workers") == set()
@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+
+from utils.filas import FilaConfiavel
+from utils.fluxo_utils import TIPO_UNIFICADO, ThreadPoolManager
+from utils.metricas import metricas
+from utils.reciclagem import PoliticaReciclagem, faixa_idade
+
+
+class _Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_motivos_de_reciclagem():
+    relogio = _Relogio()
+    politica = PoliticaReciclagem(
+        max_jobs=100, max_idade=3600, max_rss_bytes=1024 ** 3, fator_latencia=2.0,
+        jobs_referencia=3, janela_recente=3, relogio=relogio,
+    )
+    politica.nascer("w1")
+    for _ in range(3):
+        politica.registrar_job("w1", "emissao", 10.0)
+    assert politica.motivo("w1") is None
+    assert "memória" in politica.motivo("w1", rss_bytes=2 * 1024 ** 3)
+
+    # Latência recente no dobro da referência do próprio worker
+    for _ in range(3):
+        politica.registrar_job("w1", "emissao", 25.0)
+    assert "latência de emissao" in politica.motivo("w1")
+
+    politica.nascer("w2")
+    relogio.agora += 3600
+    assert "min de vida" in politica.motivo("w2")
+
+    politica.nascer("w3")
+    for _ in range(100):
+        politica.registrar_job("w3", "conferencia", 1.0)
+    assert "100 jobs" in politica.motivo("w3")
+
+    politica.esquecer("w3")
+    assert politica.motivo("w3") is None
+    assert PoliticaReciclagem.from_config({}) is None
+
+
+def test_latencia_por_idade_do_worker():
+    relogio = _Relogio()
+    politica = PoliticaReciclagem(relogio=relogio)
+    antes = metricas.obter("latencia_por_idade")
+
+    politica.nascer("w1")
+    politica.registrar_job("w1", "emissao", 4.0)
+    relogio.agora += 90 * 60
+    politica.registrar_job("w1", "emissao", 8.0)
+
+    depois = metricas.obter("latencia_por_idade")
+    assert depois["emissao:0-30min:n"] == antes.get("emissao:0-30min:n", 0) + 1
+    assert depois["emissao:60-120min:n"] == antes.get("emissao:60-120min:n", 0) + 1
+    assert faixa_idade(10 * 3600) == "480+min"
+
+
+def test_substituta_sobe_antes_de_drenar_o_worker_antigo(redis_falso):
+    config = {
+        "thread_pool_settings": {"autoscaler_enabled": False, "shutdown_timeout_seconds": 5},
+        "unified_worker_settings": {"enabled": True},
+        "recycling_settings": {"enabled": True, "max_jobs": 3, "max_age_minutes": 0, "latency_factor": None},
+        "memory_settings": {"enabled": False},
+        "event_settings": {"enabled": False},
+    }
+    eventos = []
+    manager = None
+
+    def executor_falso(nome_worker, funcao_fluxo, config):
+        nome = threading.current_thread().name
+        time.sleep(0.05)  # "Login"
+        manager.registrar_worker_pronto()
+        eventos.append(("pronto", nome))
+        token = manager.obter_token_parada()
+        fila = FilaConfiavel(redis_falso, "fila:emissao", nome_worker, fatia_espera=0.05)
+        while not manager.thread_deve_morrer(TIPO_UNIFICADO):
+            job_json = fila.aguardar(token, timeout=60)
+            if job_json:
+                time.sleep(0.02)
+                fila.confirmar(job_json)
+                eventos.append(("job", nome))
+                manager.registrar_duracao_job("emissao", 0.02)
+        eventos.append(("fim", nome))
+        manager.remover_navegador_worker()
+
+    manager = ThreadPoolManager(
+        redis_client=redis_falso, config=config, ejecutor_function=executor_falso, usuario="u", senha="s",
+    )
+    antes = metricas.obter("reciclagem").get("reciclagens", 0)
+    for i in range(12):
+        redis_falso.rpush("fila:emissao", json.dumps({"row": i}))
+    try:
+        manager.rebalancear_threads()
+        for _ in range(200):
+            if sum(1 for e in eventos if e[0] == "job") == 12 and sum(1 for e in eventos if e[0] == "fim") >= 2:
+                break
+            time.sleep(0.02)
+
+        # O worker antigo segue atendendo enquanto a substituta faz login
+        assert sum(1 for e in eventos if e[0] == "job") == 12
+        assert metricas.obter("reciclagem")["reciclagens"] >= antes + 2
+
+        # Cada worker reciclado só encerra depois que o seguinte está pronto
+        encerrados = [nome for tipo, nome in eventos if tipo == "fim"]
+        prontos = [nome for tipo, nome in eventos if tipo == "pronto"]
+        assert encerrados == prontos[:2]
+        for antigo, substituto in zip(prontos, prontos[1:3]):
+            assert eventos.index(("pronto", substituto)) < eventos.index(("fim", antigo))
+        assert len(manager._threads_ativas(TIPO_UNIFICADO)) == 1
+    finally:
+        manager.parar()
+
+
+def test_nomes_de_threads_nao_se_repetem(redis_falso):
+    config = {
+        "thread_pool_settings": {"autoscaler_enabled": False},
+        "memory_settings": {"enabled": False},
+        "event_settings": {"enabled": False},
+    }
+    manager = ThreadPoolManager(
+        redis_client=redis_falso, config=config, ejecutor_function=lambda *args: None, usuario="u", senha="s",
+    )
+    primeira = manager.criar_thread_worker("emissao", "emissao_worker_1")
+    segunda = manager.criar_thread_worker("emissao", "emissao_worker_2")
+    manager.threads["emissao"] = [segunda]  # A primeira morreu e saiu da lista
+
+    # A próxima não pode herdar o nome da que ainda está viva
+    terceira = manager.criar_thread_worker("emissao", "emissao_worker_2")
+    assert len({primeira.name, segunda.name, terceira.name}) == 3
+    assert manager.criar_thread_worker("conferencia", "conferencia_worker_1").name == "Worker-conferencia-1"
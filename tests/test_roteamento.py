@@ -0,0 +1,59 @@
+from utils.metricas import metricas
+from utils.roteamento import PoliticaRoteamento
+
+
+class _RequestFalso:
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.resource_type = resource_type
+
+
+class _RouteFalsa:
+    def __init__(self, url, resource_type):
+        self.request = _RequestFalso(url, resource_type)
+        self.resultado = None
+
+    def continue_(self):
+        self.resultado = "continue"
+
+    def abort(self, motivo=None):
+        self.resultado = "abort"
+
+
+def _politica():
+    return PoliticaRoteamento.from_config({
+        "routing_settings": {
+            "allowed_hosts": ["emiteai.com.br"],
+            "deny_hosts": ["hotjar.com"],
+            "allow_url_patterns": [r"/assets/logo-login\.png$"],
+        }
+    })
+
+
+def test_decisao_por_tipo_host_e_excecoes():
+    politica = _politica()
+    assert politica.motivo_bloqueio("https://portal.emiteai.com.br/#/consulta", "document") is None
+    assert politica.motivo_bloqueio("https://api.emiteai.com.br/v1/consulta", "fetch") is None
+    assert politica.motivo_bloqueio("https://portal.emiteai.com.br/static/bg.png", "image") == "tipo"
+    assert politica.motivo_bloqueio("https://fonts.gstatic.com/roboto.woff2", "font") == "terceiro"
+    assert politica.motivo_bloqueio("https://static.hotjar.com/c/hotjar.js", "script") == "host_bloqueado"
+    assert politica.motivo_bloqueio("https://portal.emiteai.com.br/assets/logo-login.png", "image") is None
+    assert politica.motivo_bloqueio("data:image/png;base64,AAAA", "image") is None
+
+
+def test_rota_aborta_e_conta_bytes_estimados():
+    politica = _politica()
+    antes = metricas.obter("roteamento").get("bytes_bloqueados_estimados", 0)
+
+    imagem = _RouteFalsa("https://portal.emiteai.com.br/static/bg.png", "image")
+    api = _RouteFalsa("https://api.emiteai.com.br/v1/consulta", "xhr")
+    politica._ao_rotear(imagem)
+    politica._ao_rotear(api)
+
+    assert imagem.resultado == "abort" and api.resultado == "continue"
+    depois = metricas.obter("roteamento")["bytes_bloqueados_estimados"]
+    assert depois - antes == politica.bytes_estimados["image"]
+
+
+def test_desligada_por_config():
+    assert PoliticaRoteamento.from_config({"routing_settings": {"enabled": False}}) is None
@@ -0,0 +1,36 @@
+import sys
+
+from utils.metricas import metricas
+from utils.servidor_navegador import ServidorNavegador
+
+# Processo que se comporta como o launchServer: informa o endpoint e fica no ar
+_SERVIDOR_FALSO = [sys.executable, "-c", "import time; print('ws://127.0.0.1:9/abc', flush=True); time.sleep(60)"]
+
+
+def test_endpoint_sobrevive_e_servidor_e_recriado_apos_queda():
+    servidor = ServidorNavegador(timeout_partida=5, comando=_SERVIDOR_FALSO)
+    antes = metricas.obter("servidor_navegador")
+    try:
+        assert servidor.endpoint() == "ws://127.0.0.1:9/abc"
+        pid = servidor.pid
+        assert servidor.endpoint() == "ws://127.0.0.1:9/abc" and servidor.pid == pid  # Reaproveitado
+
+        servidor.processo.kill()
+        servidor.processo.wait()
+        assert servidor.endpoint() == "ws://127.0.0.1:9/abc"
+        assert servidor.pid != pid
+
+        depois = metricas.obter("servidor_navegador")
+        assert depois["partidas"] == antes.get("partidas", 0) + 2
+        assert depois["quedas"] == antes.get("quedas", 0) + 1
+    finally:
+        processo = servidor.processo
+        servidor.parar()
+    assert servidor.pid is None and processo.poll() is not None
+
+
+def test_falha_na_partida_nao_deixa_processo():
+    servidor = ServidorNavegador(timeout_partida=5, comando=[sys.executable, "-c", "raise SystemExit(1)"])
+    assert servidor.endpoint() is None
+    assert servidor.processo is None
+    assert ServidorNavegador.from_config({}) is None
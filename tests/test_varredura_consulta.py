@@ -0,0 +1,135 @@
+import utils.varredura_consulta as varredura_consulta
+from utils.varredura_consulta import CHAVE_LOCK, CHAVE_MAPA, VarreduraConsulta, indexar_linhas
+
+
+def test_indexar_linhas_encontra_lt_no_nome_do_arquivo():
+    linhas = [
+        ["", "14/10/2025", "LT-123_CTE.xml", "Carga Finalizada"],
+        ["", "14/10/2025", "LT 456 conferir", "Aguardando Conferência"],
+        ["linha incompleta"],
+    ]
+    mapa = indexar_linhas(linhas)
+    assert mapa["123"] == "Carga Finalizada"
+    assert mapa["456"] == "Aguardando Conferência"
+    assert mapa["LT-123"] == "Carga Finalizada"
+    assert "Carga" not in mapa  # Célula de status não vira chave
+
+
+def test_indexar_linhas_ignora_tokens_que_nao_sao_lt_e_lts_repetidas():
+    linhas = [
+        ["14", "14/10/2025", "LT-2025_CTE.xml", "Carga Finalizada"],
+        ["2025", "15/10/2025", "LT-14_CTE.xml", "Aguardando Conferência"],
+        ["3", "15/10/2025", "LT-77_CTE.xml", "Carga Finalizada"],
+        ["4", "16/10/2025", "LT-77_reenvio.xml", "Aguardando Conferência"],
+    ]
+    mapa = indexar_linhas(linhas)
+    # Datas e números de outras colunas não colidem com a LT
+    assert mapa["2025"] == "Carga Finalizada"
+    assert mapa["14"] == "Aguardando Conferência"
+    assert "10" not in mapa and "CTE" not in mapa
+    # LT em mais de uma linha: ambígua, resolvida pela pesquisa individual
+    assert "77" not in mapa and "LT-77" not in mapa
+
+
+class _Linhas:
+    def __init__(self, pagina):
+        self.pagina = pagina
+
+    def evaluate_all(self, script):
+        return [list(linha) for linha in self.pagina.linhas_visiveis]
+
+    @property
+    def first(self):
+        return self
+
+    def evaluate(self, script):
+        return list(self.pagina.linhas_visiveis[0])
+
+
+class _BotaoProxima:
+    def __init__(self, pagina):
+        self.pagina = pagina
+
+    @property
+    def first(self):
+        return self
+
+    def count(self):
+        return 1
+
+    def is_enabled(self):
+        return self.pagina.atual < len(self.pagina.paginas) - 1
+
+    def click(self):
+        self.pagina.atual += 1
+        self.pagina.cliques_pendentes = 2  # A tabela só troca depois de algumas leituras
+
+
+class _PaginaTabela:
+    """Tabela paginada cuja próxima página aparece com atraso após o clique."""
+
+    def __init__(self, paginas):
+        self.paginas = paginas
+        self.atual = 0
+        self.cliques_pendentes = 0
+
+    @property
+    def linhas_visiveis(self):
+        if self.cliques_pendentes:
+            self.cliques_pendentes -= 1
+            return self.paginas[self.atual - 1]
+        return self.paginas[self.atual]
+
+    def locator(self, seletor, **kwargs):
+        return _Linhas(self) if seletor == "table tbody tr" else _BotaoProxima(self)
+
+
+def test_varredura_espera_a_proxima_pagina_antes_de_ler(monkeypatch):
+    monkeypatch.setattr(varredura_consulta, "filtro_cargas", lambda page, lt: None)
+    monkeypatch.setattr(varredura_consulta, "aguardar_spinner", lambda *args, **kwargs: True)
+    paginas = [
+        [["1", "d", "LT-1_CTE.xml", "Carga Finalizada"]],
+        [["2", "d", "LT-2_CTE.xml", "Aguardando Conferência"]],
+    ]
+    mapa, completo = varredura_consulta.varrer_tabela(_PaginaTabela(paginas))
+    assert completo
+    assert mapa == {"1": "Carga Finalizada", "LT-1": "Carga Finalizada",
+                    "2": "Aguardando Conferência", "LT-2": "Aguardando Conferência"}
+
+
+def test_varre_uma_vez_e_resolve_pelo_mapa(monkeypatch, redis_falso):
+    varreduras = []
+
+    def varrer_falso(page, max_paginas):
+        varreduras.append(page)
+        return {"123": "Carga Finalizada", "456": "Aguardando Conferência"}, True
+
+    monkeypatch.setattr(varredura_consulta, "varrer_tabela", varrer_falso)
+    varredura = VarreduraConsulta(redis_falso, fila_minima=5)
+
+    # Fila pequena: não compensa varrer
+    assert varredura.obter_status("pagina", "123", jobs_na_fila=1) is None
+    assert varreduras == []
+
+    assert varredura.obter_status("pagina", "123", jobs_na_fila=10) == "Carga Finalizada"
+    assert varredura.obter_status("pagina", "456", jobs_na_fila=9) == "Aguardando Conferência"
+    assert varredura.obter_status("pagina", "789", jobs_na_fila=8) is None
+    assert len(varreduras) == 1
+    assert CHAVE_LOCK not in redis_falso.dados
+
+
+def test_outro_worker_varrendo_nao_dispara_nova_varredura(monkeypatch, redis_falso):
+    monkeypatch.setattr(
+        varredura_consulta, "varrer_tabela", lambda page, max_paginas: (_ for _ in ()).throw(AssertionError)
+    )
+    redis_falso.set(CHAVE_LOCK, "1", nx=True)
+    varredura = VarreduraConsulta(redis_falso, fila_minima=1)
+
+    assert varredura.obter_status("pagina", "123", jobs_na_fila=50) is None
+    assert CHAVE_MAPA not in redis_falso.dados
+
+
+def test_from_config_respeita_desligamento(redis_falso):
+    assert VarreduraConsulta.from_config(redis_falso, {"conference_settings": {"sweep_enabled": False}}) is None
+    varredura = VarreduraConsulta.from_config(redis_falso, {"conference_settings": {"sweep_min_queue": 3}})
+    assert varredura.fila_minima == 3
@@ -0,0 +1,176 @@
+import json
+from types import SimpleNamespace
+
+import utils.redis_client
+import workers.fluxo_unificado as worker_unificado
+from utils.filas import FilaConfiavel, SeletorFilas
+from utils.fluxo_utils import TIPO_UNIFICADO, ThreadPoolManager
+
+
+def _filas(r):
+    return {tipo: FilaConfiavel(r, f"fila:{tipo}", "w", fatia_espera=0.05) for tipo in ("conferencia", "emissao")}
+
+
+def _encher(r, tipo, quantidade):
+    for i in range(quantidade):
+        r.rpush(f"fila:{tipo}", json.dumps({"row": i, "data": {"N° Carga": f"{tipo}-{i}", "ID 3ZX": f"{tipo}-{i}"}}))
+
+
+def test_preferida_primeiro_e_roubo_da_fila_mais_carregada(redis_falso):
+    seletor = SeletorFilas(_filas(redis_falso), "conferencia", razao_roubo=2.0)
+
+    # Preferida vazia: rouba da outra
+    _encher(redis_falso, "emissao", 1)
+    assert seletor.ordem() == ["emissao", "conferencia"]
+
+    # Backlogs parecidos: fica na preferida
+    _encher(redis_falso, "conferencia", 1)
+    assert seletor.ordem() == ["conferencia", "emissao"]
+
+    # A outra fila com o dobro do backlog: rouba
+    _encher(redis_falso, "emissao", 1)
+    assert seletor.obter(timeout=0)[0] == "emissao"
+
+    # O peso muda a prioridade do tipo
+    seletor.pesos = {"conferencia": 3.0}
+    assert seletor.ordem() == ["conferencia", "emissao"]
+
+
+def test_obter_espera_nas_duas_filas(redis_falso):
+    seletor = SeletorFilas(_filas(redis_falso), "conferencia")
+    assert seletor.obter(timeout=0.2) is None
+
+    _encher(redis_falso, "emissao", 1)
+    tipo, job_json = seletor.obter(timeout=1)
+    assert tipo == "emissao"
+    # O job foi para a lista de processamento da fila de origem
+    assert redis_falso.lrange(seletor.filas["emissao"].chave_processando, 0, -1) == [job_json]
+
+
+def test_pool_unificado_dimensionado_pela_soma_das_filas(redis_falso):
+    config = {
+        "thread_pool_settings": {"autoscaler_enabled": False, "jobs_per_thread_ratio": 10},
+        "unified_worker_settings": {"enabled": True},
+        "memory_settings": {"enabled": False},
+        "event_settings": {"enabled": False},
+    }
+    manager = ThreadPoolManager(
+        redis_client=redis_falso, config=config, ejecutor_function=None, usuario="u", senha="s", max_total_threads=4,
+    )
+    assert manager.tipos == [TIPO_UNIFICADO] and list(manager.threads) == [TIPO_UNIFICADO]
+
+    # Filas vazias: um navegador no total (não um por tipo)
+    assert manager.calcular_threads_necessarias(TIPO_UNIFICADO) == 1
+
+    _encher(redis_falso, "conferencia", 15)
+    _encher(redis_falso, "emissao", 12)
+    assert manager.calcular_threads_necessarias(TIPO_UNIFICADO) == 3
+
+    _encher(redis_falso, "emissao", 30)
+    assert manager.calcular_threads_necessarias(TIPO_UNIFICADO) == 4  # Limitado ao orçamento global
+
+
+class _PoolFalso:
+    """Encerra o worker quando as duas filas esvaziam."""
+
+    def __init__(self, r):
+        self.r = r
+        self.duracoes = []
+
+    def thread_deve_morrer(self, tipo_job):
+        assert tipo_job == TIPO_UNIFICADO
+        return self.r.llen("fila:conferencia") == 0 and self.r.llen("fila:emissao") == 0
+
+    def obter_token_parada(self):
+        return None
+
+    def registrar_duracao_job(self, tipo_job, duracao):
+        self.duracoes.append(tipo_job)
+
+
+def test_worker_unificado_atende_as_duas_filas(monkeypatch, redis_falso):
+    processados = []
+
+    def etapas_falsas(page, rec, job_json, job, inicio_job):
+        processados.append(("conferencia", job["data"]["N° Carga"]))
+        rec.fila.confirmar(job_json)
+        return iter(())
+
+    def lote_falso(page, rec, lote_json):
+        processados.extend(("emissao", json.loads(j)["data"]["N° Carga"]) for j in lote_json)
+        for job_json in lote_json:
+            rec.fila.confirmar(job_json)
+        return None
+
+    monkeypatch.setattr(utils.redis_client, "get_redis", lambda **kwargs: redis_falso)
+    monkeypatch.setattr(worker_unificado, "_etapas_conferencia", etapas_falsas)
+    monkeypatch.setattr(worker_unificado, "_processar_lote_emissao", lote_falso)
+    monkeypatch.setattr(FilaConfiavel, "from_config", classmethod(
+        lambda cls, r, fila, consumidor, config: cls(r, fila, consumidor, fatia_espera=0.05)
+    ))
+    _encher(redis_falso, "conferencia", 2)
+    _encher(redis_falso, "emissao", 3)
+
+    config = {
+        "redis_settings": {"conference_queue": "fila:conferencia", "emission_queue": "fila:emissao", "control_set": "jobs_em_progresso"},
+        "conference_settings": {"sweep_enabled": False},
+        "page_state_settings": {"enabled": False},
+        "network_capture_settings": {"enabled": False},
+        "option_cache_settings": {"enabled": False},
+        "master_data_settings": {"enabled": False},
+        "emission_settings": {"batch_size": 2},
+        "thread_pool_manager": _PoolFalso(redis_falso),
+    }
+    worker_unificado.fluxo_unificado_worker(page=SimpleNamespace(), config=config)
+
+    assert sorted(processados) == sorted(
+        [("conferencia", f"conferencia-{i}") for i in range(2)] + [("emissao", f"emissao-{i}") for i in range(3)]
+    )
+    # Nada ficou preso nas listas de processamento
+    assert not [chave for chave, valor in redis_falso.dados.items() if ":processando:" in chave and valor]
+
+
+def test_erro_ao_obter_job_libera_na_fila_de_origem(monkeypatch, redis_falso):
+    processados = []
+
+    def lote_falso(page, rec, lote_json):
+        processados.extend(json.loads(j)["data"]["N° Carga"] for j in lote_json)
+        for job_json in lote_json:
+            rec.fila.confirmar(job_json)
+        return None
+
+    completar_original = FilaConfiavel.completar_lote
+    falhas = []
+
+    def completar_com_falha(self, lote, maximo):
+        if not falhas:
+            falhas.append(lote[0])
+            raise RuntimeError("falha simulada")
+        return completar_original(self, lote, maximo)
+
+    monkeypatch.setattr(utils.redis_client, "get_redis", lambda **kwargs: redis_falso)
+    monkeypatch.setattr(worker_unificado, "_processar_lote_emissao", lote_falso)
+    monkeypatch.setattr(worker_unificado.time, "sleep", lambda segundos: None)
+    monkeypatch.setattr(FilaConfiavel, "completar_lote", completar_com_falha)
+    monkeypatch.setattr(FilaConfiavel, "from_config", classmethod(
+        lambda cls, r, fila, consumidor, config: cls(r, fila, consumidor, fatia_espera=0.05)
+    ))
+    _encher(redis_falso, "emissao", 2)
+    redis_falso.rpush("fila:conferencia", "{json quebrado")
+
+    config = {
+        "redis_settings": {"conference_queue": "fila:conferencia", "emission_queue": "fila:emissao", "control_set": "jobs_em_progresso"},
+        "conference_settings": {"sweep_enabled": False},
+        "page_state_settings": {"enabled": False},
+        "network_capture_settings": {"enabled": False},
+        "option_cache_settings": {"enabled": False},
+        "master_data_settings": {"enabled": False},
+        "emission_settings": {"batch_size": 1},
+        "thread_pool_manager": _PoolFalso(redis_falso),
+    }
+    worker_unificado.fluxo_unificado_worker(page=SimpleNamespace(), config=config)
+
+    # A emissão que falhou voltou para a fila e foi processada depois; a conferência malformada foi descartada
+    assert sorted(processados) == ["emissao-0", "emissao-1"]
+    assert redis_falso.llen("fila:conferencia") == 0
+    assert not [chave for chave, valor in redis_falso.dados.items() if ":processando:" in chave and valor]
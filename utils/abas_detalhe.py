@@ -0,0 +1,142 @@
+"""
+Telas de detalhe (CT-e, MDF-e) de um card abertas em abas secundárias.
+
+Antes, `preencher_cte` clicava no contador "Autorizado" e a própria aba do
+worker navegava para a lista de CT-es; o MDF-e precisava depois da vista de
+Cards de novo (nova navegação + novo filtro, ou locators velhos). Com as abas:
+
+    abas = AbasDetalhe.from_config(page, config)
+    abertas = abas.abrir_varias(numero_lt, {"cte": botao_cte, "mdfe": botao_mdfe})
+    try:
+        preencher_cte(page, card, numero_lt, aba=abertas.get("cte"))
+        preencher_mdfe(page, card, numero_lt, aba=abertas.get("mdfe"))
+    finally:
+        abas.fechar(abertas)
+
+As abas são abertas no mesmo contexto (mesma sessão) e as navegações são
+disparadas juntas (`wait_until="commit"`), então o portal carrega as duas
+telas em paralelo enquanto a aba principal continua na vista de Cards filtrada.
+
+Os botões do portal não são links na maioria das telas. O endereço da tela
+vem, nesta ordem, do `href` do botão (quando for um link) ou de uma rota
+aprendida: na primeira vez que um tipo é aberto na própria aba, a URL de
+destino é guardada com o número da LT como parâmetro. Sem endereço
+conhecido, o fluxo segue como antes (clique na própria aba).
+
+Aberturas por tipo e caminho ficam em metricas, grupo "abas_detalhe".
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+from playwright.sync_api import Locator, Page
+
+from utils.captura_rede import CapturaRede, captura_da_pagina
+from utils.metricas import metricas
+
+MARCADOR_LT = "{numero_lt}"
+
+# Rotas aprendidas, compartilhadas por todos os workers do processo: {tipo: modelo de URL}
+_rotas: Dict[str, str] = {}
+_lock_rotas = threading.Lock()
+
+
+def aprender_rota(tipo: str, url: str, numero_lt: str):
+    """Guarda a URL da tela de `tipo` com a LT trocada pelo marcador (se ela aparecer na URL)."""
+    if not numero_lt or numero_lt not in url:
+        return
+    modelo = url.replace(numero_lt, MARCADOR_LT)
+    with _lock_rotas:
+        if _rotas.get(tipo) != modelo:
+            _rotas[tipo] = modelo
+            logger.debug(f"[AbasDetalhe] Rota de '{tipo}' aprendida: {modelo}")
+
+
+def rota_conhecida(tipo: str, numero_lt: str) -> Optional[str]:
+    with _lock_rotas:
+        modelo = _rotas.get(tipo)
+    return modelo.replace(MARCADOR_LT, numero_lt) if modelo else None
+
+
+def esquecer_rotas():
+    with _lock_rotas:
+        _rotas.clear()
+
+
+class AbasDetalhe:
+    """Abre e fecha as abas de detalhe de um worker."""
+
+    def __init__(self, page: Page, config: Optional[dict] = None, timeout_ms: float = 30000):
+        """
+        Args:
+            page: Aba principal do worker (fica na vista de Cards)
+            config: Configuração do worker (captura de rede das abas novas)
+            timeout_ms: Limite para a navegação de cada aba começar
+        """
+        self.page = page
+        self.config = config or {}
+        self.timeout_ms = timeout_ms
+
+    @classmethod
+    def from_config(cls, page: Page, config: dict) -> Optional["AbasDetalhe"]:
+        """Cria a partir de 'detail_tabs_settings' (None se desligado)."""
+        abas_cfg = config.get("detail_tabs_settings", {})
+        if not abas_cfg.get("enabled", True):
+            return None
+        return cls(page, config, timeout_ms=abas_cfg.get("navigation_timeout_ms", 30000))
+
+    def url_destino(self, tipo: str, botao: Locator, numero_lt: str) -> Optional[str]:
+        """Endereço da tela que `botao` abriria (None se desconhecido)."""
+        try:
+            href = botao.evaluate("b => (b.closest('a') || {}).href || null")
+        except Exception as e:
+            logger.debug(f"[AbasDetalhe] Falha ao ler o link do botão de '{tipo}': {e}")
+            href = None
+        return href or rota_conhecida(tipo, numero_lt)
+
+    def abrir(self, tipo: str, botao: Locator, numero_lt: str) -> Optional[Page]:
+        """Abre a tela de `tipo` em uma aba nova, sem esperar o carregamento (None se não der)."""
+        url = self.url_destino(tipo, botao, numero_lt)
+        if not url:
+            metricas.incrementar("abas_detalhe", f"{tipo}:sem_rota")
+            return None
+        inicio = time.monotonic()
+        aba = None
+        try:
+            aba = self.page.context.new_page()
+            # Captura antes da navegação: a lista que a tela baixar fica disponível (ex: chaves de MDF-e)
+            CapturaRede.from_config(aba, self.config)
+            aba.goto(url, wait_until="commit", timeout=self.timeout_ms)
+        except Exception as e:
+            logger.warning(f"[AbasDetalhe] [LT {numero_lt}] Falha ao abrir '{tipo}' em nova aba: {e}")
+            self.fechar({tipo: aba})
+            metricas.incrementar("abas_detalhe", f"{tipo}:falhas")
+            return None
+        metricas.observar("abas_detalhe", f"{tipo}:abertura_s", time.monotonic() - inicio)
+        metricas.incrementar("abas_detalhe", f"{tipo}:aba")
+        return aba
+
+    def abrir_varias(self, numero_lt: str, botoes: Dict[str, Optional[Locator]]) -> Dict[str, Page]:
+        """Dispara a abertura de todas as telas; as que não abrirem ficam de fora do resultado."""
+        abertas = {}
+        for tipo, botao in botoes.items():
+            if botao is None:
+                continue
+            aba = self.abrir(tipo, botao, numero_lt)
+            if aba:
+                abertas[tipo] = aba
+        return abertas
+
+    def fechar(self, abertas: Dict[str, Optional[Page]]):
+        for tipo, aba in abertas.items():
+            if aba is None:
+                continue
+            captura = captura_da_pagina(aba)
+            if captura:
+                captura.encerrar()
+            try:
+                aba.close()
+            except Exception as e:
+                logger.debug(f"[AbasDetalhe] Falha ao fechar a aba de '{tipo}': {e}")
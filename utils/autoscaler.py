@@ -0,0 +1,298 @@
+"""
+Autoscaler preditivo orientado a SLO para o ThreadPoolManager.
+
+Em vez de dimensionar o pool apenas por ceil(fila / ratio), estima a taxa de
+chegada de jobs e o tempo de serviço de cada tipo a partir do histórico
+recente e calcula quantas threads são necessárias para que nenhum job espere
+mais do que `tempo_espera_alvo` segundos na fila.
+
+Características:
+- Taxa de chegada estimada por média móvel exponencial (EWMA) no tempo,
+  robusta a observações em intervalos irregulares
+- Tempo de serviço por tipo (conferência é bem mais lenta que emissão)
+- Histerese: escala para cima rápido, reduz só após um período estável
+- Cooldowns para não desperdiçar a inicialização (cara) de navegadores
+"""
+
+import threading
+import time
+from math import ceil, exp
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+
+class _EstadoTipo:
+    """Estado interno do autoscaler para um tipo de job."""
+
+    def __init__(self, tempo_servico: float):
+        self.tempo_servico = tempo_servico      # EWMA da duração dos jobs (s)
+        self.taxa_chegada = 0.0                  # EWMA de jobs/s
+        self.pendentes_anterior: Optional[int] = None
+        self.instante_anterior: Optional[float] = None
+        self.concluidos_desde_observacao = 0
+        self.alvo_atual: Optional[int] = None    # Última decisão devolvida
+        self.ultimo_aumento: Optional[float] = None
+        self.abaixo_desde: Optional[float] = None
+        self.pico_durante_queda = 0
+
+
+class AutoscalerPreditivo:
+    """
+    Dimensiona cada pool para cumprir um tempo máximo de espera na fila.
+
+    Fórmula (por tipo):
+        carga     = taxa_chegada * tempo_servico / utilizacao_maxima
+        backlog   = jobs_pendentes * tempo_servico / tempo_espera_alvo
+        desejadas = ceil(carga + backlog), limitado a [min_threads, max_threads]
+
+    Uso:
+        autoscaler = AutoscalerPreditivo(["conferencia", "emissao"], min_threads=1, max_threads=10)
+        autoscaler.registrar_servico("conferencia", 85.0)   # Worker concluiu um job
+        alvo = autoscaler.decidir("conferencia", jobs_pendentes=120)
+    """
+
+    def __init__(
+        self,
+        tipos: list,
+        min_threads: int = 1,
+        max_threads: int = 10,
+        tempo_espera_alvo: float = 300,
+        tempo_servico_padrao: Optional[Dict[str, float]] = None,
+        suavizacao: float = 0.3,
+        janela_taxa: float = 300,
+        utilizacao_maxima: float = 0.8,
+        cooldown_aumento: float = 30,
+        cooldown_reducao: float = 300,
+        relogio: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            tipos: Tipos de job gerenciados (ex: ["conferencia", "emissao"])
+            min_threads: Mínimo de threads por tipo
+            max_threads: Máximo de threads por tipo
+            tempo_espera_alvo: Tempo máximo desejado de um job na fila (s)
+            tempo_servico_padrao: Duração estimada de um job por tipo antes de haver histórico (s)
+            suavizacao: Peso do job mais recente na média do tempo de serviço (0-1)
+            janela_taxa: Constante de tempo da média da taxa de chegada (s)
+            utilizacao_maxima: Fração de ocupação alvo das threads em regime
+            cooldown_aumento: Intervalo mínimo entre dois aumentos do pool (s)
+            cooldown_reducao: Tempo que a demanda precisa ficar abaixo do pool antes de reduzir (s)
+            relogio: Fonte de tempo (injetável para simulações)
+        """
+        self.min_threads = min_threads
+        self.max_threads = max_threads
+        self.tempo_espera_alvo = tempo_espera_alvo
+        self.suavizacao = suavizacao
+        self.janela_taxa = janela_taxa
+        self.utilizacao_maxima = utilizacao_maxima
+        self.cooldown_aumento = cooldown_aumento
+        self.cooldown_reducao = cooldown_reducao
+        self.relogio = relogio
+
+        tempo_servico_padrao = tempo_servico_padrao or {}
+        self.estado: Dict[str, _EstadoTipo] = {
+            tipo: _EstadoTipo(float(tempo_servico_padrao.get(tipo, 60)))
+            for tipo in tipos
+        }
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, tipos: list, thread_pool_cfg: dict, min_threads: int, max_threads: int):
+        """Cria o autoscaler a partir da seção 'thread_pool_settings' do config.json."""
+        return cls(
+            tipos=tipos,
+            min_threads=min_threads,
+            max_threads=max_threads,
+            tempo_espera_alvo=thread_pool_cfg.get("target_queue_wait_seconds", 300),
+            tempo_servico_padrao=thread_pool_cfg.get("default_service_time_seconds", {}),
+            suavizacao=thread_pool_cfg.get("service_time_smoothing", 0.3),
+            janela_taxa=thread_pool_cfg.get("arrival_rate_window_seconds", 300),
+            utilizacao_maxima=thread_pool_cfg.get("max_utilization", 0.8),
+            cooldown_aumento=thread_pool_cfg.get("scale_up_cooldown_seconds", 30),
+            cooldown_reducao=thread_pool_cfg.get("scale_down_cooldown_seconds", 300),
+        )
+
+    def registrar_servico(self, tipo_job: str, duracao: float):
+        """Registra a duração de um job concluído (chamado pelos workers)."""
+        if tipo_job not in self.estado or duracao < 0:
+            return
+        with self.lock:
+            estado = self.estado[tipo_job]
+            estado.tempo_servico += self.suavizacao * (duracao - estado.tempo_servico)
+            estado.concluidos_desde_observacao += 1
+
+    def observar_fila(self, tipo_job: str, jobs_pendentes: int):
+        """
+        Atualiza a estimativa de taxa de chegada a partir do tamanho da fila.
+
+        Chegadas no intervalo = variação da fila + jobs concluídos no intervalo.
+        O peso da amostra cresce com a duração do intervalo, então chamadas
+        frequentes (ou irregulares) não distorcem a média.
+        """
+        agora = self.relogio()
+        with self.lock:
+            estado = self.estado[tipo_job]
+            if estado.instante_anterior is not None:
+                intervalo = agora - estado.instante_anterior
+                if intervalo <= 0:
+                    return
+                chegadas = max(
+                    0,
+                    jobs_pendentes - estado.pendentes_anterior + estado.concluidos_desde_observacao,
+                )
+                taxa = chegadas / intervalo
+                peso = 1 - exp(-intervalo / self.janela_taxa)
+                estado.taxa_chegada += peso * (taxa - estado.taxa_chegada)
+
+            estado.pendentes_anterior = jobs_pendentes
+            estado.instante_anterior = agora
+            estado.concluidos_desde_observacao = 0
+
+    def threads_desejadas(self, tipo_job: str, jobs_pendentes: int) -> int:
+        """Calcula o tamanho ideal do pool, sem histerese."""
+        with self.lock:
+            estado = self.estado[tipo_job]
+            carga = estado.taxa_chegada * estado.tempo_servico / self.utilizacao_maxima
+            backlog = jobs_pendentes * estado.tempo_servico / self.tempo_espera_alvo
+
+        desejadas = ceil(carga + backlog - 1e-9)
+        return max(self.min_threads, min(desejadas, self.max_threads))
+
+    def decidir(self, tipo_job: str, jobs_pendentes: int) -> int:
+        """
+        Observa a fila e devolve o tamanho do pool a ser aplicado, com histerese.
+
+        - Aumento: imediato, respeitando `cooldown_aumento` entre aumentos
+        - Redução: só depois da demanda ficar abaixo do pool por `cooldown_reducao`,
+          e apenas até o pico de demanda visto nesse período
+        """
+        self.observar_fila(tipo_job, jobs_pendentes)
+        desejadas = self.threads_desejadas(tipo_job, jobs_pendentes)
+        agora = self.relogio()
+
+        with self.lock:
+            estado = self.estado[tipo_job]
+            atual = estado.alvo_atual
+
+            if atual is None:
+                estado.alvo_atual = desejadas
+                estado.ultimo_aumento = agora
+                return desejadas
+
+            if desejadas > atual:
+                estado.abaixo_desde = None
+                if estado.ultimo_aumento is None or agora - estado.ultimo_aumento >= self.cooldown_aumento:
+                    logger.debug(f"[Autoscaler] {tipo_job}: {atual} → {desejadas} threads (aumento).")
+                    estado.alvo_atual = desejadas
+                    estado.ultimo_aumento = agora
+                return estado.alvo_atual
+
+            if desejadas < atual:
+                if estado.abaixo_desde is None:
+                    estado.abaixo_desde = agora
+                    estado.pico_durante_queda = desejadas
+                estado.pico_durante_queda = max(estado.pico_durante_queda, desejadas)
+
+                if agora - estado.abaixo_desde >= self.cooldown_reducao:
+                    logger.debug(
+                        f"[Autoscaler] {tipo_job}: {atual} → {estado.pico_durante_queda} threads (redução)."
+                    )
+                    estado.alvo_atual = estado.pico_durante_queda
+                    estado.abaixo_desde = None
+                return estado.alvo_atual
+
+            estado.abaixo_desde = None
+            return atual
+
+    def obter_estimativas(self) -> Dict[str, dict]:
+        """Retorna as estimativas atuais por tipo (útil para logs/APIs)."""
+        with self.lock:
+            return {
+                tipo: {
+                    "taxa_chegada_por_min": round(estado.taxa_chegada * 60, 2),
+                    "tempo_servico_s": round(estado.tempo_servico, 1),
+                    "alvo_atual": estado.alvo_atual,
+                }
+                for tipo, estado in self.estado.items()
+            }
+
+    def demanda_ponderada(self, tipo_job: str, jobs_pendentes: int) -> float:
+        """
+        Trabalho pendente estimado em segundos de navegador.
+
+        (fila atual + chegadas esperadas dentro do alvo de espera) × tempo de serviço.
+        Usado para dividir o orçamento global de navegadores entre os tipos.
+        """
+        with self.lock:
+            estado = self.estado[tipo_job]
+            esperados = jobs_pendentes + estado.taxa_chegada * self.tempo_espera_alvo
+            return esperados * estado.tempo_servico
+
+
+def distribuir_orcamento(
+    desejadas: Dict[str, int],
+    pesos: Dict[str, float],
+    orcamento: int,
+    minimo: int = 1,
+) -> Dict[str, int]:
+    """
+    Divide um orçamento fixo de navegadores entre os tipos de job.
+
+    Se a soma do que cada tipo deseja cabe no orçamento, todos recebem o que
+    pediram. Caso contrário cada tipo recebe o mínimo e o restante é dividido
+    proporcionalmente ao peso (demanda ponderada), sem passar do desejado de
+    cada tipo — o que sobra de um tipo é redistribuído aos demais. Quando uma
+    fila drena, seu peso cai a zero e a capacidade vai para a outra.
+
+    Args:
+        desejadas: Threads desejadas por tipo (já limitadas por tipo)
+        pesos: Demanda ponderada por tipo (fila × tempo de serviço)
+        orcamento: Total máximo de threads (navegadores) somando todos os tipos
+        minimo: Threads garantidas por tipo, se couberem no orçamento
+
+    Returns:
+        Threads alocadas por tipo (soma <= orcamento)
+    """
+    if sum(desejadas.values()) <= orcamento:
+        return dict(desejadas)
+
+    alocadas = {tipo: min(minimo, qtd) for tipo, qtd in desejadas.items()}
+    if sum(alocadas.values()) > orcamento:
+        # Orçamento menor que os mínimos: prioriza os tipos de maior demanda
+        alocadas = {tipo: 0 for tipo in desejadas}
+        for tipo in sorted(desejadas, key=lambda t: pesos.get(t, 0), reverse=True):
+            if orcamento <= 0:
+                break
+            alocadas[tipo] = min(minimo, desejadas[tipo], orcamento)
+            orcamento -= alocadas[tipo]
+        return alocadas
+
+    restante = orcamento - sum(alocadas.values())
+    while restante > 0:
+        abertos = {tipo for tipo in desejadas if alocadas[tipo] < desejadas[tipo]}
+        if not abertos:
+            break
+
+        peso_total = sum(max(pesos.get(tipo, 0), 0) for tipo in abertos)
+        if peso_total <= 0:
+            cotas = {tipo: restante / len(abertos) for tipo in abertos}
+        else:
+            cotas = {tipo: restante * max(pesos.get(tipo, 0), 0) / peso_total for tipo in abertos}
+
+        # Parte inteira primeiro, depois maiores restos (ao menos 1 vaga por rodada)
+        distribuido = 0
+        for tipo in abertos:
+            extra = min(int(cotas[tipo]), desejadas[tipo] - alocadas[tipo])
+            alocadas[tipo] += extra
+            distribuido += extra
+        if distribuido == 0:
+            for tipo in sorted(abertos, key=lambda t: cotas[t] - int(cotas[t]), reverse=True):
+                if restante - distribuido <= 0:
+                    break
+                if alocadas[tipo] < desejadas[tipo]:
+                    alocadas[tipo] += 1
+                    distribuido += 1
+        restante -= distribuido
+
+    return alocadas
@@ -0,0 +1,79 @@
+"""
+Cache, compartilhado entre os workers, das opções escolhidas nos autocompletes.
+
+Os mesmos textos de Origem/Destino se repetem em quase todas as cargas. Na
+primeira vez a opção é escolhida pela busca aproximada
+(`escolher_opcao_mais_parecida`); o rótulo exato que funcionou fica no Redis:
+
+    cache:opcoes:<campo>:<texto normalizado>  →  rótulo da opção   (expira em ttl_seconds)
+
+Nas próximas, o fluxo digita o rótulo exato e clica direto na opção, sem a
+busca aproximada e sem a segunda tentativa com o "nome limpo". Se a opção
+conhecida não aparecer, a entrada é invalidada e o caminho normal é usado.
+
+Acertos/faltas por campo ficam em metricas, grupo "cache_opcoes".
+"""
+
+from typing import Optional
+
+import redis
+from loguru import logger
+
+from utils.correspondencia import normalizar_texto
+from utils.metricas import metricas
+
+PREFIXO_CHAVE = "cache:opcoes"
+
+
+class CacheOpcoes:
+    """Mapa (campo, texto de entrada) → rótulo exato da opção, no Redis."""
+
+    def __init__(self, redis_client: redis.Redis, ttl: int = 7 * 24 * 3600):
+        """
+        Args:
+            redis_client: Cliente Redis do worker
+            ttl: Validade de cada entrada (s)
+        """
+        self.redis_client = redis_client
+        self.ttl = ttl
+
+    @classmethod
+    def from_config(cls, redis_client: redis.Redis, config: dict) -> Optional["CacheOpcoes"]:
+        """Cria a partir de 'option_cache_settings' (None se desligado)."""
+        cache_cfg = config.get("option_cache_settings", {})
+        if not cache_cfg.get("enabled", True):
+            return None
+        return cls(redis_client, ttl=cache_cfg.get("ttl_seconds", 7 * 24 * 3600))
+
+    def _chave(self, campo: str, texto: str) -> str:
+        return f"{PREFIXO_CHAVE}:{campo}:{normalizar_texto(texto)}"
+
+    def obter(self, campo: str, texto: str) -> Optional[str]:
+        """Rótulo que funcionou da última vez para `texto` neste campo (None se desconhecido)."""
+        try:
+            rotulo = self.redis_client.get(self._chave(campo, texto))
+        except Exception as e:
+            logger.debug(f"[CacheOpcoes] Falha ao ler cache de '{campo}': {e}")
+            rotulo = None
+        metricas.incrementar("cache_opcoes", f"{campo}:{'acertos' if rotulo else 'faltas'}")
+        return rotulo
+
+    def salvar(self, campo: str, texto: str, rotulo: str):
+        try:
+            self.redis_client.set(self._chave(campo, texto), rotulo, ex=self.ttl)
+        except Exception as e:
+            logger.debug(f"[CacheOpcoes] Falha ao gravar cache de '{campo}': {e}")
+
+    def invalidar(self, campo: str, texto: str):
+        """Remove a entrada (a opção conhecida não apareceu mais no portal)."""
+        try:
+            self.redis_client.delete(self._chave(campo, texto))
+        except Exception as e:
+            logger.debug(f"[CacheOpcoes] Falha ao invalidar cache de '{campo}': {e}")
+        metricas.incrementar("cache_opcoes", f"{campo}:invalidacoes")
+
+    def limpar(self, campo: Optional[str] = None) -> int:
+        """Remove todas as entradas (de um campo ou de todos). Retorna quantas removeu."""
+        padrao = f"{PREFIXO_CHAVE}:{campo}:*" if campo else f"{PREFIXO_CHAVE}:*"
+        chaves = list(self.redis_client.scan_iter(match=padrao))
+        return self.redis_client.delete(*chaves) if chaves else 0
@@ -0,0 +1,270 @@
+"""
+Índice local dos cadastros do portal (veículos, motoristas, participantes).
+
+Falhas de cadastro (placa, motorista ou expedidor inexistentes) só apareciam
+no meio do formulário de conferência, depois de abri-lo, e exigiam
+`cancelar_e_sair`. Com o índice, o worker valida a Carga antes de tocar no
+navegador e falha na hora os jobs sabidamente inválidos.
+
+O índice é baixado periodicamente dos endpoints de consulta do portal
+(`page.request`, com a sessão do worker) e fica no Redis, compartilhado:
+
+    cadastros:<tipo>            →  set com os nomes normalizados
+    cadastros:<tipo>:completo   →  existe enquanto a última carga completa é válida
+    cadastros:lock              →  só um worker atualiza por vez
+
+Os endpoints são paginados: o índice segue as páginas (`page`/`size` na
+query) até somar o total informado pelo portal. Um tipo só é marcado como
+completo se a resposta traz esse total e todos os registros foram baixados;
+sem total (ou com páginas faltando) o download é descartado.
+
+Só se reprova uma carga com base em um tipo cujo índice está completo e
+válido; sem índice (endpoints não configurados, falha de download) a
+validação não bloqueia nada e o formulário segue como antes.
+
+Config ('master_data_settings'):
+    "endpoints": {"veiculos": "<url>", "motoristas": "<url>", "participantes": "<url>"},
+    "name_fields": {"veiculos": ["placa"], "motoristas": ["nome"], "participantes": ["razaoSocial", "nome"]},
+    "page_size": 500,
+    "max_pages": 200
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import redis
+from loguru import logger
+from playwright.sync_api import Page
+from rapidfuzz import fuzz, process
+
+from dados.dataclass import Carga
+from utils.captura_rede import ler_campo
+from utils.correspondencia import normalizar_texto
+from utils.metricas import metricas
+
+PREFIXO_CHAVE = "cadastros"
+CHAVE_LOCK = f"{PREFIXO_CHAVE}:lock"
+
+# Mesmo corte usado por escolher_opcao_mais_parecida no formulário
+SCORE_MINIMO_PARTICIPANTE = 30
+
+# Onde a resposta paginada guarda os registros e o total
+CAMPOS_REGISTROS = ["content", "data", "items", "registros", "results"]
+CAMPOS_TOTAL = ["totalElements", "total", "totalRegistros", "totalItems"]
+
+
+def normalizar_placa(placa: str) -> str:
+    return "".join(c for c in (placa or "").upper() if c.isalnum())
+
+
+def extrair_registros(payload) -> List[dict]:
+    """Registros de uma resposta: a própria lista ou a lista do envelope paginado."""
+    if isinstance(payload, dict):
+        payload = ler_campo(payload, CAMPOS_REGISTROS)
+    if not isinstance(payload, list):
+        return []
+    return [item for item in payload if isinstance(item, dict)]
+
+
+def extrair_total(payload) -> Optional[int]:
+    """Total de registros informado pelo envelope paginado (None se ausente)."""
+    if not isinstance(payload, dict):
+        return None
+    total = ler_campo(payload, CAMPOS_TOTAL)
+    return total if isinstance(total, int) and not isinstance(total, bool) else None
+
+
+def extrair_nomes(registros: Iterable[dict], campos: Iterable[str]) -> List[str]:
+    """Nome de cada registro (primeiro campo de `campos` presente), sem descer em objetos aninhados."""
+    nomes = []
+    for registro in registros:
+        nome = ler_campo(registro, campos)
+        if isinstance(nome, str):
+            nomes.append(nome)
+    return nomes
+
+
+class IndiceCadastros:
+    """Índice de cadastros no Redis com cópia local para consultas rápidas."""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        endpoints: Optional[Dict[str, str]] = None,
+        campos_nome: Optional[Dict[str, List[str]]] = None,
+        intervalo: int = 3600,
+        tamanho_pagina: int = 500,
+        max_paginas: int = 200,
+    ):
+        """
+        Args:
+            redis_client: Cliente Redis do worker
+            endpoints: {tipo: URL} dos endpoints de consulta do portal
+            campos_nome: {tipo: [campos]} com o nome de cada registro
+            intervalo: Segundos entre atualizações (e validade do índice)
+            tamanho_pagina: Registros pedidos por página
+            max_paginas: Páginas baixadas por tipo, no máximo
+        """
+        self.redis_client = redis_client
+        self.endpoints = endpoints or {}
+        self.campos_nome = campos_nome or {}
+        self.intervalo = intervalo
+        self.tamanho_pagina = tamanho_pagina
+        self.max_paginas = max_paginas
+
+        # Cópia local: {tipo: (lida_em, nomes)}
+        self._locais: Dict[str, Tuple[float, Set[str]]] = {}
+
+    @classmethod
+    def from_config(cls, redis_client: redis.Redis, config: dict) -> Optional["IndiceCadastros"]:
+        """Cria a partir de 'master_data_settings' (None se desligado)."""
+        cad_cfg = config.get("master_data_settings", {})
+        if not cad_cfg.get("enabled", True):
+            return None
+        return cls(
+            redis_client,
+            endpoints=cad_cfg.get("endpoints", {}),
+            campos_nome=cad_cfg.get("name_fields", {}),
+            intervalo=cad_cfg.get("refresh_interval_seconds", 3600),
+            tamanho_pagina=cad_cfg.get("page_size", 500),
+            max_paginas=cad_cfg.get("max_pages", 200),
+        )
+
+    # --- Atualização ---
+
+    def _normalizar(self, tipo: str, nome: str) -> str:
+        return normalizar_placa(nome) if tipo == "veiculos" else normalizar_texto(nome)
+
+    def gravar(self, tipo: str, nomes: Iterable[str]):
+        """Substitui o índice de `tipo` por `nomes` e o marca como completo."""
+        normalizados = {self._normalizar(tipo, n) for n in nomes if n}
+        chave = f"{PREFIXO_CHAVE}:{tipo}"
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.delete(chave)
+        if normalizados:
+            pipe.sadd(chave, *normalizados)
+            pipe.expire(chave, self.intervalo * 2)
+            pipe.set(f"{chave}:completo", "1", ex=self.intervalo * 2)
+        pipe.execute()
+        self._locais.pop(tipo, None)
+        metricas.definir("cadastros", f"{tipo}:registros", len(normalizados))
+
+    def baixar(self, page: Page, url: str) -> Tuple[List[dict], Optional[int]]:
+        """
+        Segue as páginas de `url` até somar o total informado.
+
+        Returns:
+            (registros, total informado pelo portal ou None)
+        """
+        registros: List[dict] = []
+        total, anterior = None, None
+        for numero in range(self.max_paginas):
+            resposta = page.request.get(
+                url, params={"page": numero, "size": self.tamanho_pagina}, timeout=30000
+            )
+            if not resposta.ok:
+                raise RuntimeError(f"HTTP {resposta.status} na página {numero}")
+            payload = resposta.json()
+            lote = extrair_registros(payload)
+            total = extrair_total(payload)
+            if not lote or lote == anterior:
+                break  # Acabou (ou o endpoint ignora a paginação e repete a mesma página)
+            registros.extend(lote)
+            anterior = lote
+            if total is None or len(registros) >= total:
+                break
+        return registros, total
+
+    def atualizar_se_necessario(self, page: Page) -> bool:
+        """Baixa os cadastros se o índice estiver velho e nenhum outro worker estiver baixando."""
+        if not self.endpoints:
+            return False
+        pendentes = {
+            tipo: url for tipo, url in self.endpoints.items()
+            if not self.redis_client.exists(f"{PREFIXO_CHAVE}:{tipo}:completo")
+        }
+        if not pendentes:
+            return False
+        if not self.redis_client.set(CHAVE_LOCK, "1", nx=True, ex=300):
+            return False
+        try:
+            for tipo, url in pendentes.items():
+                inicio = time.monotonic()
+                try:
+                    registros, total = self.baixar(page, url)
+                    if total is None or len(registros) < total:
+                        # Índice parcial reprovaria cadastros válidos: melhor não validar este tipo
+                        metricas.incrementar("cadastros", f"{tipo}:incompletos")
+                        logger.warning(
+                            f"[Cadastros] {tipo}: {len(registros)} de {total if total is not None else '?'} registros "
+                            f"baixados. Índice não gravado; validação de {tipo} desligada."
+                        )
+                    else:
+                        nomes = extrair_nomes(registros, self.campos_nome.get(tipo, ["nome"]))
+                        self.gravar(tipo, nomes)
+                        logger.info(f"[Cadastros] Índice de {tipo} atualizado ({len(nomes)} registros).")
+                except Exception as e:
+                    logger.warning(f"[Cadastros] Falha ao baixar {tipo} ({url}): {e}. Validação de {tipo} desligada.")
+                metricas.observar("cadastros", f"{tipo}:atualizacao_s", time.monotonic() - inicio)
+            return True
+        finally:
+            self.redis_client.delete(CHAVE_LOCK)
+
+    # --- Consulta ---
+
+    def _nomes(self, tipo: str) -> Optional[Set[str]]:
+        """Nomes normalizados de `tipo`, ou None se o índice não está completo/válido."""
+        lida_em, nomes = self._locais.get(tipo, (0.0, None))
+        if nomes is not None and time.monotonic() - lida_em < 60:
+            return nomes
+        chave = f"{PREFIXO_CHAVE}:{tipo}"
+        if not self.redis_client.exists(f"{chave}:completo"):
+            self._locais.pop(tipo, None)
+            return None
+        nomes = set(self.redis_client.smembers(chave))
+        self._locais[tipo] = (time.monotonic(), nomes)
+        return nomes
+
+    def _participante_existe(self, nomes: Set[str], texto: str) -> bool:
+        # Mesmas 2 tentativas do formulário: texto completo e "nome limpo"
+        nome_limpo = texto.rsplit("_")[-1].rsplit("-")[-1].strip()
+        for busca in (texto, nome_limpo):
+            if process.extractOne(
+                normalizar_texto(busca), nomes, scorer=fuzz.WRatio, score_cutoff=SCORE_MINIMO_PARTICIPANTE
+            ):
+                return True
+        return False
+
+    def validar_carga(self, carga: Carga) -> Optional[Tuple[str, str]]:
+        """
+        Confere os cadastros da carga.
+
+        Returns:
+            (campo, valor) do primeiro cadastro sabidamente inexistente, ou None.
+        """
+        verificacoes = [
+            ("veiculos", "Placa Principal", carga.placa),
+            ("veiculos", "Placa Secundária", carga.placa2 if carga.perfil == "CARRETA" else None),
+            ("participantes", "Expedidor", carga.origem),
+            ("participantes", "Tomador", carga.origem),
+            ("participantes", "Recebedor", carga.destino),
+            ("motoristas", "Motorista", carga.motorista),
+        ]
+        for tipo, campo, valor in verificacoes:
+            if not valor:
+                continue
+            nomes = self._nomes(tipo)
+            if not nomes:
+                continue  # Sem índice válido: não dá para afirmar nada
+
+            if tipo == "participantes":
+                existe = self._participante_existe(nomes, valor)
+            else:
+                # O formulário aceita a primeira opção que contém o texto digitado
+                busca = self._normalizar(tipo, valor)
+                existe = any(busca in nome for nome in nomes)
+
+            metricas.incrementar("cadastros", f"{tipo}:{'validos' if existe else 'reprovados'}")
+            if not existe:
+                return campo, valor
+        return None
@@ -0,0 +1,167 @@
+"""
+Captura das respostas JSON (XHR/fetch) que o portal já baixa.
+
+A tabela de consulta e os cards de emissão são montados pelo portal a partir
+de chamadas à API dele. Em vez de ler cada dado do DOM (vários round trips e
+classes CSS-in-JS instáveis), a captura escuta `page.on("response")`, guarda
+o JSON das respostas cujas URLs batem com os endpoints configurados e
+o expõe aos fluxos:
+
+    captura = CapturaRede.from_config(page, config)
+    filtro_cargas(page, numero_lt)                 # dispara a pesquisa
+    registros = captura.buscar("consulta", numero_lt)
+
+Funções que não recebem a captura (ex: a extração dos MDF-es) a obtêm com
+`captura_da_pagina(page)`.
+
+Se nada foi capturado (endpoint mudou, resposta não é JSON...), os fluxos
+continuam lendo o DOM como antes.
+"""
+
+import re
+import weakref
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from loguru import logger
+from playwright.sync_api import Page, Response
+
+from utils.metricas import metricas
+
+_capturas: "weakref.WeakKeyDictionary[Page, CapturaRede]" = weakref.WeakKeyDictionary()
+
+
+def captura_da_pagina(page: Page) -> Optional["CapturaRede"]:
+    """Captura registrada para a página (None se o worker não usa captura)."""
+    try:
+        return _capturas.get(page)
+    except TypeError:
+        return None  # Objeto que não aceita weakref (ex: página falsa em testes)
+
+
+def buscar_registros(payload: Any, valor: str) -> List[dict]:
+    """
+    Percorre o JSON e retorna os objetos que têm algum campo texto/número
+    contendo `valor` (ex: o número da LT dentro do nome do arquivo).
+    """
+    encontrados = []
+    pilha = [payload]
+    while pilha:
+        item = pilha.pop()
+        if isinstance(item, dict):
+            if any(
+                isinstance(v, (str, int)) and not isinstance(v, bool) and valor in str(v)
+                for v in item.values()
+            ):
+                encontrados.append(item)
+            pilha.extend(v for v in item.values() if isinstance(v, (dict, list)))
+        elif isinstance(item, list):
+            pilha.extend(reversed(item))
+    return encontrados
+
+
+def ler_campo(registro: dict, nomes: Iterable[str]) -> Optional[Any]:
+    """Valor do primeiro campo de `nomes` presente no registro (sem diferenciar maiúsculas)."""
+    por_nome = {str(chave).lower(): valor for chave, valor in registro.items()}
+    for nome in nomes:
+        valor = por_nome.get(nome.lower())
+        if valor not in (None, ""):
+            return valor
+    return None
+
+
+class CapturaRede:
+    """Guarda as últimas respostas JSON de cada endpoint de interesse de uma página."""
+
+    def __init__(self, page: Page, endpoints: Dict[str, str], max_respostas: int = 20):
+        """
+        Args:
+            page: Página do worker (a captura vive enquanto a página viver)
+            endpoints: {nome: regex da URL}, ex: {"consulta": r"/api/.*consulta"}
+            max_respostas: Respostas guardadas por endpoint (as mais antigas são descartadas)
+        """
+        self.page = page
+        self.endpoints = {nome: re.compile(padrao) for nome, padrao in endpoints.items()}
+        self.respostas: Dict[str, Deque[Any]] = {nome: deque(maxlen=max_respostas) for nome in endpoints}
+        self.page.on("response", self._ao_receber)
+
+        try:
+            _capturas[page] = self
+        except TypeError:
+            logger.debug("[CapturaRede] Página não aceita weakref; captura não registrada.")
+
+    @classmethod
+    def from_config(cls, page: Page, config: dict) -> Optional["CapturaRede"]:
+        """Cria a partir de 'network_capture_settings' (None se desligada)."""
+        captura_cfg = config.get("network_capture_settings", {})
+        if not captura_cfg.get("enabled", True) or not captura_cfg.get("endpoints"):
+            return None
+        return cls(
+            page,
+            captura_cfg["endpoints"],
+            max_respostas=captura_cfg.get("max_responses_per_endpoint", 20),
+        )
+
+    def _endpoint_da_url(self, url: str) -> Optional[str]:
+        for nome, padrao in self.endpoints.items():
+            if padrao.search(url):
+                return nome
+        return None
+
+    def _ao_receber(self, response: Response):
+        nome = self._endpoint_da_url(response.url)
+        if nome is None:
+            return
+        if "json" not in (response.headers.get("content-type") or ""):
+            return
+        try:
+            payload = response.json()
+        except Exception as e:
+            # Resposta de redirect/erro sem corpo: não há o que guardar
+            logger.debug(f"[CapturaRede] Resposta de '{nome}' sem JSON legível ({response.url}): {e}")
+            return
+        self.respostas[nome].append(payload)
+        metricas.incrementar("captura_rede", f"{nome}:respostas")
+
+    def ultima(self, nome: str) -> Optional[Any]:
+        """JSON da resposta mais recente do endpoint (None se nada foi capturado)."""
+        respostas = self.respostas.get(nome)
+        return respostas[-1] if respostas else None
+
+    def buscar(self, nome: str, valor: str) -> List[dict]:
+        """Registros que contêm `valor`, da resposta mais recente para a mais antiga."""
+        for payload in reversed(self.respostas.get(nome, ())):
+            registros = buscar_registros(payload, valor)
+            if registros:
+                metricas.incrementar("captura_rede", f"{nome}:acertos")
+                return registros
+        metricas.incrementar("captura_rede", f"{nome}:faltas")
+        return []
+
+    def aguardar(self, nome: str, acao: Callable[[], Any], timeout: float = 20000) -> Any:
+        """
+        Executa `acao` (ex: clicar em Pesquisar) e retorna o JSON da resposta
+        do endpoint que ela disparar. Levanta TimeoutError se não vier nenhuma.
+        """
+        padrao = self.endpoints[nome]
+        with self.page.expect_response(lambda resp: bool(padrao.search(resp.url)), timeout=timeout) as info:
+            acao()
+        return info.value.json()
+
+    def limpar(self, nome: Optional[str] = None):
+        """Descarta respostas antigas (antes de uma nova pesquisa, por exemplo)."""
+        for chave, respostas in self.respostas.items():
+            if nome is None or chave == nome:
+                respostas.clear()
+
+    def encerrar(self):
+        """Remove o listener da página."""
+        try:
+            self.page.remove_listener("response", self._ao_receber)
+        except Exception as e:
+            logger.debug(f"[CapturaRede] Falha ao remover listener: {e}")
+        try:
+            if _capturas.get(self.page) is self:
+                del _capturas[self.page]
+        except TypeError:
+            pass
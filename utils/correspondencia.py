@@ -0,0 +1,139 @@
+"""
+Correspondência aproximada entre um texto e as opções de um dropdown.
+
+Antes, cada chamada de `escolher_opcao_mais_parecida` normalizava de novo
+todas as opções (unidecode), montava um dict novo e rodava `extractOne`.
+Aqui:
+
+    - `normalizar_texto` é memoizado (os mesmos nomes se repetem o dia todo);
+    - cada lista de opções vira um `IndiceOpcoes` pré-normalizado, guardado
+      em um LRU por campo (a mesma busca devolve as mesmas opções);
+    - as consultas são pontuadas em lote com `process.cdist` e o resultado
+      traz a margem para a segunda melhor opção, para sinalizar escolhas
+      ambíguas em vez de clicar em silêncio.
+
+Uso:
+    resultado = correspondente.melhor("expedidor", rotulos, "SHOPEE_XPT-Cajamar")
+    if resultado and not resultado.ambiguo:
+        ...  # clicar em resultado.rotulo
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from unidecode import unidecode
+
+from utils.metricas import metricas
+
+
+@lru_cache(maxsize=8192)
+def _normalizar_str(texto: str) -> str:
+    texto_sem_underscore = texto.replace('_', ' ')
+    texto_base = unidecode(texto_sem_underscore.lower())
+    return ' '.join(texto_base.split())
+
+
+def normalizar_texto(texto: str) -> str:
+    if not isinstance(texto, str):
+        return ""
+    return _normalizar_str(texto)
+
+
+class IndiceOpcoes:
+    """Rótulos de um dropdown com as formas normalizadas pré-calculadas."""
+
+    def __init__(self, rotulos: Sequence[str]):
+        # Rótulos com a mesma forma normalizada: vale o primeiro (como no dict original)
+        vistos = {}
+        for rotulo in rotulos:
+            vistos.setdefault(normalizar_texto(rotulo), rotulo)
+        self.normalizados = list(vistos.keys())
+        self.rotulos = list(vistos.values())
+
+
+@dataclass
+class ResultadoCorrespondencia:
+    rotulo: str
+    score: float
+    margem: float     # Diferença para a segunda melhor opção (100 se só há uma)
+    ambiguo: bool
+
+
+class CorrespondenteOpcoes:
+    """Escolhe a opção mais parecida, com índices memoizados por campo."""
+
+    def __init__(self, score_minimo: float = 30, margem_minima: float = 5, tamanho_cache: int = 64):
+        """
+        Args:
+            score_minimo: Score (WRatio) mínimo para aceitar uma opção
+            margem_minima: Abaixo desta diferença para a 2ª opção, o resultado é ambíguo
+            tamanho_cache: Listas de opções guardadas (LRU)
+        """
+        self.score_minimo = score_minimo
+        self.margem_minima = margem_minima
+        self.tamanho_cache = tamanho_cache
+        self._indices: "OrderedDict[Tuple[str, Tuple[str, ...]], IndiceOpcoes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def indexar(self, campo: str, rotulos: Sequence[str]) -> IndiceOpcoes:
+        """Índice da lista de opções (reaproveitado se a mesma lista já apareceu)."""
+        chave = (campo, tuple(rotulos))
+        with self._lock:
+            indice = self._indices.get(chave)
+            if indice is not None:
+                self._indices.move_to_end(chave)
+                metricas.incrementar("correspondencia", "indices_reaproveitados")
+                return indice
+        indice = IndiceOpcoes(rotulos)
+        with self._lock:
+            self._indices[chave] = indice
+            while len(self._indices) > self.tamanho_cache:
+                self._indices.popitem(last=False)
+        return indice
+
+    def pontuar(self, indice: IndiceOpcoes, consultas: Sequence[str]) -> list:
+        """Uma linha de resultado por consulta (None se nenhuma opção atinge o score mínimo)."""
+        if not indice.normalizados or not consultas:
+            return [None] * len(consultas)
+        matriz = process.cdist(
+            [normalizar_texto(c) for c in consultas], indice.normalizados, scorer=fuzz.WRatio, workers=1
+        )
+        resultados = []
+        for linha in matriz:
+            melhor = int(linha.argmax())
+            score = float(linha[melhor])
+            if score < self.score_minimo:
+                resultados.append(None)
+                continue
+            margem = score - float(np.partition(linha, -2)[-2]) if len(linha) > 1 else 100.0
+            resultados.append(
+                ResultadoCorrespondencia(indice.rotulos[melhor], score, margem, margem < self.margem_minima)
+            )
+        return resultados
+
+    def melhor(self, campo: str, rotulos: Sequence[str], consulta: str) -> Optional[ResultadoCorrespondencia]:
+        """Melhor opção para `consulta` entre `rotulos` (None se nenhuma serve)."""
+        resultado = self.pontuar(self.indexar(campo, rotulos), [consulta])[0]
+        if resultado and resultado.ambiguo:
+            metricas.incrementar("correspondencia", f"{campo}:ambiguos")
+        return resultado
+
+
+# Carrega configurações da correspondência
+config_path = os.path.join(os.path.dirname(__file__), "config.json")
+with open(config_path, "r", encoding="utf-8") as f:
+    _matcher_cfg = json.load(f).get("matcher_settings", {})
+
+# Instância compartilhada pelos fluxos (o cache de índices é thread-safe)
+correspondente = CorrespondenteOpcoes(
+    score_minimo=_matcher_cfg.get("min_score", 30),
+    margem_minima=_matcher_cfg.get("ambiguity_margin", 5),
+    tamanho_cache=_matcher_cfg.get("index_cache_size", 64),
+)
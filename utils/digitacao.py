@@ -0,0 +1,116 @@
+"""
+Preenchimento rápido de campos, com digitação lenta só como fallback.
+
+Os formulários do portal eram preenchidos com `type(valor, delay=50)`, uma
+tecla por vez (placas, nomes, motoristas, datas). O modo rápido preenche o
+valor inteiro com um único `fill` (um evento `input`, que é o que o MUI
+Autocomplete e os campos com máscara escutam) e confere o resultado:
+
+    - autocomplete: as opções aparecem;
+    - máscara (datas, percentuais): os dígitos do campo batem com os do valor;
+    - texto simples: o valor do campo é o esperado.
+
+Se a conferência falhar, o campo é refeito tecla a tecla, como antes.
+O tempo de cada campo vai para metricas, grupo "preenchimento":
+
+    {"<campo>:rapido:n/soma/max", "<campo>:lento:n/soma/max", "<campo>:fallbacks"}
+
+Com `fast_input_settings.enabled = false` todo campo usa a digitação lenta,
+o que dá a base de comparação ("antes") nas mesmas métricas.
+"""
+
+import json
+import os
+import re
+import time
+from typing import Callable, Optional
+
+from loguru import logger
+from playwright.sync_api import Locator, Page
+
+from utils.esperas import aguardar_estado
+from utils.metricas import metricas
+
+# Carrega configurações de preenchimento
+config_path = os.path.join(os.path.dirname(__file__), "config.json")
+with open(config_path, "r", encoding="utf-8") as f:
+    config = json.load(f)
+
+_input_cfg = config.get("fast_input_settings", {})
+MODO_RAPIDO = _input_cfg.get("enabled", True)
+VERIFICACAO_TIMEOUT_MS = _input_cfg.get("verify_timeout_ms", 3000)
+ATRASO_DIGITACAO_MS = _input_cfg.get("slow_type_delay_ms", 50)
+
+
+def _somente_digitos(texto: str) -> str:
+    return re.sub(r"\D", "", texto or "")
+
+
+def _digitar_lento(locator: Locator, valor: str):
+    locator.fill("")
+    locator.type(valor, delay=ATRASO_DIGITACAO_MS)
+
+
+def preencher_campo(
+    locator: Locator,
+    valor: str,
+    campo: str,
+    verificar: Optional[Callable[[], bool]] = None,
+    digitar_lento: Optional[Callable[[], None]] = None,
+) -> bool:
+    """
+    Preenche `locator` com `valor` em uma operação e confere o resultado.
+
+    Args:
+        locator: Campo de texto
+        valor: Valor a preencher
+        campo: Nome do campo (métricas e logs)
+        verificar: Conferência do modo rápido (padrão: input_value() == valor)
+        digitar_lento: Fallback (padrão: limpar e digitar tecla a tecla)
+
+    Returns:
+        True se o modo rápido bastou, False se precisou do fallback.
+    """
+    if MODO_RAPIDO:
+        inicio = time.monotonic()
+        try:
+            locator.fill(valor)
+            ok = verificar() if verificar else locator.input_value() == valor
+        except Exception as e:
+            logger.debug(f"[Digitação] Modo rápido falhou em '{campo}': {e}")
+            ok = False
+        if ok:
+            metricas.observar("preenchimento", f"{campo}:rapido", time.monotonic() - inicio)
+            return True
+        metricas.incrementar("preenchimento", f"{campo}:fallbacks")
+        logger.debug(f"[Digitação] '{campo}' não confirmou o preenchimento rápido. Digitando tecla a tecla.")
+
+    inicio = time.monotonic()
+    if digitar_lento:
+        digitar_lento()
+    else:
+        _digitar_lento(locator, valor)
+    metricas.observar("preenchimento", f"{campo}:lento", time.monotonic() - inicio)
+    return False
+
+
+def preencher_autocomplete(page: Page, locator: Locator, valor: str, campo: str) -> bool:
+    """Preenche um MUI Autocomplete; o modo rápido vale se a lista de opções abrir."""
+    opcoes = page.locator("[role='option']").first
+    return preencher_campo(
+        locator,
+        valor,
+        campo,
+        verificar=lambda: aguardar_estado(opcoes, f"preenchimento:{campo}", "visible", VERIFICACAO_TIMEOUT_MS),
+    )
+
+
+def preencher_mascarado(locator: Locator, valor: str, campo: str, digitar_lento: Optional[Callable[[], None]] = None) -> bool:
+    """Preenche um campo com máscara (data, percentual); confere só os dígitos."""
+    return preencher_campo(
+        locator,
+        valor,
+        campo,
+        verificar=lambda: _somente_digitos(locator.input_value()) == _somente_digitos(valor),
+        digitar_lento=digitar_lento,
+    )
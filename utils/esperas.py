@@ -0,0 +1,89 @@
+"""
+Esperas por condição (no lugar de time.sleep fixo) com medição do tempo gasto.
+
+Cada espera termina assim que a condição é satisfeita (elemento visível,
+spinner sumiu, rede ociosa...) ou ao atingir o timeout, e registra a duração
+em `metricas` no grupo "esperas", por etapa:
+
+    metricas:esperas  →  {"<etapa>:n": ..., "<etapa>:soma": ..., "<etapa>:max": ...,
+                          "<etapa>:timeouts": ...}
+
+Assim dá para ver quanto tempo de cada job vai para esperas e em qual passo.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from loguru import logger
+from playwright.sync_api import Locator, Page, TimeoutError
+
+from utils.metricas import metricas
+
+# Indicadores de carregamento do MUI usados pelo portal
+SELETOR_SPINNER = ".MuiCircularProgress-root, .MuiLinearProgress-root, .MuiBackdrop-root:not(.MuiBackdrop-invisible)"
+
+
+@contextmanager
+def medir_espera(etapa: str):
+    """Registra em metricas o tempo gasto no bloco."""
+    inicio = time.monotonic()
+    try:
+        yield
+    finally:
+        duracao = time.monotonic() - inicio
+        metricas.observar("esperas", etapa, duracao)
+        logger.trace(f"[Esperas] {etapa}: {duracao:.2f}s")
+
+
+def _registrar_timeout(etapa: str):
+    metricas.incrementar("esperas", f"{etapa}:timeouts")
+    logger.debug(f"[Esperas] Condição de '{etapa}' não satisfeita no tempo limite.")
+
+
+def aguardar_condicao(etapa: str, condicao: Callable[[], bool], timeout: float = 10, intervalo: float = 0.1) -> bool:
+    """
+    Reavalia `condicao` a cada `intervalo` segundos até ela ser verdadeira.
+
+    Returns:
+        True se a condição foi satisfeita, False no timeout.
+    """
+    prazo = time.monotonic() + timeout
+    with medir_espera(etapa):
+        while True:
+            try:
+                if condicao():
+                    return True
+            except Exception as e:
+                logger.trace(f"[Esperas] Condição de '{etapa}' falhou: {e}")
+            if time.monotonic() >= prazo:
+                _registrar_timeout(etapa)
+                return False
+            time.sleep(intervalo)
+
+
+def aguardar_estado(locator: Locator, etapa: str, estado: str = "visible", timeout_ms: int = 10000) -> bool:
+    """Espera o locator atingir `estado` (visible, hidden, attached, detached). False no timeout."""
+    with medir_espera(etapa):
+        try:
+            locator.wait_for(state=estado, timeout=timeout_ms)
+            return True
+        except TimeoutError:
+            _registrar_timeout(etapa)
+            return False
+
+
+def aguardar_spinner(page: Page, etapa: str, timeout_ms: int = 15000) -> bool:
+    """Espera os indicadores de carregamento sumirem. False no timeout."""
+    return aguardar_estado(page.locator(SELETOR_SPINNER).first, etapa, "hidden", timeout_ms)
+
+
+def aguardar_rede_ociosa(page: Page, etapa: str, timeout_ms: int = 10000) -> bool:
+    """Espera a página ficar sem requisições pendentes. False no timeout."""
+    with medir_espera(etapa):
+        try:
+            page.wait_for_load_state("networkidle", timeout=timeout_ms)
+            return True
+        except TimeoutError:
+            _registrar_timeout(etapa)
+            return False
@@ -0,0 +1,142 @@
+"""
+Estado conhecido da página de cada worker, para evitar navegações redundantes.
+
+O worker registra a página ao iniciar; as funções de navegação/filtro
+consultam o estado antes de agir:
+
+    estado = EstadoPagina.from_config(page, worker_name, config)
+    ...
+    goto_cards(page)            # não faz nada se a página já está em Cards
+    filtro_cards(page, lts)     # não refaz a pesquisa se o filtro vigente é o mesmo
+
+O estado é "otimista, mas conferido": a vista registrada só é aceita se a
+URL ainda bate e não há diálogo aberto (uma única chamada ao navegador), e
+expira após `max_age_seconds`. Quem faz algo que pode deixar a página em
+estado incerto (formulários, erros) chama `invalidar()`.
+
+Navegações evitadas ficam em metricas, grupo "navegacoes_evitadas":
+    {"<worker>:<acao>": n}
+"""
+
+import time
+import weakref
+from typing import Optional
+
+from loguru import logger
+from playwright.sync_api import Page
+
+from utils.metricas import metricas
+
+URL_CONSULTA = "https://portal.emiteai.com.br/#/ecommerce/shopee/consulta"
+URL_EMISSOR = "https://portal.emiteai.com.br/#/emissor"
+
+# Vista → (prefixo da URL, condição JS que confirma a vista)
+VISTAS = {
+    "consulta": (URL_CONSULTA, "true"),
+    "cards": (
+        URL_EMISSOR,
+        'document.querySelector("[role=tab][aria-selected=true]")?.textContent.includes("Cards")',
+    ),
+}
+
+_JS_SEM_DIALOGO = '!document.querySelector("[role=dialog], .MuiDrawer-paperAnchorRight")'
+
+_estados: "weakref.WeakKeyDictionary[Page, EstadoPagina]" = weakref.WeakKeyDictionary()
+
+
+def estado_da_pagina(page: Page) -> Optional["EstadoPagina"]:
+    """Estado registrado para a página (None se o worker não usa o rastreador)."""
+    try:
+        return _estados.get(page)
+    except TypeError:
+        return None  # Objeto que não aceita weakref (ex: página falsa em testes)
+
+
+class EstadoPagina:
+    """Vista atual e último filtro aplicado de uma página."""
+
+    def __init__(self, page: Page, nome_worker: str, validade: float = 300, validade_filtro: float = 30):
+        """
+        Args:
+            page: Página do worker
+            nome_worker: Nome usado nas métricas
+            validade: Segundos em que a vista registrada é aceita sem nova navegação
+            validade_filtro: Segundos em que o resultado de um filtro é reaproveitado
+        """
+        self.page = page
+        self.nome_worker = nome_worker
+        self.validade = validade
+        self.validade_filtro = validade_filtro
+
+        self.vista: Optional[str] = None
+        self.vista_em = 0.0
+        self.ultimo_filtro = None
+        self.filtro_em = 0.0
+
+        try:
+            _estados[page] = self
+        except TypeError:
+            logger.debug("[EstadoPagina] Página não aceita weakref; estado não registrado.")
+
+    @classmethod
+    def from_config(cls, page: Page, nome_worker: str, config: dict) -> Optional["EstadoPagina"]:
+        """Cria (e registra) a partir de 'page_state_settings'. None se desligado."""
+        estado_cfg = config.get("page_state_settings", {})
+        if not estado_cfg.get("enabled", True):
+            return None
+        return cls(
+            page,
+            nome_worker,
+            validade=estado_cfg.get("max_age_seconds", 300),
+            validade_filtro=estado_cfg.get("filter_max_age_seconds", 30),
+        )
+
+    # --- Atualização ---
+
+    def definir_vista(self, vista: str):
+        """A página acabou de ser levada para `vista` (nenhum filtro aplicado ainda)."""
+        self.vista = vista
+        self.vista_em = time.monotonic()
+        self.ultimo_filtro = None
+
+    def definir_filtro(self, filtro):
+        """Um filtro acabou de ser aplicado na vista atual."""
+        self.ultimo_filtro = filtro
+        self.filtro_em = time.monotonic()
+
+    def invalidar_filtro(self):
+        self.ultimo_filtro = None
+
+    def invalidar(self, motivo: str = ""):
+        """Estado da página incerto: a próxima navegação/filtro será feita de fato."""
+        if self.vista is not None and motivo:
+            logger.trace(f"[EstadoPagina] {self.nome_worker}: estado invalidado ({motivo}).")
+        self.vista = None
+        self.ultimo_filtro = None
+
+    # --- Consulta ---
+
+    def vista_valida(self, vista: str) -> bool:
+        """True se a página está em `vista`, sem diálogo aberto e dentro da validade."""
+        if self.vista != vista or time.monotonic() - self.vista_em > self.validade:
+            return False
+        prefixo_url, condicao = VISTAS[vista]
+        try:
+            if not self.page.url.startswith(prefixo_url):
+                return False
+            return bool(self.page.evaluate(f"() => Boolean(({condicao}) && {_JS_SEM_DIALOGO})"))
+        except Exception as e:
+            logger.debug(f"[EstadoPagina] Falha ao conferir a vista '{vista}': {e}")
+            return False
+
+    def filtro_vigente(self, filtro) -> bool:
+        """True se `filtro` é o último aplicado e ainda está dentro da validade."""
+        return (
+            self.ultimo_filtro is not None
+            and self.ultimo_filtro == filtro
+            and time.monotonic() - self.filtro_em <= self.validade_filtro
+        )
+
+    def registrar_evitada(self, acao: str):
+        metricas.incrementar("navegacoes_evitadas", f"{self.nome_worker}:{acao}")
+        logger.trace(f"[EstadoPagina] {self.nome_worker}: '{acao}' evitado (página já no estado esperado).")
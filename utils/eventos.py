@@ -0,0 +1,143 @@
+"""
+Eventos de mudança nas filas via Redis Pub/Sub.
+
+O poller (e o watchdog) publicam uma mensagem no canal de eventos sempre que
+enfileiram jobs ou sinalizam um worker travado; os workers publicam quando
+confirmam o último job e a fila esvazia. O orquestrador escuta esse
+canal e reage em segundos, com debounce para agrupar rajadas, em vez de
+consultar LLEN em intervalos fixos.
+
+Opcionalmente também escuta keyspace notifications das filas
+(`__keyspace@<db>__:fila:*`). Isso exige `notify-keyspace-events Kl`
+configurado no Redis.
+"""
+
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+import redis
+from loguru import logger
+
+CANAL_EVENTOS_PADRAO = "eventos:filas"
+
+
+def publicar_evento_fila(redis_client: redis.Redis, canal: Optional[str] = None, **dados):
+    """
+    Publica um evento de mudança de fila (falhas são apenas logadas).
+
+    Exemplo:
+        publicar_evento_fila(r, "eventos:filas", origem="poller", conferencia=12, emissao=3)
+    """
+    try:
+        redis_client.publish(canal or CANAL_EVENTOS_PADRAO, json.dumps(dados))
+    except Exception as e:
+        logger.error(f"[Eventos] Falha ao publicar evento no canal '{canal or CANAL_EVENTOS_PADRAO}': {e}")
+
+
+class OuvinteEventosFila:
+    """
+    Escuta o canal de eventos e chama `callback` com debounce.
+
+    Vários eventos dentro de `debounce` segundos resultam em UMA chamada,
+    feita `debounce` segundos após o primeiro evento da rajada.
+
+    Uso:
+        ouvinte = OuvinteEventosFila(redis_client, callback=manager.notificar_mudanca_fila)
+        ouvinte.iniciar()
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        callback: Callable[[], None],
+        canal: str = CANAL_EVENTOS_PADRAO,
+        debounce: float = 2.0,
+        keyspace_notifications: bool = False,
+    ):
+        """
+        Args:
+            redis_client: Cliente Redis (o pubsub abre uma conexão própria)
+            callback: Função chamada após cada rajada de eventos
+            canal: Canal Pub/Sub onde poller/watchdog publicam
+            debounce: Janela de agrupamento de eventos (s)
+            keyspace_notifications: Também escutar alterações nas chaves fila:*
+        """
+        self.redis_client = redis_client
+        self.callback = callback
+        self.canal = canal
+        self.debounce = debounce
+        self.keyspace_notifications = keyspace_notifications
+
+        self.lock = threading.Lock()
+        self.timer_pendente: Optional[threading.Timer] = None
+        self.eventos_recebidos = 0
+        self.disparos = 0
+        self.running = False
+        self.thread_ouvinte = None
+
+    def processar_mensagem(self, mensagem: dict):
+        """Agenda o callback para o fim da janela de debounce (se ainda não agendado)."""
+        if not mensagem or mensagem.get("type") not in ("message", "pmessage"):
+            return
+        with self.lock:
+            self.eventos_recebidos += 1
+            if self.timer_pendente is not None:
+                return
+            self.timer_pendente = threading.Timer(self.debounce, self._disparar)
+            self.timer_pendente.daemon = True
+            self.timer_pendente.start()
+
+    def _disparar(self):
+        with self.lock:
+            self.timer_pendente = None
+            self.disparos += 1
+        try:
+            self.callback()
+        except Exception as e:
+            logger.error(f"[Eventos] Erro no callback de evento de fila: {e}")
+
+    def _escutar(self):
+        espera_reconexao = 1
+        while self.running:
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.canal)
+                if self.keyspace_notifications:
+                    db = self.redis_client.connection_pool.connection_kwargs.get("db", 0)
+                    pubsub.psubscribe(f"__keyspace@{db}__:fila:*")
+                logger.info(f"[Eventos] Escutando o canal '{self.canal}' (debounce {self.debounce}s).")
+                espera_reconexao = 1
+
+                while self.running:
+                    # Bloqueia no socket (sem comandos ao Redis) por até 1s
+                    self.processar_mensagem(pubsub.get_message(timeout=1.0))
+
+            except Exception as e:
+                logger.error(f"[Eventos] Conexão Pub/Sub perdida: {e}. Reconectando em {espera_reconexao}s...")
+                time.sleep(espera_reconexao)
+                espera_reconexao = min(espera_reconexao * 2, 30)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def iniciar(self):
+        """Inicia a escuta em uma thread daemon."""
+        if self.running:
+            return
+        self.running = True
+        self.thread_ouvinte = threading.Thread(target=self._escutar, daemon=True, name="OuvinteEventosFila")
+        self.thread_ouvinte.start()
+
+    def parar(self):
+        """Para a escuta (a thread encerra em até 1s)."""
+        self.running = False
+        with self.lock:
+            if self.timer_pendente is not None:
+                self.timer_pendente.cancel()
+                self.timer_pendente = None
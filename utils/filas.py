@@ -0,0 +1,449 @@
+"""
+Consumo confiável das filas de jobs pelos workers (at-least-once).
+
+Cada worker consome sua fila com BLMOVE para uma lista "em processamento"
+própria e só remove o job de lá (confirmar) depois de processá-lo:
+
+    fila:emissao  --BLMOVE-->  fila:emissao:processando:<consumidor>  --LREM (confirmar)
+
+Enquanto o worker vive, uma thread de heartbeat renova a chave
+`fila:emissao:heartbeat:<consumidor>` (com TTL). Se a thread do worker morrer,
+o próprio heartbeat devolve os jobs dela à fila na hora; se o processo
+inteiro morrer (container reiniciado), o heartbeat expira e
+`recuperar_jobs_orfaos` (chamado periodicamente pelo ThreadPoolManager)
+devolve os jobs ao início da fila.
+
+Cada devolução por falha do worker (thread morta, heartbeat expirado, kill
+signal) conta uma tentativa do job (`fila:emissao:tentativas`, hash por id
+do job); o encerramento limpo (`parar`) devolve os jobs sem contar. Um job que derruba o worker
+toda vez (crash, travamento morto pelo watchdog) não volta para sempre: ao
+atingir `max_delivery_attempts` ele vai para `fila:emissao:mortos`.
+
+Quando o worker confirma o último job e a fila fica vazia, ele publica um
+evento "drenada" no canal de eventos (uma vez por esvaziamento), para que o
+orquestrador e o display de status reajam sem esperar o próximo ciclo.
+
+Uso (no worker):
+    fila = FilaConfiavel(r, "fila:emissao", worker_name)
+    fila.iniciar_heartbeat()
+    job_json = fila.aguardar(token_parada)
+    ...
+    fila.confirmar(job_json)
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis
+from loguru import logger
+
+from utils.eventos import CANAL_EVENTOS_PADRAO, publicar_evento_fila
+from utils.metricas import metricas
+
+MAX_TENTATIVAS_PADRAO = 3
+
+
+def _id_job(job_json: str) -> str:
+    """Identificador estável do job (o JSON é o mesmo a cada entrega)."""
+    return hashlib.sha1(job_json.encode("utf-8")).hexdigest()
+
+
+def _chave_tentativas(fila: str) -> str:
+    return f"{fila}:tentativas"
+
+
+def _chave_mortos(fila: str) -> str:
+    return f"{fila}:mortos"
+
+
+class TokenParada:
+    """
+    Sinal de parada de um worker (downscaling, reciclagem ou encerramento).
+
+    O worker espera jobs em fatias curtas (FilaConfiavel.aguardar) e confere o
+    token entre elas, então a parada é percebida em até `wait_slice_seconds`.
+    """
+
+    def __init__(self):
+        self.evento = threading.Event()
+
+    def is_set(self) -> bool:
+        return self.evento.is_set()
+
+    def sinalizar(self):
+        """Pede a parada."""
+        self.evento.set()
+
+    def cancelar(self):
+        """Desfaz a parada (worker volta a consumir jobs)."""
+        self.evento.clear()
+
+
+class FilaConfiavel:
+    """Fila Redis com lista de processamento por consumidor e heartbeat."""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        fila: str,
+        consumidor: str,
+        ttl_heartbeat: int = 15,
+        fatia_espera: float = 2,
+        max_tentativas: int = MAX_TENTATIVAS_PADRAO,
+        canal_eventos: Optional[str] = None,
+    ):
+        """
+        Args:
+            redis_client: Cliente Redis do worker
+            fila: Nome da fila (ex: "fila:emissao")
+            consumidor: Identificação do worker (ex: nome da thread)
+            ttl_heartbeat: Segundos sem heartbeat até os jobs do worker serem considerados órfãos
+            fatia_espera: Duração de cada BLMOVE (s); limita a demora para perceber o token de parada
+            max_tentativas: Entregas com falha do worker até o job ir para a lista de mortos
+            canal_eventos: Canal onde publicar quando a fila esvazia (None: não publica)
+        """
+        self.redis_client = redis_client
+        self.fila = fila
+        # Sufixo aleatório: nomes de thread podem se repetir entre reinícios
+        self.consumidor = f"{consumidor}:{uuid.uuid4().hex[:8]}"
+        self.ttl_heartbeat = ttl_heartbeat
+        self.fatia_espera = fatia_espera
+        self.max_tentativas = max_tentativas
+        self.canal_eventos = canal_eventos
+        self._drenagem_publicada = False  # Já avisou que a fila esvaziou (até pegar outro job)
+
+        self.chave_processando = f"{fila}:processando:{self.consumidor}"
+        self.chave_heartbeat = f"{fila}:heartbeat:{self.consumidor}"
+
+        self._parar_heartbeat = threading.Event()
+        self.thread_heartbeat = None
+
+    @classmethod
+    def from_config(cls, redis_client: redis.Redis, fila: str, consumidor: str, config: dict):
+        """Cria a fila a partir da seção 'queue_settings' do config.json."""
+        queue_cfg = config.get("queue_settings", {})
+        eventos_habilitados = config.get("event_settings", {}).get("enabled", True)
+        return cls(
+            redis_client,
+            fila,
+            consumidor,
+            ttl_heartbeat=queue_cfg.get("heartbeat_ttl_seconds", 15),
+            fatia_espera=queue_cfg.get("wait_slice_seconds", 2),
+            max_tentativas=queue_cfg.get("max_delivery_attempts", MAX_TENTATIVAS_PADRAO),
+            canal_eventos=(
+                config.get("redis_settings", {}).get("events_channel", CANAL_EVENTOS_PADRAO)
+                if eventos_habilitados else None
+            ),
+        )
+
+    # --- Heartbeat ---
+
+    def _renovar_heartbeat(self):
+        self.redis_client.set(self.chave_heartbeat, str(time.time()), ex=self.ttl_heartbeat)
+
+    def iniciar_heartbeat(self, thread_dono: Optional[threading.Thread] = None):
+        """
+        Mantém o heartbeat vivo enquanto `thread_dono` (padrão: thread atual)
+        estiver viva. Quando ela morre, devolve seus jobs em processamento.
+        """
+        thread_dono = thread_dono or threading.current_thread()
+        self._renovar_heartbeat()
+
+        def manter():
+            ultima_renovacao = time.monotonic()
+            while not self._parar_heartbeat.wait(timeout=1):
+                if not thread_dono.is_alive():
+                    devolvidos = self.devolver_pendentes(contar_tentativa=True)
+                    if devolvidos:
+                        logger.warning(
+                            f"[Filas] Worker '{thread_dono.name}' morreu com {devolvidos} job(s) em andamento. "
+                            f"Devolvidos à '{self.fila}'."
+                        )
+                    self._remover_heartbeat()
+                    return
+                if time.monotonic() - ultima_renovacao >= self.ttl_heartbeat / 3:
+                    try:
+                        self._renovar_heartbeat()
+                        ultima_renovacao = time.monotonic()
+                    except Exception as e:
+                        logger.error(f"[Filas] Falha ao renovar heartbeat '{self.chave_heartbeat}': {e}")
+
+        self.thread_heartbeat = threading.Thread(
+            target=manter, daemon=True, name=f"Heartbeat-{thread_dono.name}"
+        )
+        self.thread_heartbeat.start()
+
+    def _remover_heartbeat(self):
+        try:
+            self.redis_client.delete(self.chave_heartbeat)
+        except Exception as e:
+            logger.debug(f"[Filas] Falha ao remover '{self.chave_heartbeat}': {e}")
+
+    def parar(self):
+        """Encerramento limpo: devolve o que sobrou e remove o heartbeat."""
+        self._parar_heartbeat.set()
+        self.devolver_pendentes()
+        self._remover_heartbeat()
+
+    # --- Consumo ---
+
+    def aguardar(self, token: Optional[TokenParada] = None, timeout: float = 60) -> Optional[str]:
+        """
+        Move o próximo job da fila para a lista de processamento deste worker.
+
+        Returns:
+            O job (JSON) ou None em caso de timeout/parada.
+        """
+        prazo = time.monotonic() + timeout
+        while True:
+            if token is not None and token.is_set():
+                return None
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                return None
+            job_json = self.redis_client.blmove(
+                self.fila, self.chave_processando, min(self.fatia_espera, restante), src="LEFT", dest="RIGHT"
+            )
+            if job_json is not None:
+                self._drenagem_publicada = False
+                return job_json
+
+    def obter_disponivel(self) -> Optional[str]:
+        """Move o próximo job, se já houver um na fila (sem esperar). None se a fila está vazia."""
+        job_json = self.redis_client.lmove(self.fila, self.chave_processando, src="LEFT", dest="RIGHT")
+        if job_json is not None:
+            self._drenagem_publicada = False
+        return job_json
+
+    def aguardar_lote(self, token: Optional[TokenParada] = None, maximo: int = 1, timeout: float = 60) -> List[str]:
+        """
+        Espera o primeiro job e completa o lote com até `maximo - 1` jobs que
+        já estejam na fila (sem esperar por eles). Cada job deve ser confirmado.
+        """
+        primeiro = self.aguardar(token, timeout)
+        if primeiro is None:
+            return []
+        return self.completar_lote([primeiro], maximo)
+
+    def completar_lote(self, lote: List[str], maximo: int) -> List[str]:
+        """Acrescenta ao lote os jobs já disponíveis na fila, até `maximo` no total."""
+        while len(lote) < maximo:
+            job_json = self.obter_disponivel()
+            if job_json is None:
+                break
+            lote.append(job_json)
+        return lote
+
+    def confirmar(self, job_json: str):
+        """Job concluído (com sucesso ou não): sai da lista de processamento."""
+        try:
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.lrem(self.chave_processando, 1, job_json)
+            pipe.hdel(_chave_tentativas(self.fila), _id_job(job_json))
+            pipe.llen(self.fila)
+            _, _, restantes = pipe.execute()
+        except Exception as e:
+            logger.error(f"[Filas] Falha ao confirmar job em '{self.chave_processando}': {e}")
+            return
+        self._avisar_drenagem(restantes)
+
+    def _avisar_drenagem(self, restantes: int):
+        """Publica 'drenada' uma vez quando a fila esvazia (o ouvinte agrupa os avisos dos workers)."""
+        if not restantes and self.canal_eventos and not self._drenagem_publicada:
+            self._drenagem_publicada = True
+            publicar_evento_fila(self.redis_client, self.canal_eventos, origem="worker", fila=self.fila, evento="drenada")
+
+    def devolver(self, job_json: str, contar_tentativa: bool = False):
+        """
+        Devolve um job ao fim da fila (ex: página indisponível, tentar depois).
+
+        Com `contar_tentativa` (o job foi interrompido por falha, ex: kill
+        signal), a devolução conta como tentativa e o job pode ir para os mortos.
+        """
+        destino = self.fila
+        if contar_tentativa and _esgotou_tentativas(self.redis_client, self.fila, job_json, self.max_tentativas):
+            destino = _chave_mortos(self.fila)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.lrem(self.chave_processando, 1, job_json)
+        pipe.rpush(destino, job_json)
+        pipe.execute()
+
+    def devolver_pendentes(self, contar_tentativa: bool = False) -> int:
+        """
+        Devolve ao início da fila todos os jobs em processamento deste worker.
+
+        Só conta tentativa (`contar_tentativa`) quando o worker morreu com os
+        jobs; no encerramento limpo (downscale, reciclagem, SIGTERM) eles voltam sem custo.
+        """
+        return _devolver_lista(
+            self.redis_client, self.chave_processando, self.fila, self.max_tentativas, contar_tentativa
+        )
+
+
+class SeletorFilas:
+    """
+    Escolhe de qual fila um worker unificado (conferência e emissão no mesmo
+    navegador) pega o próximo job.
+
+    Cada worker tem uma fila preferida e só "rouba" da outra quando a sua está
+    vazia ou quando o backlog ponderado da outra é `razao_roubo` vezes maior:
+
+        backlog ponderado = jobs na fila × peso do tipo
+
+    Com as preferências alternadas entre os workers, os dois tipos sempre têm
+    quem os atenda, e a capacidade ociosa de um lado drena a fila do outro.
+    """
+
+    def __init__(
+        self,
+        filas: Dict[str, FilaConfiavel],
+        preferida: str,
+        pesos: Optional[Dict[str, float]] = None,
+        razao_roubo: float = 2.0,
+    ):
+        """
+        Args:
+            filas: Fila de cada tipo de job (ex: {"conferencia": ..., "emissao": ...})
+            preferida: Tipo atendido primeiro enquanto não houver motivo para roubar
+            pesos: Prioridade de cada tipo no backlog ponderado (padrão: 1)
+            razao_roubo: Quantas vezes o backlog da outra fila deve superar o da preferida
+        """
+        self.filas = filas
+        self.preferida = preferida
+        self.pesos = pesos or {}
+        self.razao_roubo = razao_roubo
+
+    @classmethod
+    def from_config(cls, filas: Dict[str, FilaConfiavel], preferida: str, config: dict) -> "SeletorFilas":
+        """Cria o seletor a partir da seção 'unified_worker_settings' do config.json."""
+        unif_cfg = config.get("unified_worker_settings", {})
+        return cls(
+            filas,
+            preferida,
+            pesos=unif_cfg.get("weights", {}),
+            razao_roubo=unif_cfg.get("steal_ratio", 2.0),
+        )
+
+    def _backlog(self, tipo: str) -> float:
+        try:
+            return self.filas[tipo].redis_client.llen(self.filas[tipo].fila) * self.pesos.get(tipo, 1.0)
+        except Exception as e:
+            logger.error(f"[Filas] Falha ao medir '{self.filas[tipo].fila}': {e}")
+            return 0.0
+
+    def ordem(self) -> List[str]:
+        """Tipos na ordem em que as filas devem ser tentadas."""
+        backlog = {tipo: self._backlog(tipo) for tipo in self.filas}
+        outras = sorted((t for t in self.filas if t != self.preferida), key=lambda t: -backlog[t])
+        if outras and backlog[outras[0]] > 0 and (
+            backlog[self.preferida] == 0 or backlog[outras[0]] >= self.razao_roubo * backlog[self.preferida]
+        ):
+            return outras + [self.preferida]
+        return [self.preferida] + outras
+
+    def obter(self, token: Optional[TokenParada] = None, timeout: float = 60) -> Optional[Tuple[str, str]]:
+        """
+        Move o próximo job da fila escolhida para a lista de processamento dela.
+
+        Com todas as filas vazias, espera uma fatia em cada uma, alternando.
+
+        Returns:
+            (tipo, job JSON) ou None em caso de timeout/parada
+        """
+        prazo = time.monotonic() + timeout
+        rodada = 0
+        while True:
+            if token is not None and token.is_set():
+                return None
+            ordem = self.ordem()
+            for tipo in ordem:
+                job_json = self.filas[tipo].obter_disponivel()
+                if job_json is not None:
+                    return self._escolhido(tipo, job_json)
+
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                return None
+            tipo = ordem[rodada % len(ordem)]
+            fila = self.filas[tipo]
+            job_json = fila.aguardar(token, timeout=min(fila.fatia_espera, restante))
+            if job_json is not None:
+                return self._escolhido(tipo, job_json)
+            rodada += 1
+
+    def _escolhido(self, tipo: str, job_json: str) -> Tuple[str, str]:
+        metricas.incrementar("unificado", f"{tipo}:jobs")
+        if tipo != self.preferida:
+            metricas.incrementar("unificado", "roubos")
+        return tipo, job_json
+
+
+def _esgotou_tentativas(redis_client: redis.Redis, fila: str, job_json: str, max_tentativas: int) -> bool:
+    """Conta uma tentativa com falha do job. True se ele deve ir para a lista de mortos."""
+    id_job = _id_job(job_json)
+    tentativas = redis_client.hincrby(_chave_tentativas(fila), id_job, 1)
+    if tentativas < max_tentativas:
+        return False
+    redis_client.hdel(_chave_tentativas(fila), id_job)
+    metricas.incrementar("filas", f"{fila}:jobs_mortos")
+    logger.error(
+        f"[Filas] Job falhou {tentativas} vez(es) em '{fila}'. Movido para '{_chave_mortos(fila)}': {job_json[:200]}"
+    )
+    return True
+
+
+def _devolver_lista(
+    redis_client: redis.Redis,
+    chave_processando: str,
+    fila: str,
+    max_tentativas: int = MAX_TENTATIVAS_PADRAO,
+    contar_tentativa: bool = False,
+) -> int:
+    devolvidos = 0
+    try:
+        while True:
+            job_json = redis_client.lindex(chave_processando, -1)
+            if job_json is None:
+                break
+            destino = fila
+            if contar_tentativa and _esgotou_tentativas(redis_client, fila, job_json, max_tentativas):
+                destino = _chave_mortos(fila)
+            # LMOVE é atômico: cada job está sempre em exatamente uma das listas
+            if redis_client.lmove(chave_processando, destino, src="RIGHT", dest="LEFT") is None:
+                break
+            if destino == fila:
+                devolvidos += 1
+    except Exception as e:
+        logger.error(f"[Filas] Falha ao devolver jobs de '{chave_processando}' para '{fila}': {e}")
+    if devolvidos:
+        metricas.incrementar("filas", f"{fila}:jobs_recuperados", devolvidos)
+    return devolvidos
+
+
+def recuperar_jobs_orfaos(
+    redis_client: redis.Redis, filas: Iterable[str], max_tentativas: int = MAX_TENTATIVAS_PADRAO
+) -> int:
+    """
+    Devolve às filas os jobs de consumidores cujo heartbeat expirou.
+
+    Returns:
+        Total de jobs devolvidos
+    """
+    total = 0
+    for fila in filas:
+        prefixo = f"{fila}:processando:"
+        for chave_processando in redis_client.scan_iter(match=f"{prefixo}*"):
+            consumidor = chave_processando[len(prefixo):]
+            if redis_client.exists(f"{fila}:heartbeat:{consumidor}"):
+                continue
+            devolvidos = _devolver_lista(redis_client, chave_processando, fila, max_tentativas, contar_tentativa=True)
+            if devolvidos:
+                logger.warning(
+                    f"[Filas] Consumidor '{consumidor}' sem heartbeat. "
+                    f"{devolvidos} job(s) devolvido(s) à '{fila}'."
+                )
+                total += devolvidos
+    return total
@@ -1,8 +1,12 @@
 from playwright.sync_api import TimeoutError, Page, expect
 import datetime
 import re
+from contextlib import contextmanager
+from typing import List
 from loguru import logger
-import time
+from utils.esperas import aguardar_condicao
+from utils.estado_pagina import estado_da_pagina
+from utils.digitacao import preencher_mascarado
 import json
 import os
 
@@ -14,13 +18,59 @@ with open(config_path, "r", encoding="utf-8") as f:
 PAGE_RELOAD_TIMEOUT = config.get("timeout_settings", {}).get("page_reload_ms", 45000)
 
 
-def filtro_cargas(page: Page, numero_lt: str):
-    logger.debug(f"[filtro_cargas] Iniciando filtro para LT {numero_lt}...")
+def _seletores_filtro_cargas(page: Page):
+    filtrar_button = page.get_by_role("button", name="Filtrar")
+    data_inicial_input = page.locator("div").filter(has_text=re.compile(r"^Data Inicial$")).get_by_role("textbox")
+    return filtrar_button, data_inicial_input
+
+
+@contextmanager
+def _recuperar_falha_filtro(page: Page, numero_lt: str):
+    """Em caso de erro no filtro: invalida o estado, recarrega a página e repassa o erro."""
+    estado = estado_da_pagina(page)
     try:
+        yield
+    except TimeoutError as e:
+        if estado:
+            estado.invalidar("falha no filtro")  # A página é recarregada abaixo
+        detalhe_erro = str(e).split('\n')[0]
+        logger.error(f"[Worker Conferência] [LT {numero_lt}] Timeout ao pesquisar: {detalhe_erro}")
+        logger.debug(f"[Worker Conferência] [LT {numero_lt}] URL no momento do erro: {page.url}")
+        try:
+            page.reload(timeout=PAGE_RELOAD_TIMEOUT, wait_until="domcontentloaded")
+            logger.debug(f"[Worker Conferência] [LT {numero_lt}] URL após reload: {page.url}")
+        except Exception as reload_err:
+            logger.error(f"[Worker Conferência] [LT {numero_lt}] Falha ao recarregar: {reload_err}")
+        raise
+
+    except Exception as e:
+        if estado:
+            estado.invalidar("falha no filtro")  # A página é recarregada abaixo
+        logger.critical(f"[Worker Conferência] [LT {numero_lt}] Erro inesperado ao pesquisar: {e}")
+        try:
+            page.reload(timeout=PAGE_RELOAD_TIMEOUT, wait_until="domcontentloaded")
+        except Exception as reload_err:
+            logger.error(f"[Worker Conferência] [LT {numero_lt}] Falha ao recarregar: {reload_err}")
+        raise
+
+
+def disparar_filtro_cargas(page: Page, numero_lt: str) -> bool:
+    """
+    Preenche o filtro de cargas e clica em Pesquisar, sem esperar o resultado.
+
+    Returns:
+        False se o filtro para esta LT já está aplicado (nada foi feito).
+    """
+    logger.debug(f"[filtro_cargas] Iniciando filtro para LT {numero_lt}...")
+    estado = estado_da_pagina(page)
+    if estado and estado.filtro_vigente(numero_lt):
+        logger.debug(f"[filtro_cargas] Filtro para LT {numero_lt} já aplicado. Reaproveitando a pesquisa.")
+        estado.registrar_evitada("filtro_cargas")
+        return False
+    with _recuperar_falha_filtro(page, numero_lt):
         # --- 1. Seletores ---
         logger.debug(f"[filtro_cargas] Localizando seletores...")
-        filtrar_button = page.get_by_role("button", name="Filtrar")
-        data_inicial_input = page.locator("div").filter(has_text=re.compile(r"^Data Inicial$")).get_by_role("textbox")
+        filtrar_button, data_inicial_input = _seletores_filtro_cargas(page)
         arquivo_input = page.locator("div").filter(has_text=re.compile(r"^Nome do arquivo$")).get_by_role("textbox")
 
         # --- 2. GARANTIR QUE A PÁGINA ESTÁ PRONTA ---
@@ -49,6 +99,14 @@ def filtro_cargas(page: Page, numero_lt: str):
         logger.debug(f"[filtro_cargas] Clicando em Pesquisar...")
         pesquisar_btn = page.get_by_role("button", name="Pesquisar")
         pesquisar_btn.click()
+    return True
+
+
+def concluir_filtro_cargas(page: Page, numero_lt: str):
+    """Espera o resultado da pesquisa disparada por `disparar_filtro_cargas` e fecha o painel."""
+    estado = estado_da_pagina(page)
+    with _recuperar_falha_filtro(page, numero_lt):
+        filtrar_button, data_inicial_input = _seletores_filtro_cargas(page)
 
         logger.debug(f"[filtro_cargas] Aguardando networkidle (máx 20s)...")
         page.wait_for_load_state("networkidle", timeout=20000)
@@ -61,27 +119,29 @@ def filtro_cargas(page: Page, numero_lt: str):
             expect(data_inicial_input).to_be_hidden(timeout=5000)
         
         logger.debug(f"[filtro_cargas] Filtro para LT {numero_lt} finalizado com sucesso!")
+        if estado:
+            estado.definir_filtro(numero_lt)
 
-    except TimeoutError as e:
-        detalhe_erro = str(e).split('\n')[0]
-        logger.error(f"[Worker Conferência] [LT {numero_lt}] Timeout ao pesquisar: {detalhe_erro}")
-        logger.debug(f"[Worker Conferência] [LT {numero_lt}] URL no momento do erro: {page.url}")
-        try:
-            page.reload(timeout=PAGE_RELOAD_TIMEOUT, wait_until="domcontentloaded")
-            logger.debug(f"[Worker Conferência] [LT {numero_lt}] URL após reload: {page.url}")
-        except Exception as reload_err:
-            logger.error(f"[Worker Conferência] [LT {numero_lt}] Falha ao recarregar: {reload_err}")
-        raise
 
-    except Exception as e:
-        logger.critical(f"[Worker Conferência] [LT {numero_lt}] Erro inesperado ao pesquisar: {e}")
-        try:
-            page.reload(timeout=PAGE_RELOAD_TIMEOUT, wait_until="domcontentloaded")
-        except Exception as reload_err:
-            logger.error(f"[Worker Conferência] [LT {numero_lt}] Falha ao recarregar: {reload_err}")
-        raise
-
-def filtro_cards(page: Page, numero_lt: str):
+def filtro_cargas(page: Page, numero_lt: str):
+    if disparar_filtro_cargas(page, numero_lt):
+        concluir_filtro_cargas(page, numero_lt)
+
+def filtro_cards(page: Page, numero_lt: str | List[str]):
+    """
+    Filtra os cards de emissão por uma ou várias DTs (caixa multi-valor "Valores").
+
+    Com uma lista, todas as DTs entram na mesma pesquisa e os cards delas
+    aparecem juntos (modo lote do worker de emissão).
+    """
+    numeros_lt = [numero_lt] if isinstance(numero_lt, str) else list(numero_lt)
+    numero_lt = ", ".join(numeros_lt)  # Para os logs
+
+    estado = estado_da_pagina(page)
+    if estado and estado.filtro_vigente(tuple(numeros_lt)):
+        logger.debug(f"[filtro_cards] Filtro para DT(s) {numero_lt} já aplicado. Reaproveitando a pesquisa.")
+        estado.registrar_evitada("filtro_cards")
+        return
 
     def ir_para_inicio_input(locator_name):
         for _ in range(10):
@@ -114,21 +174,32 @@ def filtro_cards(page: Page, numero_lt: str):
         data_inicial_str = data_inicial.strftime("%m-%d-%YT00:00")
         data_final_str = data_final.strftime("%m-%d-%YT23:59")
 
-        data_inicial_input.click()
-        data_inicial_input.fill("")
-        ir_para_inicio_input("dataInicial")
-        data_inicial_input.type(data_inicial_str)
-
-        data_final_input.click()
-        data_final_input.fill("")
-        ir_para_inicio_input("dataFinal")
-        data_final_input.type(data_final_str)
+        def digitar_data(data_input, locator_name, valor):
+            # Caminho lento: a máscara só aceita a data digitada a partir do início do campo
+            data_input.click()
+            data_input.fill("")
+            ir_para_inicio_input(locator_name)
+            data_input.type(valor)
+
+        preencher_mascarado(
+            data_inicial_input, data_inicial_str, "filtro_cards:data_inicial",
+            digitar_lento=lambda: digitar_data(data_inicial_input, "dataInicial", data_inicial_str),
+        )
+        preencher_mascarado(
+            data_final_input, data_final_str, "filtro_cards:data_final",
+            digitar_lento=lambda: digitar_data(data_final_input, "dataFinal", data_final_str),
+        )
 
         dt_input.click()
-        valores_dt_input.press("Backspace")
-        valores_dt_input.type(numero_lt)
-        valores_dt_input.press("Enter")
-        time.sleep(3)
+        # Remove as DTs da pesquisa anterior (um Backspace por valor)
+        valores_anteriores = valores_dt_input.locator("xpath=..").locator(".MuiChip-root").count()
+        for _ in range(max(1, valores_anteriores)):
+            valores_dt_input.press("Backspace")
+        for numero in numeros_lt:
+            valores_dt_input.fill(numero)  # Chip criado no Enter: não precisa digitar tecla a tecla
+            valores_dt_input.press("Enter")
+        chips_dt = valores_dt_input.locator("xpath=..").locator(".MuiChip-root")
+        aguardar_condicao("filtro_cards:valores", lambda: chips_dt.count() >= len(numeros_lt), timeout=3)
         salvar_dt_input.click()
 
         # 5. Executa a pesquisa
@@ -140,7 +211,12 @@ def filtro_cards(page: Page, numero_lt: str):
             filtrar_button.click()
             expect(data_inicial_input).to_be_hidden(timeout=5000)
 
+        if estado:
+            estado.definir_filtro(tuple(numeros_lt))
+
     except TimeoutError as e:
+        if estado:
+            estado.invalidar("falha no filtro")  # A página é recarregada abaixo
         detalhe_erro = str(e).split('\n')[0]
         logger.error(f"[Worker Emissão] [LT {numero_lt}] Timeout na pesquisa de cards: {detalhe_erro}")
         try:
@@ -150,6 +226,8 @@ def filtro_cards(page: Page, numero_lt: str):
         raise
 
     except Exception as e:
+        if estado:
+            estado.invalidar("falha no filtro")  # A página é recarregada abaixo
         logger.critical(f"[Worker Emissão] [LT {numero_lt}] Erro inesperado na pesquisa de cards: {e}")
         try:
             page.reload(timeout=PAGE_RELOAD_TIMEOUT, wait_until="domcontentloaded")
@@ -1,10 +1,15 @@
 import time
 import datetime
 import re
-from playwright.sync_api import Locator, TimeoutError, Page, expect
+from itertools import count, cycle
+from playwright.sync_api import TimeoutError, Page, expect
 from fluxos.fluxo_login import fluxo_login
 from typing import List, Dict
 from loguru import logger
+from utils.captura_rede import CapturaRede, captura_da_pagina, ler_campo
+from utils.esperas import aguardar_condicao, aguardar_rede_ociosa, aguardar_spinner
+from utils.estado_pagina import estado_da_pagina
+from utils.metricas import metricas
 import json
 import os
 
@@ -14,6 +19,8 @@ with open(config_path, "r", encoding="utf-8") as f:
     config = json.load(f)
 
 PAGE_RELOAD_TIMEOUT = config.get("timeout_settings", {}).get("page_reload_ms", 45000)
+STATUS_FIELDS = config.get("network_capture_settings", {}).get("status_fields", ["status"])
+ACCESS_KEY_FIELDS = config.get("network_capture_settings", {}).get("access_key_fields", ["chave", "chaveAcesso"])
 
 def garantir_pagina_consulta(
     page: Page,
@@ -48,8 +55,13 @@ def garantir_pagina_consulta(
             if tentativa == max_tentativas:
                 break 
             
-            logger.debug(f"Tentando recuperar... Aguardando {espera_entre_tentativas} segundos.")
-            time.sleep(espera_entre_tentativas)
+            logger.debug(f"Tentando recuperar... Aguardando a rede (mín {espera_entre_tentativas}s).")
+            inicio_espera = time.monotonic()
+            aguardar_rede_ociosa(page, "garantir_pagina:recuperacao", timeout_ms=espera_entre_tentativas * 1000)
+            # Rede ociosa não quer dizer portal recuperado: mantém o intervalo mínimo entre tentativas
+            restante = espera_entre_tentativas - (time.monotonic() - inicio_espera)
+            if restante > 0:
+                time.sleep(restante)
             
             # Tenta ir direto para a URL nas tentativas subsequentes
             if tentativa > 1:
@@ -65,7 +77,12 @@ def garantir_pagina_consulta(
 
 
 def goto_cards(page):
-    """Navega para a aba 'Cards' de emissão."""
+    """Navega para a aba 'Cards' de emissão (se a página ainda não estiver nela)."""
+    estado = estado_da_pagina(page)
+    if estado and estado.vista_valida("cards"):
+        estado.registrar_evitada("goto_cards")
+        return
+
     # Garante que estamos na página de emissão
     garantir_pagina_consulta(page, "https://portal.emiteai.com.br/#/emissor", '[role="tab"]:has-text("Cards")')
 
@@ -88,139 +105,169 @@ def goto_cards(page):
         'document.querySelector("[role=tab][aria-selected=true]")?.textContent.includes("Cards")'
     )
     logger.debug("Aba 'Cards' carregada com sucesso.")
-
-
-def identificar_tipo_card(card: Locator) -> str | None:
-    """Verifica se o card é do tipo 'cte' ou 'nfs'."""
-    cte_block = card.locator("div", has_text=re.compile(r"^\s*CT-e\s*$"))
-    if cte_block.count() > 0:
-        cte_container = cte_block.first.locator("xpath=..")
-        spans = cte_container.locator("button span")
-        for i in range(spans.count()):
-            text = spans.nth(i).inner_text().strip()
-            if text.isdigit() and int(text) > 0:
-                return "cte"
-
-    nfs_block = card.locator("div", has_text=re.compile(r"^\s*NFS-e\s*$"))
-    if nfs_block.count() > 0:
-        nfs_container = nfs_block.first.locator("xpath=..")
-        spans = nfs_container.locator("button span")
-        for i in range(spans.count()):
-            text = spans.nth(i).inner_text().strip()
-            if text.isdigit() and int(text) > 0:
-                return "nfs"
+    if estado:
+        estado.definir_vista("cards")
+
+
+SELETOR_CARDS_EMISSAO = ".MuiGrid-root.MuiGrid-item.MuiGrid-grid-xs-12.MuiGrid-grid-sm-6"
+
+# Lê tudo o que a análise precisa de um card em uma única ida ao navegador.
+# Reproduz os seletores antigos: status = div anterior ao botão "more_vert";
+# contadores = "button div span" do pai do rótulo "CT-e"; MDF-e = primeiro
+# botão do avô do rótulo "MDF-e".
+_JS_EXTRAIR_CARD = r"""
+card => {
+    const texto = el => (el.innerText || el.textContent || "").trim();
+    const rotulo = (tag, nome) => Array.from(card.querySelectorAll(tag)).find(el => texto(el) === nome) || null;
+    const spans = (container, seletor) => Array.from(container.querySelectorAll(seletor)).map(texto);
+    const secao = nome => {
+        const label = rotulo("div", nome);
+        if (!label || !label.parentElement) return null;
+        return {
+            contadores: spans(label.parentElement, "button div span"),
+            numeros: spans(label.parentElement, "button span"),
+        };
+    };
+
+    const dt = (texto(card).match(/DT:\s*(\S+)/) || [])[1] || null;
+
+    let status = null;
+    const menu = Array.from(card.querySelectorAll("button")).find(b => texto(b).includes("more_vert"));
+    if (menu) {
+        let anterior = menu.previousElementSibling;
+        while (anterior && anterior.tagName !== "DIV") anterior = anterior.previousElementSibling;
+        status = anterior ? texto(anterior) : null;
+    }
+
+    let mdfe = null;
+    const mdfeLabel = rotulo("span", "MDF-e");
+    if (mdfeLabel) {
+        const linha = mdfeLabel.parentElement && mdfeLabel.parentElement.parentElement;
+        const botao = linha ? linha.querySelector("button") : null;
+        mdfe = { status: botao ? texto(botao) : null };
+    }
+
+    return { dt, status, cte: secao("CT-e"), nfs: secao("NFS-e"), mdfe };
+}
+"""
+
+
+def _normalizar_status(texto: str) -> str:
+    return texto.lower().replace(" ", "_")
+
+
+def _tem_documento(secao: dict | None) -> bool:
+    """True se algum número da seção (CT-e/NFS-e) é maior que zero."""
+    return bool(secao) and any(n.isdigit() and int(n) > 0 for n in secao.get("numeros", []))
+
+
+def identificar_tipo_card(dados: dict) -> str | None:
+    """Verifica se o card (dados extraídos) é do tipo 'cte' ou 'nfs'."""
+    if _tem_documento(dados.get("cte")):
+        return "cte"
+    if _tem_documento(dados.get("nfs")):
+        return "nfs"
     return None
 
 
-def obter_status_principal_card(card: Locator) -> str | None:
-    """Extrai o status principal do card (ex: 'ag._revisão')."""
-    try:
-        menu_button = card.locator('button:has-text("more_vert")')
-        menu_button.wait_for(state="visible", timeout=5000)
-
-        status_locator = menu_button.locator("xpath=preceding-sibling::div[1]")
-        status_texto = status_locator.inner_text().strip()
-        
-        return status_texto.lower().replace(" ", "_")
-        
-    except TimeoutError:
-        logger.debug(f"Não foi possível encontrar o botão de menu ('more_vert') no card.")
-        return "nao_encontrado"
-    except Exception as e:
-        logger.error(f"Erro ao extrair status principal do card via âncora de botão: {e}")
+def decidir_status_cte(contadores: List[str]) -> str | None:
+    """Resume os contadores do CT-e (Autorizado, Pendente, Rejeitado, Cancelado)."""
+    if len(contadores) != 4:
+        logger.warning(f"Esperava 4 contadores para CT-e, mas encontrou {len(contadores)}.")
         return None
-
-
-def verificar_status_cte(card) -> str | None:
-    """Verifica os contadores de status do CT-e (Autorizado, Pendente, etc.)."""
     try:
-        cte_label = card.locator("div", has_text=re.compile(r"^\s*CT-e\s*$"))
-        if cte_label.count() == 0:
-            return None # Sem seção CT-e
-
-        cte_row_container = cte_label.first.locator("xpath=..")
-        spans = cte_row_container.locator("button div span")
-        
-        if spans.count() != 4:
-            logger.warning(f"Esperava 4 contadores para CT-e, mas encontrou {spans.count()}.")
-            return None
-
-        status_counts = {
-            "autorizado": int(spans.nth(0).inner_text().strip()),
-            "pendente":   int(spans.nth(1).inner_text().strip()),
-            "rejeitado":  int(spans.nth(2).inner_text().strip()),
-            "cancelado":  int(spans.nth(3).inner_text().strip()),
-        }
-        logger.debug(f"Status CT-e encontrados: {status_counts}")
-
-        # Lógica de decisão
-        if status_counts["rejeitado"] > 0:
-            return "rejeitado"
-        if status_counts["pendente"] > 0:
-            return "pendente"
-        if status_counts["cancelado"] > 0 and status_counts["autorizado"] == 0:
-            return "cancelado"
-        if status_counts["autorizado"] > 0:
-            return "autorizado"
-        if all(value == 0 for value in status_counts.values()):
-            return "vazio"
-        
-        return "misto"
-
+        status_counts = dict(zip(("autorizado", "pendente", "rejeitado", "cancelado"), map(int, contadores)))
     except (ValueError, TypeError) as e:
         logger.error(f"Não foi possível converter um status de CT-e para número: {e}")
         return None
-    except Exception as e:
-        logger.error(f"Ocorreu um erro inesperado ao verificar status do CT-e: {e}")
-        return None
-
+    logger.debug(f"Status CT-e encontrados: {status_counts}")
+
+    # Lógica de decisão
+    if status_counts["rejeitado"] > 0:
+        return "rejeitado"
+    if status_counts["pendente"] > 0:
+        return "pendente"
+    if status_counts["cancelado"] > 0 and status_counts["autorizado"] == 0:
+        return "cancelado"
+    if status_counts["autorizado"] > 0:
+        return "autorizado"
+    if all(value == 0 for value in status_counts.values()):
+        return "vazio"
+
+    return "misto"
+
+
+def interpretar_card(dados: dict) -> dict:
+    """Converte os dados brutos de um card no resultado da análise."""
+    if dados.get("status"):
+        status_principal = _normalizar_status(dados["status"])
+    else:
+        logger.debug("Não foi possível encontrar o status ('more_vert') no card.")
+        status_principal = "nao_encontrado"
+
+    cte = dados.get("cte")
+    status_cte = decidir_status_cte(cte["contadores"]) if cte else None  # Sem seção CT-e
+
+    mdfe = dados.get("mdfe")
+    if mdfe is None:
+        status_mdfe = None  # Sem seção MDF-e
+    elif mdfe.get("status"):
+        status_mdfe = _normalizar_status(mdfe["status"])
+    else:
+        logger.warning("Rótulo 'MDF-e' encontrado, mas o botão de status não foi localizado.")
+        status_mdfe = "status_nao_encontrado"
+
+    return {
+        "status_card": status_principal,
+        "status_cte": status_cte,
+        "status_mdfe": status_mdfe,
+        "tipo_card": identificar_tipo_card(dados),
+    }
+
+
+def extrair_cards_emissao(page: Page) -> Dict[str, dict]:
+    """
+    Lê todos os cards da grade de emissão em uma única chamada ao navegador.
 
-def verificar_status_mdfe(card: Locator) -> str | None:
-    """Extrai o status textual do MDF-e (ex: 'autorizado', 'encerrado')."""
+    Returns:
+        {DT: dados brutos do card}; cards sem DT são ignorados.
+    """
     try:
-        mdfe_label = card.locator("span", has_text=re.compile(r"^\s*MDF-e\s*$"))
-        if mdfe_label.count() == 0:
-            return None # Sem seção MDF-e
+        dados = page.locator(SELETOR_CARDS_EMISSAO).evaluate_all(f"cards => cards.map({_JS_EXTRAIR_CARD})")
+    except Exception as e:
+        logger.error(f"Erro ao extrair os cards de emissão: {e}")
+        return {}
+    cards = {}
+    for item in dados:
+        if item.get("dt"):
+            cards.setdefault(item["dt"], item)  # Como o .first do locator: vale o primeiro
+    logger.debug(f"{len(cards)} cards de emissão extraídos em uma chamada.")
+    return cards
 
-        mdfe_row_container = mdfe_label.first.locator("xpath=../..")
-        status_button = mdfe_row_container.locator("button")
-        
-        if status_button.count() > 0:
-            status_texto = status_button.first.inner_text().strip()
-            return status_texto.lower().replace(" ", "_")
 
-        else:
-            logger.warning("Rótulo 'MDF-e' encontrado, mas o botão de status não foi localizado.")
-            return "status_nao_encontrado"
-
-    except Exception as e:
-        logger.error(f"Ocorreu um erro inesperado ao verificar status do MDF-e: {e}")
-        return None
+def analisar_status_emissao(page: Page, numero_lt: str, cards: Dict[str, dict] | None = None) -> dict | None:
+    """
+    Orquestra a análise completa de um card de LT.
 
-def analisar_status_emissao(page: Page, numero_lt: str) -> dict | None:
-    """Orquestra a análise completa de um card de LT."""
+    Args:
+        cards: Resultado de `extrair_cards_emissao` (lote); sem ele, o card é
+            lido sozinho, também em uma única chamada.
+    """
     try:
-        card_locator = page.locator(".MuiGrid-root.MuiGrid-item.MuiGrid-grid-xs-12.MuiGrid-grid-sm-6").filter(
-            has_text=re.compile(rf"DT:\s*{re.escape(numero_lt)}")
+        # DT exata (como a chave de _JS_EXTRAIR_CARD): no lote, "DT: 123" não pode casar com "DT: 1234"
+        card_locator = page.locator(SELETOR_CARDS_EMISSAO).filter(
+            has_text=re.compile(rf"DT:\s*{re.escape(numero_lt)}(?!\S)")
         )
 
-        if card_locator.count() == 0:
-            return None
-        
-        card = card_locator.first
+        dados = cards.get(numero_lt) if cards else None
+        if dados is None:
+            if card_locator.count() == 0:
+                return None
+            dados = card_locator.first.evaluate(_JS_EXTRAIR_CARD)
 
-        # Chama as funções especialistas
-        status_principal = obter_status_principal_card(card)
-        status_cte_detalhado = verificar_status_cte(card)
-        status_mdfe_detalhado = verificar_status_mdfe(card)
+        resultado = interpretar_card(dados)
+        resultado["card"] = card_locator.first  # Passa o locator para o worker usar
 
-        resultado = {
-            "status_card": status_principal,
-            "status_cte": status_cte_detalhado,
-            "status_mdfe": status_mdfe_detalhado,
-            "card": card # Passa o locator para o worker usar
-        }
-        
         logger.success(f"Análise da LT {numero_lt} concluída")
         return resultado
 
@@ -228,13 +275,22 @@ def analisar_status_emissao(page: Page, numero_lt: str) -> dict | None:
         logger.critical(f"Erro inesperado ao analisar o card da LT {numero_lt}: {e}")
         return None
 
-def obter_status_lt(page: Page, numero_lt: str) -> str:
-    """Procura a LT na tabela e retorna o Status."""
+def obter_status_lt(page: Page, numero_lt: str, captura: CapturaRede | None = None) -> str:
+    """Procura a LT na tabela e retorna o Status (lendo a resposta da API, se capturada)."""
     logger.debug(f"[obter_status_lt] Iniciando busca do status da LT {numero_lt}...")
+    if captura:
+        for registro in captura.buscar("consulta", numero_lt):
+            status = ler_campo(registro, STATUS_FIELDS)
+            if isinstance(status, str):
+                logger.debug(f"[obter_status_lt] Status da LT {numero_lt} lido da resposta da API: '{status}'")
+                return status.strip()
+        logger.debug(f"[obter_status_lt] LT {numero_lt} sem status na resposta capturada. Lendo a tabela...")
     try:
-        time.sleep(5)  # CORRIGIDO: Era 5000 segundos (83 min!) - Agora 2 segundos
         logger.debug(f"[obter_status_lt] Buscando linha na tabela para LT {numero_lt}...")
         linha_alvo = page.locator("table tbody tr", has_text=numero_lt).first
+        # A linha costuma já estar renderizada; espera só enquanto a tabela ainda carrega
+        aguardar_spinner(page, "obter_status_lt:spinner", timeout_ms=10000)
+        aguardar_condicao("obter_status_lt:linha", lambda: linha_alvo.count() > 0, timeout=5)
         
         if linha_alvo.count() == 0:
             logger.info(f"[obter_status_lt] LT {numero_lt} não encontrada na tabela.")
@@ -253,6 +309,16 @@ def obter_status_lt(page: Page, numero_lt: str) -> str:
         return "desconhecido"
 
 
+# Texto dos parágrafos "DT:", "Nº:" e "Valor:" de cada card de CT-e (null se ausente)
+_JS_TEXTOS_CARDS_CTE = r"""
+cards => cards.map(card => {
+    const paragrafos = Array.from(card.querySelectorAll("p")).map(p => p.innerText || p.textContent || "");
+    const primeiro = rotulo => paragrafos.find(t => t.includes(rotulo)) ?? null;
+    return { dt: primeiro("DT:"), numero: primeiro("Nº:"), valor: primeiro("Valor:") };
+})
+"""
+
+
 def extrair_dados_dos_cards_cte(page: Page, numero_lt_esperado: str) -> List[Dict[str, any]]:
     """Extrai os dados de N° e Valor de todos os cards de CT-e para uma LT específica."""
     dados_dos_ctes = []
@@ -272,16 +338,16 @@ def extrair_dados_dos_cards_cte(page: Page, numero_lt_esperado: str) -> List[Dic
 
         logger.debug(f"{total_cards} cards de CT-e encontrados. Iniciando validação...")
 
-        for i in range(total_cards):
-            card = cards_cte.nth(i)
-            
+        # Textos de todos os cards em uma única chamada ao navegador
+        textos_cards = cards_cte.evaluate_all(_JS_TEXTOS_CARDS_CTE)
+
+        for i, textos in enumerate(textos_cards):
             try:
                 # 1. Extrai a DT
-                dt_locator = card.locator('p:has-text("DT:")')
-                if dt_locator.count() == 0:
+                if textos["dt"] is None:
                     logger.warning(f"Card {i+1} ignorado. Não foi possível encontrar a DT.")
                     continue
-                dt_extraido = dt_locator.first.inner_text().replace("DT:", "").strip()
+                dt_extraido = textos["dt"].replace("DT:", "").strip()
 
                 # 2. Validação da DT
                 if dt_extraido != numero_lt_esperado:
@@ -291,12 +357,10 @@ def extrair_dados_dos_cards_cte(page: Page, numero_lt_esperado: str) -> List[Dic
                 logger.success(f"Card {i+1} validado para a LT '{dt_extraido}'.")
 
                 # 3. Extrai o NÚMERO
-                numero_locator = card.locator('p:has-text("Nº:")')
-                numero_cte = numero_locator.first.inner_text().replace("Nº:", "").strip()
+                numero_cte = textos["numero"].replace("Nº:", "").strip()
 
                 # 4. Extrai o VALOR
-                valor_locator = card.locator('p:has-text("Valor:")')
-                valor_str = valor_locator.first.inner_text() # Ex: "Valor: 3068.70"
+                valor_str = textos["valor"] # Ex: "Valor: 3068.70"
                 
                 valor_limpo_str = valor_str.split(":")[-1].replace("R$", "").replace("\xa0", "").strip()
                 valor_cte = float(valor_limpo_str.replace(".", "").replace(",", "."))
@@ -315,10 +379,69 @@ def extrair_dados_dos_cards_cte(page: Page, numero_lt_esperado: str) -> List[Dic
         return []
 
 
+# Nº de cada card de MDF-e e a chave de acesso, se o card já a mostrar (null se ausente)
+_JS_DADOS_CARDS_MDFE = r"""
+cards => cards.map(card => {
+    const numero = Array.from(card.querySelectorAll("p")).map(p => p.innerText || p.textContent || "")
+        .find(t => t.includes("Nº:")) ?? null;
+    const chave = ((card.innerText || card.textContent || "").match(/(?:\d{4}\s?){10}\d{4}/) || [null])[0];
+    return { numero, chave };
+})
+"""
+
+
+def chave_acesso_valida(chave) -> bool:
+    """True se `chave` tem 44 dígitos e o dígito verificador (módulo 11) confere."""
+    if not isinstance(chave, str) or not re.fullmatch(r"\d{44}", chave):
+        return False
+    pesos = cycle(range(2, 10))
+    soma = sum(int(digito) * next(pesos) for digito in reversed(chave[:43]))
+    resto = soma % 11
+    return int(chave[43]) == (0 if resto < 2 else 11 - resto)
+
+
+def _chave_capturada(captura: CapturaRede, numero_mdfe: str) -> str | None:
+    """Chave do MDF-e `numero_mdfe` nas respostas da API já capturadas."""
+    for registro in captura.buscar("mdfe", numero_mdfe):
+        # buscar() casa por substring; exige um campo igual ao número (ignorando zeros à esquerda)
+        if not any(
+            isinstance(v, (str, int)) and not isinstance(v, bool) and str(v).strip().lstrip("0") == numero_mdfe.lstrip("0")
+            for v in registro.values()
+        ):
+            continue
+        chave = ler_campo(registro, ACCESS_KEY_FIELDS)
+        chave = re.sub(r"\D", "", chave) if isinstance(chave, str) else None
+        if chave_acesso_valida(chave):
+            return chave
+    return None
+
+
+def _chave_pelo_drawer(page: Page, card) -> str:
+    """Abre "Detalhes" do card, lê a Chave de Acesso no painel lateral e o fecha."""
+    detalhes_button = card.locator('button:has(span[aria-label="Detalhes"])')
+    detalhes_button.click()
+
+    drawer = page.locator("div.MuiDrawer-paperAnchorRight")
+    drawer.wait_for(state="visible", timeout=10000)
+
+    chave_acesso = drawer.locator('p:has-text("Chave de Acesso") + p').inner_text().strip()
+
+    close_button = drawer.locator('button:has(svg[data-testid="CloseIcon"])')
+    close_button.click()
+    drawer.wait_for(state="hidden", timeout=5000)
+    return chave_acesso
+
+
 def extrair_dados_dos_cards_mdfe(page: Page) -> List[Dict[str, str]]:
-    """Extrai N° e Chave de todos os cards de MDF-e na página."""
-    dados_dos_mdfes = []
-    logger.info("Iniciando extração interativa de dados dos cards de MDF-e...")
+    """
+    Extrai N° e Chave de todos os cards de MDF-e na página.
+
+    Os números (e as chaves que o card já mostrar) são lidos em uma única
+    chamada; as chaves que faltam vêm das respostas da API capturadas
+    (`captura_da_pagina`). Só os MDF-es que continuarem sem chave passam pelo
+    painel "Detalhes", um a um, como antes.
+    """
+    logger.info("Iniciando extração de dados dos cards de MDF-e...")
 
     try:
         container_principal = page.locator("div.MuiGrid-container[class*='css-h13rzo']")
@@ -326,46 +449,40 @@ def extrair_dados_dos_cards_mdfe(page: Page) -> List[Dict[str, str]]:
 
         cards_mdfe = container_principal.locator("div.MuiStack-root[class*='css-11jo4c7']")
         cards_mdfe.first.wait_for(state="visible", timeout=120000)
-        total_cards = cards_mdfe.count()
-
-        if total_cards == 0:
+        dados_cards = cards_mdfe.evaluate_all(_JS_DADOS_CARDS_MDFE)
 
+        if not dados_cards:
             return []
 
-        logger.debug(f"{total_cards} cards de MDF-e encontrados. Iniciando ciclo interativo...")
-
-        for i in range(total_cards):
-            card = cards_mdfe.nth(i)
-            numero_mdfe = None
-            chave_acesso = None
-
-            try:
-                # 4. Extrai o número do manifesto
-                numero_locator = card.locator('p:has-text("Nº:")')
-                if numero_locator.count() == 0:
-                    logger.warning(f"Não foi possível encontrar o número do MDF-e no card {i+1}. Pulando.")
-                    continue
-                numero_mdfe = numero_locator.first.inner_text().replace("Nº:", "").strip()
-
-                # 5. AÇÃO: Clica em "Detalhes"
-                detalhes_button = card.locator('button:has(span[aria-label="Detalhes"])')
-                detalhes_button.click()
+        logger.debug(f"{len(dados_cards)} cards de MDF-e encontrados.")
+        captura = captura_da_pagina(page)
+        extraidos: Dict[int, Dict[str, str]] = {}
+        sem_chave = []
 
-                # 6. ESPERA: Aguarda o painel lateral (Drawer)
-                drawer = page.locator("div.MuiDrawer-paperAnchorRight")
-                drawer.wait_for(state="visible", timeout=10000)
+        for i, dados in enumerate(dados_cards):
+            if dados["numero"] is None:
+                logger.warning(f"Não foi possível encontrar o número do MDF-e no card {i+1}. Pulando.")
+                continue
+            numero_mdfe = dados["numero"].replace("Nº:", "").strip()
 
-                # 7. EXTRAÇÃO DA CHAVE
-                chave_locator = drawer.locator('p:has-text("Chave de Acesso") + p')
-                chave_acesso = chave_locator.inner_text().strip()
+            chave_acesso, origem = re.sub(r"\D", "", dados["chave"] or ""), "card"
+            if not chave_acesso_valida(chave_acesso):
+                chave_acesso, origem = (_chave_capturada(captura, numero_mdfe) if captura else None), "api"
 
-                # 8. AÇÃO: Fecha o drawer
-                close_button = drawer.locator('button:has(svg[data-testid="CloseIcon"])')
-                close_button.click()
-                drawer.wait_for(state="hidden", timeout=5000)
+            if chave_acesso:
+                extraidos[i] = {"numero": numero_mdfe, "chave": chave_acesso}
+                metricas.incrementar("mdfe_chaves", origem)
+            else:
+                sem_chave.append((i, numero_mdfe))
 
-                if numero_mdfe and chave_acesso:
-                    dados_dos_mdfes.append({"numero": numero_mdfe, "chave": chave_acesso})
+        if sem_chave:
+            logger.debug(f"{len(sem_chave)} MDF-e(s) sem chave nos dados carregados. Abrindo os detalhes...")
+        for i, numero_mdfe in sem_chave:
+            try:
+                chave_acesso = _chave_pelo_drawer(page, cards_mdfe.nth(i))
+                if chave_acesso:
+                    extraidos[i] = {"numero": numero_mdfe, "chave": chave_acesso}
+                    metricas.incrementar("mdfe_chaves", "drawer")
 
             except Exception as e_card:
                 logger.error(f"Erro ao processar o card {i+1} (MDF-e nº {numero_mdfe}): {e_card}")
@@ -373,6 +490,7 @@ def extrair_dados_dos_cards_mdfe(page: Page) -> List[Dict[str, str]]:
                     page.keyboard.press("Escape") # Tenta fechar o painel
                 continue
 
+        dados_dos_mdfes = [extraidos[i] for i in sorted(extraidos)]
         logger.debug(f"Extração concluída. Total de MDF-es processados: {len(dados_dos_mdfes)}")
         return dados_dos_mdfes
 
@@ -388,6 +506,15 @@ import threading
 from math import ceil
 from typing import Callable, Optional, Dict, Any
 import redis
+from utils.autoscaler import AutoscalerPreditivo, distribuir_orcamento
+from utils.eventos import CANAL_EVENTOS_PADRAO, OuvinteEventosFila
+from utils.filas import TokenParada, recuperar_jobs_orfaos
+from utils.memoria import MonitorMemoria
+from utils.reciclagem import PoliticaReciclagem
+from utils.sessao import EscalonadorLogins
+
+# Tipo de thread do worker unificado (atende as duas filas, ver workers/fluxo_unificado.py)
+TIPO_UNIFICADO = "unificado"
 
 
 class ThreadPoolManager:
@@ -395,11 +522,29 @@ class ThreadPoolManager:
     Gerencia um pool de threads dinâmico que escala baseado na quantidade
     de jobs pendentes nas filas Redis.
     
-    Fórmula de escaling: ceil(jobs_pendentes / 50) threads por tipo de job
+    Com 'autoscaler_enabled' (padrão), o tamanho de cada pool é decidido pelo
+    AutoscalerPreditivo (taxa de chegada × tempo de serviço, alvo de espera na
+    fila e histerese). Sem ele, vale a fórmula legada:
+    ceil(jobs_pendentes / jobs_per_thread_ratio) threads por tipo de job
     
-    Exemplo:
+    Exemplo (fórmula legada):
       - 322 jobs de conferência → ceil(322/50) = 7 threads
       - 3 jobs de emissão → ceil(3/50) = 1 thread
+    
+    Com 'unified_worker_settings.enabled', há um único pool de workers
+    unificados: cada navegador atende as duas filas, o pool é dimensionado
+    pela soma da demanda e o mínimo de navegadores vale para o total (não
+    para cada tipo), então uma fila vazia não deixa navegadores ociosos.
+    
+    Com 'scale_to_zero_enabled', depois de 'scale_to_zero_idle_seconds' sem
+    nenhum job (filas e listas de processamento vazias) o mínimo cai para
+    zero e todos os navegadores são liberados. O primeiro job que chegar
+    recria um worker (ver SessaoPortal para a partida rápida).
+    
+    Com 'recycling_settings.enabled', cada worker é reciclado depois de N
+    jobs, M minutos ou ao passar dos limites de memória/latência (ver
+    PoliticaReciclagem). O substituto sobe antes e o worker antigo só é
+    drenado quando ele fica pronto, então a capacidade não cai durante a troca.
     """
     
     def __init__(
@@ -421,9 +566,12 @@ class ThreadPoolManager:
             ejecutor_function: Função que executa o fluxo (ex: executar_fluxo)
             usuario: Usuário RPA
             senha: Senha RPA
-            rebalance_interval: Intervalo em segundos para verificar e ajustar threads (default: 60s)
+            rebalance_interval: Intervalo em segundos para verificar e ajustar threads (default: 60s).
+                Com 'event_settings.enabled', o rebalanceamento é disparado pelos eventos
+                das filas e este intervalo é substituído por 'fallback_rebalance_seconds'
             max_threads_per_type: Limite máximo de threads por tipo (conferência/emissão)
-            max_total_threads: Limite máximo total de threads
+            max_total_threads: Orçamento global de navegadores (soma de todos os tipos),
+                dividido entre os tipos por demanda ponderada
         """
         self.redis_client = redis_client
         self.config = config
@@ -439,20 +587,87 @@ class ThreadPoolManager:
         thread_pool_cfg = config.get("thread_pool_settings", {})
         self.min_threads_per_type = thread_pool_cfg.get("min_threads_per_type", 1)
         self.jobs_per_thread_ratio = thread_pool_cfg.get("jobs_per_thread_ratio", 50)
+        self.timeout_encerramento = thread_pool_cfg.get("shutdown_timeout_seconds", 120)
+        self.prazo_kill_pipeline = thread_pool_cfg.get("pipeline_kill_grace_seconds", 120)
+        self.intervalo_recuperacao = config.get("queue_settings", {}).get("reaper_interval_seconds", 5)
+        self.max_tentativas_job = config.get("queue_settings", {}).get("max_delivery_attempts", 3)
+        
+        # Filas de jobs e tipos de thread (um pool por fila, ou um pool unificado)
+        self.modo_unificado = config.get("unified_worker_settings", {}).get("enabled", False)
+        self.tipos_fila = ["conferencia", "emissao"]
+        self.tipos = [TIPO_UNIFICADO] if self.modo_unificado else list(self.tipos_fila)
+        
+        # Escala a zero: sem trabalho por 'scale_to_zero_idle_seconds', o mínimo vira 0
+        self.escala_zero = thread_pool_cfg.get("scale_to_zero_enabled", False)
+        self.ociosidade_para_zero = thread_pool_cfg.get("scale_to_zero_idle_seconds", 900)
+        self._ocioso_desde: Optional[float] = None   # Início do período sem jobs
+        self._zerado_desde: Optional[float] = None   # Pool liberou todos os navegadores
+        self._partida_fria_desde: Optional[float] = None  # Trabalho chegou com o pool em zero
+        
+        # Partida: workers sobem em paralelo, com os logins espaçados (ver EscalonadorLogins)
+        self.escalonador_logins = EscalonadorLogins.from_config(config)
+        self._partida: Optional[Dict[str, Any]] = None  # {"inicio", "alvo", "prontos"} até a capacidade inicial
+        
+        # Autoscaler preditivo (taxa de chegada + tempo de serviço + histerese)
+        self.autoscaler = None
+        if thread_pool_cfg.get("autoscaler_enabled", True):
+            self.autoscaler = AutoscalerPreditivo.from_config(
+                self.tipos_fila,
+                thread_pool_cfg,
+                # O mínimo é aplicado aqui (ver _minimo_threads): no modo unificado vale
+                # para o pool inteiro e, com escala a zero, pode ser 0
+                min_threads=0 if self.modo_unificado or self.escala_zero else self.min_threads_per_type,
+                max_threads=self.max_threads_per_type,
+            )
         
         # Dicionário para rastrear threads ativas por tipo
         # {"conferencia": [t1, t2, ...], "emissao": [t3, t4, ...]}
-        self.threads: Dict[str, list] = {
-            "conferencia": [],
-            "emissao": []
-        }
+        self.threads: Dict[str, list] = {tipo: [] for tipo in self.tipos}
+        
+        # Numeração dos nomes das threads por tipo: só cresce, então uma thread
+        # nova nunca repete o nome de uma viva (o nome identifica a lista de
+        # processamento na fila, a memória e a vida do worker)
+        self.__numeracao: Dict[str, count] = {tipo: count(1) for tipo in self.tipos}
         
         # Dicionário para rastrear threads marcadas para morte por tipo
         # {"conferencia": set([t1, t2]), "emissao": set([t3])}
-        self.__threads_marked_to_die: Dict[str, set] = {
-            "conferencia": set(),
-            "emissao": set()
-        }
+        self.__threads_marked_to_die: Dict[str, set] = {tipo: set() for tipo in self.tipos}
+        
+        # Token de parada de cada thread: o worker o confere entre as fatias de
+        # espera na fila, então para em segundos quando é marcado para morte
+        # (downscaling/reciclagem) ou no parar()
+        self.__tokens_parada: Dict[threading.Thread, TokenParada] = {}
+        
+        # Workers com pipeline de abas: tratam os próprios kill signals (cancelam só a
+        # aba travada); o gerenciador só os substitui se a thread inteira travar
+        self.__workers_pipeline: set = set()
+        
+        # Threads marcadas para morte que devem ser SUBSTITUÍDAS ao morrer
+        # (reciclagem de navegadores pesados, não redução de capacidade)
+        self.__threads_em_reciclagem: Dict[str, set] = {tipo: set() for tipo in self.tipos}
+        
+        # Reciclagem preventiva por idade/uso com reposição antecipada:
+        # {thread substituta: (tipo_job, thread antiga)} até a substituta ficar pronta
+        self.reciclagem = PoliticaReciclagem.from_config(config)
+        self.__substituicoes: Dict[threading.Thread, tuple] = {}
+        
+        # Monitor de memória (RSS dos navegadores + limite do cgroup)
+        memory_cfg = config.get("memory_settings", {})
+        self.monitor_memoria = MonitorMemoria.from_config(memory_cfg) if memory_cfg.get("enabled", True) else None
+        
+        # Reação a eventos das filas (Pub/Sub) em vez de sleeps fixos.
+        # Os intervalos abaixo viram apenas rede de segurança (ex: evento perdido).
+        event_cfg = config.get("event_settings", {})
+        self.eventos_habilitados = event_cfg.get("enabled", True)
+        self.ouvinte_eventos = None
+        self._evento_rebalancear = threading.Event()
+        self._evento_supervisao = threading.Event()
+        self._evento_parar = threading.Event()
+        if self.eventos_habilitados:
+            self.rebalance_interval = event_cfg.get("fallback_rebalance_seconds", 300)
+            self.intervalo_supervisao = event_cfg.get("supervision_timeout_seconds", 60)
+        else:
+            self.intervalo_supervisao = 10
         
         # Lock para operações thread-safe
         self.lock = threading.Lock()
@@ -464,20 +679,39 @@ class ThreadPoolManager:
         """
         Calcula quantas threads são necessárias para o tipo de job.
         
-        Fórmula: ceil(jobs_pendentes / jobs_per_thread_ratio)
+        Com autoscaler: ver AutoscalerPreditivo.decidir (inclui histerese, então
+        deve ser chamado uma vez por ciclo de rebalanceamento).
+        Legado: ceil(jobs_pendentes / jobs_per_thread_ratio)
         Mínimo: min_threads_per_type (configurável em thread_pool_settings) - SEMPRE respeitado
         Máximo: max_threads_per_type
+        Unificado: soma das filas, entre min_threads_per_type e max_total_threads
         """
+        if self._ocioso_para_zero():
+            # Nem a estimativa de chegadas do autoscaler segura navegadores ociosos
+            return 0
+        minimo = self.min_threads_per_type
+        if tipo_job == TIPO_UNIFICADO:
+            if self.autoscaler:
+                necessarias = sum(
+                    self.autoscaler.decidir(tipo, self._contar_jobs_pendentes(tipo)) for tipo in self.tipos_fila
+                )
+            else:
+                necessarias = ceil(self._contar_jobs_pendentes(tipo_job) / self.jobs_per_thread_ratio)
+            return max(minimo, min(necessarias, self.max_total_threads))
+        
         fila_key = f"fila:{tipo_job}"
         try:
             jobs_pendentes = self.redis_client.llen(fila_key)
             
+            if self.autoscaler:
+                return max(minimo, self.autoscaler.decidir(tipo_job, jobs_pendentes))
+            
             if jobs_pendentes == 0:
                 # Mesmo sem jobs, mantém o mínimo de threads configurado
-                return self.min_threads_per_type
+                return minimo
             
             threads_necessarias = ceil(jobs_pendentes / self.jobs_per_thread_ratio)
-            threads_necessarias = max(threads_necessarias, self.min_threads_per_type)
+            threads_necessarias = max(threads_necessarias, minimo)
             threads_necessarias = min(threads_necessarias, self.max_threads_per_type)
             
             return threads_necessarias
@@ -485,22 +719,183 @@ class ThreadPoolManager:
             logger.error(f"Erro ao contar jobs em fila:{tipo_job}: {e}")
             return self.min_threads_per_type  # Em caso de erro, retorna o mínimo
     
+    def _ocioso_para_zero(self) -> bool:
+        """Escala a zero habilitada e nenhum job há pelo menos scale_to_zero_idle_seconds."""
+        return (
+            self.escala_zero
+            and self._ocioso_desde is not None
+            and time.monotonic() - self._ocioso_desde >= self.ociosidade_para_zero
+        )
+    
+    def _minimo_threads(self) -> int:
+        """min_threads_per_type, ou 0 com o pool ocioso (ver _ocioso_para_zero)."""
+        return 0 if self._ocioso_para_zero() else self.min_threads_per_type
+    
+    def _jobs_em_processamento(self) -> int:
+        """Jobs nas listas de processamento dos workers (todas as filas)."""
+        total = 0
+        for tipo in self.tipos_fila:
+            for chave in self.redis_client.scan_iter(match=f"fila:{tipo}:processando:*"):
+                total += self.redis_client.llen(chave)
+        return total
+    
+    def _observar_ociosidade(self):
+        """Marca o início (ou o fim) do período sem nenhum job pendente ou em andamento."""
+        if not self.escala_zero:
+            return
+        try:
+            ocioso = self._contar_jobs_pendentes(TIPO_UNIFICADO) == 0 and self._jobs_em_processamento() == 0
+        except Exception as e:
+            logger.error(f"Erro ao verificar ociosidade: {e}")
+            ocioso = False
+        if not ocioso:
+            self._ocioso_desde = None
+        elif self._ocioso_desde is None:
+            self._ocioso_desde = time.monotonic()
+    
+    def _registrar_escala_zero(self, alocadas: Dict[str, int]):
+        """
+        Métricas da escala a zero: memória liberada ao zerar o pool e, ao sair
+        do zero, o tempo desligado (a partida a frio é medida em registrar_worker_pronto).
+        """
+        total = sum(alocadas.values())
+        if total == 0 and self._zerado_desde is None and self._contar_threads_vivas() > 0:
+            liberada = 0
+            if self.monitor_memoria:
+                liberada = sum(self.monitor_memoria.amostrar(forcar=True).values())
+            self._zerado_desde = time.monotonic()
+            metricas.incrementar("ociosidade", "escalas_a_zero")
+            metricas.definir("ociosidade", "memoria_liberada_bytes", liberada)
+            logger.warning(
+                f"[OCIOSO] Sem jobs há {self.ociosidade_para_zero}s. Liberando todos os navegadores "
+                f"(~{liberada // (1024 * 1024)} MB)."
+            )
+        elif total > 0 and self._zerado_desde is not None:
+            self._sair_da_escala_zero()
+    
+    def _sair_da_escala_zero(self):
+        """Trabalho chegou com o pool em zero: começa a medir a partida a frio."""
+        if self._zerado_desde is None:
+            return
+        metricas.observar("ociosidade", "tempo_zerado_s", time.monotonic() - self._zerado_desde)
+        metricas.definir("ociosidade", "memoria_liberada_bytes", 0)
+        self._zerado_desde = None
+        self._partida_fria_desde = time.monotonic()
+        logger.info("[OCIOSO] Trabalho chegou. Recriando navegadores (partida a frio).")
+    
+    def registrar_worker_pronto(self):
+        """
+        Chamada por executar_fluxo quando o worker termina o login e vai
+        consumir jobs; fecha a medição da partida a frio e a da capacidade
+        inicial, se houver. Se o worker substitui outro (reciclagem), o
+        antigo começa a ser drenado agora.
+        """
+        thread_atual = threading.current_thread()
+        if self.reciclagem:
+            self.reciclagem.nascer(thread_atual.name)
+        with self.lock:
+            inicio, self._partida_fria_desde = self._partida_fria_desde, None
+            if self._partida is not None:
+                self._partida["prontos"] += 1
+                self._verificar_capacidade_inicial()
+            substituicao = self.__substituicoes.pop(thread_atual, None)
+            if substituicao:
+                tipo_job, antiga = substituicao
+                if antiga.is_alive() and thread_atual not in self.__threads_marked_to_die[tipo_job]:
+                    logger.info(f"[RECICLAR] '{thread_atual.name}' pronta. Drenando '{antiga.name}'.")
+                    self._marcar_thread_para_morte(tipo_job, antiga)
+        if inicio is not None:
+            duracao = time.monotonic() - inicio
+            metricas.observar("ociosidade", "partida_fria_s", duracao)
+            logger.info(f"[OCIOSO] Partida a frio: primeiro worker pronto em {duracao:.1f}s.")
+    
+    def _verificar_capacidade_inicial(self):
+        """Com todos os workers da partida prontos, registra o tempo até a capacidade total (sob self.lock)."""
+        partida = self._partida
+        if partida["alvo"] is None or partida["prontos"] < partida["alvo"]:
+            return
+        duracao = time.monotonic() - partida["inicio"]
+        metricas.observar("partida", "capacidade_inicial_s", duracao)
+        logger.success(f"[PARTIDA] {partida['alvo']} worker(s) prontos em {duracao:.1f}s.")
+        self._partida = None
+    
+    def registrar_duracao_job(self, tipo_job: str, duracao: float):
+        """
+        Registra a duração de um job concluído.
+        
+        Chamada pelos workers ao final de cada job; alimenta a estimativa de
+        tempo de serviço do autoscaler e a política de reciclagem do worker.
+        """
+        if self.autoscaler:
+            self.autoscaler.registrar_servico(tipo_job, duracao)
+        if self.reciclagem:
+            self.reciclagem.registrar_job(threading.current_thread().name, tipo_job, duracao)
+            self._avaliar_reciclagem(threading.current_thread())
+    
+    def _avaliar_reciclagem(self, thread: threading.Thread):
+        """
+        Recicla o worker se a política pedir, com reposição antecipada.
+        
+        A substituta é criada já (pode passar de max_total_threads por até
+        'max_concurrent' navegadores durante a troca) e a thread antiga
+        continua consumindo jobs até a substituta ficar pronta (ver
+        registrar_worker_pronto). Sem folga de memória para o navegador extra,
+        a thread é drenada primeiro e reposta ao morrer, como na pressão de memória.
+        """
+        rss = self.monitor_memoria.memoria_workers.get(thread.name) if self.monitor_memoria else None
+        motivo = self.reciclagem.motivo(thread.name, rss)
+        if not motivo:
+            return
+        try:
+            with self.lock:
+                tipo_job = next((tipo for tipo, threads in self.threads.items() if thread in threads), None)
+                if tipo_job is None or not self.running:
+                    return
+                if thread in self.__threads_marked_to_die[tipo_job] or thread in self._threads_em_substituicao():
+                    return
+                if len(self.__substituicoes) >= self.reciclagem.max_simultaneas:
+                    return  # Avaliada de novo no próximo job
+                
+                if not self._cabe_na_memoria():
+                    self.reciclagem.registrar_reciclagem(thread.name, f"{motivo} (sem folga de memória: repõe ao encerrar)")
+                    self.__threads_em_reciclagem[tipo_job].add(thread)
+                    self._marcar_thread_para_morte(tipo_job, thread)
+                    return
+                
+                nova_thread = self.criar_thread_worker(tipo_job, f"{tipo_job}_worker_reciclado_{int(time.time())}")
+                if nova_thread:
+                    self.reciclagem.registrar_reciclagem(thread.name, motivo)
+                    self.__substituicoes[nova_thread] = (tipo_job, thread)
+                    nova_thread.start()
+                    self.threads[tipo_job].append(nova_thread)
+                    logger.success(f"[RECICLAR] Substituta '{nova_thread.name}' iniciada para '{thread.name}'.")
+        except Exception as e:
+            logger.error(f"Erro ao reciclar o worker '{thread.name}': {e}")
+    
+    def _threads_em_substituicao(self) -> set:
+        """Threads antigas cujas substitutas ainda estão subindo (sob self.lock)."""
+        return {antiga for _, antiga in self.__substituicoes.values()}
+    
     def _marcar_thread_para_morte(self, tipo_job: str, thread: threading.Thread):
         """
         Marca uma thread para ser encerrada graciosamente após terminar seu job atual.
         
-        A thread receberá um sinal via estrutura compartilhada e encerrará seu loop
+        A thread receberá um sinal via estrutura compartilhada e pelo seu token de
+        parada (percebido mesmo se estiver esperando na fila) e encerrará seu loop
         de consumo de jobs quando completar o job em execução.
         """
         try:
             self.__threads_marked_to_die[tipo_job].add(thread)
+            token = self.__tokens_parada.get(thread)
+            if token:
+                token.sinalizar()
             logger.info(
                 f"[DOWNSCALE] Thread '{thread.name}' marcada para morrer após completar job atual."
             )
         except Exception as e:
             logger.error(f"Erro ao marcar thread para morte: {e}")
     
-    def _matar_threads_excedentes(self, tipo_job: str):
+    def _matar_threads_excedentes(self, tipo_job: str, threads_necessarias: Optional[int] = None):
         """
         Marca threads excedentes para morte quando a demanda diminui.
         
@@ -512,6 +907,7 @@ class ThreadPoolManager:
         
         Args:
             tipo_job: Tipo de job ("conferencia" ou "emissao")
+            threads_necessarias: Alvo já calculado no ciclo atual (evita recalcular)
         """
         try:
             # Limpar threads já marcadas que morreram
@@ -520,12 +916,10 @@ class ThreadPoolManager:
             }
             
             # Threads que estão realmente vivas e NÃO estão marcadas para morte
-            threads_vivas_ativas = [
-                t for t in self.threads[tipo_job]
-                if t.is_alive() and t not in self.__threads_marked_to_die[tipo_job]
-            ]
+            threads_vivas_ativas = self._threads_ativas(tipo_job)
             
-            threads_necessarias = self.calcular_threads_necessarias(tipo_job)
+            if threads_necessarias is None:
+                threads_necessarias = self.calcular_threads_necessarias(tipo_job)
             threads_atuais = len(threads_vivas_ativas)
             
             if threads_necessarias < threads_atuais:
@@ -555,6 +949,9 @@ class ThreadPoolManager:
         """
         try:
             thread_atual = threading.current_thread()
+            token = self.__tokens_parada.get(thread_atual)
+            if token and token.is_set():
+                return True
             return thread_atual in self.__threads_marked_to_die.get(tipo_job, set())
         except Exception as e:
             logger.error(f"Erro ao verificar se thread deve morrer: {e}")
@@ -565,26 +962,204 @@ class ThreadPoolManager:
         if self.status_display:
             try:
                 with self.lock:
-                    self.status_display.atualizar_threads(
-                        "conferencia",
-                        len([t for t in self.threads["conferencia"] if t.is_alive()])
-                    )
-                    self.status_display.atualizar_threads(
-                        "emissao",
-                        len([t for t in self.threads["emissao"] if t.is_alive()])
-                    )
+                    for tipo_job in self.tipos:
+                        self.status_display.atualizar_threads(
+                            tipo_job,
+                            len([t for t in self.threads[tipo_job] if t.is_alive()])
+                        )
             except Exception as e:
                 logger.error(f"Erro ao atualizar status display: {e}")
     
+    def _contar_jobs_pendentes(self, tipo_job: str) -> int:
+        """Retorna o tamanho da fila do tipo (0 em caso de erro; unificado: soma das filas)."""
+        if tipo_job == TIPO_UNIFICADO:
+            return sum(self._contar_jobs_pendentes(tipo) for tipo in self.tipos_fila)
+        try:
+            return self.redis_client.llen(f"fila:{tipo_job}")
+        except Exception as e:
+            logger.error(f"Erro ao contar jobs em fila:{tipo_job}: {e}")
+            return 0
+    
+    def _peso_demanda(self, tipo_job: str, jobs_pendentes: int) -> float:
+        """Demanda ponderada (fila × tempo de serviço esperado) usada no orçamento global."""
+        if tipo_job == TIPO_UNIFICADO:
+            return sum(self._peso_demanda(tipo, self._contar_jobs_pendentes(tipo)) for tipo in self.tipos_fila)
+        if self.autoscaler:
+            return self.autoscaler.demanda_ponderada(tipo_job, jobs_pendentes)
+        return float(jobs_pendentes)
+    
+    def _threads_ativas(self, tipo_job: str) -> list:
+        """
+        Threads vivas do tipo que NÃO estão marcadas para morte. Uma thread
+        em reciclagem conta pela substituta, não por ela mesma.
+        """
+        em_substituicao = self._threads_em_substituicao()
+        return [
+            t for t in self.threads[tipo_job]
+            if t.is_alive() and t not in self.__threads_marked_to_die[tipo_job] and t not in em_substituicao
+        ]
+    
+    def _contar_threads_vivas(self) -> int:
+        """
+        Total de threads vivas (todos os tipos), incluindo as marcadas para morte:
+        enquanto não terminam, elas ainda ocupam um navegador.
+        """
+        return sum(1 for threads in self.threads.values() for t in threads if t.is_alive())
+    
+    def _tem_vaga_no_orcamento(self) -> bool:
+        """Indica se ainda cabe mais um navegador dentro de max_total_threads."""
+        return self._contar_threads_vivas() < self.max_total_threads
+    
+    def _desmarcar_threads(self, tipo_job: str, quantidade: int) -> int:
+        """
+        Cancela a morte de até `quantidade` threads marcadas que ainda estão vivas.
+        
+        Reaproveitar um navegador já logado é mais barato que abrir outro.
+        
+        Returns:
+            Quantas threads foram desmarcadas
+        """
+        marcadas_vivas = [t for t in self.__threads_marked_to_die[tipo_job] if t.is_alive()]
+        desmarcadas = 0
+        for thread in marcadas_vivas[:quantidade]:
+            self.__threads_marked_to_die[tipo_job].discard(thread)
+            token = self.__tokens_parada.get(thread)
+            if token:
+                token.cancelar()
+            desmarcadas += 1
+            logger.info(f"[ESCALAR] Thread '{thread.name}' desmarcada: volta a consumir jobs.")
+        return desmarcadas
+    
+    def registrar_navegador_worker(self, pid_driver: Optional[int]):
+        """
+        Associa a thread atual ao pid do driver do Playwright que ela abriu.
+        
+        Chamada por executar_fluxo após lançar o navegador; permite medir a
+        memória da árvore de processos de cada worker.
+        """
+        if self.monitor_memoria and pid_driver:
+            self.monitor_memoria.registrar_worker(threading.current_thread().name, pid_driver)
+    
+    def remover_navegador_worker(self):
+        """Remove a thread atual do monitor de memória (navegador fechado)."""
+        if self.monitor_memoria:
+            self.monitor_memoria.remover_worker(threading.current_thread().name)
+        if self.reciclagem:
+            self.reciclagem.esquecer(threading.current_thread().name)
+    
+    def _navegadores_sem_amostra(self) -> int:
+        """Threads vivas que ainda não registraram navegador (inicializando)."""
+        if not self.monitor_memoria:
+            return 0
+        registrados = set(self.monitor_memoria.pids_workers)
+        return sum(
+            1 for threads in self.threads.values() for t in threads
+            if t.is_alive() and t.name not in registrados
+        )
+    
+    def _cabe_na_memoria(self, navegadores_novos: int = 1) -> bool:
+        """Verifica se cabem mais navegadores, contando os que ainda estão subindo."""
+        if not self.monitor_memoria:
+            return True
+        return self.monitor_memoria.pode_escalar(self._navegadores_sem_amostra() + navegadores_novos)
+    
+    def _verificar_pressao_memoria(self):
+        """
+        Amostra a memória e, sob pressão, recicla o worker mais pesado.
+        
+        A thread é marcada para morrer após o job atual e é substituída por
+        uma nova (contexto limpo) em aguardar_encerramento. Apenas uma
+        reciclagem por vez, para não derrubar a capacidade.
+        """
+        if not self.monitor_memoria:
+            return
+        try:
+            self.monitor_memoria.amostrar()
+            if not self.monitor_memoria.sob_pressao():
+                return
+            
+            with self.lock:
+                if any(t.is_alive() for threads in self.__threads_em_reciclagem.values() for t in threads):
+                    return
+                
+                for nome in self.monitor_memoria.mais_pesados(len(self.monitor_memoria.memoria_workers)):
+                    for tipo_job, threads in self.threads.items():
+                        thread = next((t for t in threads if t.name == nome and t.is_alive()), None)
+                        if thread and thread not in self.__threads_marked_to_die[tipo_job]:
+                            status = self.monitor_memoria.obter_status()
+                            logger.warning(
+                                f"[MEMÓRIA] Container sob pressão ({status['uso_mb']}/{status['limite_mb']} MB). "
+                                f"Reciclando o worker mais pesado '{nome}' ({status['workers_mb'].get(nome)} MB)."
+                            )
+                            self.__threads_em_reciclagem[tipo_job].add(thread)
+                            self._marcar_thread_para_morte(tipo_job, thread)
+                            return
+        except Exception as e:
+            logger.error(f"Erro ao verificar pressão de memória: {e}")
+    
+    def notificar_mudanca_fila(self):
+        """
+        Chamado (após o debounce) quando o poller/watchdog publica um evento:
+        acorda o rebalanceamento, a supervisão e o display de status.
+        """
+        self._evento_rebalancear.set()
+        self._evento_supervisao.set()
+        if self.status_display:
+            self.status_display.notificar()
+    
+    def registrar_worker_pipeline(self):
+        """Chamado pelo worker que abriu um pipeline de abas: os kill signals dos seus jobs ficam com ele."""
+        self.__workers_pipeline.add(threading.current_thread())
+    
+    def _kill_fica_com_o_worker(self, signal: dict) -> bool:
+        """
+        True se o kill signal é de um job em uma aba de pipeline e deve ser
+        deixado para o worker (que cancela só aquela aba e segue com as outras).
+        
+        Se o worker não consumir o sinal em 'pipeline_kill_grace_seconds', a
+        thread inteira está travada: o sinal volta a ser do gerenciador, que a substitui.
+        """
+        worker = next(
+            (t for t in list(self.__workers_pipeline) if t.name == signal.get("worker_id") and t.is_alive()), None
+        )
+        if worker is None:
+            return False
+        try:
+            idade = (datetime.datetime.now() - datetime.datetime.fromisoformat(signal["timestamp"])).total_seconds()
+        except (KeyError, TypeError, ValueError):
+            idade = 0.0
+        if idade < self.prazo_kill_pipeline:
+            return True
+        logger.warning(
+            f"[KILL SIGNAL] '{worker.name}' não atendeu o kill signal do job '{signal.get('job_id')}' "
+            f"em {idade:.0f}s: a thread inteira está travada."
+        )
+        return False
+    
+    def obter_token_parada(self) -> Optional[TokenParada]:
+        """Token de parada da thread atual (usado pelo worker ao esperar jobs)."""
+        return self.__tokens_parada.get(threading.current_thread())
+    
+    def _executar_worker(self, nome_worker: str, worker_func: Callable):
+        """Alvo das threads: roda o worker e acorda a supervisão quando ele termina."""
+        try:
+            self.ejecutor_function(nome_worker, worker_func, self.config)
+        finally:
+            self.__tokens_parada.pop(threading.current_thread(), None)
+            self.__workers_pipeline.discard(threading.current_thread())
+            self._evento_supervisao.set()
+    
     def criar_thread_worker(self, tipo_job: str, nome_worker: str) -> threading.Thread:
         """Cria e retorna uma nova thread para executar o worker."""
         # Importa aqui para evitar imports circulares
         from workers.fluxo_conferencia import fluxo_conferencia_worker
         from workers.fluxo_verificar_emissao import fluxo_verificar_emissao_worker
+        from workers.fluxo_unificado import fluxo_unificado_worker
         
         worker_map = {
             "conferencia": fluxo_conferencia_worker,
             "emissao": fluxo_verificar_emissao_worker,
+            TIPO_UNIFICADO: fluxo_unificado_worker,
         }
         
         worker_func = worker_map.get(tipo_job)
@@ -593,11 +1168,12 @@ class ThreadPoolManager:
             return None
         
         thread = threading.Thread(
-            target=self.ejecutor_function,
-            args=(nome_worker, worker_func, self.config),
+            target=self._executar_worker,
+            args=(nome_worker, worker_func),
             daemon=True,
-            name=f"Worker-{tipo_job}-{len(self.threads[tipo_job])+1}"
+            name=f"Worker-{tipo_job}-{next(self.__numeracao[tipo_job])}"
         )
+        self.__tokens_parada[thread] = TokenParada()
         return thread
     
     def rebalancear_threads(self):
@@ -606,30 +1182,76 @@ class ThreadPoolManager:
         
         - Se jobs aumentam: cria novas threads
         - Se jobs diminuem: finaliza threads em excesso graciosamente
+        - A soma dos dois tipos respeita max_total_threads (orçamento global
+          de navegadores), dividido por demanda ponderada (ver distribuir_orcamento)
         """
+        tipos = list(self.tipos)
+        if self.monitor_memoria:
+            self.monitor_memoria.amostrar()
+        self._observar_ociosidade()
+        
         with self.lock:
-            for tipo_job in ["conferencia", "emissao"]:
-                threads_atuais = len(self.threads[tipo_job])
-                threads_necessarias = self.calcular_threads_necessarias(tipo_job)
-                
+            jobs_pendentes = {}
+            desejadas = {}
+            pesos = {}
+            for tipo_job in tipos:
                 # Limpa threads mortas
                 self.threads[tipo_job] = [t for t in self.threads[tipo_job] if t.is_alive()]
-                threads_atuais = len(self.threads[tipo_job])
                 
-                fila_key = f"fila:{tipo_job}"
-                jobs_pendentes = self.redis_client.llen(fila_key)
+                desejadas[tipo_job] = self.calcular_threads_necessarias(tipo_job)
+                jobs_pendentes[tipo_job] = self._contar_jobs_pendentes(tipo_job)
+                pesos[tipo_job] = self._peso_demanda(tipo_job, jobs_pendentes[tipo_job])
+            
+            alocadas = distribuir_orcamento(
+                desejadas, pesos, self.max_total_threads, minimo=self._minimo_threads()
+            )
+            self._registrar_escala_zero(alocadas)
+            if alocadas != desejadas:
+                logger.info(
+                    f"[ORÇAMENTO] Demanda {desejadas} excede {self.max_total_threads} navegadores. "
+                    f"Alocação por peso: {alocadas}"
+                )
+            
+            # Reduções primeiro, para liberar orçamento antes de criar threads
+            for tipo_job in sorted(tipos, key=lambda t: alocadas[t] - len(self._threads_ativas(t))):
+                threads_necessarias = alocadas[tipo_job]
+                threads_atuais = len(self._threads_ativas(tipo_job))
                 
                 if threads_necessarias > threads_atuais:
-                    # ESCALAR: Criar novas threads
+                    # ESCALAR: reaproveita threads marcadas que ainda não morreram
                     diferenca = threads_necessarias - threads_atuais
-                    logger.info(
-                        f"[ESCALAR] {tipo_job}: {jobs_pendentes} jobs → "
-                        f"criando {diferenca} thread(s) (total: {threads_atuais} → {threads_necessarias})"
-                    )
+                    diferenca -= self._desmarcar_threads(tipo_job, diferenca)
+                    
+                    if diferenca > 0 and not self._cabe_na_memoria():
+                        logger.warning(
+                            f"[MEMÓRIA] {tipo_job}: +{diferenca} thread(s) necessárias, mas a memória do container "
+                            f"está no limite de segurança. Escalonamento adiado."
+                        )
+                        diferenca = 0
+                    
+                    vagas = self.max_total_threads - self._contar_threads_vivas()
+                    if diferenca > vagas:
+                        logger.warning(
+                            f"[ORÇAMENTO] {tipo_job}: precisa de +{diferenca} thread(s), mas só há "
+                            f"{max(vagas, 0)} vaga(s) até threads em encerramento liberarem navegadores."
+                        )
+                        diferenca = max(vagas, 0)
+                    
+                    if diferenca > 0:
+                        logger.info(
+                            f"[ESCALAR] {tipo_job}: {jobs_pendentes[tipo_job]} jobs → "
+                            f"criando {diferenca} thread(s) (total: {threads_atuais} → {threads_necessarias})"
+                        )
                     
                     for i in range(diferenca):
+                        if i > 0 and not self._cabe_na_memoria():
+                            logger.warning(
+                                f"[MEMÓRIA] {tipo_job}: escalonamento interrompido após {i} thread(s) "
+                                f"(limite de segurança de memória)."
+                            )
+                            break
                         try:
-                            thread_num = threads_atuais + i + 1
+                            thread_num = len(self.threads[tipo_job]) + 1
                             nome_worker = f"{tipo_job}_worker_{thread_num}"
                             nova_thread = self.criar_thread_worker(tipo_job, nome_worker)
                             
@@ -647,36 +1269,49 @@ class ThreadPoolManager:
                     # DOWNSCALE: Marcar threads excedentes para morte graceful
                     diferenca = threads_atuais - threads_necessarias
                     logger.warning(
-                        f"[DOWNSCALE] {tipo_job}: {jobs_pendentes} jobs → "
+                        f"[DOWNSCALE] {tipo_job}: {jobs_pendentes[tipo_job]} jobs → "
                         f"marcando {diferenca} thread(s) para morrer (total: {threads_atuais} → {threads_necessarias})"
                     )
-                    self._matar_threads_excedentes(tipo_job)
+                    self._matar_threads_excedentes(tipo_job, threads_necessarias)
                 
                 else:
                     # Sem mudança
                     if threads_atuais > 0:
                         logger.debug(
-                            f"[EQUILIBRIO] {tipo_job}: {jobs_pendentes} jobs → "
+                            f"[EQUILIBRIO] {tipo_job}: {jobs_pendentes[tipo_job]} jobs → "
                             f"{threads_atuais} thread(s) ativa(s). Sem mudanças."
                         )
         
+        if self.autoscaler:
+            logger.debug(f"[Autoscaler] Estimativas: {self.autoscaler.obter_estimativas()}")
+        
+        # Memória: recicla navegadores pesados se o container estiver sob pressão
+        self._verificar_pressao_memoria()
+        if self.monitor_memoria:
+            logger.debug(f"[Memória] {self.monitor_memoria.obter_status()}")
+        
+        # Publica métricas (memória por worker etc.) no Redis
+        metricas.publicar(self.redis_client)
+        
         # Atualizar display de status após rebalanceamento
         self._atualizar_status_display()
     
     def monitorar_rebalanceamento(self):
         """
-        Loop que monitora periodicamente e rebalanceia threads.
-        Roda em sua própria thread daemon.
+        Loop que rebalanceia threads a cada evento de fila (ou, na falta de
+        eventos, a cada rebalance_interval). Roda em sua própria thread daemon.
         """
         logger.info(
             f"Monitor de rebalanceamento iniciado. "
-            f"Verificando a cada {self.rebalance_interval}s. "
+            f"{'Reagindo a eventos das filas; ' if self.eventos_habilitados else ''}"
+            f"Verificando no máximo a cada {self.rebalance_interval}s. "
             f"Limites: {self.max_threads_per_type} por tipo, {self.max_total_threads} total."
         )
         
         while self.running:
             try:
-                time.sleep(self.rebalance_interval)
+                self._evento_rebalancear.wait(timeout=self.rebalance_interval)
+                self._evento_rebalancear.clear()
                 
                 if not self.running:
                     break
@@ -686,23 +1321,47 @@ class ThreadPoolManager:
             except Exception as e:
                 logger.error(f"Erro no monitor de rebalanceamento: {e}")
     
+    def monitorar_jobs_orfaos(self):
+        """
+        Loop que devolve às filas os jobs de workers mortos (heartbeat expirado),
+        inclusive os deixados por uma execução anterior do container.
+        """
+        logger.info(f"Recuperação de jobs órfãos iniciada (a cada {self.intervalo_recuperacao}s).")
+        while not self._evento_parar.wait(timeout=self.intervalo_recuperacao):
+            try:
+                recuperados = recuperar_jobs_orfaos(
+                    self.redis_client, [f"fila:{tipo_job}" for tipo_job in self.tipos_fila], self.max_tentativas_job
+                )
+                if recuperados:
+                    self.notificar_mudanca_fila()
+            except Exception as e:
+                logger.error(f"Erro ao recuperar jobs órfãos: {e}")
+    
     def iniciar(self):
         """Inicia o gerenciador de thread pool."""
         logger.info("Iniciando ThreadPoolManager...")
         
-        # Cria threads iniciais (SEMPRE 1 de cada tipo, independente de jobs)
+        # Dimensiona o pool já pela profundidade atual das filas: um reinício no meio
+        # de um backlog sobe todos os workers de uma vez (em paralelo, com os logins
+        # espaçados), sem esperar o primeiro ciclo de rebalanceamento
+        self._partida = {"inicio": time.monotonic(), "alvo": None, "prontos": 0}
+        self.rebalancear_threads()
         with self.lock:
-            for tipo_job in ["conferencia", "emissao"]:
-                try:
-                    nome_worker = f"{tipo_job}_worker_1"
-                    nova_thread = self.criar_thread_worker(tipo_job, nome_worker)
-                    
-                    if nova_thread:
-                        nova_thread.start()
-                        self.threads[tipo_job].append(nova_thread)
-                        logger.success(f"Thread inicial '{nova_thread.name}' iniciada.")
-                except Exception as e:
-                    logger.error(f"Erro ao criar thread inicial de {tipo_job}: {e}")
+            self._partida["alvo"] = self._contar_threads_vivas()
+            logger.info(f"[PARTIDA] {self._partida['alvo']} worker(s) iniciados pela fila atual.")
+            self._verificar_capacidade_inicial()
+        
+        # Escuta eventos das filas (poller/watchdog) para reagir em segundos
+        if self.eventos_habilitados:
+            event_cfg = self.config.get("event_settings", {})
+            self.ouvinte_eventos = OuvinteEventosFila(
+                self.redis_client,
+                callback=self.notificar_mudanca_fila,
+                canal=self.config.get("redis_settings", {}).get("events_channel", CANAL_EVENTOS_PADRAO),
+                debounce=event_cfg.get("debounce_seconds", 2),
+                keyspace_notifications=event_cfg.get("use_keyspace_notifications", False),
+            )
+            self.ouvinte_eventos.iniciar()
         
         # Inicia thread de monitoramento
         thread_monitor = threading.Thread(
@@ -711,6 +1370,8 @@ class ThreadPoolManager:
             name="ThreadPoolMonitor"
         )
         thread_monitor.start()
+        
+        threading.Thread(target=self.monitorar_jobs_orfaos, daemon=True, name="RecuperadorJobs").start()
         logger.success("ThreadPoolManager iniciado com sucesso.")
     
     def aguardar_encerramento(self):
@@ -726,8 +1387,11 @@ class ThreadPoolManager:
             # Verificar kill signals pendentes e criar threads de reposição
             self._processar_kill_signals()
             
+            # Verificar pressão de memória (amostragem limitada por sample_interval_seconds)
+            self._verificar_pressao_memoria()
+            
             with self.lock:
-                for tipo_job in ["conferencia", "emissao"]:
+                for tipo_job in self.tipos:
                     # Separar threads vivas de mortas
                     threads_vivas = []
                     threads_mortas_inesperadamente = []
@@ -737,7 +1401,27 @@ class ThreadPoolManager:
                             threads_vivas.append(t)
                         else:
                             # Thread morreu - verificar se foi intencional (downscaling)
-                            if t in self.__threads_marked_to_die[tipo_job]:
+                            if t in self.__substituicoes:
+                                # Substituta não chegou a ficar pronta: a thread antiga segue atendendo
+                                _, antiga = self.__substituicoes.pop(t)
+                                logger.warning(
+                                    f"[RECICLAR] Substituta '{t.name}' morreu antes de ficar pronta. "
+                                    f"'{antiga.name}' continua em serviço."
+                                )
+                            elif t in self._threads_em_substituicao():
+                                # Thread antiga morreu durante a troca: a substituta já é a reposição
+                                self.__substituicoes = {
+                                    nova: par for nova, par in self.__substituicoes.items() if par[1] is not t
+                                }
+                                self.__threads_marked_to_die[tipo_job].discard(t)
+                                logger.info(f"[RECICLAR] Thread '{t.name}' encerrada; a substituta assume.")
+                            elif t in self.__threads_em_reciclagem[tipo_job]:
+                                # Reciclagem por memória - substituir por um navegador novo
+                                self.__threads_em_reciclagem[tipo_job].discard(t)
+                                self.__threads_marked_to_die[tipo_job].discard(t)
+                                threads_mortas_inesperadamente.append(t)
+                                logger.info(f"[RECICLAR] Thread '{t.name}' encerrada para liberar memória. Substituindo...")
+                            elif t in self.__threads_marked_to_die[tipo_job]:
                                 # Morte intencional (downscaling) - remover do registro e NÃO recriar
                                 self.__threads_marked_to_die[tipo_job].discard(t)
                                 logger.info(
@@ -768,13 +1452,14 @@ class ThreadPoolManager:
                     
                     # Verifica se precisa criar mais threads por falta
                     threads_atuais = len(threads_vivas)
-                    fila_key = f"fila:{tipo_job}"
                     
                     try:
-                        jobs_pendentes = self.redis_client.llen(fila_key)
+                        jobs_pendentes = self._contar_jobs_pendentes(tipo_job)
                         
-                        # Se tem jobs mas 0 threads, cria pelo menos 1
-                        if threads_atuais == 0 and jobs_pendentes > 0:
+                        # Se tem jobs mas 0 threads, cria pelo menos 1 (se couber no orçamento)
+                        if threads_atuais == 0 and jobs_pendentes > 0 and self._tem_vaga_no_orcamento():
+                            self._ocioso_desde = None
+                            self._sair_da_escala_zero()
                             logger.info(
                                 f"[RECRIAR] {tipo_job}: 0 threads mas {jobs_pendentes} jobs. "
                                 f"Criando thread de recuperação..."
@@ -816,7 +1501,9 @@ class ThreadPoolManager:
                     )
             
             logger.debug(f"{threads_total} thread(s) ativa(s)...")
-            time.sleep(10)
+            # Acorda quando um worker termina ou chega evento de fila/kill signal
+            self._evento_supervisao.wait(timeout=self.intervalo_supervisao)
+            self._evento_supervisao.clear()
     
     def _processar_kill_signals(self):
         """
@@ -835,7 +1522,11 @@ class ThreadPoolManager:
             for signal_json in kill_signals:
                 try:
                     signal = json.loads(signal_json)
+                    if self._kill_fica_com_o_worker(signal):
+                        continue  # O worker do pipeline interrompe só a aba do job
                     tipo_job = signal.get("tipo", "conferencia")
+                    if self.modo_unificado:
+                        tipo_job = TIPO_UNIFICADO
                     job_id = signal.get("job_id", "desconhecido")
                     
                     logger.warning(
@@ -843,8 +1534,18 @@ class ThreadPoolManager:
                         f"Criando thread de substituição..."
                     )
                     
-                    # Criar uma nova thread imediatamente (não espera a antiga morrer)
+                    # Criar uma nova thread imediatamente (não espera a antiga morrer),
+                    # desde que caiba no orçamento global de navegadores
                     with self.lock:
+                        if not self._tem_vaga_no_orcamento():
+                            logger.warning(
+                                f"[ORÇAMENTO] Sem vaga para substituir o worker travado de {tipo_job} "
+                                f"({self.max_total_threads} navegadores em uso). "
+                                f"A reposição ocorrerá quando a thread travada morrer."
+                            )
+                            self.redis_client.srem("watchdog:kill_workers", signal_json)
+                            continue
+                        
                         nome_worker = f"{tipo_job}_worker_replace_{int(time.time())}"
                         nova_thread = self.criar_thread_worker(tipo_job, nome_worker)
                         
@@ -869,7 +1570,40 @@ class ThreadPoolManager:
             logger.error(f"Erro ao verificar kill signals: {e}")
     
     def parar(self):
-        """Para o gerenciador (sinaliza o fim, threads daemon encerram com a app)."""
+        """
+        Para o gerenciador e drena os workers: sinaliza o token de parada de
+        todas as threads (as ociosas acordam na hora; as ocupadas terminam o job
+        atual) e aguarda até shutdown_timeout_seconds para que fechem seus
+        navegadores.
+        """
         logger.info("Parando ThreadPoolManager...")
         self.running = False
-        logger.info("ThreadPoolManager parado. Threads daemon encerrarão com a aplicação.")
\ No newline at end of file
+        self._evento_parar.set()
+        if self.ouvinte_eventos:
+            self.ouvinte_eventos.parar()
+        self._evento_rebalancear.set()
+        self._evento_supervisao.set()
+        
+        with self.lock:
+            threads_vivas = [t for threads in self.threads.values() for t in threads if t.is_alive()]
+            for thread in threads_vivas:
+                token = self.__tokens_parada.get(thread)
+                if token:
+                    token.sinalizar()
+        
+        logger.info(
+            f"Aguardando {len(threads_vivas)} worker(s) encerrarem "
+            f"(até {self.timeout_encerramento}s)..."
+        )
+        prazo = time.monotonic() + self.timeout_encerramento
+        for thread in threads_vivas:
+            thread.join(timeout=max(0, prazo - time.monotonic()))
+        
+        restantes = [t.name for t in threads_vivas if t.is_alive()]
+        if restantes:
+            logger.warning(
+                f"ThreadPoolManager parado com {len(restantes)} worker(s) ainda ativos: {restantes}. "
+                f"Threads daemon encerrarão com a aplicação."
+            )
+        else:
+            logger.info("ThreadPoolManager parado. Todos os workers encerraram e fecharam seus navegadores.")
\ No newline at end of file
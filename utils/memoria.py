@@ -0,0 +1,276 @@
+"""
+Monitor de memória dos navegadores e do container.
+
+Cada worker roda seu próprio driver do Playwright, que por sua vez abre o
+Firefox (vários processos). O monitor soma a memória da árvore de processos
+de cada worker (PSS quando disponível, senão RSS) e lê o limite/uso do cgroup
+do container para decidir se ainda cabe mais um navegador.
+
+Lê apenas /proc e /sys/fs/cgroup (Linux / Docker); fora disso as leituras
+retornam None e o monitor não bloqueia o escalonamento.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from utils.metricas import metricas
+
+CGROUP_RAIZ = "/sys/fs/cgroup"
+PROC_RAIZ = "/proc"
+
+# Limites "infinitos" reportados pelo cgroup v1 quando não há limite
+_LIMITE_V1_SEM_LIMITE = 1 << 60
+
+
+def _ler_inteiro(caminho: str) -> Optional[int]:
+    try:
+        with open(caminho, "r") as f:
+            valor = f.read().strip()
+        if valor == "max":
+            return None
+        return int(valor)
+    except (OSError, ValueError):
+        return None
+
+
+def ler_limite_cgroup(raiz: str = CGROUP_RAIZ) -> Optional[int]:
+    """Limite de memória do container em bytes (None se não houver limite)."""
+    limite = _ler_inteiro(os.path.join(raiz, "memory.max"))  # cgroup v2
+    if limite is None:
+        limite = _ler_inteiro(os.path.join(raiz, "memory", "memory.limit_in_bytes"))  # cgroup v1
+    if limite is None or limite >= _LIMITE_V1_SEM_LIMITE:
+        return None
+    return limite
+
+
+def _ler_inactive_file(caminho_stat: str) -> int:
+    try:
+        with open(caminho_stat, "r") as f:
+            for linha in f:
+                chave, _, valor = linha.partition(" ")
+                if chave in ("inactive_file", "total_inactive_file"):
+                    return int(valor)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def ler_uso_cgroup(raiz: str = CGROUP_RAIZ) -> Optional[int]:
+    """
+    Uso de memória do container em bytes, descontando cache de arquivos
+    inativo (mesmo critério do `docker stats`).
+    """
+    uso = _ler_inteiro(os.path.join(raiz, "memory.current"))
+    if uso is not None:
+        return uso - _ler_inactive_file(os.path.join(raiz, "memory.stat"))
+
+    uso = _ler_inteiro(os.path.join(raiz, "memory", "memory.usage_in_bytes"))
+    if uso is not None:
+        return uso - _ler_inactive_file(os.path.join(raiz, "memory", "memory.stat"))
+    return None
+
+
+def _mapa_filhos(proc: str = PROC_RAIZ) -> Dict[int, List[int]]:
+    """Monta {ppid: [pids filhos]} a partir de /proc/<pid>/stat."""
+    filhos: Dict[int, List[int]] = {}
+    try:
+        entradas = os.listdir(proc)
+    except OSError:
+        return filhos
+
+    for entrada in entradas:
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc, entrada, "stat"), "r") as f:
+                stat = f.read()
+            # O nome do processo pode conter espaços: o ppid vem após o último ')'
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+            filhos.setdefault(ppid, []).append(int(entrada))
+        except (OSError, ValueError, IndexError):
+            continue
+    return filhos
+
+
+def listar_arvore(pid_raiz: int, proc: str = PROC_RAIZ, mapa_filhos: Optional[Dict[int, List[int]]] = None) -> List[int]:
+    """Retorna o pid raiz e todos os seus descendentes."""
+    mapa_filhos = mapa_filhos if mapa_filhos is not None else _mapa_filhos(proc)
+    arvore, pendentes = [], [pid_raiz]
+    while pendentes:
+        pid = pendentes.pop()
+        arvore.append(pid)
+        pendentes.extend(mapa_filhos.get(pid, []))
+    return arvore
+
+
+def medir_processo(pid: int, proc: str = PROC_RAIZ) -> int:
+    """Memória de um processo em bytes: PSS (smaps_rollup) ou, na falta, VmRSS."""
+    for arquivo, chave in (("smaps_rollup", "Pss:"), ("status", "VmRSS:")):
+        try:
+            with open(os.path.join(proc, str(pid), arquivo), "r") as f:
+                for linha in f:
+                    if linha.startswith(chave):
+                        return int(linha.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            continue
+    return 0
+
+
+def medir_arvore(pid_raiz: int, proc: str = PROC_RAIZ, mapa_filhos: Optional[Dict[int, List[int]]] = None) -> int:
+    """Memória total (bytes) da árvore de processos de um worker."""
+    return sum(medir_processo(pid, proc) for pid in listar_arvore(pid_raiz, proc, mapa_filhos))
+
+
+class MonitorMemoria:
+    """
+    Amostra a memória dos navegadores por worker e do container.
+
+    Uso:
+        monitor = MonitorMemoria.from_config(config.get("memory_settings", {}))
+        monitor.registrar_worker("Worker-emissao-1", pid_driver)
+        monitor.amostrar()
+        if monitor.pode_escalar(navegadores_novos=1): ...
+        if monitor.sob_pressao(): monitor.mais_pesados(1)
+    """
+
+    def __init__(
+        self,
+        margem_seguranca: float = 0.15,
+        limiar_reciclagem: float = 0.90,
+        estimativa_navegador_bytes: int = 450 * 1024 * 1024,
+        intervalo_amostragem: float = 30,
+        cgroup_raiz: str = CGROUP_RAIZ,
+        proc_raiz: str = PROC_RAIZ,
+    ):
+        """
+        Args:
+            margem_seguranca: Fração do limite do container que nunca deve ser usada (0-1)
+            limiar_reciclagem: Fração do limite a partir da qual os contextos mais pesados são reciclados
+            estimativa_navegador_bytes: Memória esperada de um navegador novo (antes de haver amostras)
+            intervalo_amostragem: Intervalo mínimo entre duas leituras de /proc (s)
+        """
+        self.margem_seguranca = margem_seguranca
+        self.limiar_reciclagem = limiar_reciclagem
+        self.estimativa_navegador_bytes = estimativa_navegador_bytes
+        self.intervalo_amostragem = intervalo_amostragem
+        self.cgroup_raiz = cgroup_raiz
+        self.proc_raiz = proc_raiz
+
+        self.lock = threading.Lock()
+        self.pids_workers: Dict[str, int] = {}       # {nome_thread: pid raiz}
+        self.memoria_workers: Dict[str, int] = {}    # {nome_thread: bytes}
+        self.limite: Optional[int] = None
+        self.uso: Optional[int] = None
+        self.ultima_amostra = 0.0
+
+    @classmethod
+    def from_config(cls, memory_cfg: dict):
+        """Cria o monitor a partir da seção 'memory_settings' do config.json."""
+        return cls(
+            margem_seguranca=memory_cfg.get("safety_margin", 0.15),
+            limiar_reciclagem=memory_cfg.get("recycle_threshold", 0.90),
+            estimativa_navegador_bytes=int(memory_cfg.get("default_browser_mb", 450) * 1024 * 1024),
+            intervalo_amostragem=memory_cfg.get("sample_interval_seconds", 30),
+        )
+
+    def registrar_worker(self, nome_worker: str, pid_raiz: int):
+        """Associa a thread do worker ao pid raiz de seus processos de navegador."""
+        with self.lock:
+            self.pids_workers[nome_worker] = pid_raiz
+        logger.debug(f"[Memória] Worker '{nome_worker}' registrado (pid raiz {pid_raiz}).")
+
+    def remover_worker(self, nome_worker: str):
+        """Esquece um worker encerrado."""
+        with self.lock:
+            self.pids_workers.pop(nome_worker, None)
+            self.memoria_workers.pop(nome_worker, None)
+        metricas.remover("memoria_workers", nome_worker)
+
+    def amostrar(self, forcar: bool = False) -> Dict[str, int]:
+        """Lê a memória de cada worker e do container (respeitando o intervalo)."""
+        agora = time.monotonic()
+        if not forcar and agora - self.ultima_amostra < self.intervalo_amostragem:
+            return dict(self.memoria_workers)
+
+        with self.lock:
+            pids = dict(self.pids_workers)
+
+        mapa_filhos = _mapa_filhos(self.proc_raiz)
+        medidas = {nome: medir_arvore(pid, self.proc_raiz, mapa_filhos) for nome, pid in pids.items()}
+        limite = ler_limite_cgroup(self.cgroup_raiz)
+        uso = ler_uso_cgroup(self.cgroup_raiz)
+
+        with self.lock:
+            self.memoria_workers = medidas
+            self.limite = limite
+            self.uso = uso
+            self.ultima_amostra = agora
+
+        for nome, bytes_usados in medidas.items():
+            metricas.definir("memoria_workers", nome, bytes_usados)
+        if limite is not None:
+            metricas.definir("memoria_container", "limite_bytes", limite)
+        if uso is not None:
+            metricas.definir("memoria_container", "uso_bytes", uso)
+        metricas.definir("memoria_container", "navegadores_bytes", sum(medidas.values()))
+        metricas.definir("memoria_container", "estimativa_por_navegador_bytes", self.estimativa_por_navegador())
+        return medidas
+
+    def estimativa_por_navegador(self) -> int:
+        """Média observada por worker, ou a estimativa configurada se não houver amostras."""
+        with self.lock:
+            valores = [v for v in self.memoria_workers.values() if v > 0]
+        if not valores:
+            return self.estimativa_navegador_bytes
+        return int(sum(valores) / len(valores))
+
+    def pode_escalar(self, navegadores_novos: int = 1) -> bool:
+        """
+        Indica se ainda cabem `navegadores_novos` sem ultrapassar
+        limite × (1 - margem_seguranca). Sem cgroup/limite, sempre True.
+        """
+        if self.limite is None or self.uso is None:
+            return True
+        projetado = self.uso + navegadores_novos * self.estimativa_por_navegador()
+        return projetado <= self.limite * (1 - self.margem_seguranca)
+
+    def sob_pressao(self) -> bool:
+        """Uso do container acima do limiar de reciclagem."""
+        if self.limite is None or self.uso is None:
+            return False
+        return self.uso >= self.limite * self.limiar_reciclagem
+
+    def mais_pesados(self, quantidade: int = 1) -> List[str]:
+        """Nomes dos workers com maior consumo de memória (do maior para o menor)."""
+        with self.lock:
+            ordenados = sorted(self.memoria_workers.items(), key=lambda item: item[1], reverse=True)
+        return [nome for nome, _ in ordenados[:quantidade]]
+
+    def obter_status(self) -> dict:
+        """Resumo atual (útil para logs/APIs)."""
+        mb = 1024 * 1024
+        with self.lock:
+            return {
+                "limite_mb": round(self.limite / mb) if self.limite else None,
+                "uso_mb": round(self.uso / mb) if self.uso is not None else None,
+                "workers_mb": {nome: round(v / mb) for nome, v in self.memoria_workers.items()},
+            }
+
+
+def obter_pid_driver(playwright) -> Optional[int]:
+    """
+    Pid do processo driver de uma instância sync_playwright().
+
+    O Firefox é filho desse processo, então a árvore a partir dele contém
+    todos os processos de navegador do worker. Usa atributos internos do
+    Playwright; em caso de mudança de versão retorna None (sem métrica).
+    """
+    try:
+        return playwright._impl_obj._connection._transport._proc.pid
+    except AttributeError:
+        logger.debug("[Memória] Não foi possível obter o pid do driver do Playwright.")
+        return None
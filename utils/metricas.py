@@ -0,0 +1,83 @@
+"""
+Registro de métricas do processo de workers.
+
+As métricas ficam em memória (thread-safe) e são publicadas periodicamente
+no Redis pelo ThreadPoolManager, uma hash por grupo:
+
+    metricas:<grupo>  →  {campo: valor, ...}
+
+Assim qualquer ferramenta (redis-cli, dashboard, script de sizing) consegue
+ler os números sem depender de logs.
+
+Uso:
+    from utils.metricas import metricas
+
+    metricas.incrementar("navegacoes_evitadas", "conferencia_worker_1")
+    metricas.definir("memoria_workers", "Worker-emissao-1", 412_000_000)
+    metricas.observar("esperas", "obter_status_lt", 1.7)   # n / soma / max
+"""
+
+import threading
+from typing import Dict, Optional
+
+from loguru import logger
+
+
+class RegistroMetricas:
+    """Contadores, valores instantâneos e observações agrupados por nome."""
+
+    def __init__(self, prefixo: str = "metricas"):
+        self.prefixo = prefixo
+        self.lock = threading.Lock()
+        self.grupos: Dict[str, Dict[str, float]] = {}
+
+    def incrementar(self, grupo: str, campo: str, valor: float = 1):
+        """Soma `valor` ao contador `campo` do grupo."""
+        with self.lock:
+            dados = self.grupos.setdefault(grupo, {})
+            dados[campo] = dados.get(campo, 0) + valor
+
+    def definir(self, grupo: str, campo: str, valor: float):
+        """Define o valor instantâneo (gauge) de `campo`."""
+        with self.lock:
+            self.grupos.setdefault(grupo, {})[campo] = valor
+
+    def remover(self, grupo: str, campo: str):
+        """Remove um campo (ex: worker que foi encerrado)."""
+        with self.lock:
+            self.grupos.get(grupo, {}).pop(campo, None)
+
+    def observar(self, grupo: str, campo: str, valor: float):
+        """Registra uma observação (ex: duração), mantendo contagem, soma e máximo."""
+        with self.lock:
+            dados = self.grupos.setdefault(grupo, {})
+            dados[f"{campo}:n"] = dados.get(f"{campo}:n", 0) + 1
+            dados[f"{campo}:soma"] = dados.get(f"{campo}:soma", 0) + valor
+            dados[f"{campo}:max"] = max(dados.get(f"{campo}:max", valor), valor)
+
+    def obter(self, grupo: Optional[str] = None) -> Dict:
+        """Retorna uma cópia das métricas (de um grupo ou de todos)."""
+        with self.lock:
+            if grupo is not None:
+                return dict(self.grupos.get(grupo, {}))
+            return {nome: dict(dados) for nome, dados in self.grupos.items()}
+
+    def publicar(self, redis_client):
+        """Grava todas as métricas no Redis (uma hash por grupo)."""
+        snapshot = self.obter()
+        if not snapshot:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for grupo, dados in snapshot.items():
+                chave = f"{self.prefixo}:{grupo}"
+                pipe.delete(chave)
+                if dados:
+                    pipe.hset(chave, mapping={campo: round(valor, 3) for campo, valor in dados.items()})
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"[Métricas] Erro ao publicar métricas no Redis: {e}")
+
+
+# Instância única compartilhada pelo processo
+metricas = RegistroMetricas()
@@ -0,0 +1,247 @@
+"""
+Pipeline de jobs em várias abas do mesmo contexto (mesma sessão logada).
+
+Um worker passa boa parte do job esperando o portal (resultado da pesquisa,
+formulário, envio). Com o pipeline, o worker abre K abas no seu contexto e
+cada aba fica com um job; enquanto a aba A espera o resultado da pesquisa,
+a aba B preenche o filtro.
+
+A API síncrona do Playwright só pode ser usada pela thread que a criou, então
+as abas não rodam em threads separadas. Cada job é um gerador que devolve o
+controle logo depois de disparar algo demorado no navegador:
+
+    def etapas(page, job):
+        disparar_pesquisa(page, job)                     # clica em Pesquisar
+        yield Pendencia("pesquisa", pronta=lambda: ...)  # o navegador trabalha; a thread segue
+        concluir_pesquisa(page, job)
+        ...
+
+O `PipelinePaginas` avança os jobs cujas pendências já se resolveram e, se
+nenhum puder avançar, espera uma fatia curta em uma das abas (o que também
+entrega à thread os eventos do navegador, como as respostas capturadas).
+Sem pipeline, `executar_etapas` roda o mesmo gerador do começo ao fim na
+própria aba, esperando cada pendência.
+
+Config ('pipeline_settings'):
+    "enabled": false,
+    "pages_per_context": 3,        # jobs simultâneos por contexto (= abas)
+    "max_pages_per_context": 6,    # teto, qualquer que seja o valor acima
+    "poll_slice_ms": 100
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+from loguru import logger
+from playwright.sync_api import Page
+
+from utils.esperas import medir_espera
+from utils.metricas import metricas
+
+
+class JobCancelado(Exception):
+    """
+    Lançada dentro do gerador do job quando o pipeline o interrompe.
+
+    O job ainda não terminou: o gerador deve devolvê-lo à fila (não confirmar).
+    `falha` indica que o próprio job foi a causa (ex: kill signal do watchdog).
+    """
+
+    def __init__(self, motivo: str = "", falha: bool = False):
+        super().__init__(motivo)
+        self.falha = falha
+
+
+@dataclass
+class Pendencia:
+    """Algo que o navegador está fazendo por um job; o job só continua quando `pronta()`."""
+
+    etapa: str
+    pronta: Optional[Callable[[], bool]] = None   # None: só cede a vez uma rodada
+    prazo: float = 20.0                           # Segundos; depois disso o job continua assim mesmo
+
+    def resolvida(self, desde: float) -> bool:
+        if self.pronta is None or time.monotonic() - desde >= self.prazo:
+            return True
+        try:
+            return bool(self.pronta())
+        except Exception as e:
+            logger.trace(f"[Pipeline] Condição de '{self.etapa}' falhou: {e}")
+            return False
+
+    def aguardar(self, page: Page, fatia_ms: int = 100):
+        """Espera a pendência na própria aba (modo sem pipeline)."""
+        desde = time.monotonic()
+        with medir_espera(self.etapa):
+            while not self.resolvida(desde):
+                page.wait_for_timeout(fatia_ms)
+
+
+def executar_etapas(page: Page, etapas: Iterator[Pendencia], fatia_ms: int = 100):
+    """Roda um job inteiro, esperando cada pendência na própria aba."""
+    for pendencia in etapas:
+        pendencia.aguardar(page, fatia_ms)
+
+
+@dataclass
+class _Vaga:
+    page: Page
+    etapas: Optional[Iterator[Pendencia]] = None
+    pendencia: Optional[Pendencia] = None
+    desde: float = 0.0
+    rotulo: Optional[str] = None
+    iniciado_em: float = 0.0
+
+
+class PipelinePaginas:
+    """Distribui jobs (geradores de etapas) entre as abas de um contexto."""
+
+    def __init__(self, paginas: List[Page], nome: str = "pipeline", fatia_ms: int = 100):
+        """
+        Args:
+            paginas: Abas do contexto; a primeira é a aba original do worker
+            nome: Nome usado nas métricas (ex: nome da thread)
+            fatia_ms: Espera quando nenhum job pode avançar
+        """
+        self.vagas = [_Vaga(page) for page in paginas]
+        self.nome = nome
+        self.fatia_ms = fatia_ms
+
+    @classmethod
+    def from_config(
+        cls,
+        page: Page,
+        nome: str,
+        config: dict,
+        preparar_pagina: Callable[[Page, int], None],
+    ) -> Optional["PipelinePaginas"]:
+        """
+        Abre as abas extras no contexto de `page` (None se o pipeline está desligado).
+
+        `preparar_pagina(aba, indice)` leva cada aba nova à tela de trabalho;
+        abas que falharem ficam de fora.
+        """
+        pipe_cfg = config.get("pipeline_settings", {})
+        if not pipe_cfg.get("enabled", False):
+            return None
+        total = min(pipe_cfg.get("pages_per_context", 3), pipe_cfg.get("max_pages_per_context", 6))
+        if total <= 1:
+            return None
+
+        paginas = [page]
+        for indice in range(1, total):
+            aba = None
+            try:
+                aba = page.context.new_page()
+                preparar_pagina(aba, indice)
+                paginas.append(aba)
+            except Exception as e:
+                logger.warning(f"[Pipeline] {nome}: falha ao preparar a aba {indice + 1}/{total}: {e}")
+                if aba:
+                    try:
+                        aba.close()
+                    except Exception:
+                        pass
+        logger.info(f"[Pipeline] {nome}: {len(paginas)} abas no contexto.")
+        return cls(paginas, nome, fatia_ms=pipe_cfg.get("poll_slice_ms", 100))
+
+    # --- Estado ---
+
+    def livres(self) -> List[Page]:
+        return [vaga.page for vaga in self.vagas if vaga.etapas is None]
+
+    @property
+    def ocupadas(self) -> int:
+        return sum(1 for vaga in self.vagas if vaga.etapas is not None)
+
+    def rotulos(self) -> List[str]:
+        """Rótulos (ex: número da LT) dos jobs em andamento."""
+        return [vaga.rotulo for vaga in self.vagas if vaga.etapas is not None and vaga.rotulo]
+
+    # --- Execução ---
+
+    def iniciar(self, page: Page, etapas: Iterator[Pendencia], rotulo: Optional[str] = None):
+        """Atribui um job à aba `page` (livre) e o executa até a primeira pendência."""
+        vaga = next(v for v in self.vagas if v.page is page)
+        if vaga.etapas is not None:
+            raise RuntimeError(f"A aba já está com o job '{vaga.rotulo}'.")
+        vaga.etapas, vaga.rotulo, vaga.iniciado_em = etapas, rotulo, time.monotonic()
+        metricas.definir("pipeline", f"{self.nome}:ocupadas", self.ocupadas)
+        self._avancar(vaga)
+
+    def _avancar(self, vaga: _Vaga) -> bool:
+        """Executa o job da vaga até a próxima pendência. True se o job terminou."""
+        if vaga.pendencia is not None:
+            metricas.observar("esperas", f"{vaga.pendencia.etapa}:pipeline", time.monotonic() - vaga.desde)
+        try:
+            vaga.pendencia = next(vaga.etapas)
+            vaga.desde = time.monotonic()
+            return False
+        except StopIteration:
+            pass
+        except Exception as e:
+            # O gerador trata os erros do job; aqui só chega o que escapou dele
+            logger.exception(f"[Pipeline] {self.nome}: job '{vaga.rotulo}' terminou com erro: {e}")
+        metricas.observar("pipeline", f"{self.nome}:job", time.monotonic() - vaga.iniciado_em)
+        vaga.etapas = vaga.pendencia = vaga.rotulo = None
+        metricas.definir("pipeline", f"{self.nome}:ocupadas", self.ocupadas)
+        return True
+
+    def passo(self) -> int:
+        """
+        Avança os jobs cujas pendências se resolveram; se nenhum avançou, espera
+        uma fatia. Retorna quantos jobs terminaram.
+        """
+        ativas = [vaga for vaga in self.vagas if vaga.etapas is not None]
+        if not ativas:
+            return 0
+        avancou, concluidos = False, 0
+        for vaga in ativas:
+            if vaga.pendencia is None or vaga.pendencia.resolvida(vaga.desde):
+                avancou = True
+                concluidos += self._avancar(vaga)
+        if not avancou:
+            # Qualquer chamada ao navegador entrega os eventos pendentes de todas as abas
+            ativas[0].page.wait_for_timeout(self.fatia_ms)
+        else:
+            metricas.incrementar("pipeline", f"{self.nome}:trocas")
+        return concluidos
+
+    def drenar(self):
+        """Roda os jobs em andamento até o fim (sem iniciar novos)."""
+        while self.ocupadas:
+            self.passo()
+
+    def cancelar(self, rotulo: Optional[str] = None, motivo: str = "", falha: bool = False) -> int:
+        """
+        Interrompe o job `rotulo` (ou todos): lança JobCancelado no gerador,
+        que devolve o job à fila no seu `finally`. As outras abas seguem.
+
+        Returns:
+            Quantos jobs foram interrompidos
+        """
+        cancelados = 0
+        for vaga in self.vagas:
+            if vaga.etapas is None or (rotulo is not None and vaga.rotulo != rotulo):
+                continue
+            try:
+                vaga.etapas.throw(JobCancelado(motivo, falha=falha))
+            except (StopIteration, JobCancelado):
+                pass
+            except Exception as e:
+                logger.error(f"[Pipeline] {self.nome}: erro ao interromper o job '{vaga.rotulo}': {e}")
+            finally:
+                vaga.etapas.close()
+            vaga.etapas = vaga.pendencia = vaga.rotulo = None
+            cancelados += 1
+        metricas.definir("pipeline", f"{self.nome}:ocupadas", self.ocupadas)
+        return cancelados
+
+    def fechar(self):
+        """Fecha as abas extras (a aba original do worker fica com o chamador)."""
+        for vaga in self.vagas[1:]:
+            try:
+                vaga.page.close()
+            except Exception as e:
+                logger.debug(f"[Pipeline] {self.nome}: falha ao fechar aba: {e}")
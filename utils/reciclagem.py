@@ -0,0 +1,184 @@
+"""
+Reciclagem preventiva dos navegadores dos workers.
+
+Contextos Firefox de vida longa acumulam memória e ficam mais lentos ao longo
+do dia. A política decide, a cada job concluído, se o worker deve ser
+trocado por um navegador novo:
+
+    - jobs: executou `max_jobs` jobs
+    - idade: está vivo há `max_age_minutes`
+    - memória: a árvore de processos do navegador passou de `max_rss_mb`
+    - latência: a média recente dos jobs (por tipo) passou de
+      `latency_factor` × a média dos primeiros jobs do mesmo worker
+
+A troca em si é feita pelo ThreadPoolManager com reposição antecipada: o
+substituto sobe primeiro e o worker antigo só é drenado quando o novo está
+pronto, então a capacidade não cai.
+
+Também registra a latência dos jobs por faixa de idade do worker (grupo
+"latencia_por_idade"), para acompanhar a degradação ao longo do tempo.
+
+Config ('recycling_settings'):
+    "enabled": true,
+    "max_jobs": 500,
+    "max_age_minutes": 240,
+    "max_rss_mb": 1500,
+    "latency_factor": 2.0,
+    "latency_baseline_jobs": 20,     # Jobs que formam a referência de cada worker
+    "latency_window_jobs": 20,       # Janela da média recente (EWMA)
+    "max_concurrent": 1              # Reciclagens simultâneas
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+from utils.metricas import metricas
+
+# Limites (minutos) das faixas de idade usadas na métrica de latência
+FAIXAS_IDADE_MIN = [30, 60, 120, 240, 480]
+
+
+def faixa_idade(idade_segundos: float) -> str:
+    """Rótulo da faixa de idade (ex: '30-60min', '480+min')."""
+    inicio = 0
+    for limite in FAIXAS_IDADE_MIN:
+        if idade_segundos < limite * 60:
+            return f"{inicio}-{limite}min"
+        inicio = limite
+    return f"{inicio}+min"
+
+
+@dataclass
+class _LatenciaTipo:
+    jobs: int = 0
+    referencia: float = 0.0  # Média dos primeiros jobs
+    recente: Optional[float] = None  # EWMA dos jobs seguintes
+
+
+@dataclass
+class _VidaWorker:
+    nascimento: float
+    jobs: int = 0
+    latencias: Dict[str, _LatenciaTipo] = field(default_factory=dict)
+
+
+class PoliticaReciclagem:
+    """Acompanha a vida de cada worker e diz quando ele deve ser reciclado."""
+
+    def __init__(
+        self,
+        max_jobs: Optional[int] = 500,
+        max_idade: Optional[float] = 240 * 60,
+        max_rss_bytes: Optional[int] = 1500 * 1024 * 1024,
+        fator_latencia: Optional[float] = 2.0,
+        jobs_referencia: int = 20,
+        janela_recente: int = 20,
+        max_simultaneas: int = 1,
+        relogio: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_jobs: Jobs por worker antes da reciclagem (None: sem limite)
+            max_idade: Segundos de vida do worker (None: sem limite)
+            max_rss_bytes: Memória da árvore do navegador (None: sem limite)
+            fator_latencia: Degradação tolerada da latência recente sobre a referência (None: desligado)
+            jobs_referencia: Primeiros jobs de cada tipo que formam a referência do worker
+            janela_recente: Tamanho (em jobs) da média móvel recente
+            max_simultaneas: Reciclagens em andamento ao mesmo tempo
+            relogio: Fonte de tempo (injetável para testes)
+        """
+        self.max_jobs = max_jobs
+        self.max_idade = max_idade
+        self.max_rss_bytes = max_rss_bytes
+        self.fator_latencia = fator_latencia
+        self.jobs_referencia = max(1, jobs_referencia)
+        self.suavizacao = 2 / (max(1, janela_recente) + 1)
+        self.janela_recente = janela_recente
+        self.max_simultaneas = max_simultaneas
+        self.relogio = relogio
+        self.vidas: Dict[str, _VidaWorker] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["PoliticaReciclagem"]:
+        """Cria a política a partir de 'recycling_settings' (None se desligada)."""
+        recycle_cfg = config.get("recycling_settings", {})
+        if not recycle_cfg.get("enabled", False):
+            return None
+        max_idade_min = recycle_cfg.get("max_age_minutes", 240)
+        max_rss_mb = recycle_cfg.get("max_rss_mb", 1500)
+        return cls(
+            max_jobs=recycle_cfg.get("max_jobs", 500),
+            max_idade=max_idade_min * 60 if max_idade_min else None,
+            max_rss_bytes=max_rss_mb * 1024 * 1024 if max_rss_mb else None,
+            fator_latencia=recycle_cfg.get("latency_factor", 2.0),
+            jobs_referencia=recycle_cfg.get("latency_baseline_jobs", 20),
+            janela_recente=recycle_cfg.get("latency_window_jobs", 20),
+            max_simultaneas=recycle_cfg.get("max_concurrent", 1),
+        )
+
+    # --- Ciclo de vida ---
+
+    def nascer(self, nome_worker: str):
+        """Worker pronto para consumir jobs (navegador novo)."""
+        with self.lock:
+            self.vidas[nome_worker] = _VidaWorker(nascimento=self.relogio())
+
+    def esquecer(self, nome_worker: str):
+        with self.lock:
+            self.vidas.pop(nome_worker, None)
+
+    def idade(self, nome_worker: str) -> float:
+        with self.lock:
+            vida = self.vidas.get(nome_worker)
+            return self.relogio() - vida.nascimento if vida else 0.0
+
+    # --- Jobs ---
+
+    def registrar_job(self, nome_worker: str, tipo_job: str, duracao: float):
+        """Contabiliza um job do worker e alimenta a métrica de latência por idade."""
+        with self.lock:
+            vida = self.vidas.setdefault(nome_worker, _VidaWorker(nascimento=self.relogio()))
+            vida.jobs += 1
+            idade = self.relogio() - vida.nascimento
+            lat = vida.latencias.setdefault(tipo_job, _LatenciaTipo())
+            lat.jobs += 1
+            if lat.jobs <= self.jobs_referencia:
+                lat.referencia += (duracao - lat.referencia) / lat.jobs
+            elif lat.recente is None:
+                lat.recente = duracao
+            else:
+                lat.recente += self.suavizacao * (duracao - lat.recente)
+        metricas.observar("latencia_por_idade", f"{tipo_job}:{faixa_idade(idade)}", duracao)
+
+    def motivo(self, nome_worker: str, rss_bytes: Optional[int] = None) -> Optional[str]:
+        """Motivo para reciclar o worker agora, ou None."""
+        with self.lock:
+            vida = self.vidas.get(nome_worker)
+            if vida is None:
+                return None
+            idade = self.relogio() - vida.nascimento
+            if self.max_jobs and vida.jobs >= self.max_jobs:
+                return f"{vida.jobs} jobs executados"
+            if self.max_idade and idade >= self.max_idade:
+                return f"{idade / 60:.0f} min de vida"
+            if self.max_rss_bytes and rss_bytes and rss_bytes >= self.max_rss_bytes:
+                return f"{rss_bytes // (1024 * 1024)} MB de memória"
+            if self.fator_latencia:
+                for tipo_job, lat in vida.latencias.items():
+                    maduro = lat.jobs >= self.jobs_referencia + self.janela_recente
+                    if maduro and lat.referencia > 0 and lat.recente >= self.fator_latencia * lat.referencia:
+                        return (
+                            f"latência de {tipo_job} {lat.recente:.1f}s "
+                            f"({lat.recente / lat.referencia:.1f}× a inicial de {lat.referencia:.1f}s)"
+                        )
+        return None
+
+    def registrar_reciclagem(self, nome_worker: str, motivo: str):
+        metricas.incrementar("reciclagem", "reciclagens")
+        metricas.observar("reciclagem", "idade_min", self.idade(nome_worker) / 60)
+        logger.info(f"[RECICLAR] '{nome_worker}': {motivo}.")
@@ -0,0 +1,131 @@
+"""
+Bloqueio de recursos não essenciais nos contextos dos workers.
+
+O conferência recarrega a página a cada job e todos os workers navegam com
+frequência. Cada navegação baixava de novo imagens, fontes, ícones e scripts
+de analytics que os fluxos não usam. A política aborta esses pedidos via
+`context.route` antes de saírem do navegador:
+
+    politica = PoliticaRoteamento.from_config(config)
+    if politica:
+        politica.aplicar(context)
+
+Ordem de decisão de cada pedido:
+    1. URL casa com `allow_url_patterns`      → passa
+    2. host em `deny_hosts`                  → bloqueia
+    3. host fora de `allowed_hosts` (se `block_third_party`) → bloqueia
+    4. tipo em `blocked_resource_types`      → bloqueia
+    5. demais                                → passa
+"""
+
+import re
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+from loguru import logger
+from playwright.sync_api import BrowserContext, Route
+
+from utils.metricas import metricas
+
+# Tamanho médio (bytes) assumido por tipo de recurso bloqueado. O pedido é
+# abortado antes da resposta, então o tamanho real nunca é conhecido.
+BYTES_ESTIMADOS_PADRAO = {
+    "image": 25_000,
+    "font": 40_000,
+    "media": 250_000,
+    "stylesheet": 15_000,
+    "script": 60_000,
+}
+
+
+def _host_casa(host: str, dominios: Iterable[str]) -> bool:
+    """True se `host` é um dos domínios ou subdomínio deles."""
+    return any(host == dominio or host.endswith(f".{dominio}") for dominio in dominios)
+
+
+class PoliticaRoteamento:
+    """Decide, por URL e tipo de recurso, quais pedidos dos workers são abortados."""
+
+    def __init__(
+        self,
+        tipos_bloqueados: Iterable[str] = ("image", "media", "font"),
+        hosts_permitidos: Iterable[str] = (),
+        hosts_bloqueados: Iterable[str] = (),
+        padroes_permitidos: Iterable[str] = (),
+        bloquear_terceiros: bool = True,
+        bytes_estimados: Optional[dict] = None,
+    ):
+        """
+        Args:
+            tipos_bloqueados: resource_type do Playwright a abortar (image, font, media...)
+            hosts_permitidos: Domínios do portal; os demais são terceiros
+            hosts_bloqueados: Domínios sempre bloqueados (analytics, chat...)
+            padroes_permitidos: Regex de URLs que nunca são bloqueadas
+            bloquear_terceiros: Bloqueia hosts fora de `hosts_permitidos`
+            bytes_estimados: {tipo: bytes} usado para estimar a banda economizada
+        """
+        self.tipos_bloqueados = set(tipos_bloqueados)
+        self.hosts_permitidos = list(hosts_permitidos)
+        self.hosts_bloqueados = list(hosts_bloqueados)
+        self.padroes_permitidos = [re.compile(padrao) for padrao in padroes_permitidos]
+        self.bloquear_terceiros = bloquear_terceiros and bool(self.hosts_permitidos)
+        self.bytes_estimados = {**BYTES_ESTIMADOS_PADRAO, **(bytes_estimados or {})}
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["PoliticaRoteamento"]:
+        """Cria a partir de 'routing_settings' (None se desligada)."""
+        rota_cfg = config.get("routing_settings", {})
+        if not rota_cfg.get("enabled", True):
+            return None
+        return cls(
+            tipos_bloqueados=rota_cfg.get("blocked_resource_types", ["image", "media", "font"]),
+            hosts_permitidos=rota_cfg.get("allowed_hosts", []),
+            hosts_bloqueados=rota_cfg.get("deny_hosts", []),
+            padroes_permitidos=rota_cfg.get("allow_url_patterns", []),
+            bloquear_terceiros=rota_cfg.get("block_third_party", True),
+            bytes_estimados=rota_cfg.get("estimated_bytes_by_type"),
+        )
+
+    def motivo_bloqueio(self, url: str, tipo_recurso: str) -> Optional[str]:
+        """Motivo do bloqueio ('tipo', 'host_bloqueado', 'terceiro') ou None se o pedido passa."""
+        if any(padrao.search(url) for padrao in self.padroes_permitidos):
+            return None
+        partes = urlsplit(url)
+        if partes.scheme not in ("http", "https"):
+            return None  # data:, blob:, about:
+        host = (partes.hostname or "").lower()
+        if _host_casa(host, self.hosts_bloqueados):
+            return "host_bloqueado"
+        if self.bloquear_terceiros and not _host_casa(host, self.hosts_permitidos):
+            return "terceiro"
+        if tipo_recurso in self.tipos_bloqueados:
+            return "tipo"
+        return None
+
+    def _ao_rotear(self, route: Route):
+        request = route.request
+        try:
+            motivo = self.motivo_bloqueio(request.url, request.resource_type)
+        except Exception as e:
+            logger.debug(f"[Roteamento] Falha ao avaliar '{request.url}': {e}. Deixando passar.")
+            motivo = None
+
+        if motivo is None:
+            route.continue_()
+            return
+
+        route.abort("blockedbyclient")
+        metricas.incrementar("roteamento", "bloqueados")
+        metricas.incrementar("roteamento", f"bloqueados:{motivo}")
+        metricas.incrementar("roteamento", f"bloqueados:{request.resource_type}")
+        metricas.incrementar(
+            "roteamento", "bytes_bloqueados_estimados", self.bytes_estimados.get(request.resource_type, 0)
+        )
+
+    def aplicar(self, context: BrowserContext):
+        """Registra a política em todas as páginas do contexto."""
+        context.route("**/*", self._ao_rotear)
+        logger.debug(
+            f"[Roteamento] Política aplicada: tipos={sorted(self.tipos_bloqueados)}, "
+            f"hosts permitidos={self.hosts_permitidos}, hosts bloqueados={len(self.hosts_bloqueados)}."
+        )
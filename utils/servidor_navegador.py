@@ -0,0 +1,149 @@
+"""
+Servidor de navegador compartilhado pelos workers do container.
+
+Sem ele, cada executar_fluxo paga um `firefox.launch` completo, inclusive
+nas threads de recuperação e reposição. Com ele, um único Firefox de vida
+longa roda num processo à parte (`firefox.launchServer` do driver Node que
+vem com o pacote playwright, a API Python não expõe launch_server) e cada
+worker só faz `firefox.connect(ws_endpoint)` e abre o seu contexto.
+
+O servidor sobrevive à queda dos workers (cada um perde só o seu contexto).
+Se o próprio servidor morrer, o próximo worker a pedir o endpoint o recria.
+
+Desligado por padrão. Com ele, o Firefox não fica mais na árvore de
+processos de cada worker: o MonitorMemoria só mede o driver de cada um, a
+reciclagem por memória (mais pesado / 'max_rss_mb') perde o efeito e
+reciclar um worker não troca o processo do navegador. Uma queda do Firefox
+compartilhado derruba todos os workers de uma vez.
+
+Config ('browser_server_settings'):
+    "enabled": false,
+    "headless": true,
+    "startup_timeout_seconds": 30,
+    "connect_timeout_ms": 30000
+"""
+
+import json
+import os
+import queue
+import subprocess
+import threading
+from typing import List, Optional
+
+from loguru import logger
+
+from utils.metricas import metricas
+
+# Sobe o servidor e escreve o endpoint websocket na primeira linha do stdout
+_SCRIPT_SERVIDOR = """
+const { firefox } = require(process.argv[1]);
+firefox.launchServer(JSON.parse(process.argv[2])).then(
+  (servidor) => console.log(servidor.wsEndpoint()),
+  (erro) => { console.error(erro); process.exit(1); },
+);
+"""
+
+
+class ServidorNavegador:
+    """Processo de navegador de vida longa ao qual os workers se conectam."""
+
+    def __init__(
+        self,
+        headless: bool = True,
+        timeout_partida: float = 30,
+        timeout_conexao_ms: int = 30000,
+        comando: Optional[List[str]] = None,
+    ):
+        """
+        Args:
+            headless: Firefox sem interface
+            timeout_partida: Segundos para o servidor informar o endpoint
+            timeout_conexao_ms: Timeout do connect de cada worker
+            comando: Comando que sobe o servidor (padrão: driver Node do playwright)
+        """
+        self.headless = headless
+        self.timeout_partida = timeout_partida
+        self.timeout_conexao_ms = timeout_conexao_ms
+        self.comando = comando
+        self.processo: Optional[subprocess.Popen] = None
+        self.ws_endpoint: Optional[str] = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["ServidorNavegador"]:
+        """Cria o servidor a partir de 'browser_server_settings' (None se desligado)."""
+        server_cfg = config.get("browser_server_settings", {})
+        if not server_cfg.get("enabled", False):
+            return None
+        return cls(
+            headless=server_cfg.get("headless", True),
+            timeout_partida=server_cfg.get("startup_timeout_seconds", 30),
+            timeout_conexao_ms=server_cfg.get("connect_timeout_ms", 30000),
+        )
+
+    def _comando_padrao(self) -> List[str]:
+        from playwright._impl._driver import compute_driver_executable
+
+        node, cli = compute_driver_executable()
+        opcoes = {"headless": self.headless, "handleSIGTERM": True}
+        return [node, "-e", _SCRIPT_SERVIDOR, os.path.dirname(cli), json.dumps(opcoes)]
+
+    def _iniciar(self):
+        """Sobe o processo e espera o endpoint (sob self.lock)."""
+        self.processo = subprocess.Popen(
+            self.comando or self._comando_padrao(),
+            stdout=subprocess.PIPE,
+            stdin=subprocess.DEVNULL,
+            text=True,
+        )
+        linhas: queue.Queue = queue.Queue()
+        threading.Thread(
+            target=lambda: linhas.put(self.processo.stdout.readline()), daemon=True, name="ServidorNavegadorStdout"
+        ).start()
+        try:
+            endpoint = linhas.get(timeout=self.timeout_partida).strip()
+        except queue.Empty:
+            endpoint = ""
+        if not endpoint.startswith("ws"):
+            self._encerrar_processo()
+            raise RuntimeError(f"Servidor de navegador não informou o endpoint em {self.timeout_partida}s.")
+        self.ws_endpoint = endpoint
+        metricas.incrementar("servidor_navegador", "partidas")
+        logger.success(f"[Servidor] Navegador compartilhado no ar (pid {self.processo.pid}): {endpoint}")
+
+    def endpoint(self) -> Optional[str]:
+        """Endpoint websocket do servidor; sobe (ou recria) o processo se preciso."""
+        with self.lock:
+            if self.processo is not None and self.processo.poll() is None:
+                return self.ws_endpoint
+            if self.processo is not None:
+                logger.warning(f"[Servidor] Navegador compartilhado saiu (código {self.processo.returncode}). Recriando...")
+                metricas.incrementar("servidor_navegador", "quedas")
+            try:
+                self._iniciar()
+            except Exception as e:
+                logger.error(f"[Servidor] Falha ao iniciar o navegador compartilhado: {e}")
+                self.processo = None
+                return None
+            return self.ws_endpoint
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.processo.pid if self.processo is not None else None
+
+    def _encerrar_processo(self):
+        processo, self.processo, self.ws_endpoint = self.processo, None, None
+        if processo is None or processo.poll() is not None:
+            return
+        processo.terminate()
+        try:
+            processo.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+            processo.wait()
+
+    def parar(self):
+        """Encerra o servidor (depois que os workers fecharam seus contextos)."""
+        with self.lock:
+            self._encerrar_processo()
+        logger.info("[Servidor] Navegador compartilhado encerrado.")
@@ -0,0 +1,168 @@
+"""
+Sessão do portal reaproveitada entre navegadores (storage_state do Playwright).
+
+Depois de um login bem-sucedido, os cookies e o localStorage do contexto são
+gravados em disco. O próximo navegador (worker novo, reposição ou a volta
+de uma escala a zero) abre o contexto com esse estado e já cai logado: o
+login de ~10-30s vira um goto de poucos segundos.
+
+Se o portal pedir login mesmo assim (sessão expirada), o arquivo é
+descartado e o worker segue pelo login normal, que grava um estado novo.
+
+Config ('session_cache_settings'):
+    "enabled": true,
+    "path": "dados/sessao_portal.json",
+    "max_age_seconds": 43200,     # Estado mais velho que isso é ignorado
+    "check_timeout_ms": 15000
+
+Quando vários workers sobem juntos (partida, escalonamento), o
+EscalonadorLogins espaça a abertura das sessões: o portal não recebe uma
+rajada de logins e, depois do primeiro login, os demais já encontram o
+estado salvo.
+
+Config ('startup_settings'):
+    "max_concurrent_logins": 2,
+    "login_stagger_seconds": 2
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from loguru import logger
+from playwright.sync_api import BrowserContext, Page
+
+from utils.metricas import metricas
+
+URL_VALIDACAO = "https://portal.emiteai.com.br/#/emissor"
+
+# Login pedido (hash da rota) ou aplicação carregada (abas da tela de emissão)
+_JS_SESSAO_DEFINIDA = """() => location.hash.toLowerCase().includes('login')
+    || document.querySelector('[role="tab"]') !== null"""
+
+
+class SessaoPortal:
+    """Arquivo de storage_state compartilhado pelos workers do container."""
+
+    _lock = threading.Lock()
+
+    def __init__(self, caminho: str, idade_maxima: float = 43200, timeout_ms: int = 15000):
+        """
+        Args:
+            caminho: Arquivo JSON do storage_state
+            idade_maxima: Segundos após os quais o estado salvo é ignorado
+            timeout_ms: Espera máxima para o portal decidir entre aplicação e login
+        """
+        self.caminho = caminho
+        self.idade_maxima = idade_maxima
+        self.timeout_ms = timeout_ms
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["SessaoPortal"]:
+        """Cria a sessão a partir de 'session_cache_settings' (None se desligada)."""
+        sessao_cfg = config.get("session_cache_settings", {})
+        if not sessao_cfg.get("enabled", False):
+            return None
+        return cls(
+            sessao_cfg.get("path", "dados/sessao_portal.json"),
+            idade_maxima=sessao_cfg.get("max_age_seconds", 43200),
+            timeout_ms=sessao_cfg.get("check_timeout_ms", 15000),
+        )
+
+    def estado_salvo(self) -> Optional[str]:
+        """Caminho do estado salvo, se existir e não estiver velho demais."""
+        try:
+            idade = time.time() - os.path.getmtime(self.caminho)
+        except OSError:
+            return None
+        if idade > self.idade_maxima:
+            logger.debug(f"[Sessão] Estado salvo com {idade:.0f}s ignorado (máx {self.idade_maxima}s).")
+            return None
+        return self.caminho
+
+    def restaurar(self, page: Page) -> bool:
+        """
+        Abre o portal no contexto criado com o estado salvo.
+
+        Returns:
+            True se a sessão continua válida (o worker pode pular o login)
+        """
+        try:
+            page.goto(URL_VALIDACAO, wait_until="domcontentloaded", timeout=self.timeout_ms)
+            page.wait_for_function(_JS_SESSAO_DEFINIDA, timeout=self.timeout_ms)
+        except Exception as e:
+            logger.debug(f"[Sessão] Falha ao validar a sessão salva: {e}")
+            return False
+        if "#/login" in page.url.lower():
+            logger.info("[Sessão] Sessão salva expirou. Descartando e fazendo login.")
+            metricas.incrementar("sessao", "expiradas")
+            self.descartar()
+            return False
+        metricas.incrementar("sessao", "reaproveitadas")
+        return True
+
+    def salvar(self, context: BrowserContext):
+        """Grava o estado do contexto logado (escrita atômica: outros workers podem estar lendo)."""
+        temporario = f"{self.caminho}.{threading.get_ident()}.tmp"
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+                context.storage_state(path=temporario)
+                os.replace(temporario, self.caminho)
+            metricas.incrementar("sessao", "gravadas")
+        except Exception as e:
+            logger.warning(f"[Sessão] Falha ao gravar o estado da sessão: {e}")
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
+
+    def descartar(self):
+        """Remove o estado salvo (sessão recusada pelo portal)."""
+        try:
+            os.remove(self.caminho)
+        except OSError:
+            pass
+
+
+class EscalonadorLogins:
+    """Limita e espaça as aberturas de sessão (login ou restauração) simultâneas."""
+
+    def __init__(self, max_simultaneos: int = 2, intervalo: float = 2.0):
+        """
+        Args:
+            max_simultaneos: Sessões sendo abertas ao mesmo tempo
+            intervalo: Segundos mínimos entre o início de duas aberturas
+        """
+        self.intervalo = intervalo
+        self._vagas = threading.BoundedSemaphore(max(1, max_simultaneos))
+        self._lock = threading.Lock()
+        self._proximo_inicio = 0.0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "EscalonadorLogins":
+        """Cria o escalonador a partir de 'startup_settings'."""
+        startup_cfg = config.get("startup_settings", {})
+        return cls(
+            max_simultaneos=startup_cfg.get("max_concurrent_logins", 2),
+            intervalo=startup_cfg.get("login_stagger_seconds", 2),
+        )
+
+    @contextmanager
+    def vez(self, nome: str) -> Iterator[None]:
+        """Espera a vez do worker `nome` de abrir a sessão."""
+        inicio = time.monotonic()
+        with self._vagas:
+            with self._lock:
+                agora = time.monotonic()
+                espera = max(0.0, self._proximo_inicio - agora)
+                self._proximo_inicio = max(agora, self._proximo_inicio) + self.intervalo
+            if espera:
+                time.sleep(espera)
+            aguardado = time.monotonic() - inicio
+            metricas.observar("partida", "espera_login_s", aguardado)
+            if aguardado >= 1:
+                logger.debug(f"[Sessão] '{nome}' aguardou {aguardado:.1f}s pela vez de abrir a sessão.")
+            yield
@@ -1,10 +1,11 @@
 """
 Sistema de display de status em tempo real.
-Status é atualizado a cada 5 segundos em uma linha única (funciona em Docker).
+Status é atualizado em uma linha única (funciona em Docker) sempre que o
+ThreadPoolManager notifica uma mudança (eventos de fila, rebalanceamento) ou,
+na falta de eventos, a cada `update_interval` segundos.
 Apenas logs IMPORTANTES são mostrados.
 """
 import threading
-import time
 import redis
 from loguru import logger
 from typing import Dict, Any
@@ -23,12 +24,13 @@ class StatusDisplay:
         """
         Args:
             redis_client: Cliente Redis para contar jobs
-            update_interval: Intervalo em segundos para atualizar status (padrão: 5s)
+            update_interval: Intervalo máximo em segundos entre atualizações sem eventos (padrão: 5s)
         """
         self.redis_client = redis_client
         self.update_interval = update_interval
         self.running = False
         self.monitor_thread = None
+        self._evento_atualizar = threading.Event()
         
         # Estado compartilhado (thread-safe)
         self.lock = threading.Lock()
@@ -45,6 +47,11 @@ class StatusDisplay:
         """Atualiza quantidade de threads ativas de um tipo."""
         with self.lock:
             self.threads_status[tipo_job] = quantidade
+        self._evento_atualizar.set()
+    
+    def notificar(self):
+        """Solicita uma atualização imediata (ex: evento de fila recebido)."""
+        self._evento_atualizar.set()
     
     def _formatar_status_linha(self) -> str:
         """Formata o status em UMA ÚNICA linha (para atualizar com \r)."""
@@ -53,8 +60,15 @@ class StatusDisplay:
             emis_threads = self.threads_status.get("emissao", 0)
             conf_jobs = self.jobs_pending.get("conferencia", 0)
             emis_jobs = self.jobs_pending.get("emissao", 0)
+            unif_threads = self.threads_status.get("unificado")
         
         # Uma linha única, comprimento fixo, fácil de sobrescrever
+        if unif_threads is not None:
+            # Workers unificados: os mesmos navegadores atendem as duas filas
+            return (
+                f"[STATUS] Unif: {unif_threads}🧵 | Conf: {conf_jobs:3d}📦 | "
+                f"Emis: {emis_jobs:3d}📦                    "
+            )
         linha = (
             f"[STATUS] Conf: {conf_threads}🧵 ({conf_jobs:3d}📦) | "
             f"Emis: {emis_threads}🧵 ({emis_jobs:3d}📦)                    "
@@ -80,7 +94,8 @@ class StatusDisplay:
     
     def _monitorar_status(self):
         """
-        Loop que atualiza o status periodicamente na mesma linha.
+        Loop que atualiza o status na mesma linha a cada notificação
+        (ou a cada update_interval, como rede de segurança).
         Para Docker/Portainer, usa \r (carriage return) ao invés de ANSI codes.
         """
         while self.running:
@@ -99,7 +114,8 @@ class StatusDisplay:
                 sys.stderr.write(f"\r{linha_status}")
                 sys.stderr.flush()
                 
-                time.sleep(self.update_interval)
+                self._evento_atualizar.wait(timeout=self.update_interval)
+                self._evento_atualizar.clear()
                 
             except Exception as e:
                 logger.error(f"Erro no monitor de status: {e}")
@@ -124,6 +140,7 @@ class StatusDisplay:
     def parar(self):
         """Para o display de status."""
         self.running = False
+        self._evento_atualizar.set()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=2)
         # Limpa a linha de status final
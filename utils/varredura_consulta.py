@@ -0,0 +1,192 @@
+"""
+Varredura da tabela de consulta para resolver conferências em massa.
+
+Em vez de pesquisar cada LT pelo nome do arquivo, um worker de conferência
+percorre (página a página) a tabela de consulta da janela de datas inteira
+uma única vez e grava no Redis um mapa LT → status, compartilhado por todos
+os workers de conferência:
+
+    consulta:status_lt        →  hash {LT: status}   (expira em sweep_ttl_seconds)
+    consulta:varredura:lock   →  só um worker varre por vez
+
+Jobs cuja LT aparece no mapa com status diferente de "Aguardando Conferência"
+são resolvidos sem nenhuma pesquisa no navegador; só as LTs que realmente
+precisam do formulário consomem tempo de navegador por job.
+"""
+
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import redis
+from loguru import logger
+from playwright.sync_api import Page
+
+from utils.esperas import aguardar_condicao, aguardar_spinner
+from utils.estado_pagina import estado_da_pagina
+from utils.filtros import filtro_cargas
+from utils.metricas import metricas
+
+CHAVE_MAPA = "consulta:status_lt"
+CHAVE_LOCK = "consulta:varredura:lock"
+COLUNA_ARQUIVO = 2  # Nome do arquivo (o mesmo campo pesquisado pelo filtro de cargas)
+COLUNA_STATUS = 3  # Mesma coluna lida por obter_status_lt
+
+# LT dentro do nome do arquivo: "LT-1001_CTE.xml", "LT 456 conferir"
+_RE_LT = re.compile(r"\bLT[-_ ]?(\d+)", re.IGNORECASE)
+STATUS_PRECISA_FORMULARIO = "Aguardando Conferência"
+
+# Lê todas as células da página atual da tabela em uma única chamada ao navegador
+_JS_LINHA = "row => Array.from(row.cells).map(cell => cell.innerText.trim())"
+_JS_LINHAS_TABELA = f"rows => rows.map({_JS_LINHA})"
+
+
+def indexar_linhas(
+    linhas: List[List[str]], coluna_arquivo: int = COLUNA_ARQUIVO, coluna_status: int = COLUNA_STATUS
+) -> Dict[str, str]:
+    """
+    Monta {LT: status} a partir das linhas da tabela.
+
+    Só a coluna do nome do arquivo é lida, e só o que tem forma de LT vira
+    chave (com e sem o prefixo: "1001" e "LT-1001"). Uma LT que aparece em
+    mais de uma linha é ambígua e fica fora do mapa: o job cai na pesquisa
+    individual (obter_status_lt).
+    """
+    mapa: Dict[str, str] = {}
+    ambiguas = set()
+    for celulas in linhas:
+        if len(celulas) <= max(coluna_arquivo, coluna_status):
+            continue
+        status = celulas[coluna_status]
+        chaves = set()
+        for encontrado in _RE_LT.finditer(celulas[coluna_arquivo]):
+            chaves.update((encontrado.group(1), encontrado.group(0)))
+        for chave in chaves:
+            if chave in mapa:
+                ambiguas.add(chave)
+            mapa[chave] = status
+    for chave in ambiguas:
+        del mapa[chave]
+    if ambiguas:
+        metricas.incrementar("varredura_consulta", "ambiguas", len(ambiguas))
+        logger.debug(f"[Varredura] {len(ambiguas)} chave(s) em mais de uma linha ficaram fora do mapa.")
+    return mapa
+
+
+def varrer_tabela(page: Page, max_paginas: int = 50) -> Tuple[Dict[str, str], bool]:
+    """
+    Pesquisa a janela de datas sem filtro de arquivo e lê todas as páginas.
+
+    Returns:
+        (mapa LT → status, True se chegou à última página)
+    """
+    filtro_cargas(page, "")
+    botao_proxima = page.locator(
+        'button[aria-label="Go to next page"], button[aria-label="Próxima página"]'
+    ).first
+    linhas_tabela = page.locator("table tbody tr")
+
+    linhas: List[List[str]] = []
+    for pagina in range(1, max_paginas + 1):
+        linhas_pagina = linhas_tabela.evaluate_all(_JS_LINHAS_TABELA)
+        linhas.extend(linhas_pagina)
+        if botao_proxima.count() == 0 or not botao_proxima.is_enabled():
+            logger.debug(f"[Varredura] Tabela lida por completo ({pagina} página(s), {len(linhas)} linhas).")
+            return indexar_linhas(linhas), True
+        primeira_linha = linhas_pagina[0] if linhas_pagina else None
+        botao_proxima.click()
+        estado = estado_da_pagina(page)
+        if estado:
+            estado.invalidar_filtro()  # Tabela não está mais na primeira página da pesquisa
+        # A rede costuma já estar ociosa antes do XHR da próxima página: espera a
+        # tabela de fato trocar, senão a página antiga seria lida de novo
+        trocou = aguardar_condicao(
+            "varredura:proxima_pagina",
+            lambda: linhas_tabela.first.evaluate(_JS_LINHA) != primeira_linha,
+            timeout=20,
+        )
+        if not trocou:
+            logger.warning(f"[Varredura] Página {pagina + 1} não carregou. Varredura parcial ({len(linhas)} linhas).")
+            return indexar_linhas(linhas), False
+        aguardar_spinner(page, "varredura:spinner", timeout_ms=10000)
+
+    logger.warning(f"[Varredura] Limite de {max_paginas} páginas atingido ({len(linhas)} linhas lidas).")
+    return indexar_linhas(linhas), False
+
+
+class VarreduraConsulta:
+    """
+    Mapa LT → status compartilhado via Redis, atualizado por varredura.
+
+    Uso (no worker de conferência):
+        varredura = VarreduraConsulta.from_config(r, config)
+        status = varredura.obter_status(page, numero_lt, jobs_na_fila=r.llen(fila))
+        if status and status != STATUS_PRECISA_FORMULARIO:
+            ...  # resolve sem pesquisar a LT
+    """
+
+    def __init__(self, redis_client: redis.Redis, fila_minima: int = 20, ttl: int = 300, max_paginas: int = 50):
+        """
+        Args:
+            redis_client: Cliente Redis do worker
+            fila_minima: Só varre quando houver pelo menos esse número de jobs na fila
+            ttl: Validade do mapa (s); depois disso uma nova varredura é feita
+            max_paginas: Limite de páginas lidas por varredura
+        """
+        self.redis_client = redis_client
+        self.fila_minima = fila_minima
+        self.ttl = ttl
+        self.max_paginas = max_paginas
+
+    @classmethod
+    def from_config(cls, redis_client: redis.Redis, config: dict) -> Optional["VarreduraConsulta"]:
+        """Cria a partir de 'conference_settings' (None se a varredura estiver desligada)."""
+        conf_cfg = config.get("conference_settings", {})
+        if not conf_cfg.get("sweep_enabled", True):
+            return None
+        return cls(
+            redis_client,
+            fila_minima=conf_cfg.get("sweep_min_queue", 20),
+            ttl=conf_cfg.get("sweep_ttl_seconds", 300),
+            max_paginas=conf_cfg.get("sweep_max_pages", 50),
+        )
+
+    def _atualizar(self, page: Page) -> bool:
+        """Varre a tabela se nenhum outro worker estiver varrendo. Retorna True se varreu."""
+        if not self.redis_client.set(CHAVE_LOCK, "1", nx=True, ex=self.ttl):
+            return False
+        inicio = time.monotonic()
+        try:
+            mapa, completo = varrer_tabela(page, self.max_paginas)
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.delete(CHAVE_MAPA)
+            if mapa:
+                pipe.hset(CHAVE_MAPA, mapping=mapa)
+                pipe.expire(CHAVE_MAPA, self.ttl)
+            pipe.execute()
+            metricas.incrementar("varredura_consulta", "varreduras")
+            metricas.observar("varredura_consulta", "duracao_s", time.monotonic() - inicio)
+            logger.info(
+                f"[Varredura] Mapa LT → status atualizado ({len(mapa)} chaves, "
+                f"{'completo' if completo else 'parcial'}) em {time.monotonic() - inicio:.1f}s."
+            )
+            return True
+        except Exception as e:
+            logger.error(f"[Varredura] Falha ao varrer a tabela de consulta: {e}")
+            return False
+        finally:
+            self.redis_client.delete(CHAVE_LOCK)
+
+    def obter_status(self, page: Page, numero_lt: str, jobs_na_fila: int = 0) -> Optional[str]:
+        """
+        Status da LT segundo o mapa (None se a LT não estiver nele).
+
+        Se o mapa expirou e a fila está grande o bastante para compensar, faz
+        uma nova varredura antes (usando a página do worker atual).
+        """
+        if not self.redis_client.exists(CHAVE_MAPA) and jobs_na_fila + 1 >= self.fila_minima:
+            self._atualizar(page)
+
+        status = self.redis_client.hget(CHAVE_MAPA, numero_lt)
+        metricas.incrementar("varredura_consulta", "acertos" if status else "faltas")
+        return status
@@ -20,6 +20,8 @@ from typing import Dict, Callable, Optional
 from datetime import datetime, timedelta
 import redis
 
+from utils.eventos import CANAL_EVENTOS_PADRAO, publicar_evento_fila
+
 
 class JobWatchdog:
     """
@@ -45,16 +47,19 @@ class JobWatchdog:
         redis_client: redis.Redis,
         max_job_duration: int = 300,  # 5 minutos
         check_interval: int = 30,      # Verificar a cada 30 segundos
+        canal_eventos: str = CANAL_EVENTOS_PADRAO,
     ):
         """
         Args:
             redis_client: Cliente Redis para persistência
             max_job_duration: Tempo máximo em segundos por job (default: 300s = 5min)
             check_interval: Intervalo de verificação em segundos
+            canal_eventos: Canal Pub/Sub avisado ao enviar um kill signal
         """
         self.redis_client = redis_client
         self.max_job_duration = max_job_duration
         self.check_interval = check_interval
+        self.canal_eventos = canal_eventos
         
         # Dicionário de jobs em progresso
         # {"LT-001": {"inicio": timestamp, "worker_id": 1, "tipo": "conferencia"}}
@@ -200,6 +205,8 @@ class JobWatchdog:
                 "motivo": "timeout_travamento"
             })
             self.redis_client.sadd("watchdog:kill_workers", kill_signal)
+            # Acorda o orquestrador para criar a reposição sem esperar o próximo ciclo
+            publicar_evento_fila(self.redis_client, self.canal_eventos, origem="watchdog", tipo=tipo)
             logger.warning(f"[Watchdog] 💀 Kill signal enviado para worker {worker_id} ({tipo})")
         except Exception as e:
             logger.error(f"[Watchdog] Erro ao sinalizar kill do worker: {e}")
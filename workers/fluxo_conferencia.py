@@ -3,13 +3,22 @@ import json
 import time
 import datetime
 import os
+from dataclasses import dataclass
+from typing import Iterator, Optional
 from loguru import logger
 from playwright.sync_api import Page
 from dados.dataclass import Carga
 from fluxos.conferir import conferir_lt
 from utils.fluxo_utils import obter_status_lt, garantir_pagina_consulta
-from utils.filtros import filtro_cargas
+from utils.filtros import concluir_filtro_cargas, disparar_filtro_cargas
 from utils.watchdog import TimeoutDetector 
+from utils.filas import FilaConfiavel
+from utils.captura_rede import CapturaRede, captura_da_pagina
+from utils.estado_pagina import EstadoPagina, estado_da_pagina
+from utils.cache_opcoes import CacheOpcoes
+from utils.cadastros import IndiceCadastros
+from utils.varredura_consulta import STATUS_PRECISA_FORMULARIO, VarreduraConsulta
+from utils.pipeline import JobCancelado, Pendencia, PipelinePaginas, executar_etapas
 
 # Carrega configurações de timeout
 config_path = os.path.join(os.path.dirname(__file__), "..", "utils", "config.json")
@@ -56,15 +65,247 @@ def enviar_job_append_erro(r_client: redis.Redis, config: dict, numero_lt: str,
     except Exception as e:
         logger.error(f"[Worker Conferência] Falha ao enviar job APPEND (LT {numero_lt}) para o Redis: {e}")
 
+URL_CONSULTA = "https://portal.emiteai.com.br/#/ecommerce/shopee/consulta"
+SELETOR_CHAVE_CONSULTA = 'button:has-text("Filtrar")'
+
+
+@dataclass
+class _RecursosConferencia:
+    """O que as etapas de um job usam além da página (compartilhado pelas abas do worker)."""
+    r: redis.Redis
+    config: dict
+    fila: FilaConfiavel
+    q_conferencia: str
+    s_controle: str
+    worker_name: str
+    watchdog: Optional[object] = None
+    pool_manager: Optional[object] = None
+    varredura: Optional[VarreduraConsulta] = None
+    cache_opcoes: Optional[CacheOpcoes] = None
+    cadastros: Optional[IndiceCadastros] = None
+    fator_duracao: float = 1.0  # Com o pipeline, o tempo de parede do job é dividido entre as abas
+
+
+def _etapas_conferencia(page: Page, rec: _RecursosConferencia, job_json: str, job: dict, inicio_job: float) -> Iterator[Pendencia]:
+    """
+    Processa um job de conferência na aba `page`.
+
+    Gerador: cede a vez (`yield Pendencia`) enquanto o portal processa a
+    pesquisa, para o pipeline avançar as outras abas. Sem pipeline, é
+    executado inteiro por `executar_etapas`.
+    """
+    r, config, fila = rec.r, rec.config, rec.fila
+    captura = captura_da_pagina(page)
+    estado = estado_da_pagina(page)
+    cadastros = rec.cadastros
+    linha_data = job['data']  # Os dados da linha (dicionário)
+    linha_num = job['row']    # O número da linha
+    numero_lt = (linha_data.get("N° Carga") or "").strip()
+    id = "LT_DESCONHECIDO"
+    devolvido = False  # Job voltou para a fila (não confirmar)
+
+    # 3. PROCESSAR O JOB
+    try:
+        # Validar página ANTES de processar este job
+        pagina_esta_ok = garantir_pagina_consulta(
+            page=page,
+            url_alvo=URL_CONSULTA,
+            seletor_chave=SELETOR_CHAVE_CONSULTA
+        )
+        if not pagina_esta_ok:
+            logger.warning("[Worker Conferência] A página de consulta está inacessível. Re-adicionando job à fila.")
+            # Re-adiciona o job à fila para tentar depois
+            fila.devolver(job_json)
+            devolvido = True
+            yield Pendencia("conferencia:pagina_indisponivel", pronta=lambda: False, prazo=5)
+            return
+        
+        if cadastros:
+            cadastros.atualizar_se_necessario(page)
+        
+        id_job = (linha_data.get("ID 3ZX") or "").strip() or f"{numero_lt}-{linha_num}"
+        
+        # Registrar job no watchdog (usando nome da thread como worker_id)
+        if rec.watchdog:
+            rec.watchdog.registrar_job(numero_lt, worker_id=rec.worker_name, tipo_job="conferencia")
+        
+        carga = Carga.from_row(linha_data)
+        data_agora = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        id = (linha_data.get("ID 3ZX") or "").strip() or "LT_DESCONHECIDO"
+
+        if not carga:
+            motivo = "Dados de frete/pedágio inválidos ou ausentes"
+            logger.warning(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) pulado: {motivo}.")
+            return
+
+        if carga.status_emissao != "Pendente":
+            motivo = f"Status não é 'Pendente' (é '{carga.status_emissao}')"
+            logger.warning(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) pulado: {motivo}.")
+            return
+
+        if not carga.numero_lt:
+            motivo = "Sem número de carga (N° Carga)"
+            logger.warning(f"[Worker Conferência] Linha {linha_num} pulada: {motivo}.")
+            return
+
+        status_validos = ["ENTREGA FINALIZADA", "EM TRANSITO", "AGUARDANDO DESCARGA"]
+        if carga.status not in status_validos:
+            motivo = f"Status '{carga.status}' não requer conferência."
+            logger.info(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) pulado: {motivo}")
+            return
+
+        # --- STATUS PELA VARREDURA DA TABELA (sem pesquisar a LT) ---
+        status_emiteai = None
+        if rec.varredura:
+            status_varredura = rec.varredura.obter_status(page, numero_lt, jobs_na_fila=r.llen(rec.q_conferencia))
+            if status_varredura and status_varredura != STATUS_PRECISA_FORMULARIO:
+                status_emiteai = status_varredura
+                logger.info(f"[Worker Conferência] [LT {numero_lt}] ⚡ Status resolvido pela varredura: {status_emiteai}")
+
+        if status_emiteai is None:
+            if estado and estado.vista_valida("consulta"):
+                # Página limpa desde o último job: a pesquisa abaixo já atualiza a tabela
+                estado.registrar_evitada("reload")
+            else:
+                try:
+                    with TimeoutDetector("Recarregar página", max_seconds=20, job_id=numero_lt):
+                        page.reload(wait_until="domcontentloaded", timeout=PAGE_RELOAD_TIMEOUT)
+                except Exception as reload_err:
+                    logger.error(f"[Worker Conferência] Falha ao recarregar página: {reload_err}")
+                    # Tenta navegar para a página conhecida
+                    try:
+                        with TimeoutDetector("Navegar para consulta", max_seconds=20, job_id=numero_lt):
+                            page.goto(URL_CONSULTA, timeout=PAGE_RELOAD_TIMEOUT)
+                    except Exception as goto_err:
+                        logger.error(f"[Worker Conferência] Falha ao navegar para consulta: {goto_err}")
+                        return
+                if estado:
+                    estado.definir_vista("consulta")
+        
+            # --- LÓGICA PRINCIPAL (CAMINHO FELIZ) ---
+            logger.info(f"[Worker Conferência] ▶️  Iniciando RPA para LT {numero_lt} (Linha {linha_num}).")
+        
+            # Suas funções de RPA
+            logger.info(f"[Worker Conferência] [LT {numero_lt}] 📋 Passo 1/3: Aplicando filtro...")
+            if captura:
+                captura.limpar("consulta")
+            if disparar_filtro_cargas(page, carga.numero_lt):
+                # O portal pesquisa; enquanto isso o pipeline avança as outras abas
+                yield Pendencia(
+                    "conferencia:pesquisa",
+                    pronta=(lambda: captura.ultima("consulta") is not None) if captura else None,
+                )
+                concluir_filtro_cargas(page, carga.numero_lt)
+            logger.info(f"[Worker Conferência] [LT {numero_lt}] ✅ Filtro aplicado!")
+        
+            logger.info(f"[Worker Conferência] [LT {numero_lt}] 🔍 Passo 2/3: Obtendo status...")
+            status_emiteai = obter_status_lt(page, carga.numero_lt, captura)
+            logger.info(f"[Worker Conferência] [LT {numero_lt}] ✅ Status obtido: {status_emiteai}")
+        
+        # Prepara o pacote de resultados base
+        colunas_update = ["Data Conferência", "Status EmiteAI (coletado)"]
+        valores_update = [data_agora, status_emiteai]
+
+        if status_emiteai == "Aguardando Conferência":
+            # Cadastro sabidamente inexistente: falha sem abrir o formulário
+            cadastro_invalido = cadastros.validar_carga(carga) if cadastros else None
+            if cadastro_invalido:
+                campo_falha, valor_falha = cadastro_invalido
+                logger.error(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) FALHOU (Cadastro, índice local): {campo_falha} - {valor_falha}")
+                enviar_job_append_erro(r, config, numero_lt, campo_falha, valor_falha)
+            else:
+                # Chama a sub-tarefa de RPA
+                logger.info(f"[Worker Conferência] [LT {numero_lt}] 📝 Passo 3/3: Executando conferência...")
+                if estado:
+                    estado.invalidar("formulário de conferência")
+                resultado_rpa = conferir_lt(page, carga, rec.cache_opcoes)
+                logger.info(f"[Worker Conferência] [LT {numero_lt}] ✅ Conferência finalizada: {resultado_rpa.get('status')}")
+            
+                # --- Interpreta o resultado do RPA ---
+                if resultado_rpa["status"] == "sucesso":
+                    logger.success(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) SUCESSO na conferência.")
+                    # Sucesso! Marcamos para a próxima etapa (Verificar Emissão)
+                    colunas_update.append("Status de emissão")
+                    valores_update.append("Verificar Emissão")
+            
+                elif resultado_rpa["status"] == "falha_cadastro":
+                    campo_falha = resultado_rpa["campo"]
+                    valor_falha = resultado_rpa["valor"]
+                    logger.error(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) FALHOU (Cadastro): {campo_falha} - {valor_falha}")
+                    # Envia o log de erro para a outra planilha
+                    enviar_job_append_erro(r, config, numero_lt, campo_falha, valor_falha)
+            
+                elif resultado_rpa["status"] == "falha_rpa":
+                    motivo_falha = resultado_rpa.get("motivo") or f"{resultado_rpa.get('campo', 'Erro')}: {resultado_rpa.get('valor', 'Desconhecido')}"
+                    logger.error(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) FALHOU (RPA): {motivo_falha}")
+
+        elif status_emiteai == "Carga Finalizada" or status_emiteai == "Aguardando Emissão":
+            colunas_update.append("Status de emissão")
+            valores_update.append("Verificar Emissão")
+        
+        elif status_emiteai == "não encontrado":
+            colunas_update.append("Status de emissão")
+            valores_update.append("Arquivo c/ Erro")
+
+        else:
+            motivo = f"Status EmiteAí '{status_emiteai}' não tratado."
+            logger.warning(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}): {motivo}")
+
+        # 4. ENVIAR RESULTADO (UPDATE) PARA O WRITER
+        enviar_job_update(r, config, linha_num, colunas_update, valores_update)
+
+    except JobCancelado as e:
+        # Interrompido pelo pipeline (kill signal ou encerramento): o job não terminou
+        if estado:
+            estado.invalidar("job interrompido")
+        if not devolvido:
+            logger.warning(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) interrompida. Devolvendo à fila.")
+            fila.devolver(job_json, contar_tentativa=e.falha)
+            devolvido = True
+        raise
+    except Exception as e:
+        # 5. LIDAR COM FALHAS INESPERADAS (Ex: o próprio 'obter_status_lt' falhou)
+        logger.exception(f"[Worker Conferência] Erro ao processar LT {numero_lt} (Linha {linha_num}).")
+        if estado:
+            estado.invalidar("erro no job")
+    finally:
+        # Confirma o job: sai da lista de processamento deste worker
+        if not devolvido:
+            fila.confirmar(job_json)
+        
+        # Job devolvido continua na fila: o cadeado fica até ele ser processado
+        if numero_lt != "LT_DESCONHECIDO" and rec.s_controle and not devolvido:
+            try:
+                logger.debug(f"[Worker Conferência] [LT {numero_lt}] Processamento finalizado. Removendo cadeado do '{rec.s_controle}'.")
+                r.srem(rec.s_controle, id)
+            except Exception as e_redis:
+                logger.error(f"[Worker Conferência] [LT {numero_lt}] FALHA CRÍTICA ao remover cadeado do '{rec.s_controle}': {e_redis}")
+        
+        # Finalizar job no watchdog
+        if rec.watchdog and numero_lt:
+            rec.watchdog.finalizar_job(numero_lt)
+        
+        # Alimentar o autoscaler com o tempo de serviço do job
+        if rec.pool_manager and not devolvido:
+            rec.pool_manager.registrar_duracao_job("conferencia", (time.time() - inicio_job) * rec.fator_duracao)
+
+
+def _preparar_aba_conferencia(aba: Page, indice: int, worker_name: str, config: dict):
+    """Aba extra do pipeline: mesmos rastreadores da aba principal, já na tela de consulta."""
+    CapturaRede.from_config(aba, config)
+    EstadoPagina.from_config(aba, f"{worker_name}:{indice}", config)
+    aba.goto(URL_CONSULTA, timeout=PAGE_RELOAD_TIMEOUT)
+    if not garantir_pagina_consulta(aba, URL_CONSULTA, SELETOR_CHAVE_CONSULTA):
+        raise RuntimeError("tela de consulta inacessível")
+
+
 # --- FLUXO REATORADO COMO WORKER ---
 def fluxo_conferencia_worker(page: Page, config: dict):
     import threading
     worker_name = threading.current_thread().name
     logger.info(f"[Worker Conferência] Iniciando... (Thread: {worker_name})")
     
-    URL_CONSULTA = "https://portal.emiteai.com.br/#/ecommerce/shopee/consulta"
-    SELETOR_CHAVE_CONSULTA = 'button:has-text("Filtrar")'
-    
     redis_cfg = config.get('redis_settings', {})
     r_host = redis_cfg.get('host')
     r_port = redis_cfg.get('port')
@@ -99,6 +340,47 @@ def fluxo_conferencia_worker(page: Page, config: dict):
             logger.error(f"[Worker Conferência] Erro ao verificar downscaling: {e}")
         return False
     
+    # Token de parada desta thread (None quando rodando fora do ThreadPoolManager)
+    token_parada = pool_manager.obter_token_parada() if pool_manager else None
+    
+    # Consumo at-least-once: job só sai da lista de processamento ao ser confirmado
+    fila = FilaConfiavel.from_config(r, q_conferencia, worker_name, config)
+    fila.iniciar_heartbeat()
+    
+    # Respostas JSON da API do portal (status lido do payload, não do DOM)
+    captura = CapturaRede.from_config(page, config)
+    
+    # Vista/filtro atuais da página (evita reload e pesquisa repetidos)
+    EstadoPagina.from_config(page, worker_name, config)
+    
+    rec = _RecursosConferencia(
+        r=r,
+        config=config,
+        fila=fila,
+        q_conferencia=q_conferencia,
+        s_controle=s_controle,
+        worker_name=worker_name,
+        watchdog=watchdog,
+        pool_manager=pool_manager,
+        # Mapa LT → status da tabela de consulta (compartilhado entre os workers)
+        varredura=VarreduraConsulta.from_config(r, config),
+        # Opções de Expedidor/Tomador/Recebedor já resolvidas (compartilhado entre os workers)
+        cache_opcoes=CacheOpcoes.from_config(r, config),
+        # Índice de veículos/motoristas/participantes para reprovar cadastros inválidos antes do formulário
+        cadastros=IndiceCadastros.from_config(r, config),
+    )
+    
+    # Várias abas do mesmo contexto, cada uma com um job (None: uma aba, um job por vez)
+    pipeline = PipelinePaginas.from_config(
+        page, worker_name, config,
+        preparar_pagina=lambda aba, indice: _preparar_aba_conferencia(aba, indice, worker_name, config),
+    )
+    if pipeline:
+        rec.fator_duracao = 1 / len(pipeline.vagas)
+        if pool_manager:
+            # Os kill signals dos jobs deste worker ficam com ele (cancela só a aba travada)
+            pool_manager.registrar_worker_pipeline()
+    
     # Função helper para verificar kill signal
     def verificar_kill_signal(job_id_atual: str) -> bool:
         """Verifica se este job foi sinalizado para morrer pelo watchdog."""
@@ -128,25 +410,42 @@ def fluxo_conferencia_worker(page: Page, config: dict):
         # Verificar se thread deve morrer por downscaling
         if verificar_deve_morrer():
             logger.warning(f"[Worker Conferência] 💀 Downscaling detectado. Thread será encerrada.")
+            if pipeline:
+                pipeline.drenar()  # Termina os jobs já iniciados nas outras abas
             break
         
-        # Verificar kill signal para o job atual (se houver)
-        if job_atual and verificar_kill_signal(job_atual):
+        # Verificar kill signal para o(s) job(s) atual(is) (se houver)
+        if pipeline:
+            # Só a aba da LT sinalizada é interrompida; as outras seguem com seus jobs
+            for lt in pipeline.rotulos():
+                if verificar_kill_signal(lt):
+                    logger.critical(f"[Worker Conferência] Interrompendo a LT {lt} por kill signal do Watchdog!")
+                    pipeline.cancelar(lt, motivo="kill signal", falha=True)
+        elif job_atual and verificar_kill_signal(job_atual):
             logger.critical(f"[Worker Conferência] Encerrando thread por kill signal do Watchdog!")
             break
         
+        # Pipeline com jobs em andamento: só pega job novo se houver aba livre e job na fila
+        if pipeline and pipeline.ocupadas:
+            job_json = fila.obter_disponivel() if pipeline.livres() else None
+            if job_json is None:
+                pipeline.passo()
+                continue
+        else:
+            job_json = None
+        
         try:
-            resultado_bruto = r.blpop([q_conferencia], timeout=60) 
+            if job_json is None:
+                # Move o job para a lista de processamento deste worker (devolvido à fila se ele morrer)
+                job_json = fila.aguardar(token_parada, timeout=60)
             
-            if resultado_bruto is None:
+            if job_json is None:
                 logger.debug(f"[Worker Conferência] Nenhum job recebido. Reiniciando loop.")
                 continue
 
-            _, job_json = resultado_bruto
             job = json.loads(job_json)
-            
-            linha_data = job['data']  # Os dados da linha (dicionário)
-            linha_num = job['row']    # O número da linha
+            job_atual = (job['data'].get("N° Carga") or "").strip()
+            inicio_job = time.time()
             
             # Reset contador de reconexão após job bem-sucedido
             tentativas_reconexao = 0
@@ -161,144 +460,21 @@ def fluxo_conferencia_worker(page: Page, config: dict):
             continue
         except Exception as e:
             logger.error(f"[Worker Conferência] Erro ao obter/decodificar job do Redis: {e}")
+            if job_json:
+                fila.confirmar(job_json)  # Descarta job malformado (não volta para a fila)
             time.sleep(5)
             continue
 
-        # 3. PROCESSAR O JOB
-        try:
-            # Validar página ANTES de processar este job
-            pagina_esta_ok = garantir_pagina_consulta(
-                page=page,
-                url_alvo=URL_CONSULTA,
-                seletor_chave=SELETOR_CHAVE_CONSULTA
-            )
-            if not pagina_esta_ok:
-                logger.warning("[Worker Conferência] A página de consulta está inacessível. Re-adicionando job à fila.")
-                # Re-adiciona o job à fila para tentar depois
-                r.rpush(q_conferencia, job_json)
-                time.sleep(5)
-                continue
-            
-            numero_lt = (linha_data.get("N° Carga") or "").strip()
-            id_job = (linha_data.get("ID 3ZX") or "").strip() or f"{numero_lt}-{linha_num}"
-            
-            # Atualizar job atual para verificação de kill signal
-            job_atual = numero_lt
-            
-            # Registrar job no watchdog (usando nome da thread como worker_id)
-            if watchdog:
-                watchdog.registrar_job(numero_lt, worker_id=worker_name, tipo_job="conferencia")
-            
-            try:
-                with TimeoutDetector("Recarregar página", max_seconds=20, job_id=numero_lt):
-                    page.reload(wait_until="domcontentloaded", timeout=PAGE_RELOAD_TIMEOUT)
-            except Exception as reload_err:
-                logger.error(f"[Worker Conferência] Falha ao recarregar página: {reload_err}")
-                # Tenta navegar para a página conhecida
-                try:
-                    with TimeoutDetector("Navegar para consulta", max_seconds=20, job_id=numero_lt):
-                        page.goto(URL_CONSULTA, timeout=PAGE_RELOAD_TIMEOUT)
-                except Exception as goto_err:
-                    logger.error(f"[Worker Conferência] Falha ao navegar para consulta: {goto_err}")
-                    continue
-            
-            carga = Carga.from_row(linha_data)
-            data_agora = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            id = (linha_data.get("ID 3ZX") or "").strip() or "LT_DESCONHECIDO"
-            numero_lt = (linha_data.get("N° Carga") or "").strip()
-
-            if not carga:
-                motivo = "Dados de frete/pedágio inválidos ou ausentes"
-                logger.warning(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) pulado: {motivo}.")
-                continue
-
-            if carga.status_emissao != "Pendente":
-                motivo = f"Status não é 'Pendente' (é '{carga.status_emissao}')"
-                logger.warning(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) pulado: {motivo}.")
-                continue
-
-            if not carga.numero_lt:
-                motivo = "Sem número de carga (N° Carga)"
-                logger.warning(f"[Worker Conferência] Linha {linha_num} pulada: {motivo}.")
-                continue
-
-            status_validos = ["ENTREGA FINALIZADA", "EM TRANSITO", "AGUARDANDO DESCARGA"]
-            if carga.status not in status_validos:
-                motivo = f"Status '{carga.status}' não requer conferência."
-                logger.info(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) pulado: {motivo}")
-                continue
-
-            # --- LÓGICA PRINCIPAL (CAMINHO FELIZ) ---
-            logger.info(f"[Worker Conferência] ▶️  Iniciando RPA para LT {numero_lt} (Linha {linha_num}).")
-            
-            # Suas funções de RPA
-            logger.info(f"[Worker Conferência] [LT {numero_lt}] 📋 Passo 1/3: Aplicando filtro...")
-            filtro_cargas(page, carga.numero_lt)
-            logger.info(f"[Worker Conferência] [LT {numero_lt}] ✅ Filtro aplicado!")
-            
-            logger.info(f"[Worker Conferência] [LT {numero_lt}] 🔍 Passo 2/3: Obtendo status...")
-            status_emiteai = obter_status_lt(page, carga.numero_lt)
-            logger.info(f"[Worker Conferência] [LT {numero_lt}] ✅ Status obtido: {status_emiteai}")
-            
-            # Prepara o pacote de resultados base
-            colunas_update = ["Data Conferência", "Status EmiteAI (coletado)"]
-            valores_update = [data_agora, status_emiteai]
-
-            if status_emiteai == "Aguardando Conferência":
-                # Chama a sub-tarefa de RPA
-                logger.info(f"[Worker Conferência] [LT {numero_lt}] 📝 Passo 3/3: Executando conferência...")
-                resultado_rpa = conferir_lt(page, carga)
-                logger.info(f"[Worker Conferência] [LT {numero_lt}] ✅ Conferência finalizada: {resultado_rpa.get('status')}")
-                
-                # --- Interpreta o resultado do RPA ---
-                if resultado_rpa["status"] == "sucesso":
-                    logger.success(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) SUCESSO na conferência.")
-                    # Sucesso! Marcamos para a próxima etapa (Verificar Emissão)
-                    colunas_update.append("Status de emissão")
-                    valores_update.append("Verificar Emissão")
-                
-                elif resultado_rpa["status"] == "falha_cadastro":
-                    campo_falha = resultado_rpa["campo"]
-                    valor_falha = resultado_rpa["valor"]
-                    logger.error(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) FALHOU (Cadastro): {campo_falha} - {valor_falha}")
-                    # Envia o log de erro para a outra planilha
-                    enviar_job_append_erro(r, config, numero_lt, campo_falha, valor_falha)
-                
-                elif resultado_rpa["status"] == "falha_rpa":
-                    motivo_falha = resultado_rpa.get("motivo") or f"{resultado_rpa.get('campo', 'Erro')}: {resultado_rpa.get('valor', 'Desconhecido')}"
-                    logger.error(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}) FALHOU (RPA): {motivo_falha}")
-
-            elif status_emiteai == "Carga Finalizada" or status_emiteai == "Aguardando Emissão":
-                colunas_update.append("Status de emissão")
-                valores_update.append("Verificar Emissão")
-            
-            elif status_emiteai == "não encontrado":
-                colunas_update.append("Status de emissão")
-                valores_update.append("Arquivo c/ Erro")
-
-            else:
-                motivo = f"Status EmiteAí '{status_emiteai}' não tratado."
-                logger.warning(f"[Worker Conferência] LT {numero_lt} (Linha {linha_num}): {motivo}")
-
-            # 4. ENVIAR RESULTADO (UPDATE) PARA O WRITER
-            enviar_job_update(r, config, linha_num, colunas_update, valores_update)
-
-        except Exception as e:
-            # 5. LIDAR COM FALHAS INESPERADAS (Ex: o próprio 'obter_status_lt' falhou)
-            logger.exception(f"[Worker Conferência] Erro ao processar LT {numero_lt} (Linha {linha_num}).")
-            
-            continue # Pula para o próximo job
-        finally:
-            if numero_lt != "LT_DESCONHECIDO" and s_controle:
-                try:
-                    logger.debug(f"[Worker Conferência] [LT {numero_lt}] Processamento finalizado. Removendo cadeado do '{s_controle}'.")
-                    r.srem(s_controle, id)
-                except Exception as e_redis:
-                    logger.error(f"[Worker Conferência] [LT {numero_lt}] FALHA CRÍTICA ao remover cadeado do '{s_controle}': {e_redis}")
-            
-            # Finalizar job no watchdog
-            if watchdog and numero_lt:
-                watchdog.finalizar_job(numero_lt)
+        if pipeline:
+            aba = pipeline.livres()[0]
+            pipeline.iniciar(aba, _etapas_conferencia(aba, rec, job_json, job, inicio_job), rotulo=job_atual)
+        else:
+            executar_etapas(page, _etapas_conferencia(page, rec, job_json, job, inicio_job))
 
-    logger.info("[Worker Conferência] Encerrado.")
\ No newline at end of file
+    if pipeline:
+        pipeline.cancelar(motivo="worker encerrando")  # Jobs não terminados voltam para a fila
+        pipeline.fechar()
+    fila.parar()
+    if captura:
+        captura.encerrar()
+    logger.info("[Worker Conferência] Encerrado.")
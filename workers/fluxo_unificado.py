@@ -0,0 +1,188 @@
+import redis
+import json
+import time
+import itertools
+import threading
+from loguru import logger
+from playwright.sync_api import Page
+from utils.filas import FilaConfiavel, SeletorFilas
+from utils.captura_rede import CapturaRede
+from utils.estado_pagina import EstadoPagina
+from utils.cache_opcoes import CacheOpcoes
+from utils.cadastros import IndiceCadastros
+from utils.varredura_consulta import VarreduraConsulta
+from utils.pipeline import executar_etapas
+from utils.fluxo_utils import TIPO_UNIFICADO
+from workers.fluxo_conferencia import _RecursosConferencia, _etapas_conferencia
+from workers.fluxo_verificar_emissao import _RecursosEmissao, _processar_lote_emissao
+
+TIPOS_FILA = ["conferencia", "emissao"]
+
+# Fila preferida de cada worker novo, alternada (ver SeletorFilas)
+_contador_workers = itertools.count()
+
+
+# --- WORKER UNIFICADO: CONFERÊNCIA E EMISSÃO NO MESMO CONTEXTO ---
+def fluxo_unificado_worker(page: Page, config: dict):
+    """
+    Consome as duas filas com o mesmo navegador logado.
+
+    A cada job o SeletorFilas escolhe a fila (preferida do worker, ou a outra
+    se o backlog ponderado dela for bem maior); os jobs são processados pelas
+    mesmas etapas dos workers dedicados.
+    """
+    worker_name = threading.current_thread().name
+    preferida = TIPOS_FILA[next(_contador_workers) % len(TIPOS_FILA)]
+    logger.info(f"[Worker Unificado] Iniciando... (Thread: {worker_name}, fila preferida: {preferida})")
+
+    redis_cfg = config.get('redis_settings', {})
+    r_host = redis_cfg.get('host')
+    r_port = redis_cfg.get('port')
+    r_db = redis_cfg.get('db')
+    nomes_filas = {
+        "conferencia": redis_cfg.get('conference_queue'),
+        "emissao": redis_cfg.get('emission_queue'),
+    }
+    s_controle = redis_cfg.get('control_set')
+    if not s_controle:
+        logger.critical("[Worker Unificado] Config 'control_set' não encontrada. O Worker não pode limpar o cadeado!")
+        return
+
+    # Até quantos jobs de emissão são verificados com uma única pesquisa de cards
+    tamanho_lote = max(1, config.get('emission_settings', {}).get('batch_size', 1))
+
+    try:
+        from utils.redis_client import get_redis
+        r = get_redis(host=r_host, port=r_port, db=r_db)
+        logger.info(f"[Worker Unificado] Conectado ao Redis em {r_host}:{r_port}. Ouvindo as filas {list(nomes_filas.values())}")
+    except Exception as e:
+        logger.critical(f"[Worker Unificado] Não foi possível conectar ao Redis: {e}. Worker encerrando.")
+        return
+
+    watchdog = config.get('watchdog', None)
+    pool_manager = config.get('thread_pool_manager', None)
+
+    def verificar_deve_morrer() -> bool:
+        """Verifica se esta thread foi marcada para morte por downscaling."""
+        try:
+            if pool_manager:
+                return pool_manager.thread_deve_morrer(TIPO_UNIFICADO)
+        except Exception as e:
+            logger.error(f"[Worker Unificado] Erro ao verificar downscaling: {e}")
+        return False
+
+    # Token de parada desta thread (None quando rodando fora do ThreadPoolManager)
+    token_parada = pool_manager.obter_token_parada() if pool_manager else None
+
+    # Uma lista de processamento (e heartbeat) por fila: cada job volta à fila de origem
+    filas = {tipo: FilaConfiavel.from_config(r, nome, worker_name, config) for tipo, nome in nomes_filas.items()}
+    for fila in filas.values():
+        fila.iniciar_heartbeat()
+    seletor = SeletorFilas.from_config(filas, preferida, config)
+
+    # Rastreadores da página, compartilhados pelos dois fluxos
+    captura = CapturaRede.from_config(page, config)
+    estado = EstadoPagina.from_config(page, worker_name, config)
+
+    rec_conferencia = _RecursosConferencia(
+        r=r,
+        config=config,
+        fila=filas["conferencia"],
+        q_conferencia=nomes_filas["conferencia"],
+        s_controle=s_controle,
+        worker_name=worker_name,
+        watchdog=watchdog,
+        pool_manager=pool_manager,
+        varredura=VarreduraConsulta.from_config(r, config),
+        cache_opcoes=CacheOpcoes.from_config(r, config),
+        cadastros=IndiceCadastros.from_config(r, config),
+    )
+    rec_emissao = _RecursosEmissao(
+        r=r,
+        config=config,
+        fila=filas["emissao"],
+        s_controle=s_controle,
+        worker_name=worker_name,
+        estado=estado,
+        watchdog=watchdog,
+        pool_manager=pool_manager,
+    )
+
+    def verificar_kill_signal(job_id_atual: str) -> bool:
+        """Verifica se este job foi sinalizado para morrer pelo watchdog."""
+        try:
+            kill_signals = r.smembers("watchdog:kill_workers")
+            for signal_json in kill_signals:
+                try:
+                    signal = json.loads(signal_json)
+                    if signal.get("job_id") == job_id_atual:
+                        r.srem("watchdog:kill_workers", signal_json)
+                        logger.warning(f"[Worker Unificado] 💀 Kill signal detectado para job '{job_id_atual}'!")
+                        return True
+                except json.JSONDecodeError:
+                    continue
+        except Exception as e:
+            logger.error(f"[Worker Unificado] Erro ao verificar kill signal: {e}")
+        return False
+
+    tentativas_reconexao = 0
+    max_tentativas_reconexao = 3
+    job_atual = None
+
+    while True:
+        if verificar_deve_morrer():
+            logger.warning("[Worker Unificado] 💀 Downscaling detectado. Thread será encerrada.")
+            break
+
+        if job_atual and verificar_kill_signal(job_atual):
+            logger.critical("[Worker Unificado] Encerrando thread por kill signal do Watchdog!")
+            break
+
+        # 1. ESCOLHER A FILA E ESPERAR POR UM JOB
+        tipo, job_json = None, None
+        try:
+            escolhido = seletor.obter(token_parada, timeout=60)
+            if escolhido is None:
+                logger.debug("[Worker Unificado] Nenhum job recebido. Reiniciando loop.")
+                continue
+            tipo, job_json = escolhido
+            tentativas_reconexao = 0
+
+            if tipo == "emissao":
+                lote_json = filas["emissao"].completar_lote([job_json], tamanho_lote)
+            else:
+                job = json.loads(job_json)
+                job_atual = (job['data'].get("N° Carga") or "").strip()
+
+        except redis.exceptions.ConnectionError as e:
+            tentativas_reconexao += 1
+            logger.error(f"[Worker Unificado] Erro de conexão Redis ({tentativas_reconexao}/{max_tentativas_reconexao}): {e}")
+            if tentativas_reconexao >= max_tentativas_reconexao:
+                logger.critical("[Worker Unificado] Máximo de tentativas de reconexão atingido. Worker encerrando.")
+                break
+            time.sleep(10)
+            continue
+        except Exception as e:
+            logger.error(f"[Worker Unificado] Erro ao obter/decodificar job do Redis ({tipo}): {e}")
+            try:
+                if tipo == "emissao":
+                    # Falhou ao completar o lote: o job é válido e volta para a fila (com os que vieram junto)
+                    filas["emissao"].devolver_pendentes()
+                elif job_json:
+                    filas[tipo].confirmar(job_json)  # Descarta job malformado (não volta para a fila)
+            except Exception as e_fila:
+                logger.error(f"[Worker Unificado] Falha ao liberar o job de '{tipo}': {e_fila}")
+            time.sleep(5)
+            continue
+
+        # 2. PROCESSAR COM O FLUXO DO TIPO ESCOLHIDO
+        if tipo == "emissao":
+            job_atual = _processar_lote_emissao(page, rec_emissao, lote_json) or job_atual
+        else:
+            executar_etapas(page, _etapas_conferencia(page, rec_conferencia, job_json, job, time.time()))
+
+    for fila in filas.values():
+        fila.parar()
+    if captura:
+        captura.encerrar()
+    logger.info("[Worker Unificado] Encerrado.")
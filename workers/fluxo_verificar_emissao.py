@@ -4,14 +4,21 @@ import json
 import time
 import datetime
 import os
+from dataclasses import dataclass
+from typing import Optional
 from loguru import logger
 from playwright.sync_api import Page
-from utils.fluxo_utils import goto_cards, analisar_status_emissao, identificar_tipo_card
+from utils.fluxo_utils import goto_cards, analisar_status_emissao, extrair_cards_emissao
 from utils.filtros import filtro_cards
 from fluxos.revisar import revisar_lt
-from fluxos.preencher_cte import preencher_cte
-from fluxos.preencher_mdfe import preencher_mdfe
+from fluxos.preencher_cte import localizar_botao_cte, preencher_cte
+from fluxos.preencher_mdfe import localizar_botao_mdfe, preencher_mdfe
 from utils.watchdog import TimeoutDetector
+from utils.filas import FilaConfiavel
+from utils.estado_pagina import EstadoPagina
+from utils.captura_rede import CapturaRede
+from utils.abas_detalhe import AbasDetalhe
+from utils.metricas import metricas
 
 # Carrega configurações de timeout
 config_path = os.path.join(os.path.dirname(__file__), "..", "utils", "config.json")
@@ -38,6 +45,361 @@ def enviar_job_update(r_client: redis.Redis, config: dict, row: int, colunas: li
     except Exception as e:
         logger.error(f"[Worker Emissão] Falha ao enviar job UPDATE (Linha {row}) para o Redis: {e}")
 
+
+
+# --- PROCESSAMENTO DE UM JOB (compartilhado pelos modos individual e em lote) ---
+def _ler_job(job_json: str) -> dict:
+    """Decodifica o payload do Poller nos campos usados pelo worker."""
+    job = json.loads(job_json)
+    linha_data = job['data']  # Os dados da linha (dicionário)
+    linha_num = job['row']    # O número da linha
+    numero_lt = str(linha_data.get("N° Carga") or "").strip()
+    return {
+        "job_json": job_json,
+        "linha_num": linha_num,
+        "numero_lt": numero_lt,
+        "id": (linha_data.get("ID 3ZX") or "").strip() or f"{numero_lt}-{linha_num}",
+        "cte_valor": (linha_data.get("CTE") or "").strip(),
+        "mdfe_valor": (linha_data.get("MDFe") or "").strip(),
+        "status_transporte": (linha_data.get("Status") or "").strip(),
+    }
+
+
+def _precisa_navegador(job: dict) -> bool:
+    """False para linhas sem LT ou com CT-e e MDF-e já preenchidos na planilha."""
+    cte_preenchido = pd.notna(job["cte_valor"]) and str(job["cte_valor"]).strip() != ""
+    mdfe_preenchido = pd.notna(job["mdfe_valor"]) and str(job["mdfe_valor"]).strip() != ""
+    return bool(job["numero_lt"]) and not (cte_preenchido and mdfe_preenchido)
+
+
+def _resolver_sem_navegador(r: redis.Redis, config: dict, job: dict):
+    """Finaliza os jobs que não precisam do RPA (ver _precisa_navegador)."""
+    numero_lt = job["numero_lt"]
+    linha_num = job["linha_num"]
+
+    if not numero_lt:
+        motivo = "Linha sem 'N° Carga'"
+        logger.warning(f"[Worker Emissão] Linha {linha_num} pulada: {motivo}")
+        return
+
+    # --- Validação de "Já Preenchido" (Sua lógica original) ---
+    logger.info(f"[Worker Emissão] LT {numero_lt}: CT-e e MDF-e já estão preenchidos na planilha.")
+    if str(job["cte_valor"]).strip() in ["NFS", "Nota de Serviço"]:
+        enviar_job_update(r, config, linha_num, ["Status de emissão"], ["Nota de Serviço"])
+    else:
+        enviar_job_update(r, config, linha_num, ["Status de emissão"], ["Finalizado"])
+
+
+def _abrir_abas_detalhe(abas: AbasDetalhe, card, numero_lt: str, analise: dict, cte_preenchido: bool, mdfe_preenchido: bool) -> dict:
+    """Abre as telas de CT-e/MDF-e que o job vai ler (as que não abrirem seguem na própria aba)."""
+    botoes = {}
+    if not cte_preenchido and analise["status_cte"] == "autorizado":
+        botoes["cte"], _ = localizar_botao_cte(card)
+    if not mdfe_preenchido and analise["status_mdfe"] == "autorizado":
+        botoes["mdfe"], _ = localizar_botao_mdfe(card, numero_lt)
+    abertas = abas.abrir_varias(numero_lt, botoes)
+    if abertas:
+        logger.debug(f"[Worker Emissão] [LT {numero_lt}] Detalhes abertos em abas: {sorted(abertas)}")
+    return abertas
+
+
+def _processar_analise(page: Page, r: redis.Redis, config: dict, job: dict, analise: dict):
+    """Executa o RPA indicado pelo status do card e envia as atualizações ao Writer."""
+    numero_lt = job["numero_lt"]
+    linha_num = job["linha_num"]
+    status_transporte = job["status_transporte"]
+    cte_preenchido = pd.notna(job["cte_valor"]) and str(job["cte_valor"]).strip() != ""
+    mdfe_preenchido = pd.notna(job["mdfe_valor"]) and str(job["mdfe_valor"]).strip() != ""
+    data_agora = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    card = analise.get("card")
+    status_card = analise.get("status_card")
+
+    if not card or not status_card:
+        logger.error(f"[Worker Emissão] Não foi possível encontrar o card ou analisar o status para a LT {numero_lt}.")
+        return
+
+    # Prepara o lote de atualização
+    colunas_update = ["Data Verificação"]
+    valores_update = [data_agora]
+
+    if status_card == "ag._revisão":
+        tipo_card = analise.get("tipo_card")
+        
+        if tipo_card == "cte":
+            logger.info(f"[Worker Emissão] [LT {numero_lt}] Status 'ag._revisão' (CTE). Executando RPA de revisão...")
+            with TimeoutDetector("Revisar LT", max_seconds=30, job_id=numero_lt):
+                resultado_rpa = revisar_lt(page, numero_lt) # Chama "operário"
+            
+            if resultado_rpa["status"] == "sucesso":
+                logger.success(f"[Worker Emissão] [LT {numero_lt}] Revisão concluída. Job será re-processado pelo Poller.")
+                colunas_update.extend(["Data Revisão"])
+                valores_update.extend([data_agora])
+            else:
+                motivo = resultado_rpa["motivo"]
+                logger.error(f"[Worker Emissão] [LT {numero_lt}] Falha no RPA de Revisão: {motivo}")
+        
+        elif tipo_card == "nfs":
+            logger.info(f"[Worker Emissão] [LT {numero_lt}] É uma Nota de Serviço (NFS). Finalizando.")
+            colunas_update.extend(["Status de emissão", "CTE", "Data Revisão"])
+            valores_update.extend(["Nota de Serviço", "Nota de Serviço", data_agora])
+
+        # Volta para a aba Cards (lógica de RPA original)
+        cards_tab = page.get_by_role("tab", name="Cards")
+        cards_tab.scroll_into_view_if_needed()
+        cards_tab.click(force=True)
+        page.wait_for_function('document.querySelector("[role=tab][aria-selected=true]")?.textContent.includes("Cards")')
+
+    elif status_card in ["liberado", "inconsistente", "ag._emissão"]:
+        
+        # CT-e e MDF-e em abas secundárias, carregando em paralelo; a aba principal fica nos Cards
+        abas = AbasDetalhe.from_config(page, config)
+        abas_abertas = _abrir_abas_detalhe(abas, card, numero_lt, analise, cte_preenchido, mdfe_preenchido) if abas else {}
+        try:
+            # --- TAREFA 1: Preencher CT-e ---
+            if not cte_preenchido:
+                if analise["status_cte"] == "autorizado":
+                    logger.info(f"[Worker Emissão] [LT {numero_lt}] Status CT-e 'Autorizado'. Extraindo dados...")
+                    with TimeoutDetector("Preencher CT-e", max_seconds=30, job_id=numero_lt):
+                        resultado_cte = preencher_cte(page, card, numero_lt, aba=abas_abertas.get("cte"))
+                
+                    if resultado_cte["status"] == "sucesso":
+                        cte_preenchido = True
+                        colunas_update.extend(["CTE", "$ Transportado"])
+                        valores_update.extend([resultado_cte["numeros_ctes"], resultado_cte["valor_total"]])
+                
+                    elif resultado_cte["status"] == "sem_dados":
+                        motivo = "Status 'Autorizado' clicado, mas nenhum CT-e extraído."
+                        logger.warning(f"[Worker Emissão] [LT {numero_lt}] {motivo}")
+                
+                    elif resultado_cte["status"] == "falha_rpa":
+                        motivo = resultado_cte["motivo"]
+                        logger.error(f"[Worker Emissão] [LT {numero_lt}] Falha RPA (preencher_cte): {motivo}")
+
+
+                elif analise["status_cte"] == "rejeitado":
+                    logger.warning(f"[Worker Emissão] [LT {numero_lt}] CT-e 'Rejeitado'. Marcando como erro.")
+                    colunas_update.append("Status de emissão")
+                    valores_update.append("Arquivo c/ Erro")
+                    cte_preenchido = True
+                else:
+                    logger.info(f"[Worker Emissão] [LT {numero_lt}] Status CT-e: {analise['status_cte']} (Aguardando).")
+
+            # --- TAREFA 2: Preencher MDF-e ---
+            if not mdfe_preenchido:
+                if analise["status_mdfe"] == "autorizado":
+                    logger.info(f"[Worker Emissão] [LT {numero_lt}] Status MDF-e 'Autorizado'. Extraindo dados...")
+                    with TimeoutDetector("Preencher MDF-e", max_seconds=30, job_id=numero_lt):
+                        resultado_mdfe = preencher_mdfe(page, card, numero_lt, aba=abas_abertas.get("mdfe"))
+                
+                    if resultado_mdfe["status"] == "sucesso":
+                        mdfe_preenchido = True # Atualiza o estado local
+                        colunas_update.extend(["MDFe", "Chave"])
+                        valores_update.extend([resultado_mdfe["numeros_mdfes"], resultado_mdfe["chaves"]])
+                
+                    elif resultado_mdfe["status"] == "falha_rpa":
+                        motivo = resultado_mdfe["motivo"]
+                        logger.error(f"[Worker Emissão] [LT {numero_lt}] Falha RPA (preencher_mdfe): {motivo}")
+                    else:
+                        logger.info(f"[Worker Emissão] [LT {numero_lt}] Resultado preencher_mdfe: {resultado_mdfe['status']}")
+
+                # Condição de "Não precisa de MDF-e"
+                elif analise["status_mdfe"] == "-" or status_transporte in ["ENTREGA FINALIZADA", "AGUARDANDO DESCARGA"]:
+                    logger.info(f"[Worker Emissão] [LT {numero_lt}] MDF-e não é necessário (Status: {status_transporte} ou '-').")
+                    mdfe_preenchido = True
+                else:
+                     logger.info(f"[Worker Emissão] [LT {numero_lt}] Status MDF-e: {analise['status_mdfe']} (Aguardando).")
+        finally:
+            if abas:
+                abas.fechar(abas_abertas)
+
+        # --- Verificação Final ---
+        if cte_preenchido and mdfe_preenchido:
+            logger.success(f"[Worker Emissão] [LT {numero_lt}] Ambos CT-e e MDF-e preenchidos. Finalizando job.")
+            colunas_update.append("Status de emissão")
+            valores_update.append("Finalizado")
+
+    else:
+        motivo = f"Status do card não tratado: '{status_card}'"
+        logger.warning(f"[Worker Emissão] [LT {numero_lt}] {motivo}")
+
+    # 3. ENVIAR ATUALIZAÇÕES ACUMULADAS
+    if len(colunas_update) > 1: # > 1 pois sempre tem "Data Verificação"
+        enviar_job_update(r, config, linha_num, colunas_update, valores_update)
+    else:
+        logger.info(f"[Worker Emissão] [LT {numero_lt}] Nenhuma atualização necessária neste ciclo.")
+
+
+def _processar_job_individual(page: Page, r: redis.Redis, config: dict, job: dict):
+    """Modo original: filtra os cards só pela LT do job e analisa o card encontrado."""
+    numero_lt = job["numero_lt"]
+    logger.info(f"[Worker Emissão] Iniciando RPA para LT: {numero_lt} (Linha {job['linha_num']})")
+
+    with TimeoutDetector("Navegar para Cards", max_seconds=20, job_id=numero_lt):
+        goto_cards(page)
+    
+    with TimeoutDetector("Filtrar Cards", max_seconds=15, job_id=numero_lt):
+        filtro_cards(page, numero_lt)
+    
+    # 'analisar_status_emissao' é uma função de RPA
+    with TimeoutDetector("Analisar Status de Emissão", max_seconds=20, job_id=numero_lt):
+        analise = analisar_status_emissao(page, numero_lt)
+    if not analise:
+        logger.error(f"[Worker Emissão] Não foi possível encontrar o card ou analisar o status para a LT {numero_lt}.")
+        return
+
+    _processar_analise(page, r, config, job, analise)
+
+
+def _filtrar_lote(page: Page, numeros_lt: list) -> bool:
+    """
+    Modo lote: uma única pesquisa de cards com todas as DTs do lote.
+
+    Returns:
+        True se a página ficou filtrada com as DTs (senão, processar individualmente)
+    """
+    try:
+        with TimeoutDetector("Navegar para Cards", max_seconds=20, job_id=numeros_lt[0]):
+            goto_cards(page)
+        with TimeoutDetector("Filtrar Cards (lote)", max_seconds=15 + 2 * len(numeros_lt), job_id=numeros_lt[0]):
+            filtro_cards(page, numeros_lt)
+        logger.info(f"[Worker Emissão] Lote de {len(numeros_lt)} LTs filtrado em uma única pesquisa.")
+        return True
+    except Exception as e:
+        logger.error(f"[Worker Emissão] Falha no filtro em lote ({e}). As LTs serão processadas individualmente.")
+        return False
+
+
+def _marca_pagina(page: Page, estado: Optional[EstadoPagina]) -> tuple:
+    """URL e estado registrado da aba principal, para saber se um job a tirou dos Cards do lote."""
+    try:
+        url = page.url
+    except Exception:
+        url = None
+    return (url, estado.vista, estado.ultimo_filtro) if estado else (url,)
+
+
+@dataclass
+class _RecursosEmissao:
+    """O que o processamento de um lote usa além da página."""
+    r: redis.Redis
+    config: dict
+    fila: FilaConfiavel
+    s_controle: str
+    worker_name: str
+    estado: Optional[EstadoPagina] = None
+    watchdog: Optional[object] = None
+    pool_manager: Optional[object] = None
+
+
+def _processar_lote_emissao(page: Page, rec: _RecursosEmissao, lote_json: list) -> Optional[str]:
+    """
+    Processa um lote de jobs de emissão já movidos para a lista de
+    processamento do worker (cada um é confirmado ao terminar).
+
+    Returns:
+        LT do último job processado (para a verificação de kill signal)
+    """
+    r, config = rec.r, rec.config
+    job_atual = None
+    jobs = []
+    for job_json in lote_json:
+        try:
+            jobs.append(_ler_job(job_json))
+        except Exception as e:
+            logger.error(f"[Worker Emissão] Erro ao decodificar job do Redis: {e}")
+            rec.fila.confirmar(job_json)  # Descarta job malformado (não volta para a fila)
+
+    # 2. MODO LOTE: uma pesquisa de cards para todas as LTs que precisam do navegador
+    lts_lote = [job["numero_lt"] for job in jobs if _precisa_navegador(job)]
+    inicio_lote = time.time()
+    cards_filtrados = len(lts_lote) > 1 and _filtrar_lote(page, lts_lote)
+    # Todos os cards do lote lidos em uma única chamada ao navegador
+    cards_lote = extrair_cards_emissao(page) if cards_filtrados else None
+    marca_lote = _marca_pagina(page, rec.estado) if cards_filtrados else None
+    custo_filtro_por_job = (time.time() - inicio_lote) / len(lts_lote) if cards_filtrados else 0
+
+    # 3. PROCESSAR CADA JOB
+    for indice, job in enumerate(jobs):
+        numero_lt = job["numero_lt"]
+        linha_num = job["linha_num"]
+        inicio_job = time.time()
+        logger.info(f"[Worker Emissão] Job recebido: LT {numero_lt} (Linha {linha_num}). Processando...")
+
+        # Atualizar job atual para verificação de kill signal
+        job_atual = numero_lt
+
+        # Registrar job no watchdog (usando nome da thread como worker_id)
+        if rec.watchdog and numero_lt:
+            rec.watchdog.registrar_job(numero_lt, worker_id=rec.worker_name, tipo_job="emissao")
+
+        try:
+            if not _precisa_navegador(job):
+                _resolver_sem_navegador(r, config, job)
+                continue # Pega o próximo job
+
+            analise = None
+            if cards_filtrados:
+                with TimeoutDetector("Analisar Status de Emissão", max_seconds=20, job_id=numero_lt):
+                    analise = analisar_status_emissao(page, numero_lt, cards=cards_lote)
+                if analise:
+                    metricas.incrementar("emissao_lote", "resolvidos_no_lote")
+                else:
+                    logger.info(f"[Worker Emissão] [LT {numero_lt}] Card não encontrado no lote. Processando individualmente.")
+                    metricas.incrementar("emissao_lote", "fallback_individual")
+
+            if analise:
+                _processar_analise(page, r, config, job, analise)
+                if analise.get("status_card") == "ag._revisão":
+                    cards_lote = None  # A revisão mexeu no card; os próximos são relidos um a um
+                if cards_filtrados and _marca_pagina(page, rec.estado) != marca_lote:
+                    # CT-e/MDF-e abertos na própria aba: a pesquisa do lote se perdeu, refaz com as LTs restantes
+                    restantes = [j["numero_lt"] for j in jobs[indice + 1:] if _precisa_navegador(j)]
+                    logger.info(f"[Worker Emissão] [LT {numero_lt}] A página saiu dos Cards do lote. Refiltrando {len(restantes)} LTs restantes.")
+                    metricas.incrementar("emissao_lote", "refiltros")
+                    cards_filtrados = len(restantes) > 1 and _filtrar_lote(page, restantes)
+                    cards_lote = extrair_cards_emissao(page) if cards_filtrados else None
+                    marca_lote = _marca_pagina(page, rec.estado) if cards_filtrados else None
+            else:
+                _processar_job_individual(page, r, config, job)
+                cards_filtrados = False  # A pesquisa agora contém só esta LT
+
+        except Exception as e:
+            logger.exception(f"[Worker Emissão] Erro ao processar LT {numero_lt} (Linha {linha_num}). Tentando recarregar a página e continuar.")
+            cards_filtrados = False
+            if rec.estado:
+                rec.estado.invalidar("erro no job")
+
+            try:
+                page.reload(timeout=PAGE_RELOAD_TIMEOUT, wait_until="domcontentloaded")
+            except Exception as reload_err:
+                logger.error(f"[Worker Emissão] Falha ao recarregar página: {reload_err}")
+                # Tenta navegar para a página de cards como fallback
+                try:
+                    page.goto("https://portal.emiteai.com.br/#/emissor", timeout=PAGE_RELOAD_TIMEOUT)
+                except Exception as goto_err:
+                    logger.error(f"[Worker Emissão] Falha crítica ao navegar: {goto_err}")
+            continue
+        finally:
+            # Confirma o job: sai da lista de processamento deste worker
+            rec.fila.confirmar(job["job_json"])
+
+            # Finalizar job no watchdog
+            if rec.watchdog and numero_lt:
+                rec.watchdog.finalizar_job(numero_lt)
+
+            # Alimentar o autoscaler com o tempo de serviço do job
+            if rec.pool_manager:
+                rec.pool_manager.registrar_duracao_job("emissao", time.time() - inicio_job + custo_filtro_por_job)
+            try:
+                logger.debug(f"[Worker Emissão] [LT {numero_lt}] Processamento finalizado. Removendo cadeado do '{rec.s_controle}'.")
+                r.srem(rec.s_controle, job["id"])
+            except Exception as e_redis:
+                logger.error(f"[Worker Emissão] [LT {numero_lt}] FALHA CRÍTICA ao remover cadeado do '{rec.s_controle}': {e_redis}")
+
+    return job_atual
+
+
 # --- FLUXO REATORADO COMO WORKER ---
 def fluxo_verificar_emissao_worker(page: Page, config: dict):
     import threading
@@ -54,6 +416,9 @@ def fluxo_verificar_emissao_worker(page: Page, config: dict):
         logger.critical(f"[Worker Emissão] Config 'control_set' não encontrada. O Worker não pode limpar o cadeado!")
         return
     
+    # Até quantos jobs são verificados com uma única pesquisa de cards (1 = modo individual)
+    tamanho_lote = max(1, config.get('emission_settings', {}).get('batch_size', 1))
+    
     # Extrair watchdog da configuração
     watchdog = config.get('watchdog', None)
     
@@ -70,6 +435,9 @@ def fluxo_verificar_emissao_worker(page: Page, config: dict):
             logger.error(f"[Worker Emissão] Erro ao verificar downscaling: {e}")
         return False
     
+    # Token de parada desta thread (None quando rodando fora do ThreadPoolManager)
+    token_parada = pool_manager.obter_token_parada() if pool_manager else None
+    
     try:
         from utils.redis_client import get_redis
         r = get_redis(host=r_host, port=r_port, db=r_db)
@@ -78,6 +446,27 @@ def fluxo_verificar_emissao_worker(page: Page, config: dict):
         logger.critical(f"[Worker Emissão] Não foi possível conectar ao Redis: {e}. Worker encerrando.")
         return
 
+    # Consumo at-least-once: job só sai da lista de processamento ao ser confirmado
+    fila = FilaConfiavel.from_config(r, q_emissao, worker_name, config)
+    fila.iniciar_heartbeat()
+    
+    # Vista/filtro atuais da página (goto_cards e filtro_cards pulam o que já está feito)
+    estado = EstadoPagina.from_config(page, worker_name, config)
+
+    # Respostas da API (lista de MDF-es com as chaves de acesso, por exemplo)
+    captura = CapturaRede.from_config(page, config)
+
+    rec = _RecursosEmissao(
+        r=r,
+        config=config,
+        fila=fila,
+        s_controle=s_controle,
+        worker_name=worker_name,
+        estado=estado,
+        watchdog=watchdog,
+        pool_manager=pool_manager,
+    )
+
     # Função helper para verificar kill signal
     def verificar_kill_signal(job_id_atual: str) -> bool:
         """Verifica se este job foi sinalizado para morrer pelo watchdog."""
@@ -101,8 +490,6 @@ def fluxo_verificar_emissao_worker(page: Page, config: dict):
     job_atual = None  # Track current job for kill signal check
 
     while True:
-        numero_lt = None  # Para usar no finally block
-        
         # Verificar se thread deve morrer por downscaling
         if verificar_deve_morrer():
             logger.warning(f"[Worker Emissão] 💀 Downscaling detectado. Thread será encerrada.")
@@ -113,33 +500,17 @@ def fluxo_verificar_emissao_worker(page: Page, config: dict):
             logger.critical(f"[Worker Emissão] Encerrando thread por kill signal do Watchdog!")
             break
         
-        # 1. ESPERAR POR UM JOB
+        # 1. ESPERAR POR JOBS (o primeiro bloqueia; o resto do lote só se já estiver na fila)
         try:
-            resultado_bruto = r.blpop([q_emissao], timeout=60) 
+            # Move os jobs para a lista de processamento deste worker (devolvidos à fila se ele morrer)
+            lote_json = fila.aguardar_lote(token_parada, tamanho_lote, timeout=60)
             
-            if resultado_bruto is None:
+            if not lote_json:
                 logger.debug(f"[Worker Emissão] Nenhum job recebido. Reiniciando loop.")
                 continue
-
-            _, job_json = resultado_bruto
-            job = json.loads(job_json)
-            
-            linha_data = job['data']  # Os dados da linha (dicionário)
-            linha_num = job['row']    # O número da linha
-
-            numero_lt = (linha_data.get("N° Carga") or "").strip()
-            id = (linha_data.get("ID 3ZX") or "").strip() or f"{numero_lt}-{linha_num}"
-            logger.info(f"[Worker Emissão] Job recebido: LT {numero_lt} (Linha {linha_num}). Processando...")
-            
-            # Atualizar job atual para verificação de kill signal
-            job_atual = numero_lt
             
             # Reset contador de reconexão após job bem-sucedido
             tentativas_reconexao = 0
-            
-            # Registrar job no watchdog (usando nome da thread como worker_id)
-            if watchdog:
-                watchdog.registrar_job(numero_lt, worker_id=worker_name, tipo_job="emissao")
 
         except redis.exceptions.ConnectionError as e:
             tentativas_reconexao += 1
@@ -150,186 +521,14 @@ def fluxo_verificar_emissao_worker(page: Page, config: dict):
             time.sleep(10)
             continue
         except Exception as e:
-            logger.error(f"[Worker Emissão] Erro ao obter/decodificar job do Redis: {e}")
+            logger.error(f"[Worker Emissão] Erro ao obter job do Redis: {e}")
             time.sleep(5)
             continue
 
-        # 2. PROCESSAR O JOB
-        try:
-            # --- Extração de Dados do Job (Planilha) ---
-            numero_lt = (linha_data.get("N° Carga") or "").strip()
-            cte_valor = (linha_data.get("CTE") or "").strip()
-            mdfe_valor = (linha_data.get("MDFe") or "").strip()
-            status_transporte = (linha_data.get("Status") or "").strip()
-            id = (linha_data.get("ID 3ZX") or "").strip() or f"{numero_lt}-{linha_num}"
-
-            if not numero_lt:
-                motivo = "Linha sem 'N° Carga'"
-                logger.warning(f"[Worker Emissão] Linha {linha_num} pulada: {motivo}")
-                continue
-            
-            numero_lt = str(numero_lt).strip()
-
-            # --- Validação de "Já Preenchido" (Sua lógica original) ---
-            cte_preenchido = pd.notna(cte_valor) and str(cte_valor).strip() != ""
-            mdfe_preenchido = pd.notna(mdfe_valor) and str(mdfe_valor).strip() != ""
-            data_agora = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-            if cte_preenchido and mdfe_preenchido:
-                logger.info(f"[Worker Emissão] LT {numero_lt}: CT-e e MDF-e já estão preenchidos na planilha.")
-                if str(cte_valor).strip() in ["NFS", "Nota de Serviço"]:
-                    enviar_job_update(r, config, linha_num, ["Status de emissão"], ["Nota de Serviço"])
-                else:
-                    enviar_job_update(r, config, linha_num, ["Status de emissão"], ["Finalizado"])
-                continue # Pega o próximo job
-            
-            logger.info(f"[Worker Emissão] Iniciando RPA para LT: {numero_lt} (Linha {linha_num})")
-
-            with TimeoutDetector("Navegar para Cards", max_seconds=20, job_id=numero_lt):
-                goto_cards(page)
-            
-            with TimeoutDetector("Filtrar Cards", max_seconds=15, job_id=numero_lt):
-                filtro_cards(page, numero_lt)
-            
-            # 'analisar_status_emissao' é uma função de RPA
-            with TimeoutDetector("Analisar Status de Emissão", max_seconds=20, job_id=numero_lt):
-                analise = analisar_status_emissao(page, numero_lt)
-            if not analise:
-                logger.error(f"[Worker Emissão] Não foi possível encontrar o card ou analisar o status para a LT {numero_lt}.")
-                continue # Pula para o próximo job
-
-            card = analise.get("card")
-            status_card = analise.get("status_card")
-
-            if not card or not status_card:
-                logger.error(f"[Worker Emissão] Não foi possível encontrar o card ou analisar o status para a LT {numero_lt}.")
-                continue
-
-            # Prepara o lote de atualização
-            colunas_update = ["Data Verificação"]
-            valores_update = [data_agora]
-
-            if status_card == "ag._revisão":
-                tipo_card = identificar_tipo_card(card)
-                
-                if tipo_card == "cte":
-                    logger.info(f"[Worker Emissão] [LT {numero_lt}] Status 'ag._revisão' (CTE). Executando RPA de revisão...")
-                    with TimeoutDetector("Revisar LT", max_seconds=30, job_id=numero_lt):
-                        resultado_rpa = revisar_lt(page, numero_lt) # Chama "operário"
-                    
-                    if resultado_rpa["status"] == "sucesso":
-                        logger.success(f"[Worker Emissão] [LT {numero_lt}] Revisão concluída. Job será re-processado pelo Poller.")
-                        colunas_update.extend(["Data Revisão"])
-                        valores_update.extend([data_agora])
-                    else:
-                        motivo = resultado_rpa["motivo"]
-                        logger.error(f"[Worker Emissão] [LT {numero_lt}] Falha no RPA de Revisão: {motivo}")
-                
-                elif tipo_card == "nfs":
-                    logger.info(f"[Worker Emissão] [LT {numero_lt}] É uma Nota de Serviço (NFS). Finalizando.")
-                    colunas_update.extend(["Status de emissão", "CTE", "Data Revisão"])
-                    valores_update.extend(["Nota de Serviço", "Nota de Serviço", data_agora])
-
-                # Volta para a aba Cards (lógica de RPA original)
-                cards_tab = page.get_by_role("tab", name="Cards")
-                cards_tab.scroll_into_view_if_needed()
-                cards_tab.click(force=True)
-                page.wait_for_function('document.querySelector("[role=tab][aria-selected=true]")?.textContent.includes("Cards")')
-
-            elif status_card in ["liberado", "inconsistente", "ag._emissão"]:
-                
-                # --- TAREFA 1: Preencher CT-e ---
-                if not cte_preenchido:
-                    if analise["status_cte"] == "autorizado":
-                        logger.info(f"[Worker Emissão] [LT {numero_lt}] Status CT-e 'Autorizado'. Extraindo dados...")
-                        with TimeoutDetector("Preencher CT-e", max_seconds=30, job_id=numero_lt):
-                            resultado_cte = preencher_cte(page, card, numero_lt)
-                        
-                        if resultado_cte["status"] == "sucesso":
-                            cte_preenchido = True
-                            colunas_update.extend(["CTE", "$ Transportado"])
-                            valores_update.extend([resultado_cte["numeros_ctes"], resultado_cte["valor_total"]])
-                        
-                        elif resultado_cte["status"] == "sem_dados":
-                            motivo = "Status 'Autorizado' clicado, mas nenhum CT-e extraído."
-                            logger.warning(f"[Worker Emissão] [LT {numero_lt}] {motivo}")
-                        
-                        elif resultado_cte["status"] == "falha_rpa":
-                            motivo = resultado_cte["motivo"]
-                            logger.error(f"[Worker Emissão] [LT {numero_lt}] Falha RPA (preencher_cte): {motivo}")
-
-
-                    elif analise["status_cte"] == "rejeitado":
-                        logger.warning(f"[Worker Emissão] [LT {numero_lt}] CT-e 'Rejeitado'. Marcando como erro.")
-                        colunas_update.append("Status de emissão")
-                        valores_update.append("Arquivo c/ Erro")
-                        cte_preenchido = True
-                    else:
-                        logger.info(f"[Worker Emissão] [LT {numero_lt}] Status CT-e: {analise['status_cte']} (Aguardando).")
-
-                # --- TAREFA 2: Preencher MDF-e ---
-                if not mdfe_preenchido:
-                    if analise["status_mdfe"] == "autorizado":
-                        logger.info(f"[Worker Emissão] [LT {numero_lt}] Status MDF-e 'Autorizado'. Extraindo dados...")
-                        with TimeoutDetector("Preencher MDF-e", max_seconds=30, job_id=numero_lt):
-                            resultado_mdfe = preencher_mdfe(page, card, numero_lt)
-                        
-                        if resultado_mdfe["status"] == "sucesso":
-                            mdfe_preenchido = True # Atualiza o estado local
-                            colunas_update.extend(["MDFe", "Chave"])
-                            valores_update.extend([resultado_mdfe["numeros_mdfes"], resultado_mdfe["chaves"]])
-                        
-                        elif resultado_mdfe["status"] == "falha_rpa":
-                            motivo = resultado_mdfe["motivo"]
-                            logger.error(f"[Worker Emissão] [LT {numero_lt}] Falha RPA (preencher_mdfe): {motivo}")
-                        else:
-                            logger.info(f"[Worker Emissão] [LT {numero_lt}] Resultado preencher_mdfe: {resultado_mdfe['status']}")
-
-                    # Condição de "Não precisa de MDF-e"
-                    elif analise["status_mdfe"] == "-" or status_transporte in ["ENTREGA FINALIZADA", "AGUARDANDO DESCARGA"]:
-                        logger.info(f"[Worker Emissão] [LT {numero_lt}] MDF-e não é necessário (Status: {status_transporte} ou '-').")
-                        mdfe_preenchido = True
-                    else:
-                         logger.info(f"[Worker Emissão] [LT {numero_lt}] Status MDF-e: {analise['status_mdfe']} (Aguardando).")
-
-                # --- Verificação Final ---
-                if cte_preenchido and mdfe_preenchido:
-                    logger.success(f"[Worker Emissão] [LT {numero_lt}] Ambos CT-e e MDF-e preenchidos. Finalizando job.")
-                    colunas_update.append("Status de emissão")
-                    valores_update.append("Finalizado")
-
-            else:
-                motivo = f"Status do card não tratado: '{status_card}'"
-                logger.warning(f"[Worker Emissão] [LT {numero_lt}] {motivo}")
-
-            # 3. ENVIAR ATUALIZAÇÕES ACUMULADAS
-            if len(colunas_update) > 1: # > 1 pois sempre tem "Data Verificação"
-                enviar_job_update(r, config, linha_num, colunas_update, valores_update)
-            else:
-                logger.info(f"[Worker Emissão] [LT {numero_lt}] Nenhuma atualização necessária neste ciclo.")
-
-        except Exception as e:
-            logger.exception(f"[Worker Emissão] Erro ao processar LT {numero_lt} (Linha {linha_num}). Tentando recarregar a página e continuar.")
-            
-            try:
-                page.reload(timeout=PAGE_RELOAD_TIMEOUT, wait_until="domcontentloaded")
-            except Exception as reload_err:
-                logger.error(f"[Worker Emissão] Falha ao recarregar página: {reload_err}")
-                # Tenta navegar para a página de cards como fallback
-                try:
-                    page.goto("https://portal.emiteai.com.br/#/emissor", timeout=PAGE_RELOAD_TIMEOUT)
-                except Exception as goto_err:
-                    logger.error(f"[Worker Emissão] Falha crítica ao navegar: {goto_err}")
-            continue
-        finally:
-            # Finalizar job no watchdog
-            if watchdog and numero_lt:
-                watchdog.finalizar_job(numero_lt)
-            try:
-                logger.debug(f"[Worker Emissão] [LT {numero_lt}] Processamento finalizado. Removendo cadeado do '{s_controle}'.")
-                r.srem(s_controle, id)
-            except Exception as e_redis:
-                logger.error(f"[Worker Emissão] [LT {numero_lt}] FALHA CRÍTICA ao remover cadeado do '{s_controle}': {e_redis}")
+        job_atual = _processar_lote_emissao(page, rec, lote_json) or job_atual
         
-    # --- NA TEORIA NUNCA CHEGA AQUI ---
+    # --- Downscaling, parada ou falha de conexão ---
+    fila.parar()
+    if captura:
+        captura.encerrar()
     logger.info(f"[Worker Emissão] Encerrado.")
\ No newline at end of file